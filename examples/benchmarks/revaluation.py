@@ -0,0 +1,83 @@
+"""账户市值重算性能测试
+
+对比 vxAccountsManager 两种账户市值重算方式:
+    python  -- 拉取全部持仓至python计算，并写回全部持仓及账户
+    aggregate -- 数据库端聚合计算，只写回有变化的账户
+
+用法:
+    python examples/benchmarks/revaluation.py --db_uri mongodb://localhost:27017
+"""
+
+import argparse
+import random
+import time
+
+from vxquant.model.portfolio import vxAccountsManager
+from vxquant.model.exchange import vxAccountInfo, vxCashPosition, vxPosition
+
+
+def seed(manager, n_accounts, n_positions):
+    """生成 n_accounts 个账户，每个账户 n_positions 个持仓"""
+    db = manager._database
+    for collection in ["accounts", "positions"]:
+        db[collection].delete_many({})
+
+    accounts = []
+    positions = []
+    for i in range(n_accounts):
+        account_id = f"bench_{i:04d}"
+        accounts.append(vxAccountInfo(account_id=account_id).message)
+        positions.append(
+            vxCashPosition(account_id=account_id, volume_his=1_000_000).message
+        )
+        for j in range(n_positions):
+            positions.append(
+                vxPosition(
+                    account_id=account_id,
+                    symbol=f"SHSE.{600000 + j}",
+                    volume_his=random.randint(1, 100) * 100,
+                    lasttrade=round(random.uniform(5, 50), 2),
+                    cost=random.uniform(1000, 100000),
+                ).message
+            )
+    db.accounts.insert_many(accounts)
+    db.positions.insert_many(positions)
+    db.positions.create_index([("account_id", 1), ("symbol", 1)], unique=True)
+    db.accounts.create_index([("account_id", 1)], unique=True)
+    return [account["account_id"] for account in accounts]
+
+
+def timeit(manager, account_ids, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        manager._update_account_info(account_ids)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db_uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db_name", default="vxquant_bench")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    manager = vxAccountsManager(
+        args.db_uri, args.db_name, hqfetcher=lambda *symbols: {}
+    )
+    account_ids = seed(manager, args.accounts, args.positions)
+    print(f"{args.accounts} 个账户 x {args.positions} 个持仓")
+
+    for aggregate in [False, True]:
+        manager._aggregate_revaluation = aggregate
+        # 第一轮所有账户均有变化，之后各轮持仓未变化
+        first = timeit(manager, account_ids, 1)
+        steady = timeit(manager, account_ids, args.rounds)
+        name = "aggregate" if aggregate else "python"
+        print(f"{name:>10}: 首次 {first*1000:.1f}ms, 无变化时 {steady*1000:.1f}ms")
+        manager._database.accounts.update_many({}, {"$set": {"marketvalue": 0}})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""日终结算性能测试
+
+默认只测试 settle_frames 的计算耗时；指定 --db_uri 时，写入测试数据并测试
+vxSettlementEngine 在不同进程数下的完整结算耗时(读取、计算、批量写回)。
+
+用法:
+    python examples/benchmarks/settlement.py --accounts 10000
+    python examples/benchmarks/settlement.py --accounts 10000 --db_uri mongodb://localhost:27017
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from vxquant.model.settle import settle_frames, vxSettlementEngine
+
+
+def make_frames(n_accounts, n_positions, n_orders, seed=0):
+    """生成测试数据"""
+    rng = np.random.default_rng(seed)
+    account_ids = np.array([f"bench_{i:05d}" for i in range(n_accounts)])
+    symbols = np.array([f"SHSE.{600000 + j}" for j in range(n_positions)])
+
+    accounts = pd.DataFrame(
+        {
+            "account_id": account_ids,
+            "debt": 0.0,
+            "fund_shares": 1_000_000.0,
+        }
+    )
+    stocks = pd.DataFrame(
+        {
+            "account_id": np.repeat(account_ids, n_positions),
+            "symbol": np.tile(symbols, n_accounts),
+            "volume_his": rng.integers(0, 100, n_accounts * n_positions) * 100.0,
+            "volume_today": rng.integers(0, 10, n_accounts * n_positions) * 100.0,
+            "lasttrade": rng.uniform(5, 50, n_accounts * n_positions).round(2),
+            "cost": rng.uniform(1_000, 100_000, n_accounts * n_positions).round(2),
+            "allow_t0": False,
+        }
+    )
+    cash = pd.DataFrame(
+        {
+            "account_id": account_ids,
+            "symbol": "CNY",
+            "volume_his": 500_000.0,
+            "volume_today": 0.0,
+            "lasttrade": 1.0,
+            "cost": 500_000.0,
+            "allow_t0": True,
+        }
+    )
+    n = n_accounts * n_orders
+    orders = pd.DataFrame(
+        {
+            "order_id": [f"order_{i}" for i in range(n)],
+            "account_id": np.repeat(account_ids, n_orders),
+            "symbol": rng.choice(symbols, n),
+            "order_direction": rng.choice(["Buy", "Sell"], n),
+            "volume": 100,
+            "filled_volume": 0,
+            "price": 10.0,
+            "status": "New",
+            "due_dt": rng.choice([0.0, 2e9], n),
+        }
+    )
+    return accounts, pd.concat([cash, stocks], ignore_index=True), orders
+
+
+def seed_database(db_uri, db_name, accounts, positions, orders):
+    """写入测试数据"""
+    from vxutils.database import vxMongoDB
+
+    db = vxMongoDB(db_uri, db_name)
+    for collection, frame in [
+        ("accounts", accounts),
+        ("positions", positions),
+        ("orders", orders),
+    ]:
+        db[collection].delete_many({})
+        db[collection].insert_many(frame.to_dict("records"))
+    db.ensure_index("accounts", "account_id", unique=True)
+    db.ensure_index("positions", ["account_id", "symbol"], unique=True)
+    db.ensure_index("orders", ["account_id", "status"])
+    db.ensure_index("orders", "order_id", unique=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=5)
+    parser.add_argument("--db_uri", default="")
+    parser.add_argument("--db_name", default="vxquant_bench")
+    args = parser.parse_args()
+
+    frames = make_frames(args.accounts, args.positions, args.orders)
+    print(
+        f"{args.accounts} 个账户 x {args.positions} 个持仓 x {args.orders} 个委托"
+    )
+
+    start = time.perf_counter()
+    settle_frames(*frames, settle_dt=time.time())
+    print(f"settle_frames: {time.perf_counter() - start:.2f}s")
+
+    if not args.db_uri:
+        return
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        seed_database(args.db_uri, args.db_name, *frames)
+        engine = vxSettlementEngine(args.db_uri, args.db_name, workers=workers)
+        start = time.perf_counter()
+        summary = engine.settle()
+        print(
+            f"vxSettlementEngine(workers={workers}):"
+            f" {time.perf_counter() - start:.2f}s {summary}"
+        )
+
+
+if __name__ == "__main__":
+    main()
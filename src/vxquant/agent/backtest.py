@@ -0,0 +1,297 @@
+"""回测agent
+
+以虚拟时钟驱动 vxEngine: 从本地K线库回放历史行情(on_bar)，由 vxSimBroker 按K线撮合
+vxStockAccount 的委托，策略目录与实盘一样通过 vxEngine.load_modules 加载。
+"""
+
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from vxutils import logger, vxtime, to_timestamp, to_timestring
+from vxsched import vxengine, vxEngine, vxEvent, vxContext
+from vxsched.clock import vxVirtualClock
+from vxquant.mdapi.barstore import vxBarStore
+from vxquant.model.exchange import vxOrder, vxTick, vxTrade
+from vxquant.model.contants import OrderDirection, OrderStatus, TradeStatus
+from vxquant.model.portfolio import vxStockAccount
+
+__all__ = ["vxBarFeed", "vxSimBroker", "run_backtest"]
+
+
+class vxBarFeed:
+    """历史K线行情
+
+    按日期将回测区间的K线生成 on_bar 事件，event.data 为当日的K线 DataFrame(index: symbol)。
+    """
+
+    def __init__(
+        self,
+        bars: pd.DataFrame,
+        frequency: str = "1d",
+        event_type: str = "on_bar",
+        bar_time: str = "15:00:00",
+    ) -> None:
+        """历史K线行情
+
+        Arguments:
+            bars {pd.DataFrame} -- K线数据, index: [date, symbol]
+
+        Keyword Arguments:
+            frequency {str} -- K线周期 (default: {"1d"})
+            event_type {str} -- 事件类型 (default: {"on_bar"})
+            bar_time {str} -- 日线的触发时间，分钟线以K线时间触发 (default: {"15:00:00"})
+        """
+        self._bars = bars
+        self._event_type = event_type
+        self._offset = (
+            pd.Timedelta(bar_time) if frequency == "1d" else pd.Timedelta(0)
+        )
+
+    @classmethod
+    def from_store(
+        cls,
+        bar_store: vxBarStore,
+        symbols: Optional[List[str]] = None,
+        start_date: str = "",
+        end_date: str = "",
+        frequency: str = "1d",
+        **kwargs,
+    ) -> "vxBarFeed":
+        """一次性从本地K线库读取回测区间的K线
+
+        Arguments:
+            bar_store {vxBarStore} -- 本地K线库
+
+        Keyword Arguments:
+            symbols {List[str]} -- 标的列表，为None时回放全部标的 (default: {None})
+            start_date {str} -- 开始日期(含) (default: {""})
+            end_date {str} -- 结束日期(含) (default: {""})
+            frequency {str} -- K线周期 (default: {"1d"})
+        """
+        bars = bar_store.read(
+            symbols, start_date=start_date, end_date=end_date, frequency=frequency
+        )
+        return cls(bars, frequency, **kwargs)
+
+    @property
+    def dates(self) -> pd.Index:
+        """K线日期"""
+        return self._bars.index.get_level_values("date").unique()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __iter__(self) -> Iterator[vxEvent]:
+        for date, bars in self._bars.groupby(level="date", sort=True):
+            yield vxEvent(
+                type=self._event_type,
+                data=bars.droplevel("date"),
+                trigger_dt=to_timestamp(date + self._offset),
+            )
+
+
+class vxSimBroker:
+    """按K线撮合的模拟券商
+
+    on_bar 须先于策略处理每一根K线:
+        1. 交易日切换时执行账户日结
+        2. 以当前K线撮合此前提交的未完成委托，未成交部分作废
+        3. 以收盘价更新持仓市值，并记录账户净值
+    限价买单在最低价不高于委托价时以 min(委托价, 开盘价) 成交，限价卖单在最高价不低于
+    委托价时以 max(委托价, 开盘价) 成交，市价单以开盘价成交。
+    """
+
+    def __init__(
+        self,
+        account: vxStockAccount,
+        commission_coeff: float = 0.0003,
+        tax_coeff: float = 0.001,
+        min_commission: float = 5.0,
+    ) -> None:
+        """按K线撮合的模拟券商
+
+        Arguments:
+            account {vxStockAccount} -- 回测账户
+
+        Keyword Arguments:
+            commission_coeff {float} -- 佣金费率 (default: {0.0003})
+            tax_coeff {float} -- 卖出印花税率 (default: {0.001})
+            min_commission {float} -- 最低佣金 (default: {5.0})
+        """
+        self._account = account
+        self._commission_coeff = commission_coeff
+        self._tax_coeff = tax_coeff
+        self._min_commission = min_commission
+        self._bars = pd.DataFrame()
+        self._trade_date = None
+        self._navs: Dict[pd.Timestamp, float] = {}
+
+    @property
+    def account(self) -> vxStockAccount:
+        """回测账户"""
+        return self._account
+
+    @property
+    def navs(self) -> pd.DataFrame:
+        """每日账户净值"""
+        navs = pd.Series(self._navs, name="nav", dtype=float)
+        navs.index.name = "date"
+        return navs.to_frame().assign(fund_nav=navs / navs.iloc[0] if len(navs) else 1)
+
+    def ticks(self, symbols: Optional[List[str]] = None) -> Dict[str, vxTick]:
+        """以当前K线收盘价生成的行情，可用于 submit_orders 的市价单估值
+
+        Keyword Arguments:
+            symbols {List[str]} -- 标的列表，为None时返回全部标的 (default: {None})
+
+        Returns:
+            Dict[str, vxTick] -- {symbol: vxTick}
+        """
+        bars = self._bars if symbols is None else self._bars.reindex(symbols).dropna()
+        return {
+            symbol: vxTick(
+                symbol=symbol,
+                open=bar.open,
+                high=bar.high,
+                low=bar.low,
+                lasttrade=bar.close,
+                yclose=getattr(bar, "yclose", bar.close),
+            )
+            for symbol, bar in zip(bars.index, bars.itertuples(index=False))
+        }
+
+    def on_bar(self, context: vxContext, event: vxEvent) -> None:
+        """K线事件处理函数"""
+        self._bars = event.data
+        trade_date = pd.Timestamp(to_timestring(vxtime.now(), "%Y-%m-%d"))
+        if self._trade_date is not None and trade_date != self._trade_date:
+            self._account.on_settle()
+        self._trade_date = trade_date
+
+        self._match_orders()
+        self._account.on_tick(self.ticks(list(self._account.get_positions().keys())))
+        self._navs[trade_date] = self._account.account_info.nav
+
+    def _match_orders(self) -> None:
+        """撮合未完成的委托，未成交的委托作废"""
+        for order in list(self._account.get_open_orders().values()):
+            price = self._match_price(order)
+            if price is None:
+                expired_order = vxOrder(order.message)
+                expired_order.status = OrderStatus.Expired
+                self._account.on_order_status(expired_order)
+                continue
+
+            volume = order.volume - order.filled_volume
+            commission = price * volume * self._commission_coeff
+            if order.order_direction == OrderDirection.Sell:
+                commission += price * volume * self._tax_coeff
+            self._account.on_execution_report(
+                vxTrade(
+                    account_id=order.account_id,
+                    order_id=order.order_id,
+                    exchange_order_id=order.exchange_order_id,
+                    symbol=order.symbol,
+                    order_direction=order.order_direction,
+                    order_offset=order.order_offset,
+                    price=price,
+                    volume=volume,
+                    commission=max(commission, self._min_commission),
+                    status=TradeStatus.Trade,
+                )
+            )
+
+    def _match_price(self, order: vxOrder) -> Optional[float]:
+        """委托的成交价，不能成交时返回None"""
+        if order.symbol not in self._bars.index:
+            return None
+
+        bar = self._bars.loc[order.symbol]
+        if not bar["volume"] > 0:
+            return None
+        if order.price <= 0:
+            return bar["open"]
+        if order.order_direction == OrderDirection.Buy:
+            return min(order.price, bar["open"]) if bar["low"] <= order.price else None
+        return max(order.price, bar["open"]) if bar["high"] >= order.price else None
+
+
+def _slice_bars(
+    bars: pd.DataFrame,
+    symbols: Optional[List[str]] = None,
+    start_date: str = "",
+    end_date: str = "",
+) -> pd.DataFrame:
+    """按标的及日期区间筛选已读取的K线"""
+    dates = bars.index.get_level_values("date")
+    mask = np.ones(len(bars), dtype=bool)
+    if symbols is not None:
+        mask &= bars.index.get_level_values("symbol").isin(symbols)
+    if start_date:
+        mask &= dates >= pd.Timestamp(start_date)
+    if end_date:
+        mask &= dates < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    return bars[mask] if not mask.all() else bars
+
+
+def run_backtest(
+    mod_path: str,
+    bar_store: Union[vxBarStore, pd.DataFrame],
+    symbols: Optional[List[str]] = None,
+    start_date: str = "",
+    end_date: str = "",
+    balance: float = 1_000_000,
+    engine: vxEngine = vxengine,
+    params: Optional[Dict] = None,
+) -> pd.DataFrame:
+    """运行回测
+
+    运行前重置 engine(清空已注册的事件处理函数、待处理的events及上下文)，再加载策略
+    目录，因此同一进程中可以多次运行回测。策略通过 context.account 下单，
+    context.broker.ticks() 获取当前K线对应的行情。
+
+    Arguments:
+        mod_path {str} -- 策略目录
+        bar_store {Union[vxBarStore, pd.DataFrame]} -- 本地K线库或已读取的K线(index: [date, symbol])
+
+    Keyword Arguments:
+        symbols {List[str]} -- 回测标的，为None时回放全部标的 (default: {None})
+        start_date {str} -- 开始日期(含) (default: {""})
+        end_date {str} -- 结束日期(含) (default: {""})
+        balance {float} -- 初始资金 (default: {1_000_000})
+        engine {vxEngine} -- 驱动引擎 (default: {vxengine})
+        params {Dict} -- 策略参数，保存于 context.params (default: {None})
+
+    Returns:
+        pd.DataFrame -- 每日账户净值, index: date, columns: [nav, fund_nav]
+    """
+    if isinstance(bar_store, pd.DataFrame):
+        feed = vxBarFeed(_slice_bars(bar_store, symbols, start_date, end_date))
+    else:
+        feed = vxBarFeed.from_store(bar_store, symbols, start_date, end_date)
+    if not len(feed):
+        logger.warning(f"没有 {start_date} ~ {end_date} 的K线数据")
+        return pd.DataFrame(columns=["nav", "fund_nav"])
+
+    # 上一次回测注册的模拟券商及策略的事件处理函数不能继续处理本次的K线
+    engine.reset()
+    dates = feed.dates
+    clock = vxVirtualClock(to_timestamp(dates.min()))
+    with clock.install():
+        account = vxStockAccount(balance=balance)
+        broker = vxSimBroker(account)
+
+    engine.context.account = account
+    engine.context.broker = broker
+    engine.context.params = params or {}
+    # 模拟券商须先于策略处理K线
+    engine.event_handler.register("on_bar", broker.on_bar)
+    engine.load_modules(mod_path)
+
+    count = engine.run_backtest(
+        to_timestamp(dates.max() + pd.Timedelta(days=1)), clock=clock, feed=feed
+    )
+    logger.info(f"回测完成: {len(feed)} 个交易日，{count} 个event")
+    return broker.navs
@@ -0,0 +1,342 @@
+"""参数扫描
+
+vxParameterSweep: 以进程池并行运行同一策略目录在参数网格上的回测，
+汇总各组参数的净值曲线及绩效指标，并支持中断后继续运行。
+"""
+
+import os
+import json
+import hashlib
+import itertools
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from vxutils import logger
+from vxquant.mdapi.barstore import vxBarStore
+from vxquant.agent.backtest import run_backtest
+
+__all__ = ["vxParameterSweep", "expand_grid", "nav_metrics"]
+
+_RUNS_DIR = "runs"
+# 年化的交易日数
+_TRADE_DAYS_PER_YEAR = 244
+
+
+def expand_grid(param_grid: Mapping[str, Sequence]) -> List[Dict[str, Any]]:
+    """展开参数网格
+
+    Arguments:
+        param_grid {Mapping[str, Sequence]} -- {参数名: 候选值列表}
+
+    Returns:
+        List[Dict[str, Any]] -- 全部参数组合
+    """
+    keys = list(param_grid.keys())
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(*(param_grid[key] for key in keys))
+    ]
+
+
+def _digest(obj: Any) -> str:
+    """稳定的摘要，用于断点续跑的标识"""
+    text = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _read_bars(bars_path: str) -> pd.DataFrame:
+    """以内存映射方式打开K线文件
+
+    数值列直接引用映射的内存(只读)，date、symbol 以字典编码保存，索引由字典及编码构建，
+    各子进程共享操作系统的页缓存，不会各自拷贝整份行情。
+    """
+    source = pa.memory_map(bars_path, "r")
+    table = pa.ipc.open_file(source).read_all()
+
+    def _array(name: str) -> pa.Array:
+        column = table.column(name)
+        return column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+    levels, codes = [], []
+    for name in ("date", "symbol"):
+        array = _array(name)
+        levels.append(pd.Index(array.dictionary.to_pandas()))
+        codes.append(array.indices.to_numpy(zero_copy_only=False))
+    index = pd.MultiIndex(
+        levels=levels, codes=codes, names=["date", "symbol"], verify_integrity=False
+    )
+    return pd.DataFrame(
+        {
+            name: _array(name).to_numpy(zero_copy_only=False)
+            for name in table.column_names
+            if name not in ("date", "symbol")
+        },
+        index=index,
+        copy=False,
+    )
+
+
+def nav_metrics(navs: pd.DataFrame) -> Dict[str, float]:
+    """净值曲线的绩效指标
+
+    Arguments:
+        navs {pd.DataFrame} -- run_backtest 返回的每日净值, columns: [nav, fund_nav]
+
+    Returns:
+        Dict[str, float] -- 总收益、年化收益、年化波动率、夏普比率及最大回撤
+    """
+    fund_nav = navs["fund_nav"].to_numpy(dtype=float)
+    if len(fund_nav) < 2:
+        return {
+            "total_return": 0.0,
+            "annual_return": 0.0,
+            "volatility": 0.0,
+            "sharpe": 0.0,
+            "max_drawdown": 0.0,
+        }
+
+    returns = fund_nav[1:] / fund_nav[:-1] - 1
+    total_return = fund_nav[-1] / fund_nav[0] - 1
+    years = len(returns) / _TRADE_DAYS_PER_YEAR
+    volatility = returns.std(ddof=1) * np.sqrt(_TRADE_DAYS_PER_YEAR)
+    return {
+        "total_return": float(total_return),
+        "annual_return": float((1 + total_return) ** (1 / years) - 1),
+        "volatility": float(volatility),
+        "sharpe": float(
+            returns.mean() * _TRADE_DAYS_PER_YEAR / volatility if volatility else 0.0
+        ),
+        "max_drawdown": float(
+            (1 - fund_nav / np.maximum.accumulate(fund_nav)).max()
+        ),
+    }
+
+
+def _run_task(
+    mod_path: str,
+    bars_path: str,
+    runs_dir: str,
+    sweep_id: str,
+    params: Dict[str, Any],
+    symbols: Optional[List[str]],
+    start_date: str,
+    end_date: str,
+    balance: float,
+) -> str:
+    """在子进程中运行一组参数的回测，结果写入 {runs_dir}/{sweep_id}.parquet"""
+    # 同一子进程会依次运行多组参数，run_backtest 每次都重置引擎并重新加载策略目录
+    bars = _read_bars(bars_path)
+    navs = run_backtest(
+        mod_path,
+        bars,
+        symbols,
+        start_date,
+        end_date,
+        balance=balance,
+        params=dict(params),
+    )
+
+    table = pa.Table.from_pandas(
+        navs.reset_index().assign(sweep_id=sweep_id), preserve_index=False
+    )
+    metadata = {
+        "params": json.dumps(params, default=str),
+        "metrics": json.dumps(nav_metrics(navs)),
+    }
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), **metadata}
+    )
+    # 先写临时文件再改名，中断时不会留下不完整的结果
+    tmp_path = Path(runs_dir, f"{sweep_id}.parquet.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, Path(runs_dir, f"{sweep_id}.parquet"))
+    return sweep_id
+
+
+class vxParameterSweep:
+    """参数扫描
+
+    目录结构:
+        {output}/bars-{key}.arrow -- 回测区间的K线(Arrow IPC格式)，子进程以内存映射方式读取
+        {output}/runs/{sweep_id}.parquet -- 每组参数的净值曲线，参数及绩效指标保存于元数据
+    key 由回测区间及标的决定，sweep_id 由策略目录、回测区间、标的、初始资金及参数决定，
+    已存在结果文件的参数组合在再次运行时跳过；同一目录中其他扫描的结果不会被返回。
+    """
+
+    def __init__(
+        self,
+        mod_path: Union[str, Path],
+        bar_store: vxBarStore,
+        param_grid: Mapping[str, Sequence],
+        start_date: str,
+        end_date: str,
+        output: Union[str, Path],
+        symbols: Optional[List[str]] = None,
+        balance: float = 1_000_000,
+    ) -> None:
+        """参数扫描
+
+        Arguments:
+            mod_path {Union[str, Path]} -- 策略目录
+            bar_store {vxBarStore} -- 本地K线库
+            param_grid {Mapping[str, Sequence]} -- 参数网格，{参数名: 候选值列表}
+            start_date {str} -- 开始日期(含)
+            end_date {str} -- 结束日期(含)
+            output {Union[str, Path]} -- 结果目录
+
+        Keyword Arguments:
+            symbols {List[str]} -- 回测标的，为None时回放全部标的 (default: {None})
+            balance {float} -- 初始资金 (default: {1_000_000})
+        """
+        self._mod_path = str(Path(mod_path).expanduser().resolve())
+        self._bar_store = bar_store
+        self._start_date = start_date
+        self._end_date = end_date
+        self._output = Path(output).expanduser()
+        self._runs_dir = self._output / _RUNS_DIR
+        self._symbols = symbols
+        self._balance = balance
+
+        bars_key = {
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "symbols": sorted(symbols) if symbols is not None else None,
+        }
+        self._bars_path = self._output / f"bars-{_digest(bars_key)}.arrow"
+        spec = dict(bars_key, mod_path=self._mod_path, balance=balance)
+        # sweep_id --> 参数组合
+        self._runs = {
+            _digest(dict(spec, params=params)): params
+            for params in expand_grid(param_grid)
+        }
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def __str__(self) -> str:
+        return (
+            f"< {self.__class__.__name__}({self._mod_path}) params: {len(self)}"
+            f" completed: {len(self.completed())} >"
+        )
+
+    __repr__ = __str__
+
+    def completed(self) -> List[str]:
+        """本次扫描中已完成的参数组合"""
+        return [
+            sweep_id
+            for sweep_id in self._runs
+            if (self._runs_dir / f"{sweep_id}.parquet").exists()
+        ]
+
+    def _prepare_bars(self) -> Path:
+        """将回测区间的K线写入 Arrow IPC 文件，供子进程内存映射"""
+        bars_path = self._bars_path
+        if bars_path.exists():
+            return bars_path
+
+        bars = self._bar_store.read(
+            self._symbols, start_date=self._start_date, end_date=self._end_date
+        )
+        table = pa.Table.from_pandas(bars.reset_index(), preserve_index=False)
+        for name in ("date", "symbol"):
+            i = table.schema.get_field_index(name)
+            table = table.set_column(i, name, table.column(name).dictionary_encode())
+        table = table.combine_chunks()
+        tmp_path = bars_path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, bars_path)
+        return bars_path
+
+    def run(self, max_workers: Optional[int] = None) -> pd.DataFrame:
+        """运行未完成的参数组合
+
+        Keyword Arguments:
+            max_workers {int} -- 进程数 (default: {os.cpu_count()})
+
+        Returns:
+            pd.DataFrame -- 各组参数的绩效指标，参见 metrics()
+        """
+        self._runs_dir.mkdir(parents=True, exist_ok=True)
+        bars_path = self._prepare_bars()
+
+        completed = set(self.completed())
+        pending = {
+            sweep_id: params
+            for sweep_id, params in self._runs.items()
+            if sweep_id not in completed
+        }
+        logger.info(
+            f"{self.__class__.__name__} 共 {len(self)} 组参数，"
+            f"已完成 {len(self) - len(pending)} 组"
+        )
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(
+                        _run_task,
+                        self._mod_path,
+                        str(bars_path),
+                        str(self._runs_dir),
+                        sweep_id,
+                        params,
+                        self._symbols,
+                        self._start_date,
+                        self._end_date,
+                        self._balance,
+                    ): sweep_id
+                    for sweep_id, params in pending.items()
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as err:
+                        logger.error(
+                            f"参数组合 {futures[future]}: {pending[futures[future]]}"
+                            f" 回测失败: {err}",
+                            exc_info=True,
+                        )
+
+        return self.metrics()
+
+    def metrics(self) -> pd.DataFrame:
+        """已完成参数组合的参数及绩效指标
+
+        Returns:
+            pd.DataFrame -- index: sweep_id, columns: 各参数及绩效指标
+        """
+        rows = {}
+        for sweep_id in self.completed():
+            metadata = pq.read_schema(self._runs_dir / f"{sweep_id}.parquet").metadata
+            rows[sweep_id] = {
+                **json.loads(metadata[b"params"]),
+                **json.loads(metadata[b"metrics"]),
+            }
+        frame = pd.DataFrame.from_dict(rows, orient="index")
+        frame.index.name = "sweep_id"
+        return frame
+
+    def navs(self) -> pd.DataFrame:
+        """已完成参数组合的净值曲线
+
+        Returns:
+            pd.DataFrame -- 长表, columns: [sweep_id, date, nav, fund_nav]
+        """
+        paths = [
+            self._runs_dir / f"{sweep_id}.parquet" for sweep_id in self.completed()
+        ]
+        if not paths:
+            return pd.DataFrame(columns=["sweep_id", "date", "nav", "fund_nav"])
+        table = pa.concat_tables(
+            [pq.read_table(path).replace_schema_metadata() for path in paths]
+        )
+        return table.select(["sweep_id", "date", "nav", "fund_nav"]).to_pandas()
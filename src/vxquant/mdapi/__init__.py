@@ -9,6 +9,8 @@ from vxutils import vxtime, logger
 from vxutils.database.sqlite import vxSqliteDB
 
 from ..model.exchange import vxTick
+from .barstore import vxBarStore
+from .calenders import get_calendar
 
 TICK_TIMEDELTA = 3
 
@@ -20,11 +22,13 @@ class vxMdAPI(ABC):
         self,
         context: Optional[vxContext] = None,
         db: Optional[vxSqliteDB] = None,
+        bar_store: Optional[vxBarStore] = None,
         **kwargs,
     ):
         self._cachedb = db or vxSqliteDB()
         self._cachedb.create_table("current", ["symbol"], vxTick)
         self._context = context or vxContext()
+        self._bar_store = bar_store
 
     @abstractmethod
     def _hq_api(self, *symbols: List) -> List[vxTick]:
@@ -70,32 +74,44 @@ class vxMdAPI(ABC):
             for tick in self._cachedb.current.query(f"symbol in [{','.join(symbols)}]")
         }
 
-    @abstractmethod
-    def calendar(self, start_date: str = None, end_date: str = None) -> List:
+    def calendar(
+        self, start_date: str = None, end_date: str = None, exchange_id: str = "SHSE"
+    ) -> pd.DatetimeIndex:
         """交易日历
 
         Keyword Arguments:
-            start_date {str} -- 开始日期 (default: {None})
-            end_date {str} -- 结束日期 (default: {None})
+            start_date {str} -- 开始日期(含) (default: {None})
+            end_date {str} -- 结束日期(含) (default: {None})
+            exchange_id {str} -- 交易所 (default: {"SHSE"})
 
         Returns:
-            List -- 交易日历
+            pd.DatetimeIndex -- 交易日
         """
+        return get_calendar(exchange_id).trading_days_between(start_date, end_date)
 
-    @abstractmethod
     def features(
-        self, symbols: List, fields: List, start_date: str = "", end_date: str = ""
+        self,
+        symbols: List,
+        fields: List,
+        start_date: str = "",
+        end_date: str = "",
+        frequency: str = "1d",
     ) -> pd.DataFrame:
-        """_summary_
+        """从本地K线库读取历史数据
 
         Arguments:
-            symbols {List} -- _description_
-            fields {List} -- _description_
+            symbols {List} -- 标的列表
+            fields {List} -- 字段列表
 
         Keyword Arguments:
-            start_date {str} -- _description_ (default: {''})
-            end_date {str} -- _description_ (default: {""})
+            start_date {str} -- 开始日期(含) (default: {''})
+            end_date {str} -- 结束日期(含) (default: {""})
+            frequency {str} -- K线周期 (default: {"1d"})
 
         Returns:
-            pd.DataFrame -- _description_
+            pd.DataFrame -- index: [date, symbol] columns: fields
         """
+        if self._bar_store is None:
+            raise NotImplementedError(f"{self.__class__.__name__} 未配置本地K线库")
+
+        return self._bar_store.read(symbols, fields, start_date, end_date, frequency)
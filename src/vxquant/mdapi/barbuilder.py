@@ -0,0 +1,449 @@
+"""K线合成
+
+vxBarAggregator: 以数组保存各标的、各周期当前K线的状态，将行情快照增量合成为分钟线及日线。
+K线按交易日历的连续竞价时段对齐，K线结束时向 vxEngine 提交 on_bar 事件；
+也可以一次性回放历史行情快照，批量补齐K线。
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from vxutils import vxtime, logger
+from vxutils.time import _ONEDAY, _UTC_OFFSET
+from vxsched import vxEngine, vxEvent, vxContext
+from vxquant.model.nomalize import normalize_freq
+from vxquant.mdapi.calenders import vxTradingCalendar, get_calendar, _session_offsets
+
+__all__ = ["vxBarAggregator"]
+
+_TICK_COLUMNS = ["symbol", "created_dt", "lasttrade", "volume", "amount", "yclose"]
+_BAR_COLUMNS = ["open", "high", "low", "close", "yclose", "volume", "amount", "vwap"]
+
+
+def _bar_ends(frequency: str, sessions: np.ndarray) -> np.ndarray:
+    """各K线结束时间相对当日0点的秒数，每个交易时段的最后一根K线截止于时段结束"""
+    count, unit = normalize_freq(frequency)
+    if unit == "day" and count == 1:
+        return sessions[-1:, 1].astype(np.int64)
+    if unit != "minute":
+        raise ValueError(f"不支持的K线周期: {frequency}")
+
+    step = count * 60
+    return np.concatenate(
+        [np.append(np.arange(start + step, end, step), end) for start, end in sessions]
+    ).astype(np.int64)
+
+
+class _vxBarState:
+    """单一周期的K线状态
+
+    slot = 本地日期天数 * 每日K线数 + 当日K线序号，随时间单调递增。
+    行情快照的成交量、成交额为当日累计值，K线的成交量为K线内最后一个快照与上一根K线
+    结束时累计值之差，交易日切换时累计值归零。
+    """
+
+    _FILLS = {
+        "open": np.nan,
+        "high": -np.inf,
+        "low": np.inf,
+        "close": np.nan,
+        "yclose": np.nan,
+        "prev_close": np.nan,
+        "cum_volume": 0.0,
+        "cum_amount": 0.0,
+        "base_volume": 0.0,
+        "base_amount": 0.0,
+    }
+
+    def __init__(self, frequency: str, event_type: str, ends: np.ndarray) -> None:
+        self.frequency = frequency
+        self.event_type = event_type
+        self.ends = ends
+        self.slot = -1
+        # 当前K线是否已结束，已结束的K线不再接受快照
+        self.closed = False
+        # 当前K线尚未到结束时间时，后续K线的快照暂存于此:
+        # (timestamps, slots, rows, price, volume, amount, yclose)
+        self.deferred: Optional[Tuple[np.ndarray, ...]] = None
+        self.arrays = {name: np.empty(0) for name in self._FILLS}
+        self.active = np.zeros(0, dtype=bool)
+
+    def resize(self, size: int) -> None:
+        """扩充标的数量"""
+        grow = size - len(self.active)
+        if grow <= 0:
+            return
+        for name, fill in self._FILLS.items():
+            self.arrays[name] = np.append(self.arrays[name], np.full(grow, fill))
+        self.active = np.append(self.active, np.zeros(grow, dtype=bool))
+
+    def end_dt(self, slot: Optional[int] = None) -> float:
+        """K线结束时间的时间戳"""
+        day, i = divmod(self.slot if slot is None else slot, len(self.ends))
+        return float(day * _ONEDAY - _UTC_OFFSET + self.ends[i])
+
+    def start(self, slot: int) -> None:
+        """开始新的K线，交易日切换时累计成交量、成交额归零"""
+        if slot // len(self.ends) != self.slot // len(self.ends):
+            for name in ("cum_volume", "cum_amount", "base_volume", "base_amount"):
+                self.arrays[name][:] = 0.0
+        self.slot = slot
+        self.closed = False
+
+    def update(
+        self,
+        rows: np.ndarray,
+        price: np.ndarray,
+        volume: np.ndarray,
+        amount: np.ndarray,
+        yclose: np.ndarray,
+    ) -> None:
+        """以同一K线内按时间排序的行情快照更新K线"""
+        order = np.argsort(rows, kind="stable")
+        rows, price = rows[order], price[order]
+        first = np.r_[0, np.flatnonzero(np.diff(rows)) + 1]
+        last = np.r_[first[1:], len(rows)] - 1
+        symbols = rows[first]
+
+        a = self.arrays
+        opened = ~self.active[symbols]
+        new, new_first = symbols[opened], first[opened]
+        prev_close = a["prev_close"][new]
+        a["open"][new] = price[new_first]
+        a["yclose"][new] = np.where(
+            np.isnan(prev_close), yclose[order][new_first], prev_close
+        )
+        high, low = np.maximum.reduceat(price, first), np.minimum.reduceat(price, first)
+        a["high"][symbols] = np.maximum(a["high"][symbols], high)
+        a["low"][symbols] = np.minimum(a["low"][symbols], low)
+        a["close"][symbols] = price[last]
+        a["cum_volume"][symbols] = volume[order][last]
+        a["cum_amount"][symbols] = amount[order][last]
+        self.active[symbols] = True
+
+    def current(self, symbols: np.ndarray) -> pd.DataFrame:
+        """当前K线, index: symbol"""
+        a = self.arrays
+        rows = np.flatnonzero(self.active)
+        volume = a["cum_volume"][rows] - a["base_volume"][rows]
+        amount = a["cum_amount"][rows] - a["base_amount"][rows]
+        close = a["close"][rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = np.where(volume > 0, amount / volume, close)
+        return pd.DataFrame(
+            {
+                "open": a["open"][rows],
+                "high": a["high"][rows],
+                "low": a["low"][rows],
+                "close": close,
+                "yclose": a["yclose"][rows],
+                "volume": volume,
+                "amount": amount,
+                "vwap": vwap,
+            },
+            index=pd.Index(symbols[rows], name="symbol"),
+            columns=_BAR_COLUMNS,
+        )
+
+    def close(self, symbols: np.ndarray) -> pd.DataFrame:
+        """结束当前K线，返回有成交快照的标的的K线"""
+        bars = self.current(symbols)
+        a = self.arrays
+        rows = np.flatnonzero(self.active)
+        a["base_volume"][rows] = a["cum_volume"][rows]
+        a["base_amount"][rows] = a["cum_amount"][rows]
+        a["prev_close"][rows] = a["close"][rows]
+        for name in ("open", "high", "low", "close", "yclose"):
+            a[name][rows] = self._FILLS[name]
+        self.active[rows] = False
+        self.closed = True
+        return bars
+
+
+class vxBarAggregator:
+    """K线合成
+
+    行情快照可以是 {symbol: vxTick}、vxTick 列表或 DataFrame(columns: symbol, created_dt,
+    lasttrade, volume, amount[, yclose])，其中成交量、成交额为当日累计值。
+
+    快照时间先映射到所在的交易时段: 开盘前(集合竞价)的快照计入第一根K线，时段结束后
+    (如午间休市)的快照计入该时段的最后一根K线，非交易日的快照忽略。K线以结束时间标记，
+    在当前时间超过结束时间 close_delay 秒后结束，此前收到的下一根K线的快照暂存，
+    待当前K线结束后再计入；已结束K线的迟到快照忽略。回放历史行情时不等待 close_delay。
+    update / flush / replay 可以在多个线程中调用。
+
+    日线的事件类型为 event_type，分钟线为 {event_type}_{frequency}，event.data 为
+    K线 DataFrame(index: symbol, columns: open, high, low, close, yclose, volume, amount,
+    vwap)，trigger_dt 为K线结束时间。
+    """
+
+    def __init__(
+        self,
+        frequencies: Sequence[str] = ("1min",),
+        calendar: Optional[vxTradingCalendar] = None,
+        engine: Optional[vxEngine] = None,
+        event_type: str = "on_bar",
+        close_delay: float = 3.0,
+    ) -> None:
+        """K线合成
+
+        Keyword Arguments:
+            frequencies {Sequence[str]} -- K线周期，支持 nmin 及 1d (default: {("1min",)})
+            calendar {vxTradingCalendar} -- 交易日历，为None时使用已登记的上交所日历，
+                                            均未登记时不过滤非交易日 (default: {None})
+            engine {vxEngine} -- 接收 on_bar 事件的引擎，为None时不提交事件 (default: {None})
+            event_type {str} -- 事件类型 (default: {"on_bar"})
+            close_delay {float} -- K线结束时间之后等待迟到快照的秒数 (default: {3.0})
+        """
+        if calendar is None:
+            try:
+                calendar = get_calendar("SHSE")
+            except ValueError:
+                logger.warning(f"{self.__class__.__name__} 未登记交易日历，不过滤非交易日")
+
+        self._calendar = calendar
+        sessions = (
+            _session_offsets("SHSE") if calendar is None else calendar.session_offsets
+        )
+        self._session_starts = sessions[:, 0]
+        self._session_ends = sessions[:, 1]
+        self._engine = engine
+        self._close_delay = close_delay
+        self._states = {
+            frequency: _vxBarState(
+                frequency,
+                event_type if frequency == "1d" else f"{event_type}_{frequency}",
+                _bar_ends(frequency, sessions),
+            )
+            for frequency in frequencies
+        }
+        self._symbols = np.empty(0, dtype=object)
+        self._index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return (
+            f"< {self.__class__.__name__}({', '.join(self._states)})"
+            f" symbols: {len(self._symbols)} >"
+        )
+
+    __repr__ = __str__
+
+    @property
+    def frequencies(self) -> List[str]:
+        """K线周期"""
+        return list(self._states)
+
+    def current_bars(self, frequency: str) -> pd.DataFrame:
+        """尚未结束的K线, index: symbol"""
+        with self._lock:
+            return self._states[frequency].current(self._symbols)
+
+    def _rows(self, symbols: np.ndarray) -> np.ndarray:
+        """标的 --> 状态数组的行号，新标的追加至末尾"""
+        codes, uniques = pd.factorize(symbols)
+        new_symbols = [symbol for symbol in uniques if symbol not in self._index]
+        if new_symbols:
+            for symbol in new_symbols:
+                self._index[symbol] = len(self._index)
+            self._symbols = np.append(
+                self._symbols, np.array(new_symbols, dtype=object)
+            )
+            for state in self._states.values():
+                state.resize(len(self._symbols))
+        rows = np.array([self._index[symbol] for symbol in uniques], dtype=np.int64)
+        return rows[codes]
+
+    @staticmethod
+    def _tick_frame(ticks: Any) -> pd.DataFrame:
+        """行情快照 --> DataFrame"""
+        if isinstance(ticks, pd.DataFrame):
+            if "symbol" not in ticks.columns:
+                ticks = ticks.reset_index()
+            return ticks.reindex(columns=_TICK_COLUMNS)
+
+        if isinstance(ticks, dict):
+            ticks = ticks.values()
+        return pd.DataFrame(
+            [
+                [getattr(tick, column) for column in _TICK_COLUMNS]
+                for tick in ticks
+            ],
+            columns=_TICK_COLUMNS,
+        )
+
+    def _close(self, state: _vxBarState) -> Tuple[_vxBarState, float, pd.DataFrame]:
+        """结束周期的当前K线"""
+        return state, state.end_dt(), state.close(self._symbols)
+
+    def _aggregate(
+        self, ticks: Any, now: float
+    ) -> List[Tuple[_vxBarState, float, pd.DataFrame]]:
+        """以行情快照更新各周期的K线，返回期间结束的K线: [(state, 结束时间, K线), ...]"""
+        frame = self._tick_frame(ticks)
+        timestamps = frame["created_dt"].to_numpy(dtype=float)
+        price = frame["lasttrade"].to_numpy(dtype=float)
+        mask = np.isfinite(timestamps) & (price > 0)
+        if self._calendar is not None and mask.any():
+            mask[mask] = self._calendar.is_trading_days(timestamps[mask])
+        if not mask.any():
+            return []
+
+        order = np.flatnonzero(mask)[np.argsort(timestamps[mask], kind="stable")]
+        timestamps, price = timestamps[order], price[order]
+        volume = frame["volume"].to_numpy(dtype=float)[order]
+        amount = frame["amount"].to_numpy(dtype=float)[order]
+        yclose = frame["yclose"].to_numpy(dtype=float)[order]
+        rows = self._rows(frame["symbol"].to_numpy(dtype=object)[order])
+
+        local = timestamps + _UTC_OFFSET
+        days = np.floor_divide(local, _ONEDAY).astype(np.int64)
+        seconds = local - days * _ONEDAY
+        session = np.maximum(
+            np.searchsorted(self._session_starts, seconds, side="right") - 1, 0
+        )
+        seconds = np.clip(
+            seconds, self._session_starts[session], self._session_ends[session]
+        )
+
+        closed = []
+        for state in self._states.values():
+            slots = days * len(state.ends) + np.searchsorted(state.ends, seconds)
+            ticks = (timestamps, slots, rows, price, volume, amount, yclose)
+            closed.extend(self._advance(state, ticks, now))
+        return closed
+
+    def _advance(
+        self, state: _vxBarState, ticks: Optional[Tuple[np.ndarray, ...]], now: float
+    ) -> List[Tuple[_vxBarState, float, pd.DataFrame]]:
+        """将快照(含暂存的快照)计入周期的K线
+
+        下一根K线的快照到达时，当前K线未到 结束时间 + close_delay 则暂存其后的全部快照。
+        """
+        if state.deferred is not None:
+            if ticks is not None:
+                ticks = tuple(map(np.concatenate, zip(state.deferred, ticks)))
+                order = np.argsort(ticks[0], kind="stable")
+                ticks = tuple(array[order] for array in ticks)
+            else:
+                ticks = state.deferred
+            state.deferred = None
+        if ticks is None:
+            return []
+
+        slots = ticks[1]
+        keep = slots > state.slot if state.closed else slots >= state.slot
+        if not keep.all():
+            logger.debug(f"{state.frequency} 忽略已结束K线的快照 {(~keep).sum()} 个")
+            ticks = tuple(array[keep] for array in ticks)
+            slots = ticks[1]
+        if not len(slots):
+            return []
+
+        closed = []
+        bounds = np.r_[0, np.flatnonzero(np.diff(slots)) + 1, len(slots)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            slot = int(slots[start])
+            if slot != state.slot:
+                if not state.closed and state.active.any():
+                    if now < state.end_dt() + self._close_delay:
+                        state.deferred = tuple(array[start:] for array in ticks)
+                        break
+                    closed.append(self._close(state))
+                state.start(slot)
+            _, _, rows, price, volume, amount, yclose = (
+                array[start:end] for array in ticks
+            )
+            state.update(rows, price, volume, amount, yclose)
+        return closed
+
+    def _close_due(self, now: float) -> List[Tuple[_vxBarState, float, pd.DataFrame]]:
+        """结束结束时间早于 now - close_delay 的K线，并计入暂存的快照"""
+        closed = []
+        for state in self._states.values():
+            while (
+                state.slot >= 0
+                and not state.closed
+                and state.end_dt() + self._close_delay <= now
+            ):
+                closed.append(self._close(state))
+                closed.extend(self._advance(state, None, now))
+        return closed
+
+    def _submit(
+        self, closed: List[Tuple[_vxBarState, float, pd.DataFrame]]
+    ) -> List[vxEvent]:
+        events = [
+            vxEvent(type=state.event_type, data=bars, trigger_dt=end_dt)
+            for state, end_dt, bars in closed
+        ]
+        if self._engine is not None:
+            for event in events:
+                self._engine.submit_event(event)
+        return events
+
+    def update(self, ticks: Any, now: Optional[float] = None) -> List[vxEvent]:
+        """更新行情快照，提交期间结束的K线
+
+        Arguments:
+            ticks {Any} -- 行情快照
+
+        Keyword Arguments:
+            now {float} -- 当前时间 (default: {vxtime.now()})
+
+        Returns:
+            List[vxEvent] -- 结束的K线事件
+        """
+        now = vxtime.now() if now is None else now
+        with self._lock:
+            closed = self._aggregate(ticks, now)
+            closed.extend(self._close_due(now))
+            return self._submit(closed)
+
+    def flush(self, now: Optional[float] = None) -> List[vxEvent]:
+        """没有新快照时，结束已到结束时间的K线
+
+        Keyword Arguments:
+            now {float} -- 当前时间 (default: {vxtime.now()})
+
+        Returns:
+            List[vxEvent] -- 结束的K线事件
+        """
+        now = vxtime.now() if now is None else now
+        with self._lock:
+            return self._submit(self._close_due(now))
+
+    def on_tick(self, context: vxContext, event: vxEvent) -> None:
+        """on_tick 事件处理函数，event.data 为行情快照"""
+        self.update(event.data)
+
+    def replay(self, ticks: Any) -> Dict[str, pd.DataFrame]:
+        """回放历史行情快照，批量补齐K线，不提交事件，回放结束时结束全部K线
+
+        Arguments:
+            ticks {Any} -- 历史行情快照
+
+        Returns:
+            Dict[str, pd.DataFrame] -- {frequency: K线(index: [date, symbol])}，
+                                       date 为K线结束时间，可直接写入 vxBarStore
+        """
+        with self._lock:
+            closed = self._aggregate(ticks, np.inf)
+            closed.extend(self._close_due(np.inf))
+
+        frames: Dict[str, List[pd.DataFrame]] = {freq: [] for freq in self._states}
+        for state, end_dt, bars in closed:
+            date = pd.Timestamp(end_dt + _UTC_OFFSET, unit="s")
+            frames[state.frequency].append(pd.concat({date: bars}, names=["date"]))
+
+        empty = pd.DataFrame(
+            columns=_BAR_COLUMNS,
+            index=pd.MultiIndex.from_arrays([[], []], names=["date", "symbol"]),
+        )
+        return {
+            frequency: pd.concat(bars) if bars else empty
+            for frequency, bars in frames.items()
+        }
@@ -0,0 +1,225 @@
+"""本地K线库
+
+vxBarStore: 以 Parquet 格式保存日线/分钟线，按 frequency/year/bucket 分区，
+读取时将日期、标的及列的筛选下推至 Parquet 扫描
+"""
+
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+__all__ = ["vxBarStore"]
+
+_VERSION_COLUMN = "_version"
+_INDEX_COLUMNS = ["date", "symbol"]
+
+
+class vxBarStore:
+    """本地K线库
+
+    目录结构: {root}/frequency={frequency}/year={year}/bucket={bucket}/part-*.parquet
+
+    每次写入只新增parquet文件，不改写已有分区；每个文件带有写入版本号，
+    读取时同一 (date, symbol) 以最后写入的数据为准。
+    数值字段统一以 float64 写入，读取时合并各文件的schema，后续新增的字段同样可以读取。
+    """
+
+    def __init__(self, root: Union[str, Path], buckets: int = 16) -> None:
+        """本地K线库
+
+        Arguments:
+            root {Union[str, Path]} -- 数据目录
+
+        Keyword Arguments:
+            buckets {int} -- 每年按标的哈希拆分的分区数 (default: {16})
+        """
+        self._root = Path(root).expanduser()
+        self._buckets = buckets
+        self._partitioning = ds.partitioning(
+            pa.schema(
+                [
+                    ("frequency", pa.string()),
+                    ("year", pa.int32()),
+                    ("bucket", pa.int32()),
+                ]
+            ),
+            flavor="hive",
+        )
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__}(root={self._root}) >"
+
+    __repr__ = __str__
+
+    @property
+    def root(self) -> Path:
+        """数据目录"""
+        return self._root
+
+    def bucket_of(self, symbol: str) -> int:
+        """标的所属的分区"""
+        return zlib.crc32(symbol.encode("utf-8")) % self._buckets
+
+    def append(self, bars: pd.DataFrame, frequency: str = "1d") -> int:
+        """追加K线
+
+        Arguments:
+            bars {pd.DataFrame} -- 包含 date、symbol 列(或以其为索引)以及各字段列的K线数据
+
+        Keyword Arguments:
+            frequency {str} -- K线周期，如 1d、1min (default: {"1d"})
+
+        Returns:
+            int -- 写入的行数
+        """
+        if bars.empty:
+            return 0
+
+        if set(_INDEX_COLUMNS).issubset(bars.index.names):
+            bars = bars.reset_index()
+        missing = set(_INDEX_COLUMNS) - set(bars.columns)
+        if missing:
+            raise ValueError(f"K线数据缺少列: {missing}")
+
+        bars = bars.assign(date=pd.to_datetime(bars["date"]))
+        bars = bars.assign(
+            frequency=frequency,
+            year=bars["date"].dt.year.astype("int32"),
+            bucket=bars["symbol"].map(self.bucket_of).astype("int32"),
+        )
+        # 数值字段统一为 float64，避免各文件中同一字段的类型不一致
+        bars = bars.astype(
+            {
+                col: "float64"
+                for col in bars.columns
+                if col not in (*_INDEX_COLUMNS, "year", "bucket")
+                and pd.api.types.is_numeric_dtype(bars[col])
+                and not pd.api.types.is_bool_dtype(bars[col])
+            }
+        )
+        bars[_VERSION_COLUMN] = time.time_ns()
+
+        ds.write_dataset(
+            pa.Table.from_pandas(bars, preserve_index=False),
+            self._root,
+            format="parquet",
+            partitioning=self._partitioning,
+            basename_template=f"part-{bars[_VERSION_COLUMN].iat[0]}"
+            f"-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return len(bars)
+
+    def read(
+        self,
+        symbols: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        start_date: str = "",
+        end_date: str = "",
+        frequency: str = "1d",
+    ) -> pd.DataFrame:
+        """读取K线
+
+        Keyword Arguments:
+            symbols {List[str]} -- 标的列表，为None时读取全部标的 (default: {None})
+            fields {List[str]} -- 字段列表，为None时读取全部字段 (default: {None})
+            start_date {str} -- 开始日期(含) (default: {""})
+            end_date {str} -- 结束日期(含) (default: {""})
+            frequency {str} -- K线周期 (default: {"1d"})
+
+        Returns:
+            pd.DataFrame -- index: [date, symbol] columns: fields
+        """
+        if not self._root.exists():
+            return self._empty(fields)
+
+        dataset = self._dataset()
+        filter_ = ds.field("frequency") == frequency
+        if start_date:
+            start_date = pd.Timestamp(start_date)
+            filter_ &= ds.field("year") >= start_date.year
+            filter_ &= ds.field("date") >= pa.scalar(start_date, pa.timestamp("ns"))
+        if end_date:
+            end_date = pd.Timestamp(end_date)
+            if end_date == end_date.normalize():
+                end_date += pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+            filter_ &= ds.field("year") <= end_date.year
+            filter_ &= ds.field("date") <= pa.scalar(end_date, pa.timestamp("ns"))
+        if symbols is not None:
+            symbols = list(symbols)
+            buckets = sorted({self.bucket_of(symbol) for symbol in symbols})
+            filter_ &= ds.field("bucket").isin(buckets)
+            filter_ &= ds.field("symbol").isin(symbols)
+
+        columns = None
+        if fields is not None:
+            columns = list(dict.fromkeys([*_INDEX_COLUMNS, *fields, _VERSION_COLUMN]))
+        table = dataset.to_table(columns=columns, filter=filter_)
+        if table.num_rows == 0:
+            return self._empty(fields)
+
+        table = table.sort_by(
+            [
+                ("date", "ascending"),
+                ("symbol", "ascending"),
+                (_VERSION_COLUMN, "ascending"),
+            ]
+        )
+        bars = table.to_pandas()
+        bars = bars.drop_duplicates(_INDEX_COLUMNS, keep="last")
+        bars = bars.drop(
+            columns=[
+                col
+                for col in ("frequency", "year", "bucket", _VERSION_COLUMN)
+                if col in bars.columns
+            ]
+        )
+        return bars.set_index(_INDEX_COLUMNS)
+
+    def last_date(self, symbol: str, frequency: str = "1d") -> Optional[pd.Timestamp]:
+        """标的最新一根K线的日期，用于增量下载，没有数据时返回None"""
+        if not self._root.exists():
+            return None
+
+        table = self._dataset().to_table(
+            columns=["date"],
+            filter=(ds.field("frequency") == frequency)
+            & (ds.field("bucket") == self.bucket_of(symbol))
+            & (ds.field("symbol") == symbol),
+        )
+        if table.num_rows == 0:
+            return None
+        return pd.Timestamp(pc.max(table["date"]).as_py())
+
+    def _dataset(self) -> ds.Dataset:
+        """以各文件合并后的schema打开数据集
+
+        ds.dataset 默认只使用第一个文件的schema，后续文件新增的字段会被忽略，
+        字段类型不一致时读取失败，因此合并各文件的schema，整数与浮点数合并为浮点数。
+        """
+        dataset = ds.dataset(
+            self._root, format="parquet", partitioning=self._partitioning
+        )
+        schema = pa.unify_schemas(
+            [fragment.physical_schema for fragment in dataset.get_fragments()]
+            + [self._partitioning.schema],
+            promote_options="permissive",
+        )
+        return ds.dataset(
+            self._root,
+            schema=schema,
+            format="parquet",
+            partitioning=self._partitioning,
+        )
+
+    @staticmethod
+    def _empty(fields: Optional[List[str]]) -> pd.DataFrame:
+        index = pd.MultiIndex.from_arrays([[], []], names=_INDEX_COLUMNS)
+        return pd.DataFrame(columns=fields or [], index=index)
@@ -0,0 +1,341 @@
+"""交易日历
+
+vxTradingCalendar: 以排序的交易日数组(距1970-01-01的本地日期天数)保存各交易所的交易日，
+单个日期的查询为二分查找，并提供对时间戳数组的向量化版本
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from vxutils import vxtime
+from vxutils.convertors import to_timestamp
+from vxutils.time import _ONEDAY, _UTC_OFFSET, _day_number
+
+__all__ = [
+    "vxTradingCalendar",
+    "register_calendar",
+    "get_calendar",
+]
+
+# 各交易所的连续竞价时段
+_SESSIONS = {
+    "SHSE": (("09:30:00", "11:30:00"), ("13:00:00", "15:00:00")),
+    "SZSE": (("09:30:00", "11:30:00"), ("13:00:00", "15:00:00")),
+}
+
+
+def _session_offsets(exchange_id: str) -> np.ndarray:
+    """交易时段相对当日0点的秒数, shape: 时段数 x 2"""
+    sessions = _SESSIONS.get(exchange_id, _SESSIONS["SHSE"])
+    return np.array(
+        [
+            [
+                sum(int(x) * s for x, s in zip(t.split(":"), (3600, 60, 1)))
+                for t in session
+            ]
+            for session in sessions
+        ],
+        dtype=np.int64,
+    )
+
+
+def _day_numbers(dates: Any) -> np.ndarray:
+    """向量化的 _day_number，时间戳数组或日期(字符串、datetime64)数组"""
+    values = np.asarray(dates)
+    if values.dtype.kind in "iuf":
+        return np.floor_divide(values + _UTC_OFFSET, _ONEDAY).astype(np.int64)
+    return (
+        pd.to_datetime(values.ravel())
+        .values.astype("datetime64[D]")
+        .astype(np.int64)
+        .reshape(values.shape)
+    )
+
+
+def _timestamps(days: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    """本地日期天数 --> 当日0点的时间戳"""
+    return days * _ONEDAY - _UTC_OFFSET
+
+
+class vxTradingCalendar:
+    """交易日历"""
+
+    def __init__(self, trade_days: Any, exchange_id: str = "SHSE") -> None:
+        """交易日历
+
+        Arguments:
+            trade_days {Any} -- 交易日列表(时间戳、日期字符串或datetime)
+
+        Keyword Arguments:
+            exchange_id {str} -- 交易所 (default: {"SHSE"})
+        """
+        self.exchange_id = exchange_id
+        self._days = np.unique(_day_numbers(list(trade_days))).astype(np.int64)
+        self._sessions = _session_offsets(exchange_id)
+
+    def __str__(self) -> str:
+        if not len(self._days):
+            return f"< {self.__class__.__name__}({self.exchange_id}) empty >"
+        return (
+            f"< {self.__class__.__name__}({self.exchange_id})"
+            f" {self.start_date:%F} ~ {self.end_date:%F}: {len(self)} days >"
+        )
+
+    __repr__ = __str__
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def __contains__(self, date_: Any) -> bool:
+        return self.is_trading_day(date_)
+
+    @classmethod
+    def from_weekdays(
+        cls,
+        start_date: str,
+        end_date: str,
+        holidays: Optional[List] = None,
+        exchange_id: str = "SHSE",
+    ) -> "vxTradingCalendar":
+        """以工作日扣除节假日生成交易日历
+
+        Arguments:
+            start_date {str} -- 开始日期(含)
+            end_date {str} -- 结束日期(含)
+
+        Keyword Arguments:
+            holidays {List} -- 节假日 (default: {None})
+            exchange_id {str} -- 交易所 (default: {"SHSE"})
+        """
+        days = pd.bdate_range(start_date, end_date)
+        if holidays:
+            days = days.difference(pd.to_datetime(list(holidays)))
+        return cls(days.values, exchange_id)
+
+    @classmethod
+    def load(
+        cls, path: Union[str, Path], exchange_id: str = ""
+    ) -> "vxTradingCalendar":
+        """从文件加载交易日历
+
+        Arguments:
+            path {Union[str, Path]} -- 由 save 保存的 .npy 文件
+
+        Keyword Arguments:
+            exchange_id {str} -- 交易所，为空时使用文件名 (default: {""})
+        """
+        path = Path(path).expanduser()
+        calendar = cls.__new__(cls)
+        calendar.exchange_id = exchange_id or path.stem
+        calendar._days = np.load(path).astype(np.int64)
+        calendar._sessions = _session_offsets(calendar.exchange_id)
+        return calendar
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """保存交易日历
+
+        Arguments:
+            path {Union[str, Path]} -- 文件路径，为目录时保存为 {path}/{exchange_id}.npy
+
+        Returns:
+            Path -- 保存的文件
+        """
+        path = Path(path).expanduser()
+        if path.is_dir():
+            path = path / f"{self.exchange_id}.npy"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self._days)
+        return path
+
+    @property
+    def start_date(self) -> pd.Timestamp:
+        """第一个交易日"""
+        return pd.Timestamp(self._days[0], unit="D")
+
+    @property
+    def end_date(self) -> pd.Timestamp:
+        """最后一个交易日"""
+        return pd.Timestamp(self._days[-1], unit="D")
+
+    @property
+    def session_offsets(self) -> np.ndarray:
+        """连续竞价时段相对当日0点的秒数, shape: 时段数 x 2"""
+        return self._sessions.copy()
+
+    def covers(self, date_: Any) -> bool:
+        """日期是否在交易日历的范围内"""
+        day = _day_number(date_)
+        return bool(len(self._days)) and self._days[0] <= day <= self._days[-1]
+
+    def is_trading_day(self, date_: Any = None) -> bool:
+        """是否交易日
+
+        Keyword Arguments:
+            date_ {Any} -- 日期或时间 (default: {vxtime.now()})
+        """
+        day = _day_number(vxtime.now() if date_ is None else date_)
+        i = np.searchsorted(self._days, day)
+        return bool(i < len(self._days) and self._days[i] == day)
+
+    def is_trading_days(self, dates: Any) -> np.ndarray:
+        """向量化的 is_trading_day
+
+        Arguments:
+            dates {Any} -- 时间戳或日期数组
+
+        Returns:
+            np.ndarray -- bool数组
+        """
+        days = _day_numbers(dates)
+        if len(self._days) == 0:
+            return np.zeros(np.shape(days), dtype=bool)
+        i = np.minimum(np.searchsorted(self._days, days), len(self._days) - 1)
+        return self._days[i] == days
+
+    def _shift(self, days: np.ndarray, n: int) -> np.ndarray:
+        """days 之后(n>0，不含当日)或之前(n<0，不含当日)的第 |n| 个交易日"""
+        if n > 0:
+            i = np.searchsorted(self._days, days, side="right") + n - 1
+        elif n < 0:
+            i = np.searchsorted(self._days, days, side="left") + n
+        else:
+            raise ValueError("n 不可以为0.")
+        if np.any(i < 0) or np.any(i >= len(self._days)):
+            raise ValueError(f"超出交易日历范围: {self}")
+        return self._days[i]
+
+    def next_trading_day(self, date_: Any = None, n: int = 1) -> float:
+        """下一个交易日(不含当日)0点的时间戳
+
+        Keyword Arguments:
+            date_ {Any} -- 日期或时间 (default: {vxtime.now()})
+            n {int} -- 第n个交易日 (default: {1})
+        """
+        day = _day_number(vxtime.now() if date_ is None else date_)
+        return float(_timestamps(self._shift(np.array([day]), n)[0]))
+
+    def prev_trading_day(self, date_: Any = None, n: int = 1) -> float:
+        """上一个交易日(不含当日)0点的时间戳
+
+        Keyword Arguments:
+            date_ {Any} -- 日期或时间 (default: {vxtime.now()})
+            n {int} -- 第n个交易日 (default: {1})
+        """
+        day = _day_number(vxtime.now() if date_ is None else date_)
+        return float(_timestamps(self._shift(np.array([day]), -n)[0]))
+
+    def next_trading_days(self, dates: Any, n: int = 1) -> np.ndarray:
+        """向量化的 next_trading_day，返回时间戳数组"""
+        return _timestamps(self._shift(_day_numbers(dates), n)).astype(float)
+
+    def prev_trading_days(self, dates: Any, n: int = 1) -> np.ndarray:
+        """向量化的 prev_trading_day，返回时间戳数组"""
+        return _timestamps(self._shift(_day_numbers(dates), -n)).astype(float)
+
+    def trading_days_between(
+        self, start_date: Any = None, end_date: Any = None
+    ) -> pd.DatetimeIndex:
+        """开始日期至结束日期之间(含)的交易日
+
+        Keyword Arguments:
+            start_date {Any} -- 开始日期，为None时从第一个交易日开始 (default: {None})
+            end_date {Any} -- 结束日期，为None时至最后一个交易日 (default: {None})
+
+        Returns:
+            pd.DatetimeIndex -- 交易日
+        """
+        start = 0
+        if start_date is not None:
+            start = np.searchsorted(self._days, _day_number(start_date), side="left")
+        end = len(self._days)
+        if end_date is not None:
+            end = np.searchsorted(self._days, _day_number(end_date), side="right")
+        return pd.DatetimeIndex(
+            self._days[start:end].astype("datetime64[D]"), name="trade_date"
+        )
+
+    def count_trading_days(self, start_date: Any, end_date: Any) -> int:
+        """开始日期至结束日期之间(含)的交易日数量"""
+        start = np.searchsorted(self._days, _day_number(start_date), side="left")
+        end = np.searchsorted(self._days, _day_number(end_date), side="right")
+        return int(max(end - start, 0))
+
+    def sessions(self, date_: Any = None) -> List[Tuple[float, float]]:
+        """交易日的连续竞价时段，非交易日返回空列表
+
+        Keyword Arguments:
+            date_ {Any} -- 日期 (default: {vxtime.now()})
+
+        Returns:
+            List[Tuple[float, float]] -- [(开始时间戳, 结束时间戳), ...]
+        """
+        date_ = vxtime.now() if date_ is None else date_
+        if not self.is_trading_day(date_):
+            return []
+        midnight = _timestamps(_day_number(date_))
+        return [
+            (float(midnight + start), float(midnight + end))
+            for start, end in self._sessions
+        ]
+
+    def is_trading_time(self, dt: Any = None) -> bool:
+        """是否处于交易时段
+
+        Keyword Arguments:
+            dt {Any} -- 时间 (default: {vxtime.now()})
+        """
+        dt = vxtime.now() if dt is None else dt
+        if not isinstance(dt, (int, float)):
+            dt = to_timestamp(dt)
+        return any(start <= dt <= end for start, end in self.sessions(dt))
+
+    def is_trading_times(self, timestamps: Any) -> np.ndarray:
+        """向量化的 is_trading_time
+
+        Arguments:
+            timestamps {Any} -- 时间戳数组
+
+        Returns:
+            np.ndarray -- bool数组
+        """
+        timestamps = np.asarray(timestamps, dtype=float)
+        days = _day_numbers(timestamps)
+        seconds = timestamps - _timestamps(days)
+        in_session = np.zeros(timestamps.shape, dtype=bool)
+        for start, end in self._sessions:
+            in_session |= (seconds >= start) & (seconds <= end)
+        return in_session & self.is_trading_days(timestamps)
+
+    def session_close(self, date_: Any = None) -> float:
+        """交易日收盘时间"""
+        date_ = vxtime.now() if date_ is None else date_
+        if not self.is_trading_day(date_):
+            raise ValueError(f"{date_} 不是交易日")
+        return float(_timestamps(_day_number(date_)) + self._sessions[-1][-1])
+
+
+_CALENDARS: Dict[str, vxTradingCalendar] = {}
+
+
+def register_calendar(calendar: vxTradingCalendar, *exchange_ids: str) -> None:
+    """登记交易所的交易日历，上交所的日历同时作为 vxtime.is_holiday 的依据
+
+    Arguments:
+        calendar {vxTradingCalendar} -- 交易日历
+        exchange_ids {str} -- 交易所，为空时使用 calendar.exchange_id
+    """
+    for exchange_id in exchange_ids or (calendar.exchange_id,):
+        _CALENDARS[exchange_id] = calendar
+        if exchange_id == "SHSE":
+            vxtime.set_calendar(calendar)
+
+
+def get_calendar(exchange_id: str = "SHSE") -> vxTradingCalendar:
+    """获取交易所的交易日历"""
+    try:
+        return _CALENDARS[exchange_id]
+    except KeyError as e:
+        raise ValueError(f"交易所({exchange_id})的交易日历未登记") from e
@@ -11,6 +11,8 @@ from concurrent.futures import ThreadPoolExecutor as Executor
 from multiprocessing.dummy import Process
 from queue import PriorityQueue, Queue
 
+import pandas as pd
+
 from pytdx.hq import TdxHq_API, TDXParams
 from pytdx.config.hosts import hq_hosts
 from vxutils import logger, vxtime
@@ -72,8 +74,55 @@ class vxTdxHQ2:
         except OSError as err:
             logger.warning(f"{self._host_file}不存在，没有保存hosts信息: {err}")
 
-    def get_security_list(self):
-        pass
+    def _call_api(self, method, *args, retries=3):
+        """调用行情接口，返回None(连接异常)时重试，仍失败时抛出ConnectionError"""
+        for _ in range(retries):
+            with self.get_available_api() as api:
+                result = getattr(api, method)(*args)
+            if result is not None:
+                return result
+        raise ConnectionError(f"{method}{args} 重试{retries}次后仍失败")
+
+    def _fetch_security_page(self, market, start):
+        securities = self._call_api("get_security_list", market, start)
+        return [
+            (parser_tdx_symbol(market, security["code"]), security["name"])
+            for security in securities
+        ]
+
+    def _fetch_ipo_date(self, symbol):
+        info = self._call_api("get_finance_info", *to_tdx_symbol(symbol))
+        ipo_date = info.get("ipo_date") if info else None
+        return pd.to_datetime(str(ipo_date), format="%Y%m%d") if ipo_date else pd.NaT
+
+    def get_security_list(self, with_listed_date=False) -> pd.DataFrame:
+        """沪深两市当前的证券列表，各市场按每页1000个并发获取
+
+        任一页获取失败时抛出 ConnectionError，不会返回不完整的列表。
+
+        Keyword Arguments:
+            with_listed_date {bool} -- 是否逐个查询上市日期(财务信息中的ipo_date) (default: {False})
+
+        Returns:
+            pd.DataFrame -- columns: symbol, name[, listed_date]
+        """
+        pages = []
+        for exchange in TDXExchange:
+            count = self._call_api("get_security_count", exchange.value)
+            pages.extend((exchange.value, start) for start in range(0, count, 1000))
+
+        securities = self._executor.map(
+            lambda page: self._fetch_security_page(*page), pages
+        )
+        securities = pd.DataFrame(
+            [security for page in securities for security in page],
+            columns=["symbol", "name"],
+        )
+        if with_listed_date:
+            securities["listed_date"] = list(
+                self._executor.map(self._fetch_ipo_date, securities["symbol"])
+            )
+        return securities
 
     def get_security_quotes(self, *symbols):
         if len(symbols) == 1 and isinstance(symbols[0], (tuple, list)):
@@ -1,43 +1,253 @@
-def get_hs_stock_symbols() -> list:
-    """get SH/SZ stock symbols
-    Returns
-    -------
-        stock symbols
+"""证券主数据
+
+vxInstrumentMaster: 以 Parquet 文件保存全部证券的代码、名称、类型及上市/退市日期，
+每个进程只加载一次；按证券代码 O(1) 查询，按日期及类型向量化筛选证券池，
+并根据行情接口的证券列表增量更新。
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from vxutils import vxtime, logger
+from vxutils.convertors import to_timestring
+from vxquant.model.contants import SecType
+from vxquant.model.exchange import vxInstrument
+from vxquant.model.preset import presets_for
+
+__all__ = ["vxInstrumentMaster"]
+
+_COLUMNS = ["symbol", "name", "security_type", "listed_date", "delisted_date"]
+
+
+def _to_date(date_: Any) -> np.datetime64:
+    """日期或时间戳 --> datetime64[D]"""
+    if isinstance(date_, (int, float)):
+        date_ = to_timestring(date_, "%Y-%m-%d")
+    return np.datetime64(pd.Timestamp(date_).normalize(), "D")
+
+
+class vxInstrumentMaster:
+    """证券主数据
+
+    文件格式为 Parquet，security_type 以 SecType 的整数值保存，未退市的 delisted_date 为空。
     """
-    global _HS_SYMBOLS
-
-    def _get_symbol():
-        _res = set()
-        for _k, _v in (("ha", "ss"), ("sa", "sz"), ("gem", "sz")):
-            resp = requests.get(HS_SYMBOLS_URL.format(s_type=_k))
-            _res |= set(
-                map(
-                    lambda x: "{}.{}".format(re.findall(r"\d+", x)[0], _v),
-                    etree.HTML(resp.text).xpath(
-                        "//div[@class='result']/ul//li/a/text()"
-                    ),
-                )
+
+    _instances: Dict[Path, "vxInstrumentMaster"] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        instruments: Optional[pd.DataFrame] = None,
+        path: Optional[Union[str, Path]] = None,
+    ) -> None:
+        """证券主数据
+
+        Keyword Arguments:
+            instruments {pd.DataFrame} -- columns: symbol, name, security_type, listed_date, delisted_date (default: {None})
+            path {Union[str, Path]} -- 保存路径 (default: {None})
+        """
+        self._path = Path(path).expanduser() if path else None
+        self._set_frame(
+            pd.DataFrame(columns=_COLUMNS) if instruments is None else instruments
+        )
+
+    def _set_frame(self, frame: pd.DataFrame) -> None:
+        frame = frame.reset_index(drop=True)
+        self._symbols = frame["symbol"].astype(str).to_numpy(dtype=object)
+        self._names = frame["name"].astype(str).to_numpy(dtype=object)
+        self._types = frame["security_type"].to_numpy(dtype=np.int64)
+        self._listed = pd.to_datetime(frame["listed_date"]).to_numpy("datetime64[D]")
+        self._delisted = pd.to_datetime(frame["delisted_date"]).to_numpy(
+            "datetime64[D]"
+        )
+        self._index = {symbol: i for i, symbol in enumerate(self._symbols)}
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "vxInstrumentMaster":
+        """加载证券主数据，同一文件在每个进程中只读取一次，文件不存在时返回空的主数据"""
+        path = Path(path).expanduser().resolve()
+        with cls._lock:
+            if path not in cls._instances:
+                frame = pd.read_parquet(path) if path.exists() else None
+                cls._instances[path] = cls(frame, path)
+            return cls._instances[path]
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> Path:
+        """保存证券主数据
+
+        Keyword Arguments:
+            path {Union[str, Path]} -- 保存路径，为None时保存至加载的路径 (default: {None})
+
+        Returns:
+            Path -- 保存的文件
+        """
+        path = Path(path).expanduser() if path else self._path
+        if path is None:
+            raise ValueError("未指定保存路径")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        self.to_frame().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._path = path
+        return path
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__}({self._path}) instruments: {len(self)} >"
+
+    __repr__ = __str__
+
+    def to_frame(self) -> pd.DataFrame:
+        """全部证券, columns: symbol, name, security_type, listed_date, delisted_date"""
+        return pd.DataFrame(
+            {
+                "symbol": self._symbols,
+                "name": self._names,
+                "security_type": self._types,
+                "listed_date": self._listed,
+                "delisted_date": self._delisted,
+            },
+            columns=_COLUMNS,
+        )
+
+    def get(self, symbol: str) -> Optional[vxInstrument]:
+        """证券信息，未知的证券返回None"""
+        i = self._index.get(symbol)
+        if i is None:
+            return None
+
+        delisted = self._delisted[i]
+        return vxInstrument(
+            symbol=symbol,
+            name=self._names[i],
+            security_type=SecType(int(self._types[i])),
+            listed_date=str(self._listed[i]),
+            delisted_date=float("inf") if np.isnat(delisted) else str(delisted),
+        )
+
+    def universe(
+        self,
+        date_: Any = None,
+        security_type: Optional[Union[SecType, List[SecType]]] = None,
+    ) -> List[str]:
+        """证券池
+
+        Keyword Arguments:
+            date_ {Any} -- 在该日期处于上市状态的证券 (default: {vxtime.now()})
+            security_type {Union[SecType, List[SecType]]} -- 证券类型，为None时不筛选 (default: {None})
+
+        Returns:
+            List[str] -- 证券代码
+        """
+        date_ = _to_date(vxtime.now() if date_ is None else date_)
+        mask = (self._listed <= date_) & (
+            np.isnat(self._delisted) | (self._delisted > date_)
+        )
+        if security_type is not None:
+            if isinstance(security_type, SecType):
+                security_type = [security_type]
+            mask &= np.isin(self._types, [t.value for t in security_type])
+        return self._symbols[mask].tolist()
+
+    def refresh(
+        self,
+        securities: pd.DataFrame,
+        as_of: Any = None,
+        max_delist_ratio: float = 0.05,
+    ) -> Dict[str, List]:
+        """根据行情接口当前的证券列表增量更新
+
+        列表中新出现的证券登记上市日期: 有 listed_date 列时使用该列，否则为 as_of，
+        因此首次更新若不提供上市日期，universe() 对 as_of 之前的日期返回空列表。
+        名称变化的证券更新名称，列表中消失且尚未退市的证券以 as_of 为退市日期，
+        重新出现的已退市证券清除退市日期。
+        证券列表为空时(如行情接口异常)不做更新；待退市的证券超过当前上市证券的
+        max_delist_ratio 时，视为列表不完整，只登记新增及更名，不做退市处理。
+
+        Arguments:
+            securities {pd.DataFrame} -- 当前上市的证券, columns: symbol, name[, listed_date]
+
+        Keyword Arguments:
+            as_of {Any} -- 更新日期 (default: {vxtime.now()})
+            max_delist_ratio {float} -- 单次更新允许退市的证券比例 (default: {0.05})
+
+        Returns:
+            Dict[str, List] -- {"added": [...], "renamed": [...], "delisted": [...], "relisted": [...]}
+        """
+        if securities.empty:
+            logger.warning(f"{self.__class__.__name__} 证券列表为空，不更新")
+            return {"added": [], "renamed": [], "delisted": [], "relisted": []}
+
+        as_of = _to_date(vxtime.now() if as_of is None else as_of)
+        securities = securities.drop_duplicates("symbol").set_index("symbol")
+        current = securities["name"]
+        frame = self.to_frame()
+
+        known = current.index.isin(self._symbols)
+        added = current[~known]
+        listed_dates = np.full(len(added), as_of)
+        if "listed_date" in securities.columns:
+            seeded = pd.to_datetime(securities["listed_date"][~known]).to_numpy(
+                "datetime64[D]"
             )
-            time.sleep(3)
-        return _res
-
-    if _HS_SYMBOLS is None:
-        symbols = set()
-        _retry = 60
-        # It may take multiple times to get the complete
-        while len(symbols) < MINIMUM_SYMBOLS_NUM:
-            symbols |= _get_symbol()
-            time.sleep(3)
-
-        symbol_cache_path = Path("~/.cache/hs_symbols_cache.pkl").expanduser().resolve()
-        symbol_cache_path.parent.mkdir(parents=True, exist_ok=True)
-        if symbol_cache_path.exists():
-            with symbol_cache_path.open("rb") as fp:
-                cache_symbols = pickle.load(fp)
-                symbols |= cache_symbols
-        with symbol_cache_path.open("wb") as fp:
-            pickle.dump(symbols, fp)
-
-        _HS_SYMBOLS = sorted(list(symbols))
-
-    return _HS_SYMBOLS
+            listed_dates = np.where(np.isnat(seeded), listed_dates, seeded)
+        frame = pd.concat(
+            [
+                frame,
+                pd.DataFrame(
+                    {
+                        "symbol": added.index,
+                        "name": added.to_numpy(),
+                        "security_type": [
+                            t.value for t in presets_for(added.index)["security_type"]
+                        ],
+                        "listed_date": listed_dates,
+                        "delisted_date": np.datetime64("NaT", "D"),
+                    }
+                ),
+            ],
+            ignore_index=True,
+        )
+
+        names = current.reindex(frame["symbol"]).to_numpy()
+        renamed = pd.notna(names) & (names != frame["name"].to_numpy())
+        renamed &= ~frame["symbol"].isin(added.index).to_numpy()
+        frame.loc[renamed, "name"] = names[renamed]
+
+        listed = frame["symbol"].isin(current.index).to_numpy()
+        delisted = ~listed & frame["delisted_date"].isna().to_numpy()
+        listed_count = int(np.isnat(self._delisted).sum())
+        if delisted.sum() > max_delist_ratio * listed_count:
+            logger.warning(
+                f"{self.__class__.__name__} 待退市证券 {delisted.sum()} 个，超过上市证券"
+                f" {listed_count} 个的 {max_delist_ratio:.0%}，证券列表可能不完整，"
+                "本次不做退市处理"
+            )
+            delisted[:] = False
+        relisted = listed & frame["delisted_date"].notna().to_numpy()
+        frame.loc[delisted, "delisted_date"] = as_of
+        frame.loc[relisted, "delisted_date"] = pd.NaT
+
+        self._set_frame(frame)
+        changes = {
+            "added": added.index.tolist(),
+            "renamed": frame.loc[renamed, "symbol"].tolist(),
+            "delisted": frame.loc[delisted, "symbol"].tolist(),
+            "relisted": frame.loc[relisted, "symbol"].tolist(),
+        }
+        logger.info(
+            f"{self.__class__.__name__} 更新: 新增 {len(changes['added'])},"
+            f" 更名 {len(changes['renamed'])}, 退市 {len(changes['delisted'])}"
+        )
+        return changes
@@ -0,0 +1,324 @@
+"""复权价格缓存
+
+vxPriceCache: 以内存映射的 numpy 数组(标的 x 日期)保存原始行情及复权因子，
+访问时才按需计算前复权/后复权价格
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["vxPriceCache", "vxAdjustedArray"]
+
+_FIELDS = ("open", "high", "low", "close", "volume")
+_PRICE_FIELDS = ("open", "high", "low", "close")
+_META_FILE = "meta.json"
+_FACTOR_MASK_FILE = "factor_mask.npy"
+
+
+class vxAdjustedArray:
+    """复权价格视图
+
+    只保存原始价格、复权因子的视图及各标的的基准因子，索引时才计算对应部分的复权价格:
+        后复权价格 = 原始价格 * 复权因子
+        前复权价格 = 原始价格 * 复权因子 / 最新复权因子
+    """
+
+    def __init__(
+        self, raw: np.ndarray, factor: np.ndarray, scale: Optional[np.ndarray] = None
+    ) -> None:
+        self._raw = raw
+        self._factor = factor
+        self._scale = scale
+
+    @property
+    def shape(self):
+        return self._raw.shape
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, key) -> np.ndarray:
+        values = self._raw[key] * self._factor[key]
+        if self._scale is not None:
+            values /= np.broadcast_to(self._scale[:, None], self._raw.shape)[key]
+        return values
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
+
+
+class vxPriceCache:
+    """复权价格缓存
+
+    目录结构: {root}/meta.json 以及每个字段一个 {field}.npy (shape: 标的数 x 日期数)，
+    按标的连续存放，读取单个标的或连续的标的区间时不产生拷贝。
+    复权因子为累计的后复权因子，factor_mask.npy 记录显式写入(及除权除息日)的列:
+    每个显式写入的值向后填充至下一个显式写入的列，因此最后一列即为各标的的最新
+    复权因子，补写较早日期的复权因子不会覆盖之后已写入的值。
+    """
+
+    def __init__(self, root: Union[str, Path], readonly: bool = False) -> None:
+        """打开已创建的复权价格缓存
+
+        Arguments:
+            root {Union[str, Path]} -- 缓存目录
+
+        Keyword Arguments:
+            readonly {bool} -- 是否以只读方式映射 (default: {False})
+        """
+        self._root = Path(root).expanduser()
+        with open(self._root / _META_FILE, "r", encoding="utf-8") as fp:
+            meta = json.load(fp)
+
+        self._symbols: List[str] = meta["symbols"]
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self._symbols)}
+        self._dates = np.array(meta["dates"], dtype="datetime64[D]")
+        self._fields = tuple(meta["fields"])
+        mode = "r" if readonly else "r+"
+        self._arrays = {
+            field: np.load(self._root / f"{field}.npy", mmap_mode=mode)
+            for field in (*self._fields, "factor")
+        }
+        mask_path = self._root / _FACTOR_MASK_FILE
+        if mask_path.exists():
+            self._factor_mask = np.load(mask_path, mmap_mode=mode)
+        else:
+            # 旧版本的缓存没有记录显式写入的列，以复权因子变化的列代替
+            factor = self._arrays["factor"]
+            self._factor_mask = np.ones(factor.shape, dtype=bool)
+            self._factor_mask[:, 1:] = factor[:, 1:] != factor[:, :-1]
+            if not readonly:
+                np.save(mask_path, self._factor_mask)
+                self._factor_mask = np.load(mask_path, mmap_mode=mode)
+        # 各标的的最新复权因子(前复权基准)，新的除权除息事件只刷新对应标的
+        self._scale = np.array(self._arrays["factor"][:, -1])
+        # 各标的复权因子的版本号，用于调用方判断基于复权价格的缓存是否失效
+        self._versions = np.zeros(len(self._symbols), dtype=np.int64)
+
+    @classmethod
+    def create(
+        cls,
+        root: Union[str, Path],
+        symbols: List[str],
+        dates: List,
+        fields=_FIELDS,
+    ) -> "vxPriceCache":
+        """创建复权价格缓存，行情初始化为NaN，复权因子初始化为1.0
+
+        Arguments:
+            root {Union[str, Path]} -- 缓存目录
+            symbols {List[str]} -- 标的列表
+            dates {List} -- 日期网格(交易日历)，可包含未来的交易日
+
+        Keyword Arguments:
+            fields {Tuple[str]} -- 行情字段 (default: {("open", "high", "low", "close", "volume")})
+
+        Returns:
+            vxPriceCache -- 复权价格缓存
+        """
+        root = Path(root).expanduser()
+        root.mkdir(parents=True, exist_ok=True)
+        dates = pd.DatetimeIndex(dates).strftime("%Y-%m-%d").tolist()
+        shape = (len(symbols), len(dates))
+        for field in (*fields, "factor"):
+            array = np.lib.format.open_memmap(
+                root / f"{field}.npy", mode="w+", dtype=np.float64, shape=shape
+            )
+            array[:] = 1.0 if field == "factor" else np.nan
+            array.flush()
+            del array
+        np.save(root / _FACTOR_MASK_FILE, np.zeros(shape, dtype=bool))
+
+        with open(root / _META_FILE, "w", encoding="utf-8") as fp:
+            json.dump(
+                {"symbols": list(symbols), "dates": dates, "fields": list(fields)}, fp
+            )
+        return cls(root)
+
+    @property
+    def symbols(self) -> List[str]:
+        """标的列表"""
+        return self._symbols
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """日期网格"""
+        return pd.DatetimeIndex(self._dates)
+
+    def version(self, symbol: str) -> int:
+        """标的复权因子的版本号，每次除权除息事件后递增"""
+        return int(self._versions[self._symbol_index[symbol]])
+
+    def _rows(self, symbols: Optional[List[str]] = None) -> Union[slice, np.ndarray]:
+        """标的对应的行；连续递增的标的返回slice，以便得到视图而不是拷贝"""
+        if symbols is None:
+            return slice(None)
+
+        rows = np.array([self._symbol_index[symbol] for symbol in symbols], dtype=int)
+        start, end = (int(rows[0]), int(rows[0]) + len(rows)) if len(rows) else (0, 0)
+        if len(rows) and np.array_equal(rows, np.arange(start, end)):
+            return slice(start, end)
+        return rows
+
+    def _cols(self, start_date=None, end_date=None) -> slice:
+        start = (
+            np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start_date), "D"))
+            if start_date
+            else 0
+        )
+        end = (
+            np.searchsorted(
+                self._dates, np.datetime64(pd.Timestamp(end_date), "D"), side="right"
+            )
+            if end_date
+            else len(self._dates)
+        )
+        return slice(int(start), int(end))
+
+    def raw(
+        self,
+        field: str,
+        symbols: Optional[List[str]] = None,
+        start_date: str = "",
+        end_date: str = "",
+    ) -> np.ndarray:
+        """原始(不复权)行情，连续的标的区间返回内存映射的视图
+
+        Arguments:
+            field {str} -- 行情字段或 factor
+
+        Keyword Arguments:
+            symbols {List[str]} -- 标的列表，为None时返回全部标的 (default: {None})
+            start_date {str} -- 开始日期(含) (default: {""})
+            end_date {str} -- 结束日期(含) (default: {""})
+
+        Returns:
+            np.ndarray -- shape: 标的数 x 日期数
+        """
+        rows, cols = self._rows(symbols), self._cols(start_date, end_date)
+        return self._arrays[field][rows, cols]
+
+    def adjusted(
+        self,
+        field: str,
+        adjust: str = "forward",
+        symbols: Optional[List[str]] = None,
+        start_date: str = "",
+        end_date: str = "",
+    ) -> Union[np.ndarray, vxAdjustedArray]:
+        """复权行情视图
+
+        Arguments:
+            field {str} -- 价格字段
+
+        Keyword Arguments:
+            adjust {str} -- forward: 前复权, backward: 后复权, none: 不复权 (default: {"forward"})
+            symbols {List[str]} -- 标的列表，为None时返回全部标的 (default: {None})
+            start_date {str} -- 开始日期(含) (default: {""})
+            end_date {str} -- 结束日期(含) (default: {""})
+
+        Returns:
+            Union[np.ndarray, vxAdjustedArray] -- 不复权或非价格字段时返回原始视图，否则返回按需计算的复权视图
+        """
+        rows, cols = self._rows(symbols), self._cols(start_date, end_date)
+        raw = self._arrays[field][rows, cols]
+        if adjust == "none" or field not in _PRICE_FIELDS:
+            return raw
+
+        factor = self._arrays["factor"][rows, cols]
+        if adjust == "backward":
+            return vxAdjustedArray(raw, factor)
+        elif adjust == "forward":
+            return vxAdjustedArray(raw, factor, self._scale[rows])
+        raise ValueError(f"不支持的复权方式: {adjust}")
+
+    def frame(
+        self,
+        field: str,
+        adjust: str = "forward",
+        symbols: Optional[List[str]] = None,
+        start_date: str = "",
+        end_date: str = "",
+    ) -> pd.DataFrame:
+        """复权行情 DataFrame(index: 日期, columns: 标的)，会计算并拷贝全部数据"""
+        cols = self._cols(start_date, end_date)
+        values = np.asarray(
+            self.adjusted(field, adjust, symbols, start_date, end_date)
+        )
+        return pd.DataFrame(
+            values.T,
+            index=pd.DatetimeIndex(self._dates[cols], name="date"),
+            columns=pd.Index(symbols or self._symbols, name="symbol"),
+        )
+
+    def write(self, bars: pd.DataFrame) -> None:
+        """写入原始行情及复权因子
+
+        Arguments:
+            bars {pd.DataFrame} -- index: [date, symbol]，columns: 行情字段及可选的 factor
+        """
+        dates = bars.index.get_level_values("date").values.astype("datetime64[D]")
+        cols = np.searchsorted(self._dates, dates)
+        if np.any(cols >= len(self._dates)) or np.any(self._dates[cols] != dates):
+            raise ValueError("K线日期不在日期网格中")
+        rows = np.array(
+            [
+                self._symbol_index[symbol]
+                for symbol in bars.index.get_level_values("symbol")
+            ]
+        )
+
+        for field in self._fields:
+            if field in bars.columns:
+                self._arrays[field][rows, cols] = bars[field].to_numpy(np.float64)
+
+        if "factor" in bars.columns:
+            factor = self._arrays["factor"]
+            factor[rows, cols] = bars["factor"].to_numpy(np.float64)
+            self._factor_mask[rows, cols] = True
+            self._fill_factor(np.unique(rows))
+
+    def _fill_factor(self, rows: np.ndarray) -> None:
+        """显式写入的复权因子向后填充至下一个显式写入的列，第一个显式写入的列之前不变"""
+        factor = self._arrays["factor"]
+        mask = np.asarray(self._factor_mask[rows])
+        values = np.asarray(factor[rows])
+        # 每一列之前(含)最近一个显式写入的列，没有时为-1
+        source = np.maximum.accumulate(
+            np.where(mask, np.arange(mask.shape[1]), -1), axis=1
+        )
+        filled = np.take_along_axis(values, np.maximum(source, 0), axis=1)
+        factor[rows] = np.where(source >= 0, filled, values)
+        for row in rows:
+            self._invalidate(row)
+
+    def on_corporate_action(self, symbol: str, ex_date: str, ratio: float) -> None:
+        """除权除息事件，除权日(含)之后的复权因子乘以ratio，只刷新该标的的前复权基准
+
+        Arguments:
+            symbol {str} -- 标的
+            ex_date {str} -- 除权除息日
+            ratio {float} -- 除权除息前收盘价 / 除权除息参考价
+        """
+        row = self._symbol_index[symbol]
+        col = self._cols(start_date=ex_date).start
+        self._arrays["factor"][row, col:] *= ratio
+        # 除权除息日作为复权因子的变化点，补写更早日期的复权因子时保留
+        if col < len(self._dates):
+            self._factor_mask[row, col] = True
+        self._invalidate(row)
+
+    def _invalidate(self, row: int) -> None:
+        self._scale[row] = self._arrays["factor"][row, -1]
+        self._versions[row] += 1
+
+    def flush(self) -> None:
+        """将修改写回磁盘"""
+        for array in (*self._arrays.values(), self._factor_mask):
+            if isinstance(array, np.memmap):
+                array.flush()
@@ -0,0 +1,213 @@
+"""组合汇总
+
+vxPortfolioAggregator: 根据成员账户的更新增量维护组合净资产、标的敞口及证券类型敞口
+vxSnapshotLog: 以关键帧 + 增量的方式保存组合的历史快照
+"""
+
+import bisect
+from array import array
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from vxquant.model.contants import SecType
+from vxquant.model.exchange import vxAccountInfo, vxCashPosition, vxPosition
+
+__all__ = ["vxPortfolioAggregator", "vxSnapshotLog"]
+
+_EPS = 1e-6
+
+
+def _accumulate(total: Dict, old: Mapping, new: Mapping) -> Dict:
+    """total += new - old，返回发生变化的 {key: 最新值}，值为0的key从total中删除"""
+    changed = {}
+    for key in old.keys() | new.keys():
+        delta = new.get(key, 0.0) - old.get(key, 0.0)
+        if abs(delta) < _EPS:
+            continue
+        value = total.get(key, 0.0) + delta
+        if abs(value) < _EPS:
+            total.pop(key, None)
+            value = 0.0
+        else:
+            total[key] = value
+        changed[key] = value
+    return changed
+
+
+class vxPortfolioAggregator:
+    """组合汇总
+
+    每个成员账户保存其上一次的贡献(净资产、标的市值、证券类型市值)，账户更新时只对
+    该账户的新旧贡献求差并累加至组合汇总值，单次更新的代价与该账户的持仓数量成正比，
+    不需要重新扫描全部成员账户。
+    """
+
+    def __init__(self) -> None:
+        # account_id --> (nav, {symbol: marketvalue}, {security_type: marketvalue})
+        self._contributions: Dict[str, Tuple[float, Dict, Dict]] = {}
+        self._nav = 0.0
+        self._by_symbol: Dict[str, float] = {}
+        self._by_type: Dict[str, float] = {}
+        # 最近一次快照之后发生变化的标的敞口
+        self._dirty: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._contributions)
+
+    def __contains__(self, account_id: str) -> bool:
+        return account_id in self._contributions
+
+    @property
+    def nav(self) -> float:
+        """成员账户净资产合计"""
+        return round(self._nav, 2)
+
+    def account_nav(self, account_id: str) -> float:
+        """成员账户的净资产"""
+        return self._contributions.get(account_id, (0.0, None, None))[0]
+
+    def exposure(self, by: str = "symbol") -> Dict[str, float]:
+        """组合敞口
+
+        Keyword Arguments:
+            by {str} -- "symbol": 按标的汇总市值, "security_type": 按证券类型汇总市值 (default: {"symbol"})
+
+        Returns:
+            Dict[str, float] -- {symbol/security_type: marketvalue}
+        """
+        if by == "symbol":
+            return {key: round(value, 2) for key, value in self._by_symbol.items()}
+        elif by == "security_type":
+            return {key: round(value, 2) for key, value in self._by_type.items()}
+        raise ValueError(f"不支持的汇总方式: {by}")
+
+    def update(
+        self,
+        account_info: vxAccountInfo,
+        positions: Optional[Mapping[str, Union[vxPosition, vxCashPosition]]] = None,
+    ) -> None:
+        """根据成员账户的更新调整组合汇总值
+
+        Arguments:
+            account_info {vxAccountInfo} -- 账户信息
+
+        Keyword Arguments:
+            positions {Mapping[str, Union[vxPosition, vxCashPosition]]} -- 账户最新的全部持仓，为None时只更新净资产 (default: {None})
+        """
+        old_nav, old_symbols, old_types = self._contributions.get(
+            account_info.account_id, (0.0, {}, {})
+        )
+        if positions is None:
+            new_symbols, new_types = old_symbols, old_types
+        else:
+            new_symbols, new_types = {}, {}
+            for symbol, position in positions.items():
+                if position.security_type == SecType.CASH or not position.marketvalue:
+                    continue
+                new_symbols[symbol] = new_symbols.get(symbol, 0.0) + position.marketvalue
+                security_type = position.security_type.name
+                new_types[security_type] = (
+                    new_types.get(security_type, 0.0) + position.marketvalue
+                )
+
+            self._dirty.update(_accumulate(self._by_symbol, old_symbols, new_symbols))
+            _accumulate(self._by_type, old_types, new_types)
+
+        self._nav += account_info.nav - old_nav
+        self._contributions[account_info.account_id] = (
+            account_info.nav,
+            new_symbols,
+            new_types,
+        )
+
+    def remove(self, account_id: str) -> None:
+        """移除成员账户"""
+        if account_id not in self._contributions:
+            return
+        nav, symbols, types = self._contributions.pop(account_id)
+        self._nav -= nav
+        self._dirty.update(_accumulate(self._by_symbol, symbols, {}))
+        _accumulate(self._by_type, types, {})
+
+    def pop_changes(self) -> Dict[str, float]:
+        """返回并清空上一次调用之后发生变化的标的敞口，值为0表示敞口已清空"""
+        changes, self._dirty = self._dirty, {}
+        return changes
+
+
+class vxSnapshotLog:
+    """组合历史快照
+
+    净资产、份额等标量按列保存于 array 中；标的敞口每 keyframe_interval 个快照保存一次
+    完整的关键帧，其余快照只保存相对于上一个快照发生变化的标的。读取时从最近的关键帧
+    开始回放增量。
+    """
+
+    def __init__(self, keyframe_interval: int = 64) -> None:
+        self._keyframe_interval = max(int(keyframe_interval), 1)
+        self._dts = array("d")
+        self._navs = array("d")
+        self._fund_shares = array("d")
+        # 每个快照的敞口: 关键帧为完整敞口，其余为变化的敞口
+        self._exposures = []
+
+    def __len__(self) -> int:
+        return len(self._dts)
+
+    def append(
+        self,
+        dt: float,
+        nav: float,
+        fund_shares: float,
+        exposure: Mapping[str, float],
+        changes: Mapping[str, float],
+    ) -> None:
+        """追加快照
+
+        Arguments:
+            dt {float} -- 快照时间，须不早于上一个快照
+            nav {float} -- 组合净资产
+            fund_shares {float} -- 组合份额
+            exposure {Mapping[str, float]} -- 当前完整的标的敞口
+            changes {Mapping[str, float]} -- 上一个快照之后变化的标的敞口
+        """
+        if self._dts and dt < self._dts[-1]:
+            raise ValueError(f"快照时间({dt})早于上一个快照({self._dts[-1]})")
+
+        if len(self._dts) % self._keyframe_interval == 0:
+            self._exposures.append(dict(exposure))
+        else:
+            self._exposures.append(dict(changes))
+        self._dts.append(dt)
+        self._navs.append(nav)
+        self._fund_shares.append(fund_shares)
+
+    def at(self, dt: float) -> Optional[Dict]:
+        """获取 dt 时刻(含)之前最近的快照
+
+        Arguments:
+            dt {float} -- 时间
+
+        Returns:
+            Optional[Dict] -- {"dt", "nav", "fund_shares", "fund_nav", "exposure"}，无快照时返回None
+        """
+        i = bisect.bisect_right(self._dts, dt) - 1
+        if i < 0:
+            return None
+
+        keyframe = i - i % self._keyframe_interval
+        exposure = dict(self._exposures[keyframe])
+        for changes in self._exposures[keyframe + 1 : i + 1]:
+            for symbol, value in changes.items():
+                if value:
+                    exposure[symbol] = value
+                else:
+                    exposure.pop(symbol, None)
+
+        fund_shares = self._fund_shares[i]
+        return {
+            "dt": self._dts[i],
+            "nav": self._navs[i],
+            "fund_shares": fund_shares,
+            "fund_nav": round(self._navs[i] / fund_shares, 4) if fund_shares else 1.0,
+            "exposure": exposure,
+        }
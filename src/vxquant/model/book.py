@@ -0,0 +1,140 @@
+"""持仓簿
+
+vxPositionBook: 按 (account_id, symbol) 索引的持仓簿，写入时复制，读取时无锁获取一致的快照
+"""
+
+import copy
+import threading
+import contextlib
+from types import MappingProxyType
+from typing import Dict, Iterator, Mapping, Optional, Tuple, Union
+
+from vxquant.model.exchange import vxPosition, vxCashPosition
+
+__all__ = ["vxPositionBook"]
+
+
+_EMPTY = MappingProxyType({})
+
+
+class vxPositionTransaction:
+    """持仓簿事务
+
+    事务内修改的持仓均为副本，事务提交时一次性发布为新的快照版本。
+    """
+
+    def __init__(self, snapshot: Mapping[str, vxPosition]) -> None:
+        self._snapshot = snapshot
+        self._edited: Dict[str, Optional[vxPosition]] = {}
+
+    def __contains__(self, symbol: str) -> bool:
+        if symbol in self._edited:
+            return self._edited[symbol] is not None
+        return symbol in self._snapshot
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols())
+
+    def symbols(self):
+        """事务内可见的全部持仓代码"""
+        symbols = dict.fromkeys(self._snapshot)
+        symbols.update(self._edited)
+        return [symbol for symbol in symbols if symbol in self]
+
+    def get(self, symbol: str) -> Optional[vxPosition]:
+        """只读获取持仓，不得修改返回的持仓"""
+        if symbol in self._edited:
+            return self._edited[symbol]
+        return self._snapshot.get(symbol, None)
+
+    def edit(self, symbol: str) -> Optional[vxPosition]:
+        """获取可修改的持仓副本，持仓不存在时返回None"""
+        if symbol not in self._edited:
+            position = self._snapshot.get(symbol, None)
+            self._edited[symbol] = copy.copy(position) if position else None
+        return self._edited[symbol]
+
+    def __setitem__(self, symbol: str, position: vxPosition) -> None:
+        self._edited[symbol] = position
+
+    def __delitem__(self, symbol: str) -> None:
+        self._edited[symbol] = None
+
+    def commit(self) -> Mapping[str, vxPosition]:
+        """生成新的快照版本"""
+        if not self._edited:
+            return self._snapshot
+
+        positions = dict(self._snapshot)
+        for symbol, position in self._edited.items():
+            if position is None:
+                positions.pop(symbol, None)
+            else:
+                positions[symbol] = position
+        return MappingProxyType(positions)
+
+
+class vxPositionBook:
+    """持仓簿
+
+    每个账户的持仓以不可变快照(symbol --> position)的形式保存，写入方在事务中修改持仓副本，
+    提交时以一次引用替换发布新版本。读取方直接获取当前快照，不需要加锁，也不会阻塞写入方;
+    快照发布后其中的持仓不再被修改，调用方不得修改快照中的持仓。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, Mapping[str, vxPosition]] = {}
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """快照版本号，每次提交修改后递增"""
+        return self._version
+
+    def snapshot(self, account_id: str) -> Mapping[str, vxPosition]:
+        """获取账户持仓的只读快照
+
+        Arguments:
+            account_id {str} -- 账户id
+
+        Returns:
+            Mapping[str, vxPosition] -- {symbol: position}
+        """
+        return self._snapshots.get(account_id, _EMPTY)
+
+    def get(
+        self, account_id: str, symbol: str
+    ) -> Optional[Union[vxPosition, vxCashPosition]]:
+        """按 (account_id, symbol) 获取持仓(只读)"""
+        return self._snapshots.get(account_id, _EMPTY).get(symbol, None)
+
+    def __getitem__(self, key: Tuple[str, str]) -> vxPosition:
+        position = self.get(*key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return self.get(*key) is not None
+
+    @contextlib.contextmanager
+    def transaction(self, account_id: str) -> Iterator[vxPositionTransaction]:
+        """修改账户持仓的事务，正常退出时发布新的快照，发生异常时放弃全部修改
+
+        Arguments:
+            account_id {str} -- 账户id
+        """
+        with self._lock:
+            txn = vxPositionTransaction(self._snapshots.get(account_id, _EMPTY))
+            yield txn
+            snapshot = txn.commit()
+            if snapshot is not self._snapshots.get(account_id, _EMPTY):
+                self._snapshots[account_id] = snapshot
+                self._version += 1
+
+    def reset(self, account_id: str, positions: Mapping[str, vxPosition]) -> None:
+        """以给定的持仓替换账户的全部持仓"""
+        with self._lock:
+            self._snapshots[account_id] = MappingProxyType(dict(positions))
+            self._version += 1
@@ -476,3 +476,11 @@ class vxInstrument(vxDataClass):
     symbol: str = vxField("", str)
     # 证券名称
     name: str = vxField("", str)
+    # 证券类型
+    security_type: SecType = vxEnumField(SecType.OTHER)
+    # 上市日期
+    listed_date: float = vxDatetimeField(default_factory=0.0, formatter_string="%F")
+    # 退市日期，未退市为 2199-12-31
+    delisted_date: float = vxDatetimeField(
+        default_factory=float("inf"), formatter_string="%F"
+    )
@@ -0,0 +1,640 @@
+"""账户内存账本
+
+vxAccountLedger: 活跃账户的内存账本，读取及校验均在内存中完成，变更通过 write-behind 批量写回 MongoDB
+"""
+
+import contextlib
+import copy
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional
+
+import pymongo
+
+from vxsched.event import vxEvent
+from vxsched.journal import vxEventJournal
+from vxutils import vxtime, logger
+from vxutils.database import vxMongoDB
+from vxquant.exceptions import NoEnoughCash, NoEnoughPosition, IllegalPrice
+from vxquant.model.preset import vxMarketPreset
+from vxquant.model.risk import vxBatchRiskChecker
+from vxquant.model.contants import OrderDirection, OrderStatus
+from vxquant.model.exchange import (
+    vxAccountInfo,
+    vxPosition,
+    vxCashPosition,
+    vxOrder,
+    vxTrade,
+)
+
+__all__ = ["vxAccountLedger"]
+
+
+# 各collection写回时使用的主键
+_PRIMARY_KEYS = {
+    "accounts": ("account_id",),
+    "positions": ("account_id", "symbol"),
+    "orders": ("order_id",),
+    "trades": ("trade_id",),
+}
+
+# 未完成的委托状态
+_OPEN_STATUS = (OrderStatus.New, OrderStatus.PendingNew, OrderStatus.PartiallyFilled)
+
+# 买入委托冻结资金的系数(含手续费)
+_FROZEN_COEFF = 1.003
+
+
+class vxAccountLedger:
+    """账户内存账本
+
+    活跃账户的账户信息、持仓以及未完成委托常驻内存，所有读取及校验均在内存中完成。
+    每次变更先写入本地事件日志(vxEventJournal)，再由后台线程按 flush_interval / flush_size
+    批量写回 MongoDB；同一文档的多次变更只写回最新状态。
+    启动时先将事件日志中尚未写回的变更写入 MongoDB，账户在首次访问时从 MongoDB 加载
+    (加载时不持有账本锁)；持仓价格由 update_prices 按最新行情更新。
+    """
+
+    def __init__(
+        self,
+        database: vxMongoDB,
+        journal_dir: str = "",
+        flush_interval: float = 0.5,
+        flush_size: int = 500,
+    ) -> None:
+        """账户内存账本
+
+        Arguments:
+            database {vxMongoDB} -- 数据库
+
+        Keyword Arguments:
+            journal_dir {str} -- 事件日志目录，为空时不写日志，进程崩溃时将丢失未写回的变更 (default: {""})
+            flush_interval {float} -- 写回间隔(秒) (default: {0.5})
+            flush_size {int} -- 待写回文档超过该数量时立即写回 (default: {500})
+        """
+        self._database = database
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        # 结算中的账户集合，None 表示全部账户
+        self._settling: List[Optional[set]] = []
+        self._settled = threading.Condition(self._lock)
+
+        self._accounts: Dict[str, vxAccountInfo] = {}
+        # account_id --> {symbol: position}
+        self._positions: Dict[str, Dict[str, vxPosition]] = {}
+        # account_id --> {order_id: order}
+        self._open_orders: Dict[str, Dict[str, vxOrder]] = defaultdict(dict)
+        # order_id --> {trade_id: trade}
+        self._order_trades: Dict[str, Dict[str, vxTrade]] = defaultdict(dict)
+        # account_id --> 已处理的trade_id，用于过滤重复的成交回报
+        self._trade_ids: Dict[str, set] = defaultdict(set)
+
+        # (collection, key) --> [版本号, 待写回的文档]
+        self._pending = OrderedDict()
+        self._version = 0
+        self._metrics = {"flushes": 0, "flushed_docs": 0, "flush_seconds": 0.0}
+
+        self._journal = vxEventJournal(journal_dir) if journal_dir else None
+        if self._journal is not None:
+            self._recover()
+
+        self._wakeup = threading.Event()
+        self._active = True
+        self._flusher = threading.Thread(
+            target=self._run_flusher, name="vxAccountLedger_flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def __str__(self) -> str:
+        return (
+            f"< {self.__class__.__name__}(id-{id(self)}) accounts:"
+            f" {len(self._accounts)} pending: {len(self._pending)} >"
+        )
+
+    __repr__ = __str__
+
+    def _recover(self) -> None:
+        """将事件日志中尚未写回的变更写入MongoDB"""
+        for event, _ in self._journal.replay():
+            collection, key = event.type, event.id.split(":", 1)[1]
+            self._version += 1
+            self._pending[(collection, key)] = [self._version, event.data]
+        if self._pending:
+            logger.info(f"{self} 从事件日志恢复 {len(self._pending)} 个未写回的文档")
+            self.flush()
+
+    def _record(self, collection: str, obj) -> None:
+        """登记变更，由后台线程批量写回"""
+        message = obj.message
+        key = ":".join(str(message[k]) for k in _PRIMARY_KEYS[collection])
+        self._version += 1
+        self._pending[(collection, key)] = [self._version, message]
+        self._pending.move_to_end((collection, key))
+        if self._journal is not None:
+            self._journal.put(
+                vxEvent(id=f"{collection}:{key}", type=collection, data=message)
+            )
+        if len(self._pending) >= self._flush_size:
+            self._wakeup.set()
+
+    def _run_flusher(self) -> None:
+        while self._active:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as err:
+                logger.error(f"{self} 写回数据库失败: {err}", exc_info=True)
+
+    def flush(self) -> int:
+        """立即将待写回的变更批量写入MongoDB
+
+        Returns:
+            int -- 写回的文档数量
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = [
+                    (collection, key, version, message)
+                    for (collection, key), (version, message) in self._pending.items()
+                ]
+
+            start = vxtime.now()
+            commands = defaultdict(list)
+            for collection, _, _, message in batch:
+                filter_ = {k: message[k] for k in _PRIMARY_KEYS[collection]}
+                commands[collection].append(
+                    pymongo.UpdateOne(filter_, {"$set": message}, upsert=True)
+                )
+            for collection, cmds in commands.items():
+                self._database[collection].bulk_write(cmds, ordered=False)
+
+            with self._lock:
+                for collection, key, version, _ in batch:
+                    # 写回期间再次变更的文档留待下次写回
+                    if self._pending.get((collection, key), [None])[0] != version:
+                        continue
+                    self._pending.pop((collection, key))
+                    if self._journal is not None:
+                        self._journal.done(f"{collection}:{key}")
+
+                self._metrics["flushes"] += 1
+                self._metrics["flushed_docs"] += len(batch)
+                self._metrics["flush_seconds"] += vxtime.now() - start
+            logger.debug(f"{self} 写回 {len(batch)} 个文档")
+            return len(batch)
+
+    @property
+    def metrics(self) -> dict:
+        """写回统计: 写回次数、文档数、耗时以及待写回的文档数"""
+        with self._lock:
+            return dict(self._metrics, pending=len(self._pending))
+
+    def close(self) -> None:
+        """停止后台写回线程，并写回剩余的变更"""
+        self._active = False
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+
+    def _load(self, account_id: str) -> None:
+        """加载账户至内存
+
+        在账本锁外查询数据库，再在锁内发布，避免加载账户时阻塞其他账户的操作。
+        调用方须在持有账本锁之前调用。
+        """
+        with self._lock:
+            self._settled.wait_for(lambda: not self._is_settling(account_id))
+            if account_id in self._accounts:
+                return
+
+        account_info = self._database.query_one("accounts", {"account_id": account_id})
+        if account_info is None:
+            raise ValueError(f"账户信息不存在: {account_id}")
+
+        positions = {}
+        for position in self._database.query("positions", {"account_id": account_id}):
+            if position.symbol == "CNY":
+                position = vxCashPosition(position)
+            positions[position.symbol] = position
+
+        if "CNY" not in positions:
+            positions["CNY"] = vxCashPosition(
+                portfolio_id=account_info.portfolio_id, account_id=account_id
+            )
+
+        open_orders = self._database.query(
+            "orders",
+            {
+                "account_id": account_id,
+                "status": {"$in": [status.name for status in _OPEN_STATUS]},
+            },
+        )
+        open_orders = {order.order_id: order for order in open_orders}
+        # 只对上次结算后的成交回报去重，结算时账户移出内存，去重集合随之清空
+        trade_ids = {
+            item["trade_id"]
+            for item in self._database.trades.find(
+                {
+                    "account_id": account_id,
+                    "created_dt": {"$gt": account_info.settle_day},
+                },
+                {"_id": 0, "trade_id": 1},
+            )
+        }
+
+        with self._lock:
+            # 其他线程已先行加载时，以内存中的状态为准；加载期间开始结算时重新加载
+            if self._is_settling(account_id):
+                return self._load(account_id)
+            if account_id in self._accounts:
+                return
+            self._open_orders[account_id] = open_orders
+            self._trade_ids[account_id] = trade_ids
+            self._positions[account_id] = positions
+            self._accounts[account_id] = account_info
+        logger.debug(
+            f"{self} 加载账户{account_id}: {len(positions)}个持仓,"
+            f" {len(open_orders)}个未完成委托"
+        )
+
+    @property
+    def loaded_accounts(self) -> List[str]:
+        """已加载至内存的账户"""
+        with self._lock:
+            return list(self._accounts)
+
+    def unload(self, account_id: str) -> None:
+        """写回并移出内存中的账户"""
+        self.flush()
+        with self._lock:
+            self._accounts.pop(account_id, None)
+            self._positions.pop(account_id, None)
+            self._trade_ids.pop(account_id, None)
+            for order_id in self._open_orders.pop(account_id, {}):
+                self._order_trades.pop(order_id, None)
+
+    @contextlib.contextmanager
+    def settling(self, account_ids: Optional[List[str]] = None):
+        """结算期间暂停账户的读写
+
+        进入时写回并移出待结算的账户，结算完成前访问这些账户的操作将等待，
+        结算完成后账户重新从数据库加载，结算期间的委托及成交回报在结算结果之上处理。
+
+        Keyword Arguments:
+            account_ids {Optional[List[str]]} -- 待结算的账户，None 表示全部账户 (default: {None})
+        """
+        settling = set(account_ids) if account_ids is not None else None
+        with self._lock:
+            self._settling.append(settling)
+        try:
+            for account_id in (
+                self.loaded_accounts if settling is None else list(settling)
+            ):
+                self.unload(account_id)
+            yield
+        finally:
+            with self._lock:
+                self._settling.remove(settling)
+                self._settled.notify_all()
+
+    def _is_settling(self, account_id: str) -> bool:
+        return any(
+            settling is None or account_id in settling for settling in self._settling
+        )
+
+    def get_account(self, account_id: str) -> vxAccountInfo:
+        """获取账户信息(副本)"""
+        self._load(account_id)
+        with self._lock:
+            return copy.copy(self._accounts[account_id])
+
+    def get_positions(self, account_id: str, symbol: str = None) -> Dict:
+        """获取持仓信息(副本)
+
+        Returns:
+            Dict -- Dict['symbol': vxPosition]
+        """
+        self._load(account_id)
+        with self._lock:
+            positions = self._positions[account_id]
+            if symbol:
+                if symbol not in positions:
+                    return {}
+                return {symbol: copy.copy(positions[symbol])}
+            return {s: copy.copy(position) for s, position in positions.items()}
+
+    def get_open_orders(self, account_id: str) -> Dict:
+        """获取未完成委托(副本)
+
+        Returns:
+            Dict -- Dict['order_id': vxOrder]
+        """
+        self._load(account_id)
+        with self._lock:
+            return {
+                order_id: copy.copy(order)
+                for order_id, order in self._open_orders[account_id].items()
+            }
+
+    def get_order(self, account_id: str, order_id: str) -> Optional[vxOrder]:
+        """获取内存中的未完成委托(副本)"""
+        self._load(account_id)
+        with self._lock:
+            order = self._open_orders[account_id].get(order_id, None)
+            return copy.copy(order) if order is not None else None
+
+    def submit_order(self, order: vxOrder) -> vxOrder:
+        """校验并冻结委托所需的资金或持仓
+
+        Arguments:
+            order {vxOrder} -- 已设置方向、数量及价格的委托
+
+        Raises:
+            NoEnoughCash: 可用资金不足
+            NoEnoughPosition: 可用持仓不足
+
+        Returns:
+            vxOrder -- 委托订单
+        """
+        self._load(order.account_id)
+        with self._lock:
+            positions = self._positions[order.account_id]
+            if order.order_direction == OrderDirection.Buy:
+                cash = positions["CNY"]
+                frozen_amount = order.volume * order.price * _FROZEN_COEFF
+                if frozen_amount > cash.available:
+                    raise NoEnoughCash(
+                        f"Buy {order.symbol} volume({order.volume}) on"
+                        f" price({order.price}) frozen {frozen_amount} >"
+                        f" {cash.available}"
+                    )
+                order.frozen_position_id = cash.position_id
+            else:
+                position = positions.get(order.symbol, None)
+                if not position or position.available < order.volume:
+                    raise NoEnoughPosition(
+                        f"Sell {order.symbol} volume({order.volume})"
+                        f" 可用持仓:({position.available if position else 0})."
+                    )
+                order.frozen_position_id = position.position_id
+
+            self._open_orders[order.account_id][order.order_id] = order
+            self._record("orders", order)
+            self._update_frozens(order.account_id)
+            self._revaluate(order.account_id)
+            return copy.copy(order)
+
+    def submit_orders(
+        self, orders: List[vxOrder], risk_checker: vxBatchRiskChecker, ticks=None
+    ) -> List[vxOrder]:
+        """批量校验并冻结同一账户委托所需的资金或持仓
+
+        Arguments:
+            orders {List[vxOrder]} -- 同一账户的委托，按优先级排序
+            risk_checker {vxBatchRiskChecker} -- 批量风控
+
+        Keyword Arguments:
+            ticks {Dict[str, vxTick]} -- 最新行情 (default: {None})
+
+        Returns:
+            List[vxOrder] -- 与orders一一对应，未通过风控的委托为 Rejected 状态
+        """
+        if not orders:
+            return []
+
+        account_id = orders[0].account_id
+        self._load(account_id)
+        with self._lock:
+            positions = self._positions[account_id]
+            result = risk_checker.check(
+                orders,
+                positions["CNY"].available,
+                {symbol: position.available for symbol, position in positions.items()},
+                ticks,
+            )
+            ret_orders = []
+            for order, accepted in zip(result.orders, result.accepted):
+                if accepted:
+                    frozen_symbol = (
+                        "CNY"
+                        if order.order_direction == OrderDirection.Buy
+                        else order.symbol
+                    )
+                    order.frozen_position_id = positions[frozen_symbol].position_id
+                    self._open_orders[account_id][order.order_id] = order
+                    order = copy.copy(order)
+                self._record("orders", order)
+                ret_orders.append(order)
+
+            self._update_frozens(account_id)
+            self._revaluate(account_id)
+            return ret_orders
+
+    def update_order(self, broker_order: vxOrder) -> None:
+        """更新委托状态
+
+        Arguments:
+            broker_order {vxOrder} -- 交易通道返回的委托订单
+        """
+        self._load(broker_order.account_id)
+        with self._lock:
+            open_orders = self._open_orders[broker_order.account_id]
+            order = open_orders.get(broker_order.order_id, None)
+            if order is None:
+                # 已完成或未知的委托，直接写回交易通道返回的状态
+                self._record("orders", broker_order)
+                return
+
+            order.filled_volume = max(order.filled_volume, broker_order.filled_volume)
+            order.filled_amount = max(order.filled_amount, broker_order.filled_amount)
+            order.exchange_order_id = broker_order.exchange_order_id
+            order.status = broker_order.status
+            order.updated_dt = broker_order.updated_dt
+            if order.status not in _OPEN_STATUS:
+                open_orders.pop(order.order_id)
+                self._order_trades.pop(order.order_id, None)
+
+            self._record("orders", order)
+            self._update_frozens(order.account_id)
+            self._revaluate(order.account_id)
+
+    def apply_trade(self, trade: vxTrade) -> None:
+        """成交回报: 更新委托成交数量、持仓及资金
+
+        Arguments:
+            trade {vxTrade} -- 成交回报
+        """
+        self._load(trade.account_id)
+        with self._lock:
+            if trade.trade_id in self._trade_ids[trade.account_id]:
+                logger.warning(f"重复的成交回报: {trade.trade_id}")
+                return
+            self._trade_ids[trade.account_id].add(trade.trade_id)
+            order_trades = self._order_trades[trade.order_id]
+            order_trades[trade.trade_id] = trade
+            self._record("trades", trade)
+
+            order = self._open_orders[trade.account_id].get(trade.order_id, None)
+            if order is not None:
+                filled_volume = sum(t.volume for t in order_trades.values())
+                filled_amount = sum(t.volume * t.price for t in order_trades.values())
+                order.filled_volume = max(order.filled_volume, filled_volume)
+                order.filled_amount = max(order.filled_amount, filled_amount)
+                order.status = (
+                    OrderStatus.Filled
+                    if order.filled_volume >= order.volume
+                    else OrderStatus.PartiallyFilled
+                )
+                if order.status == OrderStatus.Filled:
+                    self._open_orders[trade.account_id].pop(order.order_id)
+                    self._order_trades.pop(order.order_id, None)
+                self._record("orders", order)
+
+            if trade.order_direction == OrderDirection.Buy:
+                self._apply_buy(trade)
+            else:
+                self._apply_sell(trade)
+            self._update_frozens(trade.account_id)
+            self._revaluate(trade.account_id)
+
+    def _apply_buy(self, trade: vxTrade) -> None:
+        positions = self._positions[trade.account_id]
+        filled_amount = trade.price * trade.volume
+        cash = positions["CNY"]
+        delta = cash.volume_his - filled_amount - trade.commission
+        cash.volume_his = max(delta, 0)
+        cash.volume_today += min(delta, 0)
+        self._record("positions", cash)
+
+        position = positions.get(trade.symbol, None)
+        if position is None:
+            preset = vxMarketPreset(trade.symbol)
+            position = vxPosition(
+                portfolio_id=cash.portfolio_id,
+                account_id=trade.account_id,
+                symbol=trade.symbol,
+                security_type=preset.security_type,
+                allow_t0=preset.allow_t0,
+            )
+            positions[trade.symbol] = position
+        position.volume_today += trade.volume
+        position.lasttrade = trade.price
+        position.cost += filled_amount + trade.commission
+        self._record("positions", position)
+
+    def _apply_sell(self, trade: vxTrade) -> None:
+        positions = self._positions[trade.account_id]
+        filled_amount = trade.price * trade.volume
+        position = positions[trade.symbol]
+        delta = position.volume_his - trade.volume
+        position.volume_his = max(delta, 0)
+        position.volume_today += min(delta, 0)
+        position.lasttrade = trade.price
+        position.cost = position.cost - filled_amount + trade.commission
+        self._record("positions", position)
+
+        cash = positions["CNY"]
+        cash.volume_today += filled_amount - trade.commission
+        self._record("positions", cash)
+
+    def deposit(self, account_id: str, money: float) -> None:
+        """转入金额"""
+        if money <= 0:
+            raise IllegalPrice(f"转入金额 {money} <= 0 错误.")
+
+        self._load(account_id)
+        with self._lock:
+            account_info = self._accounts[account_id]
+            cash = self._positions[account_id]["CNY"]
+            account_info.fund_shares += money / account_info.fund_nav
+            account_info.deposit += money
+            cash.volume_today += money
+            self._record("positions", cash)
+            self._revaluate(account_id, force=True)
+
+    def withdraw(self, account_id: str, money: float) -> None:
+        """转出金额"""
+        if money <= 0:
+            raise IllegalPrice(f"转出金额 {money} <= 0 错误.")
+
+        self._load(account_id)
+        with self._lock:
+            account_info = self._accounts[account_id]
+            cash = self._positions[account_id]["CNY"]
+            if money > cash.available:
+                raise NoEnoughCash(f"转出金额{money} 大于可用金额 {cash.available}。 ")
+
+            account_info.withdraw += money
+            account_info.fund_shares -= money / account_info.fund_nav
+            if money < cash.volume_his:
+                cash.volume_his -= money
+            else:
+                cash.volume_today -= money - cash.volume_his
+                cash.volume_his = 0
+            self._record("positions", cash)
+            self._revaluate(account_id, force=True)
+
+    def update_prices(self, ticks: Dict) -> None:
+        """以最新行情更新已加载账户的持仓价格，并重新计算账户市值
+
+        Arguments:
+            ticks {Dict} -- Dict['symbol': vxTick]
+        """
+        with self._lock:
+            for account_id, positions in self._positions.items():
+                changed = False
+                for symbol, position in positions.items():
+                    tick = ticks.get(symbol, None)
+                    if symbol == "CNY" or tick is None or not tick.lasttrade:
+                        continue
+                    if position.lasttrade != tick.lasttrade:
+                        position.lasttrade = tick.lasttrade
+                        self._record("positions", position)
+                        changed = True
+                if changed:
+                    self._revaluate(account_id)
+
+    def _update_frozens(self, account_id: str) -> None:
+        """根据未完成委托重新计算冻结的资金及持仓"""
+        frozens = defaultdict(float)
+        for order in self._open_orders[account_id].values():
+            left_volume = order.volume - order.filled_volume
+            if order.order_direction == OrderDirection.Buy:
+                frozens["CNY"] += left_volume * order.price * _FROZEN_COEFF
+            else:
+                frozens[order.symbol] += left_volume
+
+        for symbol, position in self._positions[account_id].items():
+            frozen = round(frozens.get(symbol, 0.0), 2)
+            if position.frozen != frozen:
+                position.frozen = frozen
+                self._record("positions", position)
+
+    def _revaluate(self, account_id: str, force: bool = False) -> None:
+        """根据内存中的持仓重新计算账户信息，有变化时写回"""
+        account_info = self._accounts[account_id]
+        cash = self._positions[account_id]["CNY"]
+        stocks: List[vxPosition] = [
+            position
+            for symbol, position in self._positions[account_id].items()
+            if symbol != "CNY"
+        ]
+        update_dict = {
+            "balance": cash.marketvalue,
+            "frozen": cash.frozen,
+            "marketvalue": sum(position.marketvalue for position in stocks),
+            "fnl": sum(position.fnl for position in stocks),
+        }
+        changed = force or any(
+            account_info[key] != round(value, 2) for key, value in update_dict.items()
+        )
+        if changed:
+            account_info.update(**update_dict)
+            self._record("accounts", account_info)
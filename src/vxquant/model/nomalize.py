@@ -1,6 +1,10 @@
 import re
-from typing import Tuple, Callable, Union
-from functools import lru_cache
+import sys
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
 
 
 def normalize_freq(freq: str) -> Tuple[int, str]:
@@ -75,20 +79,145 @@ def normalize_symbol(symbol: str):
     return (exchange.upper(), code)
 
 
-@lru_cache(200)
-def to_symbol(instrument: str):
-    if instrument.upper() in {"CNY", "CACH"}:
-        return "CNY"
+# 单次匹配的证券代码解析: 交易所在前(SH600000/SHSE.600000) 或 代码在前(600000.SH)
+_SYMBOL_PATTERN = re.compile(
+    r"^(?:([A-Za-z]{2,4})[^0-9A-Za-z]?([0-9]{6,10})"
+    r"|([0-9]{6,10})[^0-9A-Za-z]?([A-Za-z]{2,4}))$"
+)
+_CASH_SYMBOLS = {"CNY", "CACH"}
+_FUND_EXCHANGES = {"OF", "ETF", "LOF", ""}
 
-    match_obj = re.match(r"^(SHSE|SZSE).(\d{6})$", instrument)
 
-    if match_obj:
-        return instrument
+def _parse_symbol(instrument: str) -> str:
+    """将各种格式的证券代码解析为 交易所.代码 格式"""
+    if instrument.upper() in _CASH_SYMBOLS:
+        return "CNY"
 
-    exchange, code = normalize_symbol(instrument)
+    match_obj = _SYMBOL_PATTERN.match(instrument)
+    if match_obj is None:
+        raise ValueError(f"{instrument} format is not support.")
+
+    exchange, code = (
+        (match_obj[1], match_obj[2])
+        if match_obj[1] is not None
+        else (match_obj[4], match_obj[3])
+    )
+    exchange = exchange.upper().replace("SE", "")
+    if exchange in _FUND_EXCHANGES:
+        exchange = "SZSE" if code[0] in "01234" else "SHSE"
+    elif len(exchange) <= 2:
+        exchange = f"{exchange}SE"
     return f"{exchange}.{code}"
 
 
+class vxSymbolRegistry:
+    """证券代码注册表
+
+    将证券代码规范化并驻留(sys.intern)，为每个规范化的代码分配从0开始连续的整数id，
+    id 可直接作为其他按列存储结构的数组下标。原始代码到规范化代码的缓存随标的数量增长，
+    超过 cache_size 时清空。
+    """
+
+    def __init__(self, cache_size: int = 65536) -> None:
+        """证券代码注册表
+
+        Keyword Arguments:
+            cache_size {int} -- 原始代码缓存的最大数量 (default: {65536})
+        """
+        self._cache_size = cache_size
+        self._cache: Dict[str, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__} symbols: {len(self)} >"
+
+    __repr__ = __str__
+
+    @property
+    def symbols(self) -> List[str]:
+        """已注册的代码，下标即为id"""
+        return list(self._symbols)
+
+    def normalize(self, instrument: str) -> str:
+        """规范化证券代码，返回驻留的字符串"""
+        try:
+            return self._cache[instrument]
+        except KeyError:
+            pass
+
+        symbol = _parse_symbol(instrument)
+        if symbol not in self._ids:
+            self._register(symbol)
+        symbol = self._symbols[self._ids[symbol]]
+
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[instrument] = symbol
+        return symbol
+
+    def _register(self, symbol: str) -> int:
+        with self._lock:
+            if symbol not in self._ids:
+                self._ids[symbol] = len(self._symbols)
+                self._symbols.append(sys.intern(symbol))
+        return self._ids[symbol]
+
+    def id_of(self, instrument: str) -> int:
+        """证券代码的整数id，未注册的代码自动注册"""
+        return self._ids[self.normalize(instrument)]
+
+    def symbol_of(self, symbol_id: int) -> str:
+        """整数id对应的规范化代码"""
+        return self._symbols[symbol_id]
+
+    def normalize_many(self, instruments: Sequence[str]) -> np.ndarray:
+        """批量规范化证券代码，相同的原始代码只解析一次
+
+        Arguments:
+            instruments {Sequence[str]} -- 原始证券代码
+
+        Returns:
+            np.ndarray -- 规范化代码(object数组)，与instruments一一对应
+        """
+        inverse, uniques = pd.factorize(np.asarray(instruments, dtype=object))
+        symbols = np.array([self.normalize(x) for x in uniques], dtype=object)
+        return symbols[inverse]
+
+    def ids_of(self, instruments: Sequence[str]) -> np.ndarray:
+        """批量获取整数id
+
+        Arguments:
+            instruments {Sequence[str]} -- 原始证券代码
+
+        Returns:
+            np.ndarray -- int64数组，与instruments一一对应
+        """
+        inverse, uniques = pd.factorize(np.asarray(instruments, dtype=object))
+        ids = np.array([self.id_of(x) for x in uniques], dtype=np.int64)
+        return ids[inverse]
+
+
+symbol_registry = vxSymbolRegistry()
+
+
+def to_symbol(instrument: str) -> str:
+    """规范化证券代码，如: sh600000 --> SHSE.600000"""
+    return symbol_registry.normalize(instrument)
+
+
+def to_symbols(instruments: Sequence[str]) -> np.ndarray:
+    """批量规范化证券代码，返回与instruments一一对应的object数组"""
+    return symbol_registry.normalize_many(instruments)
+
+
 if __name__ == "__main__":
     print(to_symbol("SHSE.600000"))
     print(to_symbol("SH600000"))
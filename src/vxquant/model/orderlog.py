@@ -0,0 +1,481 @@
+"""委托事件日志
+
+vxOrderEventStore: 以事件溯源的方式保存委托生命周期，委托及事件均以定长数组按列存储。
+事件日志仅保存在内存中，作为当日委托的去重及审计缓存，委托及成交以数据库为准。
+"""
+
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from vxutils import logger
+from vxquant.model.contants import (
+    OrderDirection,
+    OrderOffset,
+    OrderRejectReason,
+    OrderStatus,
+    OrderType,
+)
+from vxquant.model.exchange import vxOrder, vxTrade
+
+__all__ = ["vxOrderEventStore"]
+
+
+# 事件类型: 提交委托
+EVENT_SUBMIT = 0
+# 事件类型: 委托状态变化
+EVENT_STATUS = 1
+# 事件类型: 成交
+EVENT_FILL = 2
+
+_EVENT_NAMES = {EVENT_SUBMIT: "Submit", EVENT_STATUS: "Status", EVENT_FILL: "Fill"}
+
+# 已终结的委托状态，不再接受状态变化
+_FINAL_STATUS = {
+    OrderStatus.Filled.value,
+    OrderStatus.Canceled.value,
+    OrderStatus.Rejected.value,
+    OrderStatus.Expired.value,
+    OrderStatus.Suspended.value,
+}
+_OPEN_STATUS = {
+    OrderStatus.PendingNew.value,
+    OrderStatus.New.value,
+    OrderStatus.PartiallyFilled.value,
+}
+
+
+class _vxStringPool:
+    """字符串驻留池，相同的字符串只保存一份，以整数下标引用"""
+
+    def __init__(self) -> None:
+        self._values: List[str] = [""]
+        self._index: Dict[str, int] = {"": 0}
+
+    def intern(self, value: str) -> int:
+        value = value or ""
+        idx = self._index.get(value, None)
+        if idx is None:
+            idx = len(self._values)
+            self._values.append(value)
+            self._index[value] = idx
+        return idx
+
+    def find(self, value: str) -> int:
+        return self._index.get(value or "", -1)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._values[idx]
+
+
+class vxOrderEventStore:
+    """委托事件日志
+
+    每个委托在提交时分配一个整数代理id，委托的静态信息(账户、代码、方向、数量、价格等)和
+    当前状态(状态、成交数量、成交金额)按列保存在 array 中；每次提交、状态变化和成交均追加
+    一条事件，同一委托的事件通过 prev 指针串联。委托对象(vxOrder)仅在读取时按需生成，
+    history / replay 用于审计委托的完整生命周期。
+
+    事件日志不落盘，进程重启后为空；日终结算后调用 truncate 清除已终结的委托及其事件。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._strings = _vxStringPool()
+        # order_id --> 代理id
+        self._surrogates: Dict[str, int] = {}
+        # trade_id --> 代理id，用于过滤重复的成交回报
+        self._trade_events: Dict[str, int] = {}
+
+        # 委托静态信息，order_id 只在 _order_ids 及 _surrogates 中保存
+        self._order_ids: List[str] = []
+        self._account = array("l")
+        self._algo_order = array("l")
+        self._frozen_position = array("l")
+        self._symbol = array("l")
+        self._direction = array("b")
+        self._offset = array("b")
+        self._order_type = array("b")
+        self._volume = array("d")
+        self._price = array("d")
+        self._due_dt = array("d")
+        self._created_dt = array("d")
+
+        # 委托当前状态，成交数量及金额分别记录成交回报的累计值和状态回报中的值，以较大者为准
+        self._status = array("b")
+        self._filled_volume = array("d")
+        self._filled_amount = array("d")
+        self._reported_volume = array("d")
+        self._reported_amount = array("d")
+        self._exchange_order = array("l")
+        self._reject_code = array("b")
+        self._reject_reason = array("l")
+        self._updated_dt = array("d")
+        self._last_event = array("l")
+
+        # 事件日志
+        self._ev_order = array("l")
+        self._ev_kind = array("b")
+        self._ev_status = array("b")
+        self._ev_volume = array("d")
+        self._ev_price = array("d")
+        self._ev_commission = array("d")
+        self._ev_ref = array("l")
+        self._ev_dt = array("d")
+        self._ev_prev = array("l")
+
+    def __len__(self) -> int:
+        return len(self._order_ids)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._surrogates
+
+    def __str__(self) -> str:
+        return (
+            f"< {self.__class__.__name__}(id-{id(self)}) orders: {len(self)} events:"
+            f" {len(self._ev_order)} >"
+        )
+
+    __repr__ = __str__
+
+    @property
+    def nbytes(self) -> int:
+        """列数组占用的字节数(不含字符串池及索引)"""
+        return sum(
+            len(value) * value.itemsize
+            for value in vars(self).values()
+            if isinstance(value, array)
+        )
+
+    def _append_event(
+        self,
+        sid: int,
+        kind: int,
+        status: int,
+        volume: float = 0.0,
+        price: float = 0.0,
+        commission: float = 0.0,
+        ref: int = 0,
+        dt: float = 0.0,
+    ) -> int:
+        idx = len(self._ev_order)
+        self._ev_order.append(sid)
+        self._ev_kind.append(kind)
+        self._ev_status.append(status)
+        self._ev_volume.append(volume)
+        self._ev_price.append(price)
+        self._ev_commission.append(commission)
+        self._ev_ref.append(ref)
+        self._ev_dt.append(dt)
+        self._ev_prev.append(self._last_event[sid])
+        self._last_event[sid] = idx
+        return idx
+
+    def submit(self, order: vxOrder) -> int:
+        """登记新委托
+
+        Arguments:
+            order {vxOrder} -- 委托订单
+
+        Returns:
+            int -- 委托的整数代理id
+        """
+        with self._lock:
+            sid = self._surrogates.get(order.order_id, None)
+            if sid is not None:
+                return sid
+
+            sid = len(self._order_ids)
+            intern = self._strings.intern
+            self._surrogates[order.order_id] = sid
+            self._order_ids.append(order.order_id)
+            self._account.append(intern(order.account_id))
+            self._algo_order.append(intern(order.algo_order_id))
+            self._frozen_position.append(intern(order.frozen_position_id))
+            self._symbol.append(intern(order.symbol))
+            self._direction.append(order.order_direction.value)
+            self._offset.append(order.order_offset.value)
+            self._order_type.append(order.order_type.value)
+            self._volume.append(order.volume)
+            self._price.append(order.price)
+            self._due_dt.append(order.due_dt)
+            self._created_dt.append(order.created_dt)
+
+            self._status.append(order.status.value)
+            self._filled_volume.append(0.0)
+            self._filled_amount.append(0.0)
+            self._reported_volume.append(0.0)
+            self._reported_amount.append(0.0)
+            self._exchange_order.append(intern(order.exchange_order_id))
+            self._reject_code.append(order.reject_code.value)
+            self._reject_reason.append(intern(order.reject_reason))
+            self._updated_dt.append(order.updated_dt)
+            self._last_event.append(-1)
+
+            self._append_event(
+                sid,
+                EVENT_SUBMIT,
+                order.status.value,
+                order.volume,
+                order.price,
+                dt=order.created_dt,
+            )
+            return sid
+
+    def on_status(self, broker_order: vxOrder) -> bool:
+        """委托状态变化，已终结的委托及未变化的状态将被忽略
+
+        状态回报中的成交数量与成交回报的累计数量分别记录，以较大者为准，避免重复累计。
+
+        Arguments:
+            broker_order {vxOrder} -- 交易通道返回的委托
+
+        Returns:
+            bool -- 是否为新登记的委托或记录了新的状态
+        """
+        with self._lock:
+            sid = self._surrogates.get(broker_order.order_id, None)
+            is_new = sid is None
+            if is_new:
+                # 未登记的委托，先登记再记录状态回报中的成交信息
+                sid = self.submit(broker_order)
+
+            status = broker_order.status.value
+            exchange_idx = self._strings.intern(broker_order.exchange_order_id)
+            if self._status[sid] in _FINAL_STATUS or (
+                status == self._status[sid]
+                and exchange_idx == self._exchange_order[sid]
+                and broker_order.filled_volume <= self._reported_volume[sid]
+            ):
+                return is_new
+
+            self._status[sid] = status
+            self._exchange_order[sid] = exchange_idx
+            self._reject_code[sid] = broker_order.reject_code.value
+            self._reject_reason[sid] = self._strings.intern(broker_order.reject_reason)
+            if broker_order.filled_volume > self._reported_volume[sid]:
+                self._reported_volume[sid] = broker_order.filled_volume
+                self._reported_amount[sid] = broker_order.filled_amount
+            self._updated_dt[sid] = broker_order.updated_dt
+            self._append_event(
+                sid,
+                EVENT_STATUS,
+                status,
+                broker_order.filled_volume,
+                ref=exchange_idx,
+                dt=broker_order.updated_dt,
+            )
+            return True
+
+    def on_fill(self, trade: vxTrade) -> Optional[vxOrder]:
+        """成交回报，累加委托成交数量及金额并更新状态
+
+        Arguments:
+            trade {vxTrade} -- 成交回报
+
+        Returns:
+            Optional[vxOrder] -- 更新后的委托，重复的成交回报或未知委托返回None
+        """
+        with self._lock:
+            sid = self._surrogates.get(trade.order_id, None)
+            if sid is None or trade.trade_id in self._trade_events:
+                return None
+
+            amount = trade.price * trade.volume
+            if self._direction[sid] == OrderDirection.Buy.value:
+                amount += trade.commission
+            else:
+                amount -= trade.commission
+            self._filled_volume[sid] += trade.volume
+            self._filled_amount[sid] += amount
+            if self._status[sid] not in _FINAL_STATUS:
+                self._status[sid] = (
+                    OrderStatus.Filled.value
+                    if self._filled(sid)[0] >= self._volume[sid]
+                    else OrderStatus.PartiallyFilled.value
+                )
+            self._updated_dt[sid] = max(self._updated_dt[sid], trade.updated_dt)
+            self._append_event(
+                sid,
+                EVENT_FILL,
+                self._status[sid],
+                trade.volume,
+                trade.price,
+                trade.commission,
+                self._strings.intern(trade.trade_id),
+                trade.created_dt,
+            )
+            self._trade_events[trade.trade_id] = sid
+            return self._materialize(sid)
+
+    def has_trade(self, trade_id: str) -> bool:
+        """成交回报是否已处理"""
+        return trade_id in self._trade_events
+
+    def truncate(self, account_ids: Optional[List[str]] = None) -> int:
+        """清除已终结的委托及其事件，避免事件日志无限增长
+
+        未完成的委托以当前状态重新登记，保留已处理的成交回报id，之前的事件不再保留。
+
+        Keyword Arguments:
+            account_ids {Optional[List[str]]} -- 待清除的账户，None 表示全部账户 (default: {None})
+
+        Returns:
+            int -- 清除的委托数量
+        """
+        with self._lock:
+            account_idxs = (
+                None
+                if account_ids is None
+                else {self._strings.find(account_id) for account_id in account_ids}
+            )
+            store = vxOrderEventStore()
+            # 原代理id --> 新代理id
+            kept = {}
+            for sid, status in enumerate(self._status):
+                if status not in _OPEN_STATUS and (
+                    account_idxs is None or self._account[sid] in account_idxs
+                ):
+                    continue
+
+                kept[sid] = store.submit(self._materialize(sid))
+                for name in (
+                    "_filled_volume",
+                    "_filled_amount",
+                    "_reported_volume",
+                    "_reported_amount",
+                ):
+                    getattr(store, name)[kept[sid]] = getattr(self, name)[sid]
+
+            store._trade_events = {
+                trade_id: kept[sid]
+                for trade_id, sid in self._trade_events.items()
+                if sid in kept
+            }
+
+            removed = len(self) - len(store)
+            store._lock = self._lock
+            vars(self).update(vars(store))
+        logger.info(f"{self} 清除 {removed} 个已终结的委托")
+        return removed
+
+    def _filled(self, sid: int):
+        """(成交数量, 成交金额)"""
+        if self._filled_volume[sid] >= self._reported_volume[sid]:
+            return self._filled_volume[sid], self._filled_amount[sid]
+        return self._reported_volume[sid], self._reported_amount[sid]
+
+    def _materialize(self, sid: int) -> vxOrder:
+        strings = self._strings
+        filled_volume, filled_amount = self._filled(sid)
+        return vxOrder(
+            account_id=strings[self._account[sid]],
+            algo_order_id=strings[self._algo_order[sid]],
+            exchange_order_id=strings[self._exchange_order[sid]],
+            frozen_position_id=strings[self._frozen_position[sid]],
+            order_id=self._order_ids[sid],
+            symbol=strings[self._symbol[sid]],
+            order_direction=OrderDirection(self._direction[sid]),
+            order_offset=OrderOffset(self._offset[sid]),
+            order_type=OrderType(self._order_type[sid]),
+            volume=self._volume[sid],
+            price=self._price[sid],
+            filled_volume=filled_volume,
+            filled_amount=filled_amount,
+            status=OrderStatus(self._status[sid]),
+            due_dt=self._due_dt[sid],
+            reject_code=OrderRejectReason(self._reject_code[sid]),
+            reject_reason=strings[self._reject_reason[sid]],
+            created_dt=self._created_dt[sid],
+            updated_dt=self._updated_dt[sid],
+        )
+
+    def get_order(self, order_id: str) -> Optional[vxOrder]:
+        """按需生成委托的当前视图"""
+        with self._lock:
+            sid = self._surrogates.get(order_id, None)
+            return self._materialize(sid) if sid is not None else None
+
+    def open_orders(self, account_id: Optional[str] = None) -> Iterator[vxOrder]:
+        """未完成的委托"""
+        with self._lock:
+            account_idx = self._strings.find(account_id) if account_id else None
+            sids = [
+                sid
+                for sid, status in enumerate(self._status)
+                if status in _OPEN_STATUS
+                and (account_idx is None or self._account[sid] == account_idx)
+            ]
+            return iter([self._materialize(sid) for sid in sids])
+
+    def history(self, order_id: str) -> List[Dict]:
+        """委托的全部事件(按发生顺序)，用于审计
+
+        Arguments:
+            order_id {str} -- 委托id
+
+        Returns:
+            List[Dict] -- [{"event": 事件类型, "status": 状态, "volume": 数量, ...}, ...]
+        """
+        with self._lock:
+            sid = self._surrogates.get(order_id, None)
+            if sid is None:
+                return []
+
+            events = []
+            idx = self._last_event[sid]
+            while idx >= 0:
+                events.append(
+                    {
+                        "event": _EVENT_NAMES[self._ev_kind[idx]],
+                        "status": OrderStatus(self._ev_status[idx]).name,
+                        "volume": self._ev_volume[idx],
+                        "price": self._ev_price[idx],
+                        "commission": self._ev_commission[idx],
+                        "ref": self._strings[self._ev_ref[idx]],
+                        "dt": self._ev_dt[idx],
+                    }
+                )
+                idx = self._ev_prev[idx]
+            events.reverse()
+            return events
+
+    def replay(self, order_id: str) -> Optional[vxOrder]:
+        """仅根据事件重新计算委托状态，并与当前状态比对，不一致时告警
+
+        Arguments:
+            order_id {str} -- 委托id
+
+        Returns:
+            Optional[vxOrder] -- 重放得到的委托
+        """
+        with self._lock:
+            current = self.get_order(order_id)
+            if current is None:
+                return None
+
+            order = vxOrder(current.message)
+            order.status = OrderStatus.PendingNew
+            order.exchange_order_id = ""
+            is_buy = order.order_direction == OrderDirection.Buy
+            fill_volume = fill_amount = reported_volume = 0.0
+            for event in self.history(order_id):
+                order.status = event["status"]
+                if event["event"] == "Status":
+                    order.exchange_order_id = event["ref"]
+                    reported_volume = max(reported_volume, event["volume"])
+                elif event["event"] == "Fill":
+                    fill_volume += event["volume"]
+                    fill_amount += event["price"] * event["volume"] + (
+                        event["commission"] if is_buy else -event["commission"]
+                    )
+            order.filled_volume = max(fill_volume, reported_volume)
+            if fill_volume >= reported_volume:
+                order.filled_amount = fill_amount
+
+            if (order.status, order.filled_volume) != (
+                current.status,
+                current.filled_volume,
+            ):
+                logger.warning(f"委托{order_id}重放结果与当前状态不一致: {order} != {current}")
+            return order
@@ -1,11 +1,14 @@
 """组合相关数据模型"""
 
 
+import copy
 import uuid
+import threading
 import pymongo
 
-from typing import Optional, Union, Dict
-from multiprocessing import Lock
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, Dict, List, Mapping, Tuple
 
 from vxsched import vxZMQPublisher, vxZMQSubscriber
 from vxutils import vxtime, logger
@@ -33,6 +36,12 @@ from vxquant.exceptions import (
 )
 from vxquant.mdapi.hq import vxTdxHQ
 from vxquant.model.preset import vxMarketPreset
+from vxquant.model.ledger import vxAccountLedger
+from vxquant.model.book import vxPositionBook
+from vxquant.model.orderlog import vxOrderEventStore
+from vxquant.model.settle import vxSettlementEngine
+from vxquant.model.risk import vxBatchRiskChecker
+from vxquant.model.aggregate import vxPortfolioAggregator, vxSnapshotLog
 from vxquant.model.contants import (
     OrderOffset,
     TradeStatus,
@@ -48,6 +57,34 @@ from vxquant.model.exchange import (
     vxTrade,
     vxCashPosition,
     vxTick,
+    vxPortfolioInfo,
+    vxPortfolioUnderlying,
+)
+
+# 行情缓存最后一次更新后的保留时间(秒)
+_TICK_TTL = 24 * 60 * 60
+
+# 数据库及行情接口均未返回行情的symbol，在该时间(秒)内不再重复查询
+_TICK_MISS_TTL = 3
+
+# 账户中由汇总结果计算并保存的属性字段
+_ACCOUNT_DERIVED_FIELDS = ("asset", "nav", "available", "today_profit", "fund_nav")
+# 计算上述属性字段所需的账户字段
+_ACCOUNT_DERIVING_FIELDS = (
+    "debt",
+    "fund_shares",
+    "deposit",
+    "withdraw",
+    "asset_yd",
+    "nav_yd",
+    "fund_nav_yd",
+)
+
+# 未完成的委托状态
+_OPEN_ORDER_STATUS = (
+    OrderStatus.PendingNew,
+    OrderStatus.New,
+    OrderStatus.PartiallyFilled,
 )
 
 
@@ -79,26 +116,30 @@ class vxStockAccount:
         account_type=AccountType.Normal,
         portfolio_id=None,
         publisher=None,
+        position_book=None,
     ):
         self._account_type = account_type
         self._account_info = vxAccountInfo(
             account_id=account_id, portfolio_id=portfolio_id
         )
-        self._positions = {}
+        self._positions = position_book or vxPositionBook()
         self._algo_orders = {}
         self._orders = {}
         self._trades = {}
+        self._rebuild_indexes()
         self._publisher = publisher
+        self._risk_checker = vxBatchRiskChecker()
 
-        self._positions["CNY"] = vxCashPosition(
-            account_id=account_id,
-            symbol="CNY",
-            security_type="CASH",
-            allow_t0=True,
-            lasttrade=1.0,
-        )
+        with self._positions.transaction(self.account_id) as positions:
+            positions["CNY"] = vxCashPosition(
+                account_id=self.account_id,
+                symbol="CNY",
+                security_type="CASH",
+                allow_t0=True,
+                lasttrade=1.0,
+            )
 
-        self._lock = Lock()
+        self._lock = threading.Lock()
 
         self.deposit(balance)
         self.on_settle()
@@ -120,13 +161,17 @@ class vxStockAccount:
 
     def get_positions(
         self, symbol: Optional[str] = None
-    ) -> Union[Dict, vxPosition, vxCashPosition]:
-        """获取持仓信息"""
+    ) -> Union[Mapping, vxPosition, vxCashPosition]:
+        """获取持仓信息
+
+        返回当前持仓的只读快照，快照不随之后的交易变化，调用方不得修改其中的持仓。
+        """
+        positions = self._positions.snapshot(self.account_id)
         if not symbol:
-            return self._positions
+            return positions
 
-        if symbol in self._positions:
-            return self._positions[symbol]
+        if symbol in positions:
+            return positions[symbol]
 
         preset = vxMarketPreset(symbol)
         return vxPosition(
@@ -136,6 +181,44 @@ class vxStockAccount:
             allow_t0=preset.allow_t0,
         )
 
+    def _rebuild_indexes(self) -> None:
+        """根据当日委托及成交重建二级索引"""
+        # algo_order_id --> {order_id: order}
+        self._algo_order_index = defaultdict(dict)
+        # exchange_order_id --> order
+        self._exchange_order_index = {}
+        # order_id --> 已索引的 exchange_order_id
+        self._indexed_exchange_ids = {}
+        # 未完成委托的order_id
+        self._open_order_ids = set()
+        # order_id --> {trade_id: trade}
+        self._order_trade_index = defaultdict(dict)
+
+        for order in self._orders.values():
+            self._index_order(order)
+        for trade in self._trades.values():
+            self._order_trade_index[trade.order_id][trade.trade_id] = trade
+
+    def _index_order(self, order: vxOrder) -> None:
+        """委托新增或状态、exchange_order_id 更新后，维护二级索引"""
+        if order.algo_order_id:
+            self._algo_order_index[order.algo_order_id][order.order_id] = order
+
+        # exchange_order_id 变更时，删除旧的索引
+        stale_id = self._indexed_exchange_ids.get(order.order_id, None)
+        if stale_id and stale_id != order.exchange_order_id:
+            self._exchange_order_index.pop(stale_id, None)
+            self._indexed_exchange_ids.pop(order.order_id, None)
+
+        if order.exchange_order_id:
+            self._exchange_order_index[order.exchange_order_id] = order
+            self._indexed_exchange_ids[order.order_id] = order.exchange_order_id
+
+        if order.status in _OPEN_ORDER_STATUS:
+            self._open_order_ids.add(order.order_id)
+        else:
+            self._open_order_ids.discard(order.order_id)
+
     def get_orders(
         self,
         order_id: Optional[str] = None,
@@ -149,31 +232,24 @@ class vxStockAccount:
             )
 
         if algo_order_id:
-            return {
-                order_id: order
-                for order in self._orders.values()
-                if order.algo_order_id == algo_order_id
-            }
+            return dict(self._algo_order_index.get(algo_order_id, {}))
 
         if exchange_order_id:
-            return {
-                order.order_id: order
-                for order in self._orders.values()
-                if order.exchange_order_id == exchange_order_id
-            }
+            order = self._exchange_order_index.get(exchange_order_id, None)
+            return {order.order_id: order} if order is not None else {}
 
         return self._orders
 
+    def get_open_orders(self) -> Dict[str, vxOrder]:
+        """获取当日未完成的委托"""
+        return {order_id: self._orders[order_id] for order_id in self._open_order_ids}
+
     def get_trades(
         self, order_id: Optional[str] = None, trade_id: Optional[str] = None
     ) -> dict:
         """获取当日成交回报"""
         if order_id:
-            return {
-                trade.trade_id: trade
-                for trade in self._trades.values()
-                if trade.order_id == order_id
-            }
+            return dict(self._order_trade_index.get(order_id, {}))
 
         if trade_id:
             return (
@@ -190,8 +266,8 @@ class vxStockAccount:
         with self._lock:
             self.account_info.deposit += money
             self.account_info.fund_shares += money / self.account_info.fund_nav
-            self._positions["CNY"].volume_today += money
-            self._positions["CNY"].cost += money
+            with self._positions.transaction(self.account_id) as positions:
+                positions.edit("CNY").volume_today += money
             self.update_account_info()
 
     def withdraw(self, money: float) -> None:
@@ -199,19 +275,21 @@ class vxStockAccount:
         if money <= 0:
             raise IllegalPrice(f"转出金额 {money} <= 0 错误.")
 
-        cash = self._positions["CNY"]
-        if money > cash.available:
-            raise NoEnoughCash(f"转出金额{money} 大于可用金额 {cash.available}。 ")
+        if money > self.get_positions("CNY").available:
+            raise NoEnoughCash(
+                f"转出金额{money} 大于可用金额 {self.get_positions('CNY').available}。 "
+            )
         with self._lock:
             self.account_info.withdraw += money
             self.account_info.fund_shares -= money / self.account_info.fund_nav
-            if money < cash.volume_his:
-                cash.volume_his -= money
-            else:
-                money -= cash.volume_his
-                cash.volume_his = 0
-                cash.volume_today -= money
-            cash.cost = cash.marketvalue
+            with self._positions.transaction(self.account_id) as positions:
+                cash = positions.edit("CNY")
+                if money < cash.volume_his:
+                    cash.volume_his -= money
+                else:
+                    money -= cash.volume_his
+                    cash.volume_his = 0
+                    cash.volume_today -= money
             self.update_account_info()
 
     def set_bechmark_marketvalue(
@@ -229,11 +307,12 @@ class vxStockAccount:
             uplimit {float} -- 持仓市值上限，市值突破上限时，减仓至基准市值。 若小于0，则不做上限管理  (default: {-1})
             downlimit {float} -- 持仓市值下限，市值跌破下限时，加仓至基准市值。若小于0，则不做下限管理 (default: {-1})
         """
-        position = self.get_positions(symbol)
-        position.benchmark_marketvalue = benchmark_marketvalue
-        position.uplimit_marketvalue = uplimit
-        position.downlimit_marketvalue = downlimit
-        self._positions[position.position_id] = position
+        with self._positions.transaction(self.account_id) as positions:
+            position = positions.edit(symbol) or self.get_positions(symbol)
+            position.benchmark_marketvalue = benchmark_marketvalue
+            position.uplimit_marketvalue = uplimit
+            position.downlimit_marketvalue = downlimit
+            positions[symbol] = position
 
     def check_benchmark_marketvalue(self):
         """检查目标市值是否突破"""
@@ -286,6 +365,7 @@ class vxStockAccount:
                 status=OrderStatus.PendingNew,
             )
             self._orders[vxorder.order_id] = vxorder
+            self._index_order(vxorder)
             self.update_account_info()
 
         if self._publisher:
@@ -294,59 +374,108 @@ class vxStockAccount:
 
         return vxorder
 
+    def submit_orders(
+        self, orders: List[Tuple[str, float, float]], ticks: Optional[Dict] = None
+    ) -> List[vxOrder]:
+        """批量提交订单
+
+        以当前可用资金及持仓一次性完成全部订单的风控检查，再冻结通过检查的订单
+
+        Arguments:
+            orders {List[Tuple[str, float, float]]} -- [(symbol, volume, price), ...] 按优先级排序
+
+        Keyword Arguments:
+            ticks {Dict} -- 最新行情，用于涨跌停检查及市价单估值 (default: {None})
+
+        Returns:
+            List[vxOrder] -- 与orders一一对应，未通过风控的订单为 Rejected 状态
+        """
+        vxorders = [
+            vxOrder(
+                account_id=self.account_id,
+                symbol=symbol,
+                order_direction=OrderDirection.Buy
+                if volume > 0
+                else OrderDirection.Sell,
+                order_offset=OrderOffset.Open if volume > 0 else OrderOffset.Close,
+                order_type=OrderType.Market if price <= 0 else OrderType.Limit,
+                volume=abs(volume),
+                price=price,
+                status=OrderStatus.PendingNew,
+            )
+            for symbol, volume, price in orders
+        ]
+
+        with self._lock:
+            positions = self.get_positions()
+            result = self._risk_checker.check(
+                vxorders,
+                positions["CNY"].available,
+                {symbol: position.available for symbol, position in positions.items()},
+                ticks,
+            )
+            for vxorder in result.accepted_orders:
+                self._orders[vxorder.order_id] = vxorder
+                self._index_order(vxorder)
+            self.update_account_info()
+
+        if self._publisher:
+            for vxorder in result.accepted_orders:
+                self._publisher("on_submit_broker_order", vxorder)
+
+        return result.orders
+
     @property
     def message(self) -> dict:
         """账户消息"""
         return {
             "account_info": self.account_info,
-            "positions": self.get_positions(),
+            "positions": dict(self.get_positions()),
             "orders": self.get_orders(),
             "trades": self.get_trades(),
         }
 
     def update_account_info(self) -> None:
         """更新账户信息"""
+        frozens = defaultdict(float)
+        for order_id in self._open_order_ids:
+            order = self._orders[order_id]
+            if order.order_direction == OrderDirection.Buy:
+                need_amount = (order.volume - order.filled_volume) * order.price * 1.003
+                frozens["CNY"] += need_amount
+            else:
+                frozens[order.symbol] += order.volume - order.filled_volume
 
-        self._account_info.marketvalue = 0
-        self._account_info.fnl = 0
+        with self._positions.transaction(self.account_id) as positions:
+            for symbol in positions.symbols():
+                if positions.get(symbol).frozen != round(frozens.get(symbol, 0), 2):
+                    positions.edit(symbol).frozen = frozens.get(symbol, 0)
 
-        for position in self._positions.values():
-            position.frozen = 0
+        marketvalue = 0
+        fnl = 0
+        for position in self.get_positions().values():
             if position.symbol != "CNY":
-                self._account_info.marketvalue += position.marketvalue
-                self._account_info.fnl += position.fnl
+                marketvalue += position.marketvalue
+                fnl += position.fnl
             else:
                 self._account_info.balance = position.marketvalue
-                position.cost = position.marketvalue
-
-        for order in self._orders.values():
-            if order.status not in [
-                OrderStatus.PendingNew,
-                OrderStatus.New,
-                OrderStatus.PartiallyFilled,
-            ]:
-                continue
-
-            if order.order_direction == OrderDirection.Buy:
-                need_amount = (order.volume - order.filled_volume) * order.price * 1.003
-                self._positions["CNY"].frozen += need_amount
-
-            else:
-                self._positions[order.symbol].frozen += (
-                    order.volume - order.filled_volume
-                )
-        self.account_info.frozen = self._positions["CNY"].frozen
+                self._account_info.frozen = position.frozen
+        self._account_info.marketvalue = marketvalue
+        self._account_info.fnl = fnl
         logger.debug(f"更新后账户信息: {self.message}")
 
     def on_tick(self, ticks: dict) -> None:
         """更新交易价格"""
-        update_symbols = set(self._positions.keys()) | set(ticks.keys())
         with self._lock:
-            for symbol in update_symbols.items():
-                self._positions[symbol].lasttrade = ticks[symbol].lasttrade
-                self._positions[symbol].updated_dt = ticks[symbol].created_dt
+            with self._positions.transaction(self.account_id) as positions:
+                for symbol in set(positions.symbols()) & set(ticks.keys()):
+                    if symbol == "CNY":
+                        continue
+                    position = positions.edit(symbol)
+                    position.lasttrade = ticks[symbol].lasttrade
+                    position.updated_dt = ticks[symbol].created_dt
             self.account_info.marketvalue = sum(
-                p.marketvalue for p in self._positions.values() if p.symbol != "CNY"
+                p.marketvalue for p in self.get_positions().values() if p.symbol != "CNY"
             )
 
     def on_order_status(self, agent_order: vxOrder) -> None:
@@ -354,7 +483,9 @@ class vxStockAccount:
 
         if agent_order.order_id not in self._orders:
             with self._lock:
-                self._orders[agent_order.order_id] = vxOrder(agent_order.message)
+                vxorder = vxOrder(agent_order.message)
+                self._orders[vxorder.order_id] = vxorder
+                self._index_order(vxorder)
                 self.update_account_info()
                 return
 
@@ -384,6 +515,7 @@ class vxStockAccount:
             vxorder.filled_amount = agent_order.filled_amount
             vxorder.status = agent_order.status
             vxorder.updated_dt = agent_order.updated_dt
+            self._index_order(vxorder)
             self.update_account_info()
 
     def _handler_open_position(
@@ -395,7 +527,6 @@ class vxStockAccount:
         """处理开仓仓位"""
         position.volume_today += volume
         position.cost += filled_amount
-        self._positions[position.symbol] = position
 
     def _handler_close_position(
         self,
@@ -410,7 +541,6 @@ class vxStockAccount:
             position.volume_today if deta >= 0 else position.volume_today + deta
         )
         position.cost -= filled_amount
-        self._positions[position.symbol] = position
 
     def on_execution_report(self, agent_trade: vxTrade) -> None:
         """更新成交回报信息"""
@@ -423,40 +553,48 @@ class vxStockAccount:
             return
 
         with self._lock:
-            self._trades[agent_trade.trade_id] = vxTrade(agent_trade.message)
-
-            cash_position = self.get_positions("CNY")
-            symbol_position = self.get_positions(agent_trade.symbol)
-            symbol_position.lasttrade = agent_trade.price
-
-            if agent_trade.order_direction == OrderDirection.Buy:
-                filled_amount = (
-                    agent_trade.price * agent_trade.volume + agent_trade.commission
-                )
-                # 扣减现金仓位
-                self._handler_close_position(
-                    cash_position, filled_amount, filled_amount
-                )
-                self._handler_open_position(
-                    symbol_position, agent_trade.volume, filled_amount
-                )
-            else:
-                filled_amount = (
-                    agent_trade.price * agent_trade.volume - agent_trade.commission
-                )
-                # 扣减symbol 持仓
-                self._handler_close_position(
-                    symbol_position, agent_trade.volume, filled_amount
-                )
-                self._handler_open_position(cash_position, filled_amount, filled_amount)
-            cash_position.updated_dt = agent_trade.updated_dt
-            symbol_position.updated_dt = agent_trade.updated_dt
+            trade = vxTrade(agent_trade.message)
+            self._trades[trade.trade_id] = trade
+            self._order_trade_index[trade.order_id][trade.trade_id] = trade
+
+            with self._positions.transaction(self.account_id) as positions:
+                cash_position = positions.edit("CNY")
+                symbol_position = positions.edit(
+                    agent_trade.symbol
+                ) or self.get_positions(agent_trade.symbol)
+                positions[agent_trade.symbol] = symbol_position
+                symbol_position.lasttrade = agent_trade.price
+
+                if agent_trade.order_direction == OrderDirection.Buy:
+                    filled_amount = (
+                        agent_trade.price * agent_trade.volume + agent_trade.commission
+                    )
+                    # 扣减现金仓位
+                    self._handler_close_position(
+                        cash_position, filled_amount, filled_amount
+                    )
+                    self._handler_open_position(
+                        symbol_position, agent_trade.volume, filled_amount
+                    )
+                else:
+                    filled_amount = (
+                        agent_trade.price * agent_trade.volume - agent_trade.commission
+                    )
+                    # 扣减symbol 持仓
+                    self._handler_close_position(
+                        symbol_position, agent_trade.volume, filled_amount
+                    )
+                    self._handler_open_position(
+                        cash_position, filled_amount, filled_amount
+                    )
+                cash_position.updated_dt = agent_trade.updated_dt
+                symbol_position.updated_dt = agent_trade.updated_dt
 
             self._handle_order_status(agent_trade, filled_amount)
             self.update_account_info()
 
     def _handle_order_status(self, agent_trade: vxTrade, filled_amount: float) -> None:
-        vxorder = self.get_orders(agent_trade.order_id).get(agent_trade.order_id, None)
+        vxorder = self._orders.get(agent_trade.order_id, None)
 
         if vxorder is None:
             logger.warning(f"未知订单{agent_trade.order_id}")
@@ -479,6 +617,7 @@ class vxStockAccount:
             else OrderStatus.Filled
         )
         vxorder.updated_dt = max(agent_trade.updated_dt, vxorder.updated_dt)
+        self._index_order(vxorder)
 
     def on_settle(self):
         """日结函数"""
@@ -511,14 +650,17 @@ class vxStockAccount:
                 for trade_id, trade in self._trades.items()
                 if trade.order_id in self._orders
             }
+            self._rebuild_indexes()
             # position
-            positions = self._positions
-            self._positions = {}
-            for symbol, position in positions.items():
-                if position.volume == 0 and position.symbol != "CNY":
-                    continue
-                position.volume_his, position.volume_today = position.volume, 0
-                self._positions[symbol] = position
+            with self._positions.transaction(self.account_id) as positions:
+                for symbol in positions.symbols():
+                    position = positions.get(symbol)
+                    if position.volume == 0 and position.symbol != "CNY":
+                        del positions[symbol]
+                    elif position.volume_today != 0:
+                        position = positions.edit(symbol)
+                        position.volume_his = position.volume
+                        position.volume_today = 0
 
             self.update_account_info()
             self.account_info.deposit = 0
@@ -537,16 +679,20 @@ class vxStockAccount:
         """直接账户基本信息"""
         with self._lock:
             if account_info:
+                current_positions = self.get_positions()
                 self._account_info = account_info
+                if not positions:
+                    positions = current_positions
 
             if positions:
-                self._positions = positions
+                self._positions.reset(self.account_id, positions)
 
             if orders:
                 self._orders = orders
 
             if trades:
                 self._trades = trades
+            self._rebuild_indexes()
             self.update_account_info()
 
     @classmethod
@@ -558,37 +704,400 @@ class vxStockAccount:
         trades: Dict[str, vxTrade],
     ) -> "vxStockAccount":
         """加载账户信息"""
-        instance = cls.__new__(cls=cls)
+        instance = cls.__new__(cls)
+        instance._account_type = AccountType.Normal
+        instance._account_info = account_info
+        instance._positions = vxPositionBook()
+        instance._algo_orders = {}
+        instance._orders = {}
+        instance._trades = {}
+        instance._publisher = None
+        instance._risk_checker = vxBatchRiskChecker()
+        instance._lock = threading.Lock()
         instance.update(account_info, positions, orders, trades)
         return instance
 
 
 class vxPortfolioManager:
-    """组合管理"""
+    """组合管理
 
-    def __init__(self, portfolio_id: str, dbwriter):
-        pass
+    组合持有若干成员账户，组合净资产 = 未分配资金 + 成员账户净资产合计。成员账户的更新
+    事件通过 on_account_update 增量汇总，组合份额按申购/赎回时的基金净值计算。
+    """
 
-    def create_portfolio(self, balance: float = 10_000_000.00, account_ids=None):
-        """创建组合"""
+    def __init__(
+        self, portfolio_id: str, dbwriter: vxMongoDB = None, keyframe_interval=64
+    ):
+        """组合管理
 
-    def create_account(self, account_id, balance=1_000_000.00):
-        """创建账户"""
+        Arguments:
+            portfolio_id {str} -- 组合id
+
+        Keyword Arguments:
+            dbwriter {vxMongoDB} -- 保存组合信息及成员账户的数据库，为None时不保存 (default: {None})
+            keyframe_interval {int} -- 历史快照的关键帧间隔 (default: {64})
+        """
+        self._portfolio_info = vxPortfolioInfo(
+            portfolio_id=portfolio_id, fund_shares=0, fund_shares_yd=0
+        )
+        self._dbwriter = dbwriter
+        self._lock = threading.Lock()
+        # 未分配至成员账户的资金
+        self._cash = 0.0
+        self._underlyings: Dict[str, vxPortfolioUnderlying] = {}
+        self._aggregator = vxPortfolioAggregator()
+        self._snapshots = vxSnapshotLog(keyframe_interval)
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__}({id(self)}) :\n {self.portfolio_info} >"
+
+    __repr__ = __str__
+
+    @property
+    def portfolio_id(self) -> str:
+        """组合id"""
+        return self._portfolio_info.portfolio_id
+
+    @property
+    def cash(self) -> float:
+        """未分配至成员账户的资金"""
+        return round(self._cash, 2)
+
+    @property
+    def portfolio_info(self) -> vxPortfolioInfo:
+        """组合信息"""
+        self._portfolio_info.nav = self._cash + self._aggregator.nav
+        return self._portfolio_info
+
+    def create_portfolio(
+        self, balance: float = 10_000_000.00, account_ids=None
+    ) -> vxPortfolioInfo:
+        """创建组合
+
+        Keyword Arguments:
+            balance {float} -- 初始资金，按净值1.0折算份额 (default: {10_000_000.00})
+            account_ids {List[str]} -- 已存在的成员账户，净资产由 on_account_update 更新 (default: {None})
+
+        Returns:
+            vxPortfolioInfo -- 组合信息
+        """
+        with self._lock:
+            self._cash = balance
+            self._portfolio_info.fund_shares = balance
+            self._portfolio_info.fund_shares_yd = balance
+            self._portfolio_info.nav_yd = balance
+            for account_id in account_ids or []:
+                self._underlyings[account_id] = vxPortfolioUnderlying(
+                    portfolio_id=self.portfolio_id, account_id=account_id
+                )
+        self._save_portfolio()
+        return self.portfolio_info
+
+    def create_account(
+        self, account_id, balance=1_000_000.00
+    ) -> vxPortfolioUnderlying:
+        """从未分配资金中划拨资金给成员账户
+
+        Arguments:
+            account_id {str} -- 成员账户id
+
+        Keyword Arguments:
+            balance {float} -- 划拨资金 (default: {1_000_000.00})
+
+        Returns:
+            vxPortfolioUnderlying -- 成员账户
+        """
+        with self._lock:
+            if balance > self._cash:
+                raise NoEnoughCash(f"组合可用资金({self._cash}) < 划拨资金({balance})")
+
+            underlying = self._underlyings.get(account_id, None)
+            if underlying is None:
+                underlying = vxPortfolioUnderlying(
+                    portfolio_id=self.portfolio_id, account_id=account_id
+                )
+                self._underlyings[account_id] = underlying
+            self._cash -= balance
+            underlying.cost += balance
+            # 成员账户的更新事件到达前，以划拨资金作为其净资产
+            self._aggregator.update(
+                vxAccountInfo(
+                    account_id=account_id,
+                    balance=self._aggregator.account_nav(account_id) + balance,
+                )
+            )
+        self._save_portfolio()
+        return underlying
+
+    def on_account_update(
+        self,
+        account_info: vxAccountInfo,
+        positions: Optional[Mapping[str, Union[vxPosition, vxCashPosition]]] = None,
+    ) -> None:
+        """成员账户更新事件
+
+        只调整发生变化的成员账户对组合的贡献，非成员账户的更新被忽略
+
+        Arguments:
+            account_info {vxAccountInfo} -- 账户信息
+
+        Keyword Arguments:
+            positions {Mapping[str, Union[vxPosition, vxCashPosition]]} -- 账户最新的全部持仓，为None时只更新净资产 (default: {None})
+        """
+        underlying = self._underlyings.get(account_info.account_id, None)
+        if underlying is None:
+            return
+
+        with self._lock:
+            self._aggregator.update(account_info, positions)
+            underlying.nav = account_info.nav
+            underlying.fnl = underlying.nav - underlying.cost
+
+    def get_underlyings(self) -> Dict[str, vxPortfolioUnderlying]:
+        """成员账户，权重按当前组合净资产计算"""
+        with self._lock:
+            nav = self.portfolio_info.nav
+            for underlying in self._underlyings.values():
+                underlying.weights = underlying.nav / nav if nav else 0.0
+            return dict(self._underlyings)
+
+    def exposure(self, by: str = "symbol") -> Dict[str, float]:
+        """组合敞口
+
+        Keyword Arguments:
+            by {str} -- "symbol": 按标的汇总市值, "security_type": 按证券类型汇总市值 (default: {"symbol"})
+
+        Returns:
+            Dict[str, float] -- {symbol/security_type: marketvalue}
+        """
+        return self._aggregator.exposure(by)
+
+    def subscribe(self, amount: float) -> float:
+        """按当前基金净值申购
+
+        Arguments:
+            amount {float} -- 申购金额
+
+        Returns:
+            float -- 申购份额
+        """
+        if amount <= 0:
+            raise ValueError(f"申购金额({amount})必须大于0.")
+
+        with self._lock:
+            portfolio_info = self.portfolio_info
+            fund_nav = portfolio_info.fund_nav if portfolio_info.fund_shares else 1.0
+            shares = round(amount / fund_nav, 4)
+            self._cash += amount
+            portfolio_info.fund_shares += shares
+        self._save_portfolio()
+        return shares
+
+    def redeem(self, shares: float) -> float:
+        """按当前基金净值赎回，赎回资金从未分配资金中支付
+
+        Arguments:
+            shares {float} -- 赎回份额
+
+        Returns:
+            float -- 赎回金额
+        """
+        with self._lock:
+            portfolio_info = self.portfolio_info
+            if shares <= 0 or shares > portfolio_info.fund_shares:
+                raise ValueError(
+                    f"赎回份额({shares})须大于0且不超过{portfolio_info.fund_shares}."
+                )
+            amount = round(shares * portfolio_info.fund_nav, 2)
+            if amount > self._cash:
+                raise NoEnoughCash(f"组合可用资金({self._cash}) < 赎回金额({amount})")
+            self._cash -= amount
+            portfolio_info.fund_shares -= shares
+        self._save_portfolio()
+        return amount
+
+    def take_snapshot(self, dt: float = None) -> None:
+        """保存当前时刻的组合快照
+
+        Keyword Arguments:
+            dt {float} -- 快照时间 (default: {vxtime.now()})
+        """
+        with self._lock:
+            portfolio_info = self.portfolio_info
+            self._snapshots.append(
+                dt or vxtime.now(),
+                portfolio_info.nav,
+                portfolio_info.fund_shares,
+                self._aggregator.exposure("symbol"),
+                self._aggregator.pop_changes(),
+            )
+
+    def snapshot_at(self, dt: float) -> Optional[Dict]:
+        """获取dt时刻(含)之前最近的组合快照
+
+        Arguments:
+            dt {float} -- 时间
+
+        Returns:
+            Optional[Dict] -- {"dt", "nav", "fund_shares", "fund_nav", "exposure"}
+        """
+        return self._snapshots.at(dt)
+
+    def on_settle(self) -> vxPortfolioInfo:
+        """日终结算，滚动昨日净资产及份额"""
+        with self._lock:
+            portfolio_info = self.portfolio_info
+            portfolio_info.nav_yd = portfolio_info.nav
+            portfolio_info.fund_shares_yd = portfolio_info.fund_shares
+            portfolio_info.settle_day = vxtime.today("23:59:59")
+            for underlying in self._underlyings.values():
+                underlying.settle_day = portfolio_info.settle_day
+        self._save_portfolio(with_underlyings=True)
+        return portfolio_info
+
+    def _save_portfolio(self, with_underlyings: bool = False) -> None:
+        if self._dbwriter is None:
+            return
+        self._dbwriter.save("portfolios", self.portfolio_info)
+        if with_underlyings and self._underlyings:
+            self._dbwriter.save_many(
+                "portfolio_underlyings", list(self._underlyings.values())
+            )
 
 
 class vxAccountsManager:
-    def __init__(self, db_uri, db_name, publisher=None, hqfetcher=None):
+    def __init__(
+        self,
+        db_uri,
+        db_name,
+        publisher=None,
+        hqfetcher=None,
+        write_behind=False,
+        journal_dir="",
+        flush_interval=0.5,
+        flush_size=500,
+        aggregate_revaluation=False,
+        diagnostics=False,
+    ):
+        """账户管理
+
+        Arguments:
+            db_uri {str} -- mongodb 连接地址
+            db_name {str} -- 数据库名称
+
+        Keyword Arguments:
+            publisher {vxPublisher} -- 委托发布器 (default: {None})
+            hqfetcher {Callable} -- 行情获取器 (default: {None})
+            write_behind {bool} -- 是否启用内存账本，读取及校验在内存中完成，变更批量写回数据库 (default: {False})
+            journal_dir {str} -- 内存账本的事件日志目录，用于崩溃恢复 (default: {""})
+            flush_interval {float} -- 内存账本写回间隔(秒) (default: {0.5})
+            flush_size {int} -- 待写回文档超过该数量时立即写回 (default: {500})
+            aggregate_revaluation {bool} -- 是否在数据库端通过聚合计算账户市值，仅写回有变化的账户 (default: {False})
+            diagnostics {bool} -- 启动时分析常用查询的查询计划，发现全表扫描时告警 (default: {False})
+        """
+        self._db_uri = db_uri
+        self._db_name = db_name
         self._database = vxMongoDB(db_uri, db_name)
         self._database.mapping("accounts", vxAccountInfo, ["account_id"])
         self._database.mapping("positions", vxPosition, ["account_id", "symbol"])
-        self._database.mapping("orders", vxOrder, ["order_id"])
-        self._database.mapping("trades", vxTrade, ["trade_id"])
-        self._database.mapping("current", vxTick, ["symbol"])
+        self._database.mapping(
+            "orders",
+            vxOrder,
+            ["order_id"],
+            indexes=[["account_id", "status"], "frozen_position_id"],
+        )
+        self._database.mapping(
+            "trades",
+            vxTrade,
+            ["trade_id"],
+            indexes=["order_id", ["account_id", "created_dt"]],
+        )
+        self._database.mapping(
+            "current",
+            vxTick,
+            ["symbol"],
+            indexes=[["symbol", "created_dt"]],
+            ttl=_TICK_TTL,
+        )
 
         self._publisher = publisher
         self._hqfetcher = hqfetcher or vxTdxHQ()
         cur = self._database.agent_mapping.find({})
         self._agent_map = {item.account_id: item.channel_name for item in cur}
+        self._ledger = (
+            vxAccountLedger(self._database, journal_dir, flush_interval, flush_size)
+            if write_behind
+            else None
+        )
+        self._aggregate_revaluation = aggregate_revaluation
+        self._risk_checker = vxBatchRiskChecker()
+        # 委托生命周期事件，用于增量更新委托成交信息及审计
+        self._order_events = vxOrderEventStore()
+        # 进程内行情缓存，行情异步写入数据库
+        self._ticks: Dict[str, vxTick] = {}
+        # symbol --> 最近一次未能获取行情的时间
+        self._tick_misses: Dict[str, float] = {}
+        self._ticks_lock = threading.Lock()
+        self._tick_writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="vxAccountsManager_ticks"
+        )
+        if diagnostics:
+            self.check_query_plans()
+
+    @property
+    def ledger(self) -> Optional[vxAccountLedger]:
+        """内存账本，未启用 write_behind 时为None"""
+        return self._ledger
+
+    def check_query_plans(self) -> Dict:
+        """分析常用查询的查询计划，发现全表扫描时告警
+
+        Returns:
+            Dict -- {(collection, 查询字段): 查询计划各阶段名称}
+        """
+        hot_queries = [
+            ("accounts", {"account_id": ""}),
+            ("positions", {"account_id": "", "symbol": "CNY"}),
+            ("positions", {"account_id": {"$in": [""]}}),
+            ("orders", {"order_id": ""}),
+            ("orders", {"account_id": {"$in": [""]}, "status": {"$in": ["New"]}}),
+            ("orders", {"frozen_position_id": {"$in": [""]}}),
+            ("trades", {"order_id": {"$in": [""]}}),
+            ("trades", {"account_id": ""}),
+            ("current", {"symbol": {"$in": [""]}, "created_dt": {"$gt": 0}}),
+        ]
+        plans = {}
+        for collection, filter_ in hot_queries:
+            stages = self._database.explain(collection, filter_)
+            plans[(collection, tuple(filter_))] = stages
+            logger.info(f"查询计划 {collection} {list(filter_)}: {stages}")
+        return plans
+
+    def settle(
+        self,
+        account_ids: Optional[List[str]] = None,
+        workers: Optional[int] = None,
+        shard_size: int = 500,
+    ) -> Dict[str, int]:
+        """日终结算
+
+        Keyword Arguments:
+            account_ids {Optional[List[str]]} -- 待结算的账户，None 表示全部账户 (default: {None})
+            workers {Optional[int]} -- 结算进程数，None为cpu核数 (default: {None})
+            shard_size {int} -- 每个进程每次结算的账户数量 (default: {500})
+
+        Returns:
+            Dict[str, int] -- 结算的账户数、持仓数、清除的持仓数以及超时的委托数
+        """
+        engine = vxSettlementEngine(self._db_uri, self._db_name, workers, shard_size)
+        if self._ledger is None:
+            summary = engine.settle(account_ids)
+        else:
+            # 结算前写回并移出内存账本，结算完成前暂停这些账户的读写
+            with self._ledger.settling(account_ids):
+                summary = engine.settle(account_ids)
+        self._order_events.truncate(account_ids)
+        return summary
 
     def create_account(
         self,
@@ -620,6 +1129,9 @@ class vxAccountsManager:
 
         channel_name = channel_name or "simtest"
 
+        if self._ledger is not None and account_id:
+            self._ledger.unload(account_id)
+
         if self._database.accounts.count_documents({"account_id": account_id}) > 0:
             if if_exists == "skip":
                 return account_id
@@ -663,6 +1175,9 @@ class vxAccountsManager:
 
     def deposit(self, account_id, money: float) -> None:
         """转入金额"""
+        if self._ledger is not None:
+            self._ledger.deposit(account_id, money)
+            return
 
         account_info = self._database.accounts.find_one(
             {"account_id": account_id}, {"_id": 0}
@@ -694,6 +1209,10 @@ class vxAccountsManager:
         if money <= 0:
             raise IllegalPrice(f"转出金额 {money} <= 0 错误.")
 
+        if self._ledger is not None:
+            self._ledger.withdraw(account_id, money)
+            return
+
         with self._database.start_session(causal_consistency=True) as session:
             cash = self._database.query_one(
                 "positions",
@@ -724,6 +1243,8 @@ class vxAccountsManager:
 
     def _update_account_info(self, account_ids, session=None):
         """重新计算账户值"""
+        if self._aggregate_revaluation:
+            return self._aggregate_account_info(account_ids, session=session)
 
         positions = self._database.query(
             "positions", {"account_id": {"$in": account_ids}}, session=session
@@ -764,6 +1285,87 @@ class vxAccountsManager:
         self._database.save_many("positions", update_positions, session=session)
         self._database.save_many("accounts", update_account_infos, session=session)
 
+    def _aggregate_account_info(self, account_ids, session=None) -> int:
+        """通过数据库聚合重新计算账户值
+
+        根据持仓中保存的 volume_his / volume_today / lasttrade / cost / frozen 在数据库端
+        按 account_id 汇总，连同由汇总结果计算的 asset / nav / available 等属性字段，
+        只以 $set 写回有变化的字段，不重写持仓及账户文档。
+
+        Arguments:
+            account_ids {List[str]} -- 账户id列表
+
+        Keyword Arguments:
+            session {ClientSession} -- 数据库会话 (default: {None})
+
+        Returns:
+            int -- 更新的账户数量
+        """
+        account_ids = list(account_ids)
+        is_cash = {"$eq": ["$symbol", "CNY"]}
+        volume = {"$add": ["$volume_his", "$volume_today"]}
+        marketvalue = {"$round": [{"$multiply": [volume, "$lasttrade"]}, 2]}
+        pipeline = [
+            {"$match": {"account_id": {"$in": account_ids}}},
+            {
+                "$group": {
+                    "_id": "$account_id",
+                    "balance": {"$sum": {"$cond": [is_cash, volume, 0]}},
+                    "frozen": {"$sum": {"$cond": [is_cash, "$frozen", 0]}},
+                    "marketvalue": {"$sum": {"$cond": [is_cash, 0, marketvalue]}},
+                    "cost": {"$sum": {"$cond": [is_cash, 0, "$cost"]}},
+                }
+            },
+        ]
+        totals = {
+            item["_id"]: {
+                "balance": round(item["balance"], 2),
+                "frozen": round(item["frozen"], 2),
+                "marketvalue": round(item["marketvalue"], 2),
+                "fnl": round(item["marketvalue"] - item["cost"], 2),
+            }
+            for item in self._database.positions.aggregate(pipeline, session=session)
+        }
+
+        zeros = {"balance": 0, "frozen": 0, "marketvalue": 0, "fnl": 0}
+        commands = []
+        cur = self._database.accounts.find(
+            {"account_id": {"$in": account_ids}},
+            {
+                "_id": 0,
+                "account_id": 1,
+                **{key: 1 for key in zeros},
+                **{key: 1 for key in _ACCOUNT_DERIVED_FIELDS},
+                **{key: 1 for key in _ACCOUNT_DERIVING_FIELDS},
+            },
+            session=session,
+        )
+        for item in cur:
+            # 汇总结果连同由其计算的属性字段一并写回
+            account_info = vxAccountInfo(
+                {key: item[key] for key in _ACCOUNT_DERIVING_FIELDS if key in item},
+                account_id=item["account_id"],
+                **totals.get(item["account_id"], zeros),
+            )
+            changed = {
+                key: account_info[key]
+                for key in (*zeros, *_ACCOUNT_DERIVED_FIELDS)
+                if item.get(key, None) != account_info[key]
+            }
+            if changed:
+                commands.append(
+                    pymongo.UpdateOne(
+                        {"account_id": item["account_id"]}, {"$set": changed}
+                    )
+                )
+
+        if commands:
+            self._database.accounts.bulk_write(
+                commands, ordered=False, session=session
+            )
+        logger.debug(f"聚合计算{len(account_ids)}个账户, 更新{len(commands)}个账户")
+        return len(commands)
+
     def _update_frozens(self, account_ids, session=None):
         """重新计算持仓冻结信息"""
         modify_position_ids = self._database.orders.distinct(
@@ -914,7 +1516,7 @@ class vxAccountsManager:
             update_order_cmds.append(update_order_cmd)
             modify_order_ids.append(order_id)
         if update_order_cmds:
-            self._database.accounts.bulk_write(update_order_cmds, session=session)
+            self._database.orders.bulk_write(update_order_cmds, session=session)
         return modify_order_ids
 
     def get_account(self, account_id: str, session=None) -> vxAccountInfo:
@@ -926,6 +1528,9 @@ class vxAccountsManager:
         Returns:
             vxAccountInfo -- 账户信息
         """
+        if self._ledger is not None:
+            return self._ledger.get_account(account_id)
+
         logger.info(f"account_id({account_id}) session: {session}")
         item = self._database.accounts.find_one(
             {"account_id": account_id}, session=session
@@ -943,6 +1548,9 @@ class vxAccountsManager:
         Returns:
             Dict -- Dict['account_id': vxAccountInfo]
         """
+        if self._ledger is not None:
+            return self._ledger.get_positions(account_id, symbol)
+
         filter_ = {"account_id": account_id}
         if symbol:
             filter_["symbol"] = symbol
@@ -969,6 +1577,21 @@ class vxAccountsManager:
         Returns:
             Dict -- Dict['order_id': vxOrder]
         """
+        if self._ledger is not None:
+            if is_unfinished:
+                orders = self._ledger.get_open_orders(account_id)
+                return {
+                    o.order_id: o
+                    for o in orders.values()
+                    if (not order_id or o.order_id == order_id)
+                    and (
+                        not exchange_order_id
+                        or o.exchange_order_id == exchange_order_id
+                    )
+                }
+            # 已完成的委托从数据库查询，查询前写回内存账本的变更
+            self._ledger.flush()
+
         filter_ = {"account_id": account_id}
         if order_id:
             filter_["order_id"] = order_id
@@ -1000,6 +1623,9 @@ class vxAccountsManager:
         Returns:
             Dict -- Dict['trade_id':vxTrade]
         """
+        if self._ledger is not None:
+            self._ledger.flush()
+
         filter_ = {"account_id": account_id}
         if order_id:
             filter_["order_id"] = order_id
@@ -1016,22 +1642,69 @@ class vxAccountsManager:
     def _update_ticks(self, *symbols) -> Dict:
         """更新ticks数据
 
+        优先使用进程内缓存中3秒内的行情；缓存中没有的symbol才查询数据库，
+        仍然缺失或已过期的symbol从行情接口获取，并异步批量写入数据库。
+        行情接口未返回的symbol，在 _TICK_MISS_TTL 秒内不再重复查询，直接使用缓存。
+
         Returns:
-            Dict -- Dict['symbol':vxTick]
+            Dict -- Dict['symbol':vxTick]，返回缓存行情的副本
         """
         now = vxtime.now()
-        cached_symbols = self._database.distinct(
-            "current",
-            "symbol",
-            {"symbol": {"$in": symbols}, "created_dt": {"$gt": now - 3}},
-        )
-        missing_symbols = set(symbols) - set(cached_symbols)
-        if len(missing_symbols) > 0:
+        with self._ticks_lock:
+            query_symbols = [
+                symbol
+                for symbol in symbols
+                if self._tick_misses.get(symbol, 0) <= now - _TICK_MISS_TTL
+            ]
+            cold_symbols = [
+                symbol for symbol in query_symbols if symbol not in self._ticks
+            ]
+
+        if cold_symbols:
+            cur = self._database.query(
+                "current",
+                {"symbol": {"$in": cold_symbols}, "created_dt": {"$gt": now - 3}},
+            )
+            with self._ticks_lock:
+                self._ticks.update({vxtick.symbol: vxtick for vxtick in cur})
+
+        with self._ticks_lock:
+            missing_symbols = [
+                symbol
+                for symbol in query_symbols
+                if symbol not in self._ticks
+                or self._ticks[symbol].created_dt <= now - 3
+            ]
+
+        if missing_symbols:
             vxticks = self._hqfetcher(*missing_symbols)
+            with self._ticks_lock:
+                self._ticks.update(vxticks)
+                for symbol in missing_symbols:
+                    if symbol in vxticks:
+                        self._tick_misses.pop(symbol, None)
+                    else:
+                        self._tick_misses[symbol] = now
+            if vxticks:
+                future = self._tick_writer.submit(
+                    self._database.save_many, "current", list(vxticks.values())
+                )
+                future.add_done_callback(self._on_ticks_saved)
+
+        with self._ticks_lock:
+            vxticks = {
+                symbol: copy.copy(self._ticks[symbol])
+                for symbol in symbols
+                if symbol in self._ticks
+            }
+        if self._ledger is not None:
+            self._ledger.update_prices(vxticks)
+        return vxticks
 
-            self._database.save_many("current", vxticks.values())
-        cur = self._database.query("current", {"symbol": {"$in": symbols}})
-        return {vxtick.symbol: vxtick for vxtick in cur}
+    @staticmethod
+    def _on_ticks_saved(future) -> None:
+        if future.exception() is not None:
+            logger.error(f"保存行情数据失败: {future.exception()}")
 
     def order_volume(
         self,
@@ -1052,38 +1725,17 @@ class vxAccountsManager:
         Returns:
             vxOrder -- 委托订单号
         """
+        order = self._new_order(account_id, symbol, volume, price, algo_order_id)
+        if self._ledger is not None:
+            order = self._ledger.submit_order(order)
+            self._order_events.submit(order)
+            self._publish_order(order)
+            return order
+
         with self._database.start_session(
             causal_consistency=True, lock=True
         ) as session:
-            order = vxOrder(
-                account_id=account_id,
-                algo_order_id=algo_order_id,
-                symbol=symbol,
-                status="PendingNew",
-            )
-
-            if price < 0.0:
-                raise ValueError(f"委托价格({price})必须大于等于0.")
-            elif price == 0:
-                order.order_type = "Market"
-                tick = self._update_ticks(order.symbol)
-
-                order.price = (
-                    tick[order.symbol].bid1_p
-                    if volume < 0
-                    else tick[order.symbol].ask1_p
-                )
-            else:
-                order.order_type = "Limit"
-                order.price = price
-
-            if volume == 0:
-                raise ValueError("委托volume 不可以为0.")
-
-            elif volume > 0:
-                order.order_direction = "Buy"
-                order.order_offset = "Open"
-                order.volume = volume
+            if order.order_direction == OrderDirection.Buy:
                 frozen_position = self._database.query_one(
                     "positions",
                     {"account_id": account_id, "symbol": "CNY"},
@@ -1099,9 +1751,6 @@ class vxAccountsManager:
                 order.frozen_position_id = frozen_position.position_id
                 frozen_position.frozen += frozen_amount
             else:
-                order.order_direction = "Sell"
-                order.order_offset = "Close"
-                order.volume = abs(volume)
                 frozen_position = self._database.query_one(
                     "positions",
                     {"account_id": account_id, "symbol": symbol},
@@ -1121,14 +1770,138 @@ class vxAccountsManager:
             self._update_frozens([account_id], session=session)
             self._update_account_info([account_id], session=session)
 
-            channel = self._agent_map.get(account_id, "simtest")
-            self._publisher("on_submit_broker_order", data=order, channel=channel)
-            logger.warning(
-                f"account({account_id}) 通过channel({channel}) 发送"
-                f" on_submit_broker_order 委托订单: {order}"
-            )
+            self._order_events.submit(order)
+            self._publish_order(order)
             return order
 
+    def order_batch(
+        self,
+        account_id: str,
+        orders: List[Tuple[str, int, float]],
+        algo_order_id: str = "",
+    ) -> List[vxOrder]:
+        """批量委托，一次完成全部委托的风控检查及资金、持仓冻结
+
+        Arguments:
+            account_id {str} -- 交易账号
+            orders {List[Tuple[str, int, float]]} -- [(symbol, volume, price), ...] 按优先级排序
+
+        Keyword Arguments:
+            algo_order_id {str} -- 算法委托id (default: {""})
+
+        Returns:
+            List[vxOrder] -- 与orders一一对应，未通过风控的委托为 Rejected 状态
+        """
+        if not orders:
+            return []
+
+        ticks = self._update_ticks(*{symbol for symbol, _, _ in orders})
+        vxorders = [
+            self._new_order(account_id, symbol, volume, price, algo_order_id)
+            for symbol, volume, price in orders
+        ]
+
+        if self._ledger is not None:
+            vxorders = self._ledger.submit_orders(vxorders, self._risk_checker, ticks)
+        else:
+            with self._database.start_session(
+                causal_consistency=True, lock=True
+            ) as session:
+                positions = {
+                    position.symbol: position
+                    for position in self._database.query(
+                        "positions", {"account_id": account_id}, session=session
+                    )
+                }
+                cash = vxCashPosition(positions["CNY"]) if "CNY" in positions else None
+                result = self._risk_checker.check(
+                    vxorders,
+                    cash.available if cash else 0.0,
+                    {
+                        symbol: position.available
+                        for symbol, position in positions.items()
+                    },
+                    ticks,
+                )
+                for vxorder in result.accepted_orders:
+                    frozen_symbol = (
+                        "CNY"
+                        if vxorder.order_direction == OrderDirection.Buy
+                        else vxorder.symbol
+                    )
+                    vxorder.frozen_position_id = positions[frozen_symbol].position_id
+
+                self._database.save_many("orders", vxorders, session=session)
+                self._update_frozens([account_id], session=session)
+                self._update_account_info([account_id], session=session)
+
+        for vxorder in vxorders:
+            self._order_events.submit(vxorder)
+            if vxorder.status != OrderStatus.Rejected:
+                self._publish_order(vxorder)
+        return vxorders
+
+    def _new_order(
+        self,
+        account_id: str,
+        symbol: str,
+        volume: int,
+        price: float = 0.0,
+        algo_order_id: str = "",
+    ) -> vxOrder:
+        """生成委托订单，设置委托类型、方向、数量及价格"""
+        order = vxOrder(
+            account_id=account_id,
+            algo_order_id=algo_order_id,
+            symbol=symbol,
+            status="PendingNew",
+        )
+
+        if price < 0.0:
+            raise ValueError(f"委托价格({price})必须大于等于0.")
+        elif price == 0:
+            order.order_type = "Market"
+            tick = self._update_ticks(order.symbol)
+
+            order.price = (
+                tick[order.symbol].bid1_p if volume < 0 else tick[order.symbol].ask1_p
+            )
+        else:
+            order.order_type = "Limit"
+            order.price = price
+
+        if volume == 0:
+            raise ValueError("委托volume 不可以为0.")
+        elif volume > 0:
+            order.order_direction = "Buy"
+            order.order_offset = "Open"
+            order.volume = volume
+        else:
+            order.order_direction = "Sell"
+            order.order_offset = "Close"
+            order.volume = abs(volume)
+        return order
+
+    def _publish_order(self, order: vxOrder) -> None:
+        """通过账户对应的channel发送委托订单"""
+        channel = self._agent_map.get(order.account_id, "simtest")
+        self._publisher("on_submit_broker_order", data=order, channel=channel)
+        logger.warning(
+            f"account({order.account_id}) 通过channel({channel}) 发送"
+            f" on_submit_broker_order 委托订单: {order}"
+        )
+
+    def order_history(self, order_id: str) -> List[Dict]:
+        """委托生命周期中的全部事件，用于审计
+
+        Arguments:
+            order_id {str} -- 委托id
+
+        Returns:
+            List[Dict] -- 按发生顺序排列的提交、状态变化及成交事件
+        """
+        return self._order_events.history(order_id)
+
     def order_cancel(self, *orders):
         """取消委托订单"""
 
@@ -1151,8 +1924,26 @@ class vxAccountsManager:
             )
         return
 
+    def on_tick(self, context, event) -> None:
+        """行情更新: 更新行情缓存，启用内存账本时同时更新持仓价格"""
+        vxticks = event.data
+        with self._ticks_lock:
+            self._ticks.update(vxticks)
+            for symbol in vxticks:
+                self._tick_misses.pop(symbol, None)
+        if self._ledger is not None:
+            self._ledger.update_prices(vxticks)
+
     def on_order_status(self, context, event) -> None:
         """订单状态更新"""
+        if not self._order_events.on_status(event.data):
+            logger.debug(f"忽略重复或已终结委托的状态更新: {event.data.order_id}")
+            return
+
+        if self._ledger is not None:
+            self._ledger.update_order(event.data)
+            return
+
         with self._database.start_session(causal_consistency=True) as session:
             # 1. 更新order 状态信息
             broker_order = event.data
@@ -1203,6 +1994,14 @@ class vxAccountsManager:
 
     def on_trade_status(self, context, event) -> None:
         """收到成交回报信息"""
+        if self._order_events.has_trade(event.data.trade_id):
+            logger.warning(f"收到重复的成交回报: {event.data.trade_id}")
+            return
+
+        order = self._order_events.on_fill(event.data)
+        if self._ledger is not None:
+            self._ledger.apply_trade(event.data)
+            return
 
         with self._database.start_session(
             causal_consistency=True, lock=True
@@ -1212,9 +2011,25 @@ class vxAccountsManager:
             self._database.save("trades", broker_trade, session=session)
 
             # 处理order filled_volumes
-            self._update_order_filled_volumes(
-                [broker_trade.account_id], session=session
-            )
+            if order is not None:
+                # 委托事件日志中已累计成交信息，只更新该委托
+                self._database.orders.update_one(
+                    {"order_id": order.order_id},
+                    {
+                        "$set": {
+                            "filled_volume": order.filled_volume,
+                            "filled_amount": order.filled_amount,
+                            "filled_vwap": order.filled_vwap,
+                            "status": order.status.name,
+                            "updated_dt": order.updated_dt,
+                        }
+                    },
+                    session=session,
+                )
+            else:
+                self._update_order_filled_volumes(
+                    [broker_trade.account_id], session=session
+                )
 
             # 处理 position volume数据
             if broker_trade.order_direction == OrderDirection.Buy:
@@ -1,9 +1,14 @@
 # encoding=utf8
 """ 市场预设值清单 """
 
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
 from vxquant.model.contants import SecType
 
-__all__ = ["vxMarketPreset"]
+__all__ = ["vxMarketPreset", "presets_for"]
 
 _DEFULAT_SYMBOL_MAP = {
     "SHSE.204": {
@@ -340,30 +345,111 @@ _DEFAULT_RESET = {
 }
 
 
+_PRESET_FIELDS = tuple(_DEFAULT_RESET.keys())
+# presets_for 中各字段的类型，其余字段为float
+_PRESET_DTYPES = {"security_type": object, "volume_unit": np.int64, "allow_t0": bool}
+# 字典树节点中保存前缀预设及完整代码预设的key，不会与单个字符冲突
+_PREFIX_KEY = ""
+_EXACT_KEY = "__exact__"
+
+
+class _vxPresetTrie:
+    """按证券代码前缀查找预设的字典树，取最长匹配的前缀，完整代码的预设优先"""
+
+    def __init__(self) -> None:
+        self._root: Dict = {}
+
+    def insert(self, key: str, preset: Dict, exact: bool = False) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[_EXACT_KEY if exact else _PREFIX_KEY] = preset
+
+    def match(self, symbol: str, default: Dict) -> Dict:
+        node, preset = self._root, default
+        for char in symbol:
+            node = node.get(char)
+            if node is None:
+                return preset
+            preset = node.get(_PREFIX_KEY, preset)
+        return node.get(_EXACT_KEY, preset)
+
+
+def _compile_presets() -> _vxPresetTrie:
+    """编译预设的字典树，现金类证券及T+0的ETF/LOF以完整代码登记"""
+    trie = _vxPresetTrie()
+    for prefix, preset in _DEFULAT_SYMBOL_MAP.items():
+        trie.insert(prefix, {**_DEFAULT_RESET, **preset})
+
+    for symbol in _CASH_SECURITIES:
+        preset = trie.match(symbol, _DEFAULT_RESET)
+        trie.insert(
+            symbol,
+            {
+                **preset,
+                "allow_t0": True,
+                "security_type": SecType.CASH,
+                "commission_coeff_peramount": 0.0,
+                "commission_coeff_today_peramount": 0.0,
+                "tax_coeff_peramount": 0.0,
+            },
+            exact=True,
+        )
+    for symbol in set(_T0_ETFLOF) - set(_CASH_SECURITIES):
+        preset = trie.match(symbol, _DEFAULT_RESET)
+        trie.insert(symbol, {**preset, "allow_t0": True}, exact=True)
+    return trie
+
+
+_PRESETS = _compile_presets()
+
+
 class vxMarketPreset:
-    """交易所预设"""
+    """交易所预设
+
+    同一证券代码返回共享的只读对象，预设值在模块加载时编译为字典树，构造时只做一次查找。
+    """
 
-    def __init__(self, symbol) -> None:
-        preset = _DEFAULT_RESET.copy()
-        if symbol[:8] in _DEFULAT_SYMBOL_MAP:
-            self.__dict__.update(**_DEFULAT_SYMBOL_MAP[symbol[:8]])
+    _instances: Dict[str, "vxMarketPreset"] = {}
 
-        elif symbol[:7] in _DEFULAT_SYMBOL_MAP:
-            self.__dict__.update(**_DEFULAT_SYMBOL_MAP[symbol[:7]])
-        else:
-            self.__dict__.update(**preset)
+    def __new__(cls, symbol: str) -> "vxMarketPreset":
+        instance = cls._instances.get(symbol)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.__dict__.update(_PRESETS.match(symbol, _DEFAULT_RESET))
+            instance = cls._instances.setdefault(symbol, instance)
+        return instance
 
-        if symbol in _CASH_SECURITIES:
-            self.allow_t0 = True
-            self.security_type = SecType.CASH
-            self.commission_coeff_peramount = 0.0
-            self.commission_coeff_today_peramount = 0.0
-            self.tax_coeff_peramount = 0.0
-        elif symbol in _T0_ETFLOF:
-            self.allow_t0 = True
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} 为只读的共享对象，不可以修改")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{self.__class__.__name__} 为只读的共享对象，不可以修改")
 
     def __getitem__(self, key):
         try:
             return self.__dict__[key]
         except KeyError as e:
             raise AttributeError from e
+
+
+def presets_for(symbols: Sequence[str]) -> pd.DataFrame:
+    """批量获取预设值
+
+    Arguments:
+        symbols {Sequence[str]} -- 证券代码，可重复
+
+    Returns:
+        pd.DataFrame -- index: symbol(与symbols一一对应)，columns: security_type, price_tick,
+        volume_unit, upper_limit_ratio, down_limit_ratio 等预设字段
+    """
+    symbols = np.asarray(symbols, dtype=object)
+    uniques, inverse = np.unique(symbols, return_inverse=True)
+    presets = [vxMarketPreset(symbol).__dict__ for symbol in uniques]
+    columns = {}
+    for field in _PRESET_FIELDS:
+        values = np.array(
+            [preset[field] for preset in presets], dtype=_PRESET_DTYPES.get(field, float)
+        )
+        columns[field] = values[inverse]
+    return pd.DataFrame(columns, index=pd.Index(symbols, name="symbol"))
@@ -0,0 +1,321 @@
+"""批量委托风控
+
+vxBatchRiskChecker: 一次性校验一批委托，交易规则及资金、持仓充足性均以数组运算完成
+"""
+
+from typing import Callable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from vxquant.model.preset import presets_for
+from vxquant.model.contants import (
+    OrderDirection,
+    OrderRejectReason,
+    OrderStatus,
+    OrderType,
+)
+from vxquant.model.exchange import vxOrder, vxTick
+
+__all__ = [
+    "vxBatchRiskChecker",
+    "vxRiskCheckResult",
+    "volume_rule",
+    "lot_size_rule",
+    "price_tick_rule",
+    "price_limit_rule",
+    "market_price_rule",
+]
+
+# 买入委托冻结资金系数(含交易费用)
+_FROZEN_COEFF = 1.003
+_EPS = 1e-6
+
+# 风控规则: frame --> 被拒绝委托的bool数组
+vxRiskRule = Callable[[pd.DataFrame], np.ndarray]
+
+
+def volume_rule(frame: pd.DataFrame) -> np.ndarray:
+    """委托数量必须大于0"""
+    return frame["volume"].to_numpy() <= 0
+
+
+def lot_size_rule(frame: pd.DataFrame) -> np.ndarray:
+    """买入数量须为最小交易单位的整数倍，卖出时仅允许一次性卖出零股"""
+    volume = frame["volume"].to_numpy()
+    odd_lot = np.mod(volume, frame["volume_unit"].to_numpy()) != 0
+    is_buy = frame["direction"].to_numpy() > 0
+    sell_all = volume == frame["available"].to_numpy()
+    return odd_lot & (is_buy | ~sell_all)
+
+
+def price_tick_rule(frame: pd.DataFrame) -> np.ndarray:
+    """限价委托价格须大于0且为最小价格变动的整数倍"""
+    is_limit = frame["is_limit"].to_numpy()
+    price = frame["price"].to_numpy()
+    ticks = price / frame["price_tick"].to_numpy()
+    off_tick = np.abs(ticks - np.round(ticks)) > _EPS
+    return is_limit & ((price <= 0) | off_tick)
+
+
+def price_limit_rule(frame: pd.DataFrame) -> np.ndarray:
+    """限价委托价格须在涨跌停价格之间，缺少昨收价时不检查"""
+    price = frame["price"].to_numpy()
+    checked = frame["is_limit"].to_numpy() & (frame["yclose"].to_numpy() > 0)
+    return checked & (
+        (price > frame["upper_limit"].to_numpy() + _EPS)
+        | (price < frame["down_limit"].to_numpy() - _EPS)
+    )
+
+
+def market_price_rule(frame: pd.DataFrame) -> np.ndarray:
+    """市价买入委托须有最新价用于估算冻结资金"""
+    is_market_buy = ~frame["is_limit"].to_numpy() & (frame["direction"].to_numpy() > 0)
+    return is_market_buy & ~(frame["price"].to_numpy() > 0)
+
+
+_DEFAULT_RULES = [
+    ("volume", volume_rule, OrderRejectReason.IllegalVolume),
+    ("lot_size", lot_size_rule, OrderRejectReason.IllegalVolume),
+    ("price_tick", price_tick_rule, OrderRejectReason.IllegalPrice),
+    ("price_limit", price_limit_rule, OrderRejectReason.IllegalPrice),
+    ("market_price", market_price_rule, OrderRejectReason.IllegalPrice),
+]
+
+
+def _consume(amount: np.ndarray, capacity: float) -> np.ndarray:
+    """按顺序占用额度，超出剩余额度的委托被拒绝，且不占用额度
+
+    Arguments:
+        amount {np.ndarray} -- 各委托占用的额度，不占用额度的委托为0
+        capacity {float} -- 可用额度
+
+    Returns:
+        np.ndarray -- 被拒绝委托的bool数组
+    """
+    total = np.cumsum(amount)
+    rejected = total > capacity + _EPS
+    if not rejected.any():
+        return rejected
+
+    # 第一个超出额度的委托之前均可成交，之后逐个按剩余额度占用
+    first = int(np.argmax(rejected))
+    remaining = capacity - (total[first - 1] if first else 0.0)
+    rejected[first:] = False
+    for i in range(first, len(amount)):
+        if amount[i] > remaining + _EPS:
+            rejected[i] = True
+        else:
+            remaining -= amount[i]
+    return rejected
+
+
+class vxRiskCheckResult:
+    """批量风控结果"""
+
+    def __init__(
+        self,
+        orders: List[vxOrder],
+        accepted: np.ndarray,
+        reasons: np.ndarray,
+        rules: np.ndarray,
+    ) -> None:
+        self.orders = orders
+        # 通过风控的委托
+        self.accepted = accepted
+        # 拒绝代码，通过的委托为None
+        self.reasons = reasons
+        # 拒绝委托的规则名称，通过的委托为空字符串
+        self.rules = rules
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __str__(self) -> str:
+        return (
+            f"< {self.__class__.__name__} accepted: {int(self.accepted.sum())}"
+            f" rejected: {int((~self.accepted).sum())} >"
+        )
+
+    __repr__ = __str__
+
+    @property
+    def rejected(self) -> np.ndarray:
+        """被拒绝的委托"""
+        return ~self.accepted
+
+    @property
+    def accepted_orders(self) -> List[vxOrder]:
+        """通过风控的委托"""
+        return [order for order, ok in zip(self.orders, self.accepted) if ok]
+
+    @property
+    def rejected_orders(self) -> List[vxOrder]:
+        """被拒绝的委托，已设置 Rejected 状态及拒绝原因"""
+        return [order for order, ok in zip(self.orders, self.accepted) if not ok]
+
+
+class vxBatchRiskChecker:
+    """批量委托风控
+
+    依次执行各项规则(委托数量、最小交易单位、最小价格变动、涨跌停、市价单估值)，再按
+    委托顺序占用资金及持仓: 买入委托按顺序冻结资金，超过剩余可用资金的买入委托被拒绝;
+    同一标的的卖出委托按顺序占用可用持仓，超过剩余可用持仓的委托被拒绝。被拒绝的委托
+    不占用资金及持仓。
+    每个委托只记录第一个不通过的规则。
+    """
+
+    def __init__(
+        self, rules: Optional[List[Tuple[str, vxRiskRule, OrderRejectReason]]] = None
+    ) -> None:
+        """批量委托风控
+
+        Keyword Arguments:
+            rules {List[Tuple[str, vxRiskRule, OrderRejectReason]]} -- 风控规则列表，为None时使用默认规则 (default: {None})
+        """
+        self._rules = list(_DEFAULT_RULES if rules is None else rules)
+
+    @property
+    def rules(self) -> List[str]:
+        """风控规则名称"""
+        return [name for name, _, _ in self._rules]
+
+    def add_rule(
+        self,
+        name: str,
+        rule: vxRiskRule,
+        reason: OrderRejectReason = OrderRejectReason.RiskRuleCheckFailed,
+    ) -> None:
+        """增加风控规则
+
+        Arguments:
+            name {str} -- 规则名称
+            rule {vxRiskRule} -- 规则函数，输入委托frame，返回被拒绝委托的bool数组
+
+        Keyword Arguments:
+            reason {OrderRejectReason} -- 拒绝代码 (default: {OrderRejectReason.RiskRuleCheckFailed})
+        """
+        self.remove_rule(name)
+        self._rules.append((name, rule, reason))
+
+    def remove_rule(self, name: str) -> None:
+        """删除风控规则"""
+        self._rules = [r for r in self._rules if r[0] != name]
+
+    def to_frame(
+        self,
+        orders: List[vxOrder],
+        positions: Mapping[str, float],
+        ticks: Optional[Mapping[str, vxTick]] = None,
+    ) -> pd.DataFrame:
+        """将委托转换为规则使用的frame
+
+        列: symbol, direction(买入1/卖出-1), volume, price(市价单为最新价), is_limit,
+        available(标的可用持仓), yclose, volume_unit, price_tick, upper_limit, down_limit
+        """
+        ticks = ticks or {}
+        frame = pd.DataFrame(
+            {
+                "symbol": [order.symbol for order in orders],
+                "direction": [
+                    1 if order.order_direction == OrderDirection.Buy else -1
+                    for order in orders
+                ],
+                "volume": np.array([order.volume for order in orders], dtype=float),
+                "price": np.array([order.price for order in orders], dtype=float),
+                "is_limit": [order.order_type != OrderType.Market for order in orders],
+            }
+        )
+
+        symbols = frame["symbol"].unique()
+        presets = presets_for(symbols)[
+            ["volume_unit", "price_tick", "upper_limit_ratio", "down_limit_ratio"]
+        ].set_axis(["volume_unit", "price_tick", "upper_ratio", "down_ratio"], axis=1)
+        presets["yclose"] = [
+            ticks[symbol].yclose if symbol in ticks else 0.0 for symbol in symbols
+        ]
+        presets["lasttrade"] = [
+            ticks[symbol].lasttrade if symbol in ticks else 0.0 for symbol in symbols
+        ]
+        presets["available"] = [
+            float(positions.get(symbol, 0.0)) for symbol in symbols
+        ]
+        tick = presets["price_tick"]
+        presets["upper_limit"] = (
+            np.round(presets["yclose"] * presets["upper_ratio"] / tick) * tick
+        )
+        presets["down_limit"] = (
+            np.round(presets["yclose"] * presets["down_ratio"] / tick) * tick
+        )
+        frame = frame.join(presets, on="symbol")
+
+        # 未指定价格的市价单按最新价估算冻结资金
+        market_price = (~frame["is_limit"]) & (frame["price"] <= 0)
+        frame.loc[market_price, "price"] = frame.loc[market_price, "lasttrade"]
+        return frame
+
+    def check(
+        self,
+        orders: List[vxOrder],
+        cash: float,
+        positions: Mapping[str, float],
+        ticks: Optional[Mapping[str, vxTick]] = None,
+    ) -> vxRiskCheckResult:
+        """校验一批委托
+
+        Arguments:
+            orders {List[vxOrder]} -- 待校验的委托，按优先级排序
+            cash {float} -- 可用资金
+            positions {Mapping[str, float]} -- 各标的可用持仓 {symbol: available}
+
+        Keyword Arguments:
+            ticks {Mapping[str, vxTick]} -- 最新行情，用于涨跌停及市价单估值 (default: {None})
+
+        Returns:
+            vxRiskCheckResult -- 风控结果，被拒绝的委托已设置 Rejected 状态及拒绝原因
+        """
+        orders = list(orders)
+        n = len(orders)
+        accepted = np.ones(n, dtype=bool)
+        reasons = np.full(n, None, dtype=object)
+        rules = np.full(n, "", dtype=object)
+        if n == 0:
+            return vxRiskCheckResult(orders, accepted, reasons, rules)
+
+        frame = self.to_frame(orders, positions, ticks)
+
+        def _reject(mask, name, reason):
+            mask = np.asarray(mask, dtype=bool) & accepted
+            reasons[mask] = reason
+            rules[mask] = name
+            accepted[mask] = False
+
+        for name, rule, reason in self._rules:
+            _reject(rule(frame), name, reason)
+
+        is_buy = frame["direction"].to_numpy() > 0
+        volume = frame["volume"].to_numpy()
+
+        # 资金: 通过规则检查的买入委托按顺序冻结资金
+        amount = np.where(
+            accepted & is_buy, volume * frame["price"].to_numpy() * _FROZEN_COEFF, 0.0
+        )
+        _reject(_consume(amount, cash), "cash", OrderRejectReason.NoEnoughCash)
+
+        # 持仓: 同一标的的卖出委托按顺序占用可用持仓
+        sells = np.where(accepted & ~is_buy, volume, 0.0)
+        symbols = frame["symbol"].to_numpy()
+        available = frame["available"].to_numpy()
+        sold = pd.Series(sells).groupby(symbols).cumsum().to_numpy()
+        over = sold > available + _EPS
+        for symbol in pd.unique(symbols[over]):
+            rows = np.flatnonzero(symbols == symbol)
+            over[rows] = _consume(sells[rows], available[rows[0]])
+        _reject(over, "position", OrderRejectReason.NoEnoughPosition)
+
+        for i in np.flatnonzero(~accepted):
+            orders[i].status = OrderStatus.Rejected
+            orders[i].reject_code = reasons[i]
+            orders[i].reject_reason = f"风控规则({rules[i]})检查未通过"
+
+        return vxRiskCheckResult(orders, accepted, reasons, rules)
@@ -0,0 +1,326 @@
+"""日终结算
+
+settle_frames: 以DataFrame批量计算一组账户的日终结算结果
+vxSettlementEngine: 按账户分片，多进程并行结算 MongoDB 中的账户
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pymongo
+
+from vxutils import vxtime, logger
+from vxutils.database import vxMongoDB
+
+__all__ = ["settle_frames", "vxSettlementEngine"]
+
+
+# 未完成的委托状态
+_OPEN_STATUS = ["New", "PendingNew", "PartiallyFilled"]
+
+# 买入委托冻结资金的系数(含手续费)
+_FROZEN_COEFF = 1.003
+
+_ACCOUNT_COLUMNS = ["account_id", "debt", "fund_shares"]
+_POSITION_COLUMNS = [
+    "account_id",
+    "symbol",
+    "volume_his",
+    "volume_today",
+    "lasttrade",
+    "cost",
+]
+_ORDER_COLUMNS = [
+    "order_id",
+    "account_id",
+    "symbol",
+    "order_direction",
+    "volume",
+    "filled_volume",
+    "price",
+    "status",
+    "due_dt",
+]
+
+# 结算后写回的字段
+_SETTLED_POSITION_FIELDS = [
+    "volume_his",
+    "volume_today",
+    "volume",
+    "frozen",
+    "available",
+    "marketvalue",
+    "fnl",
+]
+_SETTLED_ACCOUNT_FIELDS = [
+    "balance",
+    "frozen",
+    "available",
+    "marketvalue",
+    "fnl",
+    "asset",
+    "nav",
+    "fund_nav",
+    "asset_yd",
+    "nav_yd",
+    "fund_nav_yd",
+    "deposit",
+    "withdraw",
+]
+
+
+def settle_frames(
+    accounts: pd.DataFrame,
+    positions: pd.DataFrame,
+    orders: pd.DataFrame,
+    settle_dt: float,
+) -> Dict[str, pd.DataFrame]:
+    """批量计算日终结算结果
+
+    1. 未完成且已超时的委托置为 Expired，按剩余未完成委托重新计算冻结
+    2. 今日持仓滚入昨日持仓，清除数量为0的证券持仓
+    3. 重新计算账户市值、净资产及基金净值，并滚动为昨日数据
+
+    Arguments:
+        accounts {pd.DataFrame} -- 账户信息: account_id, debt, fund_shares
+        positions {pd.DataFrame} -- 持仓: account_id, symbol, volume_his, volume_today, lasttrade, cost
+        orders {pd.DataFrame} -- 委托: order_id, account_id, symbol, order_direction, volume, filled_volume, price, status, due_dt
+        settle_dt {float} -- 结算时间
+
+    Returns:
+        Dict[str, pd.DataFrame] -- accounts: 结算后账户, positions: 结算后持仓, removed_positions: 清除的持仓, expired_orders: 超时的委托
+    """
+    accounts = accounts.reindex(columns=_ACCOUNT_COLUMNS)
+    positions = positions.reindex(columns=_POSITION_COLUMNS)
+    orders = orders.reindex(columns=_ORDER_COLUMNS)
+
+    # 1. 委托超时及冻结
+    open_orders = orders[orders["status"].isin(_OPEN_STATUS)]
+    is_expired = open_orders["due_dt"].astype(float) <= settle_dt
+    expired_orders = open_orders.loc[is_expired, ["order_id", "account_id"]]
+    open_orders = open_orders[~is_expired]
+
+    left_volume = open_orders["volume"].astype(float) - open_orders[
+        "filled_volume"
+    ].astype(float)
+    is_buy = open_orders["order_direction"] == "Buy"
+    frozens = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "account_id": open_orders.loc[is_buy, "account_id"],
+                    "symbol": "CNY",
+                    "frozen": left_volume[is_buy]
+                    * open_orders.loc[is_buy, "price"].astype(float)
+                    * _FROZEN_COEFF,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "account_id": open_orders.loc[~is_buy, "account_id"],
+                    "symbol": open_orders.loc[~is_buy, "symbol"],
+                    "frozen": left_volume[~is_buy],
+                }
+            ),
+        ]
+    )
+    frozens = frozens.groupby(["account_id", "symbol"], as_index=False)["frozen"].sum()
+
+    # 2. 持仓滚动
+    volume = positions["volume_his"].astype(float) + positions["volume_today"].astype(
+        float
+    )
+    is_cash = positions["symbol"] == "CNY"
+    removed = ~is_cash & (volume <= 0)
+    removed_positions = positions.loc[removed, ["account_id", "symbol"]]
+
+    positions = positions[~removed].assign(
+        volume_his=volume[~removed], volume_today=0.0, volume=volume[~removed]
+    )
+    positions = positions.merge(frozens, how="left", on=["account_id", "symbol"])
+    positions["frozen"] = positions["frozen"].fillna(0.0).round(2)
+    # 今日持仓已滚入昨日持仓，可用数量与是否 T+0 无关
+    positions["available"] = (positions["volume"] - positions["frozen"]).clip(lower=0)
+    is_cash = positions["symbol"] == "CNY"
+    positions["marketvalue"] = np.where(
+        is_cash,
+        positions["volume"],
+        (positions["volume"] * positions["lasttrade"].astype(float)).round(2),
+    )
+    positions["fnl"] = np.where(
+        is_cash, 0.0, positions["marketvalue"] - positions["cost"].astype(float)
+    ).round(4)
+
+    # 3. 账户净值
+    cash = positions[is_cash].set_index("account_id")
+    stocks = positions[~is_cash].groupby("account_id")[["marketvalue", "fnl"]].sum()
+    accounts = accounts.set_index("account_id")
+    accounts["debt"] = accounts["debt"].astype(float).fillna(0.0)
+    accounts["fund_shares"] = accounts["fund_shares"].astype(float).fillna(0.0)
+    accounts["balance"] = cash["volume"].reindex(accounts.index).fillna(0.0)
+    accounts["frozen"] = cash["frozen"].reindex(accounts.index).fillna(0.0)
+    accounts["available"] = (accounts["balance"] - accounts["frozen"]).clip(lower=0)
+    accounts["marketvalue"] = (
+        stocks["marketvalue"].reindex(accounts.index).fillna(0.0).round(2)
+    )
+    accounts["fnl"] = stocks["fnl"].reindex(accounts.index).fillna(0.0).round(2)
+    accounts["asset"] = accounts["balance"] + accounts["marketvalue"]
+    accounts["nav"] = accounts["asset"] - accounts["debt"]
+    accounts["fund_nav"] = np.where(
+        accounts["fund_shares"] > 0,
+        (accounts["nav"] / accounts["fund_shares"].where(accounts["fund_shares"] > 0))
+        .round(4),
+        1.0,
+    )
+    accounts["asset_yd"] = accounts["asset"]
+    accounts["nav_yd"] = accounts["nav"]
+    accounts["fund_nav_yd"] = accounts["fund_nav"]
+    accounts["deposit"] = 0.0
+    accounts["withdraw"] = 0.0
+
+    return {
+        "accounts": accounts.reset_index(),
+        "positions": positions,
+        "removed_positions": removed_positions,
+        "expired_orders": expired_orders,
+    }
+
+
+def _settle_shard(
+    db_uri: str, db_name: str, account_ids: List[str], settle_dt: float
+) -> Dict[str, int]:
+    """结算一个分片内的账户，在工作进程中执行"""
+    db = vxMongoDB(db_uri, db_name)
+    filter_ = {"account_id": {"$in": account_ids}}
+
+    def _load(collection, columns, extra_filter=None):
+        projection = dict.fromkeys(columns, 1)
+        projection["_id"] = 0
+        cur = db[collection].find(dict(filter_, **(extra_filter or {})), projection)
+        return pd.DataFrame(list(cur), columns=columns)
+
+    result = settle_frames(
+        _load("accounts", _ACCOUNT_COLUMNS),
+        _load("positions", _POSITION_COLUMNS),
+        _load("orders", _ORDER_COLUMNS, {"status": {"$in": _OPEN_STATUS}}),
+        settle_dt,
+    )
+
+    position_cmds = [
+        pymongo.UpdateOne(
+            {"account_id": item["account_id"], "symbol": item["symbol"]},
+            {"$set": dict(item, updated_dt=settle_dt)},
+        )
+        for item in result["positions"][
+            ["account_id", "symbol"] + _SETTLED_POSITION_FIELDS
+        ].to_dict("records")
+    ]
+    position_cmds.extend(
+        pymongo.DeleteOne(item)
+        for item in result["removed_positions"].to_dict("records")
+    )
+    if position_cmds:
+        db.positions.bulk_write(position_cmds, ordered=False)
+
+    expired_order_ids = result["expired_orders"]["order_id"].tolist()
+    if expired_order_ids:
+        db.orders.update_many(
+            {"order_id": {"$in": expired_order_ids}},
+            {"$set": {"status": "Expired", "updated_dt": settle_dt}},
+        )
+
+    account_cmds = [
+        pymongo.UpdateOne(
+            {"account_id": item.pop("account_id")},
+            {"$set": dict(item, settle_day=settle_dt, updated_dt=settle_dt)},
+        )
+        for item in result["accounts"][
+            ["account_id"] + _SETTLED_ACCOUNT_FIELDS
+        ].to_dict("records")
+    ]
+    if account_cmds:
+        db.accounts.bulk_write(account_cmds, ordered=False)
+
+    return {
+        "accounts": len(account_cmds),
+        "positions": len(result["positions"]),
+        "removed_positions": len(result["removed_positions"]),
+        "expired_orders": len(expired_order_ids),
+    }
+
+
+class vxSettlementEngine:
+    """日终结算引擎
+
+    将账户按 shard_size 分片，每个分片在独立进程中批量读取、以DataFrame计算结算结果并批量写回。
+    各分片之间的账户互不相关，可以并行执行。
+    """
+
+    def __init__(
+        self,
+        db_uri: str,
+        db_name: str,
+        workers: Optional[int] = None,
+        shard_size: int = 500,
+    ) -> None:
+        """日终结算引擎
+
+        Arguments:
+            db_uri {str} -- mongodb 连接地址
+            db_name {str} -- 数据库名称
+
+        Keyword Arguments:
+            workers {Optional[int]} -- 进程数，为1时在当前进程中顺序结算，None为cpu核数 (default: {None})
+            shard_size {int} -- 每个分片的账户数量 (default: {500})
+        """
+        self._db_uri = db_uri
+        self._db_name = db_name
+        self._workers = workers
+        self._shard_size = shard_size
+
+    def settle(
+        self, account_ids: Optional[List[str]] = None, settle_dt: float = None
+    ) -> Dict[str, int]:
+        """结算账户
+
+        Keyword Arguments:
+            account_ids {Optional[List[str]]} -- 待结算的账户，None 表示全部账户 (default: {None})
+            settle_dt {float} -- 结算时间，默认为当前时间 (default: {None})
+
+        Returns:
+            Dict[str, int] -- 结算的账户数、持仓数、清除的持仓数以及超时的委托数
+        """
+        settle_dt = settle_dt or vxtime.now()
+        if account_ids is None:
+            db = vxMongoDB(self._db_uri, self._db_name)
+            account_ids = db.accounts.distinct("account_id")
+
+        shards = [
+            account_ids[i : i + self._shard_size]
+            for i in range(0, len(account_ids), self._shard_size)
+        ]
+        args = (
+            [self._db_uri] * len(shards),
+            [self._db_name] * len(shards),
+            shards,
+            [settle_dt] * len(shards),
+        )
+
+        start = vxtime.now()
+        if self._workers == 1 or len(shards) <= 1:
+            results = list(map(_settle_shard, *args))
+        else:
+            with ProcessPoolExecutor(self._workers) as executor:
+                results = list(executor.map(_settle_shard, *args))
+
+        summary = {
+            key: sum(result[key] for result in results)
+            for key in ["accounts", "positions", "removed_positions", "expired_orders"]
+        }
+        logger.info(
+            f"结算完成: {summary}, 分片数: {len(shards)}, 耗时:"
+            f" {vxtime.now() - start:.2f}s"
+        )
+        return summary
@@ -4,6 +4,7 @@ import pandas as pd
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Union
 from vxquant.model.preset import vxMarketPreset
+from vxquant.model.risk import vxBatchRiskChecker
 from vxutils import vxtime
 from vxquant.model.exchange import (
     vxAccountInfo,
@@ -29,6 +30,7 @@ class vxTdAPIBase(ABC):
     def __init__(self):
         self._cache = {}
         self._cached_at = 0
+        self.risk_checker = vxBatchRiskChecker()
 
     @abstractmethod
     def get_ticks(self, *symbols) -> Dict[str, vxTick]:
@@ -91,6 +93,38 @@ class vxTdAPIBase(ABC):
             vxorders {List[vxOrder]} -- 待提交的委托订单
         """
 
+    def submit_batch(self, *vxorders: List[vxOrder]) -> List[vxOrder]:
+        """批量风控后提交委托订单
+
+        以当前可用资金及持仓一次性校验全部委托，仅提交通过风控的委托
+
+        Arguments:
+            vxorders {List[vxOrder]} -- 待提交的委托订单，按优先级排序
+
+        Returns:
+            List[vxOrder] -- 与vxorders一一对应，被拒绝的委托为 Rejected 状态
+        """
+        if vxorders and isinstance(vxorders[0], list):
+            vxorders = vxorders[0]
+        if not vxorders:
+            return []
+
+        positions = self.get_positions()
+        cash = positions["CNY"].available if "CNY" in positions else 0.0
+        result = self.risk_checker.check(
+            vxorders,
+            cash,
+            {symbol: position.available for symbol, position in positions.items()},
+            self.current(*{vxorder.symbol for vxorder in vxorders}),
+        )
+        ret_orders = list(result.orders)
+        accepted = [i for i, ok in enumerate(result.accepted) if ok]
+        if accepted:
+            broker_orders = self.order_batch(*(ret_orders[i] for i in accepted))
+            for i, broker_order in zip(accepted, broker_orders or []):
+                ret_orders[i] = broker_order
+        return ret_orders
+
     def order_volume(
         self, symbol: str, volume: int, price: Optional[float] = 0
     ) -> vxOrder:
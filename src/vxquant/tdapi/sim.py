@@ -4,10 +4,12 @@ import re
 import itertools
 from abc import abstractmethod
 from multiprocessing.dummy import Pool
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 import uuid
+import numpy as np
+import pandas as pd
 import requests
-from vxsched import vxContext, vxscheduler
+from vxsched import vxContext
 from vxutils import vxtime, logger
 from vxquant.model.exchange import (
     vxAccountInfo,
@@ -19,7 +21,15 @@ from vxquant.model.exchange import (
     vxTrade,
 )
 from functools import reduce
-from vxquant.model.contants import OrderDirection, OrderOffset, OrderStatus, OrderType
+from vxquant.model.contants import (
+    OrderDirection,
+    OrderOffset,
+    OrderRejectReason,
+    OrderStatus,
+    OrderType,
+    TradeStatus,
+)
+from vxquant.model.preset import presets_for
 from vxquant.tdapi.base import vxTdAPIBase
 
 _TENCENT_HQ_URL = "http://qt.gtimg.cn/q=%s&timestamp=%s"
@@ -49,6 +59,331 @@ def _update_dict(source, target):
     return source
 
 
+# 五档行情
+_DEPTH = 5
+_EPS = 1e-6
+# 撮合使用的预设字段
+_MATCH_PRESET_FIELDS = [
+    "volume_unit",
+    "price_tick",
+    "upper_limit_ratio",
+    "down_limit_ratio",
+    "commission_coeff_peramount",
+    "tax_coeff_peramount",
+]
+_TERMINAL_STATUS = (
+    OrderStatus.Filled,
+    OrderStatus.Canceled,
+    OrderStatus.Rejected,
+    OrderStatus.Expired,
+)
+
+
+def _group_cumsum(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(groups).cumsum().to_numpy()
+
+
+def _group_cummax(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(groups).cummax().to_numpy()
+
+
+def _depth_cost(
+    prices: np.ndarray, volumes: np.ndarray, filled: np.ndarray
+) -> np.ndarray:
+    """从第一档开始依次成交 filled 数量的成交金额"""
+    start = np.cumsum(volumes, axis=1) - volumes
+    return (prices * np.clip(filled[:, None] - start, 0, volumes)).sum(axis=1)
+
+
+class vxMatchingEngine:
+    """模拟撮合引擎
+
+    未完成委托以数组形式保存，每个行情快照以一次向量化运算完成全部委托的撮合:
+        1. 限价委托超出涨跌停价格的直接拒绝，市价委托以涨跌停价格作为保护价
+        2. 买入委托依次吃掉不高于委托价的卖五档，卖出委托依次吃掉不低于委托价的买五档
+        3. 同一标的、同一方向的委托按价格优先、时间优先分配盘口数量，可部分成交
+        4. 部分成交的数量按最小交易单位向下取整，市价委托未成交部分撤销
+    每个快照的盘口相互独立，不保留上一快照消耗的数量。
+    """
+
+    def __init__(self) -> None:
+        self._orders: List[vxOrder] = []
+        self._symbols = np.array([], dtype=object)
+        # 买入1 / 卖出-1
+        self._directions = np.array([], dtype=np.int8)
+        self._prices = np.array([], dtype=float)
+        self._volumes = np.array([], dtype=float)
+        self._filled = np.array([], dtype=float)
+        self._seq = 0
+        self._seqs = np.array([], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__} open orders: {len(self)} >"
+
+    __repr__ = __str__
+
+    @property
+    def open_orders(self) -> List[vxOrder]:
+        """未完成的委托"""
+        return list(self._orders)
+
+    def add_orders(self, orders: List[vxOrder]) -> None:
+        """添加待撮合的委托，委托状态更新为 New
+
+        Arguments:
+            orders {List[vxOrder]} -- 委托订单
+        """
+        orders = [order for order in orders if order.status not in _TERMINAL_STATUS]
+        if not orders:
+            return
+
+        for order in orders:
+            if order.status == OrderStatus.PendingNew:
+                order.status = OrderStatus.New
+
+        seqs = np.arange(self._seq, self._seq + len(orders))
+        self._seq += len(orders)
+        self._orders.extend(orders)
+        self._symbols = np.append(
+            self._symbols, np.array([order.symbol for order in orders], dtype=object)
+        )
+        self._directions = np.append(
+            self._directions,
+            [
+                1 if order.order_direction == OrderDirection.Buy else -1
+                for order in orders
+            ],
+        ).astype(np.int8)
+        self._prices = np.append(
+            self._prices,
+            [
+                0.0 if order.order_type == OrderType.Market else order.price
+                for order in orders
+            ],
+        )
+        self._volumes = np.append(self._volumes, [order.volume for order in orders])
+        self._filled = np.append(
+            self._filled, [order.filled_volume for order in orders]
+        )
+        self._seqs = np.append(self._seqs, seqs)
+
+    def cancel(self, *order_ids: str) -> List[vxOrder]:
+        """撤销未完成的委托
+
+        Returns:
+            List[vxOrder] -- 已撤销的委托
+        """
+        mask = np.array([order.order_id in order_ids for order in self._orders], bool)
+        return self._finish(mask, OrderStatus.Canceled)
+
+    def expire(self, now: Optional[float] = None) -> List[vxOrder]:
+        """超过 due_dt 的委托作废
+
+        Keyword Arguments:
+            now {float} -- 当前时间 (default: {vxtime.now()})
+
+        Returns:
+            List[vxOrder] -- 已作废的委托
+        """
+        now = vxtime.now() if now is None else now
+        mask = np.array([order.due_dt < now for order in self._orders], dtype=bool)
+        return self._finish(mask, OrderStatus.Expired)
+
+    def _finish(self, mask: np.ndarray, status: OrderStatus) -> List[vxOrder]:
+        finished = []
+        for i in np.flatnonzero(mask):
+            order = self._orders[i]
+            order.status = status
+            finished.append(order)
+        if finished:
+            self._compact(~mask)
+        return finished
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """只保留 keep 对应的委托"""
+        self._orders = [order for order, k in zip(self._orders, keep) if k]
+        self._symbols = self._symbols[keep]
+        self._directions = self._directions[keep]
+        self._prices = self._prices[keep]
+        self._volumes = self._volumes[keep]
+        self._filled = self._filled[keep]
+        self._seqs = self._seqs[keep]
+
+    def _quotes(
+        self, symbols: np.ndarray, ticks: Dict[str, vxTick]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """标的的盘口矩阵及预设
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray] -- 盘口(标的数 x 4 x 5: 卖价、卖量、买价、买量)，
+            预设(标的数 x 7: 预设值及昨收价)
+        """
+        depth = np.zeros((len(symbols), 4, _DEPTH))
+        presets = np.column_stack(
+            [
+                presets_for(symbols)[_MATCH_PRESET_FIELDS].to_numpy(float),
+                [ticks[symbol].yclose for symbol in symbols],
+            ]
+        )
+        for i, symbol in enumerate(symbols):
+            tick = ticks[symbol]
+            depth[i] = [
+                [getattr(tick, f"ask{k}_p") for k in range(1, _DEPTH + 1)],
+                [getattr(tick, f"ask{k}_v") for k in range(1, _DEPTH + 1)],
+                [getattr(tick, f"bid{k}_p") for k in range(1, _DEPTH + 1)],
+                [getattr(tick, f"bid{k}_v") for k in range(1, _DEPTH + 1)],
+            ]
+        return depth, presets
+
+    def match(self, ticks: Dict[str, vxTick]) -> Tuple[List[vxTrade], List[vxOrder]]:
+        """以行情快照撮合未完成的委托
+
+        Arguments:
+            ticks {Dict[str, vxTick]} -- {symbol: vxTick} 行情快照
+
+        Returns:
+            Tuple[List[vxTrade], List[vxOrder]] -- 成交回报，状态发生变化的委托
+        """
+        if not self._orders:
+            return [], []
+
+        symbols, codes = np.unique(self._symbols, return_inverse=True)
+        quoted = np.array([symbol in ticks for symbol in symbols], dtype=bool)
+        active = quoted[codes]
+        if not active.any():
+            return [], []
+
+        depth, presets = self._quotes(symbols[quoted], ticks)
+        # 有行情的委托在盘口矩阵中的行
+        rows = (np.cumsum(quoted) - 1)[codes]
+        rows[~active] = 0
+        depth, presets = depth[rows], presets[rows]
+        unit, tick_size, up_ratio, down_ratio, commission_coeff, tax_coeff, yclose = (
+            presets.T
+        )
+
+        has_yclose = yclose > 0
+        upper_limit = np.where(
+            has_yclose, np.round(yclose * up_ratio / tick_size) * tick_size, np.inf
+        )
+        down_limit = np.where(
+            has_yclose, np.round(yclose * down_ratio / tick_size) * tick_size, 0.0
+        )
+
+        is_buy = self._directions > 0
+        is_market = self._prices <= 0
+        rejected = (
+            active
+            & ~is_market
+            & (
+                (self._prices > upper_limit + _EPS)
+                | (self._prices < down_limit - _EPS)
+            )
+        )
+        active &= ~rejected
+
+        # 市价委托以涨跌停价格作为保护价
+        limit_price = np.where(
+            is_market, np.where(is_buy, upper_limit, down_limit), self._prices
+        )
+        level_prices = np.where(is_buy[:, None], depth[:, 0], depth[:, 2])
+        level_volumes = np.where(is_buy[:, None], depth[:, 1], depth[:, 3])
+        acceptable = (
+            active[:, None]
+            & (level_prices > 0)
+            & np.where(
+                is_buy[:, None],
+                level_prices <= limit_price[:, None] + _EPS,
+                level_prices >= limit_price[:, None] - _EPS,
+            )
+        )
+        level_volumes = np.where(acceptable, level_volumes, 0.0)
+        liquidity = level_volumes.sum(axis=1)
+
+        # 同一标的、同一方向内按价格优先、时间优先排序
+        order = np.lexsort(
+            (self._seqs, -self._directions * limit_price, self._directions, codes)
+        )
+        groups = (codes * 2 + is_buy)[order]
+        remaining = np.where(active, self._volumes - self._filled, 0.0)[order]
+        # 排在前面的委托累计成交量: 前序委托全部成交时为累计委托量，否则受限于可成交的盘口数量
+        cum_filled = _group_cummax(
+            np.minimum(_group_cumsum(remaining, groups), liquidity[order]), groups
+        )
+        prev_filled = np.r_[0.0, cum_filled[:-1]]
+        prev_filled[np.r_[True, groups[1:] != groups[:-1]]] = 0.0
+        volumes = np.zeros(len(order))
+        starts = np.zeros(len(order))
+        volumes[order] = cum_filled - prev_filled
+        starts[order] = prev_filled
+
+        # 部分成交的数量按最小交易单位向下取整
+        remaining = self._volumes - self._filled
+        volumes = np.where(
+            volumes >= remaining - _EPS, remaining, np.floor(volumes / unit) * unit
+        )
+        volumes = np.where(active, volumes, 0.0)
+        amounts = _depth_cost(
+            level_prices, level_volumes, starts + volumes
+        ) - _depth_cost(level_prices, level_volumes, starts)
+        commissions = amounts * (commission_coeff + np.where(is_buy, 0.0, tax_coeff))
+        self._filled += volumes
+
+        trades = []
+        updated = []
+        now = vxtime.now()
+        for i in np.flatnonzero(volumes > 0):
+            vxorder = self._orders[i]
+            trades.append(
+                vxTrade(
+                    account_id=vxorder.account_id,
+                    order_id=vxorder.order_id,
+                    exchange_order_id=vxorder.exchange_order_id,
+                    symbol=vxorder.symbol,
+                    order_direction=vxorder.order_direction,
+                    order_offset=vxorder.order_offset,
+                    price=amounts[i] / volumes[i],
+                    volume=int(volumes[i]),
+                    commission=commissions[i],
+                    status=TradeStatus.Trade,
+                )
+            )
+            vxorder.filled_volume = int(self._filled[i])
+            vxorder.filled_amount += amounts[i] + (
+                commissions[i] if is_buy[i] else -commissions[i]
+            )
+            vxorder.status = (
+                OrderStatus.Filled
+                if self._filled[i] >= self._volumes[i] - _EPS
+                else OrderStatus.PartiallyFilled
+            )
+            vxorder.updated_dt = now
+            updated.append(vxorder)
+
+        filled = self._filled >= self._volumes - _EPS
+        # 市价委托未成交部分撤销
+        canceled = active & is_market & ~filled
+        for i in np.flatnonzero(canceled):
+            self._orders[i].status = OrderStatus.Canceled
+            if volumes[i] == 0:
+                updated.append(self._orders[i])
+        for i in np.flatnonzero(rejected):
+            vxorder = self._orders[i]
+            vxorder.status = OrderStatus.Rejected
+            vxorder.reject_code = OrderRejectReason.IllegalPrice
+            vxorder.reject_reason = (
+                f"委托价格{vxorder.price}超出涨跌停价格"
+                f"[{down_limit[i]:.2f}, {upper_limit[i]:.2f}]"
+            )
+            updated.append(vxorder)
+
+        self._compact(~(filled | canceled | rejected))
+        return trades, updated
+
+
 class vxSIMTdAPI(vxTdAPIBase):
     """交易接口类"""
 
@@ -59,6 +394,9 @@ class vxSIMTdAPI(vxTdAPIBase):
         self._grep_stock_code = re.compile(r"(?<=_)\w+")
         self._pool = Pool(5)
         self._session.headers.update(_HEADERS)
+        self._matching_engine = vxMatchingEngine()
+        self._orders: Dict[str, vxOrder] = {}
+        self._trades: Dict[str, vxTrade] = {}
         resq = self._session.get("https://stockapp.finance.qq.com/mstats/#", timeout=1)
         resq.raise_for_status()
         logger.info(f"网络连通成功{resq.status_code}...")
@@ -225,10 +563,26 @@ class vxSIMTdAPI(vxTdAPIBase):
             broker_order = vxOrder(**vxorder)
             broker_order.exchange_order_id = str(uuid.uuid4())
             ret_orders.append(broker_order)
-            self.context.sim_orderbooks[broker_order.exchange_order_id] = broker_order
+            self._orders[broker_order.exchange_order_id] = broker_order
 
+        self._matching_engine.add_orders(ret_orders)
         return ret_orders
 
+    def on_tick(
+        self, ticks: Dict[str, vxTick]
+    ) -> Tuple[List[vxTrade], List[vxOrder]]:
+        """以行情快照撮合未完成的委托
+
+        Arguments:
+            ticks {Dict[str, vxTick]} -- {symbol: vxTick} 行情快照
+
+        Returns:
+            Tuple[List[vxTrade], List[vxOrder]] -- 本次撮合的成交回报，状态发生变化的委托
+        """
+        trades, orders = self._matching_engine.match(ticks)
+        self._trades.update({trade.trade_id: trade for trade in trades})
+        return trades, orders
+
     def order_volume(
         self, symbol: str, volume: int, price: Optional[float] = 0
     ) -> vxOrder:
@@ -265,7 +619,7 @@ class vxSIMTdAPI(vxTdAPIBase):
         Returns:
             List[vxOrder] -- 当日委托订单列表
         """
-        return {}
+        return self._orders
 
     def get_execution_reports(self) -> List[vxTrade]:
         """获取当日成交回报信息
@@ -273,7 +627,7 @@ class vxSIMTdAPI(vxTdAPIBase):
         Returns:
             List[vxTrade] -- 当日成交回报列表
         """
-        return {}
+        return self._trades
 
     def order_cancel(self, *orders: List[vxOrder]) -> None:
         """撤单
@@ -281,6 +635,9 @@ class vxSIMTdAPI(vxTdAPIBase):
         Arguments:
             orders {List[vxOrder]} -- 待撤销订单
         """
+        if orders and isinstance(orders[0], list):
+            orders = orders[0]
+        self._matching_engine.cancel(*(order.order_id for order in orders))
 
 
 if __name__ == "__main__":
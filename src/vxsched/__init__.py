@@ -1,7 +1,15 @@
 """调度器"""
 
 from vxsched.context import vxContext
-from vxsched.event import vxEvent, vxTrigger, TriggerStatus, vxEventQueue
+from vxsched.clock import vxVirtualClock
+from vxsched.event import (
+    vxEvent,
+    vxTrigger,
+    TriggerStatus,
+    OverflowPolicy,
+    vxEventQueue,
+)
+from vxsched.journal import vxEventJournal
 from vxsched.handlers import vxEventHandlers, vxRpcMethods
 from vxsched.rpc import vxRPCWrapper, rpcwrapper
 from vxsched.core import vxEngine, vxengine
@@ -10,6 +18,8 @@ from vxsched.pubsubs import (
     vxSubscriber,
     vxFTPPublisher,
     vxFTPSubscriber,
+    vxFTPSegmentPublisher,
+    vxFTPSegmentSubscriber,
     vxZMQPublisher,
     vxZMQSubscriber,
     vxZMQRpcClient,
@@ -19,8 +29,10 @@ from .triggers import vxDailyTrigger, vxIntervalTrigger, vxOnceTrigger, vxWeekly
 
 __all__ = [
     "vxContext",
+    "vxVirtualClock",
     "vxEvent",
     "vxEventQueue",
+    "vxEventJournal",
     "vxEventHandlers",
     "vxRpcMethods",
     "vxEngine",
@@ -29,6 +41,8 @@ __all__ = [
     "vxSubscriber",
     "vxFTPPublisher",
     "vxFTPSubscriber",
+    "vxFTPSegmentPublisher",
+    "vxFTPSegmentSubscriber",
     "vxZMQPublisher",
     "vxZMQSubscriber",
     "vxZMQRpcClient",
@@ -38,6 +52,7 @@ __all__ = [
     "vxOnceTrigger",
     "vxWeeklyTrigger",
     "TriggerStatus",
+    "OverflowPolicy",
     "vxRPCWrapper",
     "rpcwrapper",
 ]
@@ -0,0 +1,58 @@
+"""虚拟时钟"""
+
+import contextlib
+import threading
+from typing import Any, Iterator
+
+from vxutils import vxtime, to_timestamp
+
+__all__ = ["vxVirtualClock"]
+
+
+class vxVirtualClock:
+    """虚拟时钟
+
+    回测时替换 vxtime 的时间函数及延时函数: now() 返回虚拟时间，sleep() 直接推进虚拟时间，
+    不会真正等待。
+    """
+
+    def __init__(self, start_dt: Any = 0.0) -> None:
+        """虚拟时钟
+
+        Keyword Arguments:
+            start_dt {Any} -- 起始时间 (default: {0.0})
+        """
+        self._now = float(to_timestamp(start_dt)) if start_dt else 0.0
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__}(now={self._now}) >"
+
+    __repr__ = __str__
+
+    def now(self) -> float:
+        """虚拟时间"""
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        """推进虚拟时间，不等待"""
+        if seconds > 0:
+            with self._lock:
+                self._now += seconds
+
+    def advance_to(self, dt: float) -> None:
+        """推进虚拟时间至dt，虚拟时间不会倒退"""
+        with self._lock:
+            self._now = max(self._now, dt)
+
+    @contextlib.contextmanager
+    def install(self) -> Iterator["vxVirtualClock"]:
+        """在上下文中以虚拟时钟替换 vxtime 的时间函数及延时函数，退出时恢复"""
+        timefunc, delayfunc = vxtime._timefunc, vxtime._delayfunc
+        vxtime.set_timefunc(self.now)
+        vxtime.set_delayfunc(self.sleep)
+        try:
+            yield self
+        finally:
+            vxtime.set_timefunc(timefunc)
+            vxtime.set_delayfunc(delayfunc)
@@ -1,4 +1,5 @@
 import os
+import itertools
 import importlib
 import contextlib
 from pathlib import Path
@@ -7,12 +8,13 @@ from queue import Empty
 
 from functools import wraps
 from collections import defaultdict
-from typing import Any, Optional, Union, Callable
+from typing import Any, Iterable, Optional, Union, Callable
 from concurrent.futures import ThreadPoolExecutor as Executor, as_completed
-from vxutils import logger
+from vxutils import logger, vxtime
 from vxsched.event import vxEvent, vxTrigger, vxEventQueue
 from vxsched.context import vxContext
 from vxsched.handlers import vxEventHandlers
+from vxsched.clock import vxVirtualClock
 
 __all__ = [
     "vxEngine",
@@ -68,11 +70,11 @@ class vxEngine:
 
         event_handlers = kwargs.pop("event_handlers", None)
         if event_handlers:
-            self._event_handlers = kwargs.pop("event_handlers")
+            self._event_handlers = event_handlers
 
         event_queue = kwargs.pop("event_queue", None)
-        if event_queue:
-            self._event_queue = kwargs.pop("event_queue")
+        if event_queue is not None:
+            self._event_queue = event_queue
 
         self._active = True
         self.submit_event("__init__")
@@ -125,7 +127,11 @@ class vxEngine:
             while not self._event_queue.empty():
                 event = self._event_queue.get_nowait()
                 events[event.type].append(event)
-        list(map(self.event_handler.trigger, map(max, events.values())))
+        try:
+            list(map(self.event_handler.trigger, map(max, events.values())))
+        finally:
+            for event in itertools.chain.from_iterable(events.values()):
+                self._event_queue.done(event)
 
     def run(self) -> None:
         logger.info(f"{self.__class__.__name__} worker 启动...")
@@ -133,17 +139,79 @@ class vxEngine:
             while self.is_alive():
                 try:
                     event = self._event_queue.get(timeout=1)
+                except Empty:
+                    continue
+
+                try:
                     logger.debug(f"{self.__class__.__name__} 触发 {event.type} 事件...")
                     self.event_handler.trigger(event)
-                except Empty:
-                    pass
                 except Exception as e:
                     logger.info(f"trigger event{event} error: {e}", exc_info=True)
+                finally:
+                    self._event_queue.done(event)
 
         finally:
             logger.info(f"{self.__class__.__name__} worker 结束...")
             self.stop()
 
+    def run_backtest(
+        self,
+        end_dt: float,
+        clock: Optional[vxVirtualClock] = None,
+        feed: Optional[Iterable[vxEvent]] = None,
+    ) -> int:
+        """回测模式运行
+
+        以虚拟时钟驱动，在当前线程中依次处理event: 每次将虚拟时间直接推进到下一个
+        event的触发时间，不等待。feed 中的events(如历史行情)须按触发时间排序，与队列中
+        的events按触发时间合并，触发时间相同时 feed 中的event优先。
+
+        Arguments:
+            end_dt {float} -- 回测结束时间
+
+        Keyword Arguments:
+            clock {vxVirtualClock} -- 虚拟时钟，为None时从当前时间开始 (default: {None})
+            feed {Iterable[vxEvent]} -- 按触发时间排序的外部events (default: {None})
+
+        Returns:
+            int -- 处理的event个数
+        """
+        clock = clock or vxVirtualClock(vxtime.now())
+        feed = iter(feed or ())
+        pending = next(feed, None)
+        count = 0
+
+        with clock.install():
+            if self._is_initialized is False:
+                self.initialize()
+            self._active = True
+
+            while self._active:
+                queue_dt = self._event_queue.next_trigger_dt()
+                if pending is not None and (
+                    queue_dt is None or pending.trigger_dt <= queue_dt
+                ):
+                    if pending.trigger_dt > end_dt:
+                        break
+                    clock.advance_to(pending.trigger_dt)
+                    event, pending = pending, next(feed, None)
+                elif queue_dt is not None and queue_dt <= end_dt:
+                    clock.advance_to(queue_dt)
+                    event = self._event_queue.get_nowait()
+                else:
+                    break
+
+                try:
+                    self.event_handler.trigger(event)
+                finally:
+                    self._event_queue.done(event)
+                count += 1
+
+            clock.advance_to(end_dt)
+        self._active = False
+        logger.info(f"{self.__class__.__name__} 回测结束，共处理 {count} 个event")
+        return count
+
     def serve_forever(self) -> None:
         """运行"""
 
@@ -166,7 +234,9 @@ class vxEngine:
         logger.info("=" * 60)
 
         if self._executor is None:
+            # 5个worker及各backend均常驻一个线程
             self._executor = Executor(
+                max_workers=5 + len(self._backends),
                 thread_name_prefix=f"{self.__class__.__name__}",
             )
             logger.info(
@@ -203,6 +273,20 @@ class vxEngine:
         logger.info(f" {'stopped':=^60} ")
         logger.info("=" * 60)
 
+    def reset(self, context: Optional[vxContext] = None) -> None:
+        """清空已注册的事件处理函数及待处理的events，以便在同一进程中重新加载策略
+
+        Keyword Arguments:
+            context {vxContext} -- 新的上下文，为None时使用空的上下文 (default: {None})
+        """
+        if self._active:
+            raise RuntimeError(f"{self.__class__.__name__} 运行中，不可以重置")
+
+        self._event_handlers = vxEventHandlers(context=context or vxContext())
+        self._event_queue = vxEventQueue()
+        self._backends = []
+        self._is_initialized = False
+
     @classmethod
     def load_modules(cls, mod_path: Union[str, Path]) -> Any:
         """加载策略目录"""
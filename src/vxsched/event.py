@@ -1,8 +1,10 @@
 """消息类型"""
 
-from heapq import heappush, heappop
+from heapq import heappush, heappop, heapify
+from threading import get_ident
 from enum import Enum
-from queue import Queue, Empty
+from pathlib import Path
+from queue import Queue, Empty, Full
 from typing import Optional, Any
 from vxutils import (
     vxDataClass,
@@ -15,10 +17,12 @@ from vxutils import (
     vxPropertyField,
     vxtime,
     combine_datetime,
+    to_enum,
+    logger,
 )
 
 
-__all__ = ["vxEvent", "vxEventQueue", "vxTrigger", "TriggerStatus"]
+__all__ = ["vxEvent", "vxEventQueue", "vxTrigger", "TriggerStatus", "OverflowPolicy"]
 
 
 class TriggerStatus(Enum):
@@ -37,6 +41,28 @@ class TriggerStatus(Enum):
     Completed = 3
 
 
+class OverflowPolicy(Enum):
+    """队列满时的处理策略
+
+    Block : 阻塞等待，put_nowait 或超时后抛出 Full；消费线程(调用过get的线程)不等待，直接抛出 Full
+    DropOldest : 丢弃最早触发的event
+    Coalesce : 合并同一通道、同一类型的event，仅保留最新的一个
+    Reject : 立即拒绝，抛出 Full
+
+    带触发器的周期event(如定时任务)不计入队列长度，也不会被丢弃或合并；
+    RPC回复(reply_to非空)不会被丢弃或合并，队列满时仍然放入。
+    """
+
+    #  阻塞等待
+    Block = 1
+    #  丢弃最早触发的event
+    DropOldest = 2
+    #  合并同类型event
+    Coalesce = 3
+    #  拒绝
+    Reject = 4
+
+
 def _trigger_status(trigger):
     if trigger.trigger_dt is None:
         return TriggerStatus.Pending
@@ -153,13 +179,210 @@ class vxEvent(vxDataClass):
 
 
 class vxEventQueue(Queue):
+    """按触发时间排序的消息队列
+
+    可选的事件日志(vxEventJournal)：
+        1. put 时写入日志，处理完成后调用 done(event) 写入完成记录，初始化时重放日志
+           恢复未完成的events。已取出但未调用 done 的event在重启后会再次投递(至少一次)
+        2. 内存中的events超过 high_water_mark 时，新的events仅保留在日志中，
+           内存中只保存排序所需的索引，待内存中的events消费后再从日志中加载
+    以'__'开头的内部控制消息只在内存中传递，不写入日志。
+    """
+
+    def __init__(
+        self,
+        maxsize=0,
+        journal=None,
+        high_water_mark=0,
+        overflow=OverflowPolicy.Block,
+    ):
+        """按触发时间排序的消息队列
+
+        Keyword Arguments:
+            maxsize {int} -- 队列最大长度(含未到触发时间的events，不含带触发器的events)，0为不限制 (default: {0})
+            journal {Union[str, vxEventJournal]} -- 事件日志或日志目录，为None时不写日志 (default: {None})
+            high_water_mark {int} -- 内存中最多保存的events个数，0为不限制，仅在有日志时生效 (default: {0})
+            overflow {Union[str, OverflowPolicy]} -- 队列满时的处理策略 (default: {OverflowPolicy.Block})
+        """
+        if isinstance(journal, (str, Path)):
+            from vxsched.journal import vxEventJournal
+
+            journal = vxEventJournal(journal)
+
+        self._journal = journal
+        self._high_water_mark = high_water_mark if journal is not None else 0
+        self._overflow = to_enum(overflow, OverflowPolicy)
+        self._metrics = {
+            "dropped": 0,
+            "coalesced": 0,
+            "rejected": 0,
+            "blocked": 0,
+            "blocked_seconds": 0.0,
+        }
+        super().__init__(maxsize)
+
+        if self._journal is not None:
+            for event, location in self._journal.replay():
+                self._push(event, location)
+                self.unfinished_tasks += 1
+
     def _init(self, maxsize=0):
         self.queue = []
         self._event_ids = set()
+        # 带触发器的event.id，不计入队列长度
+        self._trigger_ids = set()
+        # 调用过get的消费线程，队列满时不阻塞等待，以免消费线程互相等待造成死锁
+        self._consumers = set()
+        # 已取出、等待 done() 写入完成记录的event.id
+        self._delivered = set()
+        # 溢出至日志的events索引: [(trigger_dt, priority, seq, event.id, 日志位置)]
+        self._spilled = []
+        self._spilled_seq = 0
 
     def _qsize(self):
         now = vxtime.now()
-        return len([event for event in self.queue if event.trigger_dt <= now])
+        return len([event for event in self.queue if event.trigger_dt <= now]) + len(
+            [key for key in self._spilled if key[0] <= now]
+        )
+
+    def _size(self):
+        """队列中events的个数，含未到触发时间的events，不含带触发器的events"""
+        return len(self._event_ids) - len(self._trigger_ids)
+
+    def full(self):
+        with self.mutex:
+            return 0 < self.maxsize <= self._size()
+
+    @property
+    def overflow(self):
+        """队列满时的处理策略"""
+        return self._overflow
+
+    @property
+    def metrics(self):
+        """流控统计信息
+
+        Returns:
+            dict -- 丢弃、合并、拒绝的events个数，阻塞次数及阻塞时长，以及当前队列长度
+        """
+        with self.mutex:
+            return dict(self._metrics, size=self._size(), maxsize=self.maxsize)
+
+    def put(self, item, block=True, timeout=None):
+        """放入event，队列满时按 overflow 策略处理
+
+        Arguments:
+            item {Union[str, vxEvent]} -- event
+
+        Keyword Arguments:
+            block {bool} -- 策略为Block时，是否阻塞等待 (default: {True})
+            timeout {float} -- 策略为Block时，最长等待时间 (default: {None})
+
+        Raises:
+            Full: 队列已满且策略为Block(不等待或等待超时)或Reject
+        """
+        if isinstance(item, str):
+            item = vxEvent(type=item)
+
+        with self.not_full:
+            if (
+                0 < self.maxsize <= self._size()
+                and not item.trigger
+                and not item.reply_to
+            ):
+                self._on_overflow(item, block, timeout)
+
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _on_overflow(self, event, block, timeout):
+        if self._overflow == OverflowPolicy.Reject:
+            self._metrics["rejected"] += 1
+            raise Full
+
+        if self._overflow == OverflowPolicy.Coalesce and self._coalesce(event):
+            return
+
+        if self._overflow in (OverflowPolicy.DropOldest, OverflowPolicy.Coalesce):
+            if self._drop_oldest():
+                return
+            # 队列中没有可以丢弃的event
+            self._metrics["rejected"] += 1
+            raise Full
+
+        if not block or get_ident() in self._consumers:
+            self._metrics["rejected"] += 1
+            raise Full
+
+        if timeout is not None and timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+
+        self._metrics["blocked"] += 1
+        start = vxtime.now()
+        try:
+            endtime = None if timeout is None else start + timeout
+            while 0 < self.maxsize <= self._size():
+                remaining = None if endtime is None else endtime - vxtime.now()
+                if remaining is not None and remaining <= 0.0:
+                    self._metrics["rejected"] += 1
+                    raise Full
+                self.not_full.wait(remaining)
+        finally:
+            self._metrics["blocked_seconds"] += vxtime.now() - start
+
+    def _discard(self, event):
+        self._event_ids.discard(event.id)
+        self._trigger_ids.discard(event.id)
+        self.unfinished_tasks -= 1
+        if self._is_durable(event):
+            self._journal.done(event.id)
+
+    def _drop_oldest(self):
+        """丢弃最早触发的event，带触发器的event及RPC回复除外
+
+        Returns:
+            bool -- 是否丢弃了event
+        """
+        candidates = [
+            i
+            for i, event in enumerate(self.queue)
+            if not event.trigger and not event.reply_to
+        ]
+        if not candidates:
+            return False
+
+        i = min(candidates, key=self.queue.__getitem__)
+        event = self.queue[i]
+        self.queue[i] = self.queue[-1]
+        self.queue.pop()
+        heapify(self.queue)
+        self._discard(event)
+        self._load_spilled()
+        self._metrics["dropped"] += 1
+        logger.warning(f"队列已满，丢弃event: {event.type}({event.id})")
+        return True
+
+    def _coalesce(self, event):
+        """移除同一通道、同一类型的待处理event，由新的event代替"""
+        for i, pending_event in enumerate(self.queue):
+            if (
+                pending_event.type == event.type
+                and pending_event.channel == event.channel
+                and not pending_event.trigger
+                and not pending_event.reply_to
+            ):
+                self.queue[i] = self.queue[-1]
+                self.queue.pop()
+                heapify(self.queue)
+                self._discard(pending_event)
+                self._load_spilled()
+                self._metrics["coalesced"] += 1
+                return True
+        return False
+
+    def _is_durable(self, event):
+        return self._journal is not None and not event.type.startswith("__")
 
     def _put(self, event):
         if isinstance(event, str):
@@ -173,11 +396,64 @@ class vxEventQueue(Queue):
         if event.trigger and event.trigger.status.name == "Pending":
             event.trigger_dt = next(event.trigger, vxtime.now())
 
-        heappush(self.queue, event)
+        location = self._journal.put(event) if self._is_durable(event) else None
+        self._push(event, location)
+
+    def _push(self, event, location=None):
+        """放入内存队列，超过内存水位且已写入日志的event只保存索引"""
         self._event_ids.add(event.id)
+        if event.trigger:
+            self._trigger_ids.add(event.id)
+        if (
+            location is not None
+            and self._high_water_mark
+            and len(self.queue) >= self._high_water_mark
+        ):
+            self._spilled_seq += 1
+            heappush(
+                self._spilled,
+                (event.trigger_dt, event.priority, self._spilled_seq, event.id, location),
+            )
+            self._load_spilled()
+            return
+
+        heappush(self.queue, event)
+
+    def _load_spilled(self):
+        """从日志中加载溢出的events，保证内存队列的队首为最早触发的event"""
+        while self._spilled and (
+            len(self.queue) < self._high_water_mark
+            or self._spilled[0][:2] < (self.queue[0].trigger_dt, self.queue[0].priority)
+        ):
+            *_, location = heappop(self._spilled)
+            heappush(self.queue, self._journal.read(location))
+
+    def done(self, event):
+        """event处理完成，写入完成记录
+
+        周期触发的event在每次取出后仍保留在队列中，不写入完成记录。
+
+        Arguments:
+            event {vxEvent} -- get() 返回的event
+        """
+        with self.mutex:
+            if event.id in self._delivered:
+                self._delivered.discard(event.id)
+                self._journal.done(event.id)
+
+    def next_trigger_dt(self):
+        """队列中最早的触发时间，含未到触发时间的events，队列为空时返回None"""
+        with self.mutex:
+            trigger_dts = []
+            if self.queue:
+                trigger_dts.append(self.queue[0].trigger_dt)
+            if self._spilled:
+                trigger_dts.append(self._spilled[0][0])
+            return min(trigger_dts) if trigger_dts else None
 
     def get(self, block=True, timeout=None):
         with self.not_empty:
+            self._consumers.add(get_ident())
             if not block:
                 if not self._qsize():
                     raise Empty
@@ -215,6 +491,10 @@ class vxEventQueue(Queue):
         if not event.trigger or event.trigger.status.name == "Completed":
             self.unfinished_tasks -= 1
             self._event_ids.remove(event.id)
+            self._trigger_ids.discard(event.id)
+            if self._is_durable(event):
+                self._delivered.add(event.id)
+            self._load_spilled()
             event.trigger = ""
             return event
 
@@ -222,6 +502,9 @@ class vxEventQueue(Queue):
         reply_event.trigger = ""
 
         event.trigger_dt = next(event.trigger, None)
+        if self._is_durable(event):
+            self._journal.put(event)
         heappush(self.queue, event)
+        self._load_spilled()
         self.not_empty.notify()
         return reply_event
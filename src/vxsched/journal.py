@@ -0,0 +1,276 @@
+"""事件日志
+
+vxEventJournal: 追加写入的事件日志，用于 vxEventQueue 的崩溃恢复以及超出内存水位时的溢出存储
+"""
+
+import os
+import mmap
+import struct
+import threading
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Tuple, Union
+from vxutils import logger, vxtime
+from vxsched.event import vxEvent
+
+__all__ = ["vxEventJournal"]
+
+
+# 记录类型: 写入/更新event
+_RECORD_PUT = 1
+# 记录类型: event已完成
+_RECORD_DONE = 2
+# 记录头: 记录类型(1字节) + 记录长度(4字节)
+_RECORD_HEADER = struct.Struct(">BI")
+_SEGMENT_SUFFIX = ".journal"
+
+
+class vxEventJournal:
+    """事件日志
+
+    日志由若干按序号命名的分段文件组成，每条记录为 PUT(event) 或 DONE(event.id)。
+    每个event以最后一条PUT记录为准，没有DONE记录的event在重启时恢复。
+    分段文件按序号从旧到新删除: 只有最早的分段文件中已没有存活的event时才删除，
+    以免删除含有DONE记录的较新分段后，较早分段中已完成的event在重启时被恢复。
+    """
+
+    def __init__(
+        self,
+        journal_dir: Union[str, Path],
+        segment_size: int = 64 * 1024 * 1024,
+        fsync_interval: float = 0.2,
+        fsync_batch: int = 256,
+    ) -> None:
+        """事件日志
+
+        Arguments:
+            journal_dir {Union[str, Path]} -- 日志目录
+
+        Keyword Arguments:
+            segment_size {int} -- 单个分段文件的最大字节数 (default: {64*1024*1024})
+            fsync_interval {float} -- 最长fsync间隔(秒) (default: {0.2})
+            fsync_batch {int} -- 累计写入多少条记录后立即fsync (default: {256})
+        """
+        self._journal_dir = Path(journal_dir)
+        self._journal_dir.mkdir(parents=True, exist_ok=True)
+        self._segment_size = segment_size
+        self._fsync_interval = fsync_interval
+        self._fsync_batch = fsync_batch
+        self._lock = threading.RLock()
+
+        # event.id --> (分段序号, offset)
+        self._locations: Dict[str, Tuple[int, int]] = {}
+        # 分段序号 --> 存活的event个数
+        self._live_counts: Dict[int, int] = defaultdict(int)
+        self._mmaps: Dict[int, mmap.mmap] = {}
+        self._unsynced = 0
+        self._last_sync_dt = vxtime.now()
+        self._sync_timer = None
+
+        # 磁盘上的分段序号(含当前写入的分段)，按序号排序
+        self._segments = self._list_segments()
+        self._active_seq = self._segments[-1] if self._segments else 1
+        if not self._segments:
+            self._segments.append(self._active_seq)
+        self._active_fp = open(self._segment_path(self._active_seq), "ab")
+
+    def __str__(self) -> str:
+        return f"< {self.__class__.__name__}({self._journal_dir}) >"
+
+    __repr__ = __str__
+
+    def _segment_path(self, seq: int) -> Path:
+        return self._journal_dir / f"{seq:010d}{_SEGMENT_SUFFIX}"
+
+    def _list_segments(self) -> List[int]:
+        return sorted(
+            int(path.stem) for path in self._journal_dir.glob(f"*{_SEGMENT_SUFFIX}")
+        )
+
+    def _iter_records(self, seq: int):
+        """遍历分段文件中完整的记录，末尾写了一半的记录将被忽略"""
+        path = self._segment_path(seq)
+        if path.stat().st_size == 0:
+            return
+
+        with open(path, "rb") as fp, mmap.mmap(
+            fp.fileno(), 0, access=mmap.ACCESS_READ
+        ) as buf:
+            pos = 0
+            while pos + _RECORD_HEADER.size <= len(buf):
+                kind, length = _RECORD_HEADER.unpack_from(buf, pos)
+                start = pos + _RECORD_HEADER.size
+                if start + length > len(buf):
+                    logger.warning(f"{self} 分段文件{path.name}末尾记录不完整，已忽略")
+                    break
+                yield kind, pos, buf[start : start + length]
+                pos = start + length
+
+    def replay(self) -> List[Tuple[vxEvent, Tuple[int, int]]]:
+        """重放日志，恢复未完成的events
+
+        Returns:
+            List[Tuple[vxEvent, Tuple[int, int]]] -- [(event, 日志位置), ...]
+        """
+        with self._lock:
+            self._locations.clear()
+            self._live_counts.clear()
+            for seq in self._list_segments():
+                for kind, offset, payload in self._iter_records(seq):
+                    # 重放过程中只统计存活个数，全部重放完成后再删除分段文件
+                    event_id = (
+                        vxEvent.unpack(payload).id
+                        if kind == _RECORD_PUT
+                        else payload.decode("utf-8")
+                    )
+                    location = self._locations.pop(event_id, None)
+                    if location is not None:
+                        self._live_counts[location[0]] -= 1
+
+                    if kind == _RECORD_PUT:
+                        self._locations[event_id] = (seq, offset)
+                        self._live_counts[seq] += 1
+
+            self._segments = self._list_segments()
+            self._remove_completed()
+            events = [
+                (self.read(location), location)
+                for location in self._locations.values()
+            ]
+        logger.info(f"{self} 恢复 {len(events)} 个未完成的events")
+        return events
+
+    def put(self, event: vxEvent) -> Tuple[int, int]:
+        """写入或更新event
+
+        Arguments:
+            event {vxEvent} -- 待写入的event
+
+        Returns:
+            Tuple[int, int] -- 日志位置 (分段序号, offset)
+        """
+        with self._lock:
+            location = self._append(_RECORD_PUT, vxEvent.pack(event))
+            self._release(event.id)
+            self._locations[event.id] = location
+            self._live_counts[location[0]] += 1
+            return location
+
+    def done(self, event_id: str) -> None:
+        """标记event已完成
+
+        Arguments:
+            event_id {str} -- event.id
+        """
+        with self._lock:
+            if event_id not in self._locations:
+                return
+            self._append(_RECORD_DONE, event_id.encode("utf-8"))
+            self._release(event_id)
+
+    def read(self, location: Tuple[int, int]) -> vxEvent:
+        """按日志位置读取event
+
+        Arguments:
+            location {Tuple[int, int]} -- 日志位置 (分段序号, offset)
+
+        Returns:
+            vxEvent -- 日志中保存的event
+        """
+        seq, offset = location
+        with self._lock:
+            if seq == self._active_seq:
+                self._active_fp.flush()
+
+            buf = self._mmap(seq, offset + _RECORD_HEADER.size)
+            _, length = _RECORD_HEADER.unpack_from(buf, offset)
+            start = offset + _RECORD_HEADER.size
+            buf = self._mmap(seq, start + length)
+            return vxEvent.unpack(buf[start : start + length])
+
+    def _mmap(self, seq: int, size: int) -> mmap.mmap:
+        """获取分段文件的只读内存映射，映射长度不足size时重新映射"""
+        buf = self._mmaps.get(seq)
+        if buf is None or len(buf) < size:
+            if buf is not None:
+                buf.close()
+            with open(self._segment_path(seq), "rb") as fp:
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps[seq] = buf
+        return buf
+
+    def _append(self, kind: int, payload: bytes) -> Tuple[int, int]:
+        if self._active_fp.tell() + len(payload) > self._segment_size:
+            self._roll()
+
+        location = (self._active_seq, self._active_fp.tell())
+        self._active_fp.write(_RECORD_HEADER.pack(kind, len(payload)))
+        self._active_fp.write(payload)
+        self._unsynced += 1
+
+        if (
+            self._unsynced >= self._fsync_batch
+            or vxtime.now() - self._last_sync_dt >= self._fsync_interval
+        ):
+            self.sync()
+        elif self._sync_timer is None:
+            # 写入较少时，由定时器保证最迟fsync_interval秒后落盘
+            self._sync_timer = threading.Timer(self._fsync_interval, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+        return location
+
+    def _roll(self) -> None:
+        self.sync()
+        self._active_fp.close()
+        self._active_seq += 1
+        self._segments.append(self._active_seq)
+        self._remove_completed()
+        self._active_fp = open(self._segment_path(self._active_seq), "ab")
+        logger.debug(f"{self} 切换至分段文件: {self._active_seq}")
+
+    def _release(self, event_id: str) -> None:
+        location = self._locations.pop(event_id, None)
+        if location is not None:
+            self._live_counts[location[0]] -= 1
+            self._remove_completed()
+
+    def _remove_completed(self) -> None:
+        """从最早的分段文件开始，依次删除没有存活event的历史分段文件"""
+        while (
+            self._segments
+            and self._segments[0] < self._active_seq
+            and self._live_counts.get(self._segments[0], 0) <= 0
+        ):
+            seq = self._segments.pop(0)
+            buf = self._mmaps.pop(seq, None)
+            if buf is not None:
+                buf.close()
+            self._live_counts.pop(seq, None)
+            self._segment_path(seq).unlink(missing_ok=True)
+            logger.debug(f"{self} 删除已完成的分段文件: {seq}")
+
+    def sync(self) -> None:
+        """将已写入的记录fsync到磁盘"""
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+
+            if self._unsynced and not self._active_fp.closed:
+                self._active_fp.flush()
+                os.fsync(self._active_fp.fileno())
+            self._unsynced = 0
+            self._last_sync_dt = vxtime.now()
+
+    def close(self) -> None:
+        """落盘并关闭日志"""
+        with self._lock:
+            self.sync()
+            self._active_fp.close()
+            for buf in self._mmaps.values():
+                buf.close()
+            self._mmaps.clear()
+
+    def __len__(self) -> int:
+        return len(self._locations)
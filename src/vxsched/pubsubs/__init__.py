@@ -2,7 +2,12 @@
 
 from vxutils import logger
 from .base import vxPublisher, vxSubscriber
-from .ftp import vxFTPPublisher, vxFTPSubscriber
+from .ftp import (
+    vxFTPPublisher,
+    vxFTPSubscriber,
+    vxFTPSegmentPublisher,
+    vxFTPSegmentSubscriber,
+)
 
 try:
     from .zeromq import vxZMQPublisher, vxZMQSubscriber, vxZMQRpcClient
@@ -21,5 +26,7 @@ __all__ = [
     "vxZMQSubscriber",
     "vxFTPPublisher",
     "vxFTPSubscriber",
+    "vxFTPSegmentPublisher",
+    "vxFTPSegmentSubscriber",
     "vxZMQRpcClient",
 ]
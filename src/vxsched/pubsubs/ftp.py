@@ -2,8 +2,12 @@
 
 
 import io
+import json
+import struct
 import pathlib
-from typing import List, Union, Optional
+import threading
+from collections import defaultdict
+from typing import List, Union, Optional, Tuple
 
 from vxutils import logger, vxFTPConnector, vxtime
 from vxsched.event import vxEvent, vxTrigger
@@ -15,7 +19,48 @@ def _to_event_rank(filename: str) -> tuple:
     return float(pathlib.Path(filename).name.split("||")[0]), filename
 
 
-__all__ = ["vxFTPPublisher", "vxFTPSubscriber"]
+__all__ = [
+    "vxFTPPublisher",
+    "vxFTPSubscriber",
+    "vxFTPSegmentPublisher",
+    "vxFTPSegmentSubscriber",
+]
+
+# 分段文件中每个event的帧头: 4字节 big-endian 的帧长度
+_FRAME_HEADER = struct.Struct(">I")
+# 记录各分段文件及其有效长度的清单文件
+_MANIFEST_FILE = "manifest.json"
+
+
+def pack_frames(events: List[vxEvent]) -> bytes:
+    """将events打包为带长度前缀的帧序列"""
+    frames = []
+    for event in events:
+        packed_event = vxEvent.pack(event)
+        frames.append(_FRAME_HEADER.pack(len(packed_event)))
+        frames.append(packed_event)
+    return b"".join(frames)
+
+
+def unpack_frames(data: bytes) -> Tuple[List[vxEvent], int]:
+    """解析帧序列
+
+    Arguments:
+        data {bytes} -- 带长度前缀的帧序列
+
+    Returns:
+        Tuple[List[vxEvent], int] -- (完整帧解析出的events, 已解析的字节数)，不完整的帧留待下次解析
+    """
+    events = []
+    pos = 0
+    while pos + _FRAME_HEADER.size <= len(data):
+        (length,) = _FRAME_HEADER.unpack_from(data, pos)
+        if pos + _FRAME_HEADER.size + length > len(data):
+            break
+        start = pos + _FRAME_HEADER.size
+        events.append(vxEvent.unpack(data[start : start + length]))
+        pos = start + length
+    return events, pos
 
 
 class vxFTPPublisher(vxPublisher):
@@ -111,7 +156,7 @@ class vxFTPPublisher(vxPublisher):
 
         remote_file = pathlib.Path(
             remote_dir,
-            f"{send_event.next_trigger_dt}____{send_event.id.replace('-','')}.pkl",
+            f"{send_event.trigger_dt}____{send_event.id.replace('-','')}.pkl",
         ).as_posix()
 
         try:
@@ -181,29 +226,319 @@ class vxFTPSubscriber(vxSubscriber):
         if now > self._next_fetch_dt:
             event_files = self._ftp_conn.list(self._remote_dir)
             self._next_fetch_dt = now + self._interval
-            return [event for event in map(self._fetch_event, event_files) if event]
+            return self._fetch_events(event_files)
 
         return []
 
-    def _fetch_event(self, event_file: str) -> vxEvent:
-        """获取单个event
+    def _fetch_events(self, event_files: List[str]) -> List[vxEvent]:
+        """通过连接池并行下载event文件，下载成功后删除远程文件
 
         Arguments:
-            event_file {str} -- event_file文件名称
-
-        Raises:
-            ConnectionError: 连接出错
+            event_files {List[str]} -- event_file文件名称列表
 
         Returns:
-            vxEvent -- vxEvent实例
+            List[vxEvent] -- vxEvent实例列表
         """
+        if not event_files:
+            return []
+
+        ftp_event_files = [
+            pathlib.Path(self._remote_dir, event_file).as_posix()
+            for event_file in event_files
+        ]
+        buffers = [io.BytesIO() for _ in ftp_event_files]
+        results = self._ftp_conn.download_many(zip(ftp_event_files, buffers))
+
+        events = []
+        downloaded_files = []
+        for ftp_event_file, bfp, is_download in zip(ftp_event_files, buffers, results):
+            if is_download is False:
+                logger.error(f"ConnectionError: 下载{ftp_event_file}发生错误")
+                continue
+            events.append(vxEvent.unpack(bfp.getvalue()))
+            downloaded_files.append(ftp_event_file)
+
+        self._ftp_conn.delete_many(downloaded_files)
+        return events
+
+
+class vxFTPSegmentPublisher(vxFTPPublisher):
+    """FTP分段文件发布器
+
+    events 以带长度前缀的帧追加(APPE)至滚动的分段文件中，每个批次窗口内的events只上传一次，
+    并通过清单文件(manifest.json)记录各分段文件的有效长度，订阅端无需列出远程目录。
+    上传在缓存锁之外进行，上传失败的events放回缓存，由下一个批次窗口重试。
+    """
+
+    def __init__(
+        self,
+        channel_name="",
+        host: str = "",
+        port: int = 21,
+        user: str = "",
+        passwd: str = "",
+        root_dir="/",
+        batch_interval: float = 0.5,
+        batch_size: int = 1024 * 1024,
+        segment_size: int = 16 * 1024 * 1024,
+        max_segments: int = 10,
+    ) -> None:
+        """FTP分段文件发布器
+
+        Keyword Arguments:
+            batch_interval {float} -- 批次窗口时长(秒) (default: {0.5})
+            batch_size {int} -- 缓存超过该字节数时立即上传 (default: {1024*1024})
+            segment_size {int} -- 单个分段文件的最大字节数 (default: {16*1024*1024})
+            max_segments {int} -- 保留的分段文件个数 (default: {10})
+        """
+        super().__init__(channel_name, host, port, user, passwd, root_dir)
+        self._batch_interval = batch_interval
+        self._batch_size = batch_size
+        self._segment_size = segment_size
+        self._max_segments = max_segments
+        self._lock = threading.Lock()
+        # 串行化上传，保证各channel内events的顺序
+        self._flush_lock = threading.Lock()
+        self._buffers = defaultdict(list)
+        self._buffer_bytes = 0
+        self._manifests = {}
+        # 追加失败的远程目录 --> 失败的分段序号，该分段文件的实际长度未知，下次写入时切换至其后的分段文件
+        self._broken_segments = {}
+        self._timer = None
+
+    def _load_manifest(self, remote_dir: str) -> dict:
+        """加载远程清单文件，不存在时创建新的清单"""
+        if remote_dir in self._manifests:
+            return self._manifests[remote_dir]
+
+        manifest = {"segments": []}
         with io.BytesIO() as bfp:
-            ftp_event_file = pathlib.Path(self._remote_dir, event_file).as_posix()
+            manifest_file = pathlib.Path(remote_dir, _MANIFEST_FILE).as_posix()
+            if self._ftp_conn.download(manifest_file, bfp) and bfp.getvalue():
+                manifest = json.loads(bfp.getvalue())
+
+        self._manifests[remote_dir] = manifest
+        return manifest
+
+    def _save_manifest(self, remote_dir: str, manifest: dict) -> bool:
+        """先上传临时文件再重命名，避免订阅端读到写了一半的清单"""
+        manifest["updated_dt"] = vxtime.now()
+        manifest_file = pathlib.Path(remote_dir, _MANIFEST_FILE).as_posix()
+        with io.BytesIO(json.dumps(manifest).encode("utf-8")) as bfp:
+            return self._ftp_conn.upload(
+                bfp, f"{manifest_file}.tmp"
+            ) and self._ftp_conn.rename(f"{manifest_file}.tmp", manifest_file)
 
-            is_download = self._ftp_conn.download(ftp_event_file, bfp)
-            if is_download is False:
-                logger.error(f"ConnectionError: 下载{event_file}发生错误")
+    def __call__(
+        self,
+        event: Union[str, vxEvent],
+        data="",
+        trigger: Optional[vxTrigger] = None,
+        priority: float = 10,
+        channel: str = None,
+        **kwargs,
+    ) -> None:
+        """发布消息，消息先缓存于批次窗口中，窗口结束时批量上传
+
+        Arguments:
+            event {Union[str, vxEvent]} -- 要推送消息或消息类型
+            data {Any} -- 消息数据信息 (default: {None})
+            trigger {Optional[vxTrigger]} -- 消息触发器 (default: {None})
+            priority {int} -- 优先级，越小优先级越高 (default: {10})
+        """
+
+        if isinstance(event, str):
+            send_event = vxEvent(
+                type=event,
+                data=data,
+                trigger=trigger,
+                priority=priority,
+                **kwargs,
+            )
+
+        else:
+            send_event = event
+        send_event.channel = channel or self.channel_name
+        frame = pack_frames([send_event])
+
+        with self._lock:
+            self._buffers[send_event.channel].append(frame)
+            self._buffer_bytes += len(frame)
+            if self._buffer_bytes < self._batch_size:
+                if self._timer is None:
+                    self._timer = threading.Timer(self._batch_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+
+        self.flush()
+
+    def flush(self) -> None:
+        """上传批次窗口内缓存的events，上传失败的events放回缓存等待重试"""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+                buffers = self._buffers
+                self._buffers = defaultdict(list)
+                self._buffer_bytes = 0
+
+            failed = {}
+            for channel, frames in buffers.items():
+                try:
+                    self._flush_channel(channel, b"".join(frames))
+                except Exception as err:
+                    logger.error(
+                        f"{self} flush {len(frames)} events to channel({channel})"
+                        f" error: {err}, retry later.",
+                        exc_info=True,
+                    )
+                    failed[channel] = frames
+
+            if not failed:
+                return
+
+            with self._lock:
+                for channel, frames in failed.items():
+                    # 放在新缓存的events之前，保持发布顺序
+                    self._buffers[channel][:0] = frames
+                    self._buffer_bytes += sum(len(frame) for frame in frames)
+                if self._timer is None:
+                    self._timer = threading.Timer(self._batch_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def _flush_channel(self, channel: str, data: bytes) -> None:
+        remote_dir = pathlib.Path(self._root_dir, channel).as_posix()
+        if remote_dir not in self._exists_remote_dirs:
+            self._ftp_conn.mkdir(remote_dir)
+            logger.info(f"创建远程ftp目录: {remote_dir}")
+            self._exists_remote_dirs = self._ftp_conn.list(self._root_dir)
+
+        manifest = self._load_manifest(remote_dir)
+        segments = manifest["segments"]
+        last_seq = int(segments[-1]["name"].split(".")[0]) if segments else 0
+        broken_seq = self._broken_segments.get(remote_dir, 0)
+        if (
+            not segments
+            or segments[-1]["size"] + len(data) > self._segment_size
+            or broken_seq >= last_seq
+        ):
+            seq = max(last_seq, broken_seq) + 1
+            segments.append({"name": f"{seq:010d}.seg", "size": 0})
+
+        segment = segments[-1]
+        segment_file = pathlib.Path(remote_dir, segment["name"]).as_posix()
+        with io.BytesIO(data) as bfp:
+            if not self._ftp_conn.append(bfp, segment_file):
+                # 追加失败时，远程文件的实际长度未知，重新加载清单并切换分段文件
+                self._manifests.pop(remote_dir, None)
+                self._broken_segments[remote_dir] = int(segment["name"].split(".")[0])
+                raise ConnectionError(f"append {segment_file} failed.")
+        self._broken_segments.pop(remote_dir, None)
+        segment["size"] += len(data)
+
+        expired_segments = segments[: -self._max_segments]
+        manifest["segments"] = segments[-self._max_segments :]
+        self._save_manifest(remote_dir, manifest)
+        for expired_segment in expired_segments:
+            self._ftp_conn.delete(
+                pathlib.Path(remote_dir, expired_segment["name"]).as_posix()
+            )
+        logger.debug(f"{self} put {len(data)} bytes to remote({segment_file}).")
+
+    def close(self) -> None:
+        """上传剩余的events"""
+        self.flush()
+
+
+class vxFTPSegmentSubscriber(vxFTPSubscriber):
+    """FTP分段文件订阅器
+
+    读取清单文件获知各分段文件的有效长度，记录每个分段文件的已读offset，
+    通过REST仅下载新增的字节，不需要列出远程目录，也不删除远程文件。
+    """
+
+    def __init__(
+        self,
+        channel_name: str = "",
+        host: str = "",
+        port: int = 21,
+        user: str = "",
+        passwd: str = "",
+        root_dir="/",
+        from_beginning: bool = False,
+        offset_file: str = "",
+    ) -> None:
+        """FTP分段文件订阅器
+
+        Keyword Arguments:
+            from_beginning {bool} -- 首次订阅时是否从头读取已有的events (default: {False})
+            offset_file {str} -- 保存各分段文件offset的本地文件，用于重启后续读 (default: {""})
+        """
+        super().__init__(channel_name, host, port, user, passwd, root_dir)
+        self._offset_file = offset_file
+        self._offsets = None
+        if offset_file and pathlib.Path(offset_file).is_file():
+            with open(offset_file, "r", encoding="utf-8") as fp:
+                self._offsets = json.load(fp)
+        elif from_beginning:
+            self._offsets = {}
+
+    def _fetch_manifest(self) -> Optional[dict]:
+        with io.BytesIO() as bfp:
+            manifest_file = pathlib.Path(self._remote_dir, _MANIFEST_FILE).as_posix()
+            if not self._ftp_conn.download(manifest_file, bfp) or not bfp.getvalue():
+                return None
+            try:
+                return json.loads(bfp.getvalue())
+            except ValueError as err:
+                logger.warning(f"{self} 清单文件解析错误: {err}")
                 return None
-            event = vxEvent.unpack(bfp.getvalue())
-            self._ftp_conn.delete(ftp_event_file)
-            return event
+
+    def __call__(self) -> List[vxEvent]:
+        now = vxtime.now()
+        if now <= self._next_fetch_dt:
+            return []
+
+        self._next_fetch_dt = now + self._interval
+        manifest = self._fetch_manifest()
+        if manifest is None:
+            return []
+
+        sizes = {segment["name"]: segment["size"] for segment in manifest["segments"]}
+        if self._offsets is None:
+            # 首次订阅，从当前末尾开始读取
+            self._offsets = dict(sizes)
+            self._save_offsets()
+            return []
+
+        events = []
+        for segment_name, size in sizes.items():
+            offset = self._offsets.get(segment_name, 0)
+            if size <= offset:
+                continue
+
+            with io.BytesIO() as bfp:
+                segment_file = pathlib.Path(self._remote_dir, segment_name).as_posix()
+                if not self._ftp_conn.download(segment_file, bfp, offset=offset):
+                    logger.error(f"ConnectionError: 下载{segment_file}发生错误")
+                    break
+                segment_events, consumed = unpack_frames(bfp.getvalue()[: size - offset])
+            events.extend(segment_events)
+            self._offsets[segment_name] = offset + consumed
+
+        self._offsets = {
+            name: offset for name, offset in self._offsets.items() if name in sizes
+        }
+        self._save_offsets()
+        return events
+
+    def _save_offsets(self) -> None:
+        if not self._offset_file:
+            return
+
+        with open(self._offset_file, "w", encoding="utf-8") as fp:
+            json.dump(self._offsets, fp)
@@ -2,28 +2,66 @@
 
 
 import zmq
+from queue import Full
 from collections import defaultdict
+from threading import Lock
 
 from typing import Optional, Union, List, Any
 from vxutils import vxtime, to_binary, vxZMQRequest, logger
-from vxutils.zmqsocket import vxZMQContext
+from vxutils.zmqsocket import vxZMQContext, vxZMQBackendThread
 from vxsched.event import vxEvent, vxTrigger
 from vxsched.pubsubs.base import vxPublisher, vxSubscriber
 
 
 __INTERNAL_ZMQFORMAT__ = "ipc://vxquant.internal.ipc"
+# broker 推送rpc方法表的消息通道
+RPCMETHODS_CHANNEL = "__RPCMETHODS__"
 
 __all__ = ["vxZMQPublisher", "vxZMQSubscriber", "vxZMQRpcClient"]
 
 
 class vxZMQPublisher(vxPublisher):
-    """Zero MQ的发布器"""
+    """Zero MQ的发布器
 
-    def __init__(self, channel_name: str, endpoint: str = "", key_file="") -> None:
+    broker 回复 __ACK__(BUSY) 时，后续发送前按指数退避等待；
+    回复 __NACK__ 时，退避后重试，超过 max_retries 次后抛出 Full。
+    """
+
+    def __init__(
+        self,
+        channel_name: str,
+        endpoint: str = "",
+        key_file="",
+        max_retries: int = 3,
+        max_backoff: float = 1.0,
+    ) -> None:
+        """Zero MQ的发布器
+
+        Keyword Arguments:
+            max_retries {int} -- 收到 __NACK__ 后的最大重试次数 (default: {3})
+            max_backoff {float} -- 最长退避时间(秒) (default: {1.0})
+        """
         super().__init__(channel_name)
         endpoint = endpoint or __INTERNAL_ZMQFORMAT__
         self._request = vxZMQRequest(endpoint, key_file, vxEvent.pack, vxEvent.unpack)
         self._last_request_dt = 0
+        self._max_retries = max_retries
+        self._max_backoff = max_backoff
+        self._backoff = 0
+        self._metrics = {"sent": 0, "busy": 0, "nacks": 0, "backoff_seconds": 0.0}
+
+    @property
+    def metrics(self) -> dict:
+        """发送统计信息: 发送个数、BUSY及NACK次数、累计退避时长"""
+        return dict(self._metrics, backoff=self._backoff)
+
+    def _wait_backoff(self) -> None:
+        if self._backoff > 0:
+            vxtime.sleep(self._backoff)
+            self._metrics["backoff_seconds"] += self._backoff
+
+    def _increase_backoff(self) -> None:
+        self._backoff = min(max(self._backoff * 2, 0.01), self._max_backoff)
 
     def __str__(self) -> str:
         return f"< {self.__class__.__name__}({self.channel_name}) with {self._request}"
@@ -79,14 +117,36 @@ class vxZMQPublisher(vxPublisher):
             send_event.channel = channel or send_event.channel or self._channel_name
 
         self.ping()
-        reply_event = self._request(send_event)
+        for _ in range(self._max_retries + 1):
+            self._wait_backoff()
+            reply_event = self._request(send_event)
+            if reply_event.type != "__NACK__":
+                break
+
+            # broker 队列已满，拒绝接收
+            self._metrics["nacks"] += 1
+            self._increase_backoff()
+            logger.warning(
+                f"{self} broker 拒绝接收 {send_event.type}，{self._backoff}s后重试."
+                f" {reply_event.data}"
+            )
+        else:
+            self._last_request_dt = vxtime.now()
+            raise Full(f"broker rejected event({send_event.type}): {reply_event.data}")
 
-        if reply_event.type != "__ACK__" or reply_event.data != "OK":
+        if reply_event.type != "__ACK__" or reply_event.data not in ("OK", "BUSY"):
             self._last_request_dt = 0
             raise ConnectionError(
                 f"wrong reply event: ({reply_event.type},{reply_event.data})"
             )
 
+        if reply_event.data == "BUSY":
+            self._metrics["busy"] += 1
+            self._increase_backoff()
+        else:
+            self._backoff = 0
+
+        self._metrics["sent"] += 1
         self._last_request_dt = vxtime.now()
         return
 
@@ -138,13 +198,44 @@ class vxZMQSubscriber(vxSubscriber):
         return list(map(max, events.values()))
 
 
+def _make_rpc_stub(client: "vxZMQRpcClient", method: str):
+    """生成远程调用方法的本地stub"""
+
+    def _rpc_stub(*args, **kwargs):
+        return client(method, *args, **kwargs)
+
+    _rpc_stub.__name__ = method
+    _rpc_stub.__qualname__ = f"{client.__class__.__name__}.{method}"
+    return _rpc_stub
+
+
 class vxZMQRpcClient:
+    """远程调用客户端
+
+    url: broker frontend 地址
+    sub_url: broker backend 地址, 设置后通过 RPCMETHODS_CHANNEL 接收方法表的推送更新
+    """
+
     def __init__(
-        self, url: str = "tcp://127.0.0.1:5555", publick_key: str = None
+        self,
+        url: str = "tcp://127.0.0.1:5555",
+        publick_key: str = None,
+        sub_url: str = "",
+        sub_public_key: str = "",
     ) -> None:
         self._request = vxZMQRequest(url, publick_key, vxEvent.pack, vxEvent.unpack)
         self._methods = {}
+        self._methods_epoch = ""
+        self._methods_version = -1
         self._last_updated_dt = 0
+        self._lock = Lock()
+        self._watcher = None
+        if sub_url:
+            self._watcher = vxZMQBackendThread(on_recv_callback=self._on_recv_methods)
+            self._watcher.connect(zmq.XSUB, sub_url, sub_public_key)
+            self._watcher.send(b"\x01" + to_binary(RPCMETHODS_CHANNEL))
+            self._watcher.daemon = True
+            self._watcher.start()
         self._update_rpc_methods()
 
     def _update_rpc_methods(self) -> None:
@@ -157,38 +248,79 @@ class vxZMQRpcClient:
             )
             if reply_event.type != "__GET_RPCMETHODS__":
                 raise ValueError(f"错误的回复类型: {reply_event.type}")
-            self._methods = dict(**reply_event.data)
+            self._apply_rpc_methods(reply_event.data)
         except TimeoutError:
             logger.error("更新methods超时")
-            self._methods = {}
 
-        return
+        self._last_updated_dt = vxtime.now()
+
+    def _on_recv_methods(self, watcher, channel, packed_event) -> None:
+        """处理broker推送的方法表"""
+        event = vxEvent.unpack(packed_event)
+        if event.type == "__RPC_METHODS_UPDATED__":
+            self._apply_rpc_methods(event.data)
+
+    def _apply_rpc_methods(self, data: dict) -> None:
+        """按版本更新本地方法表, 并绑定各个方法的stub"""
+        with self._lock:
+            if (
+                data["epoch"] == self._methods_epoch
+                and data["version"] <= self._methods_version
+            ):
+                return
+
+            methods = dict(**data["methods"])
+            for method in self._methods.keys() - methods.keys():
+                self.__dict__.pop(method, None)
+
+            for method in methods.keys() - self._methods.keys():
+                if method.startswith("_") or hasattr(self.__class__, method):
+                    continue
+                self.__dict__[method] = _make_rpc_stub(self, method)
+
+            self._methods = methods
+            self._methods_epoch = data["epoch"]
+            self._methods_version = data["version"]
+            logger.debug(f"更新rpc methods(version={data['version']}): {methods}")
 
     @property
     def methods(self) -> dict:
         """远程调用方法"""
-        now = vxtime.now()
-        if not self._methods or now > self._last_updated_dt + 60:
-            self._update_rpc_methods()
-            self._last_updated_dt = now
-        return self._methods
+        return dict(self._methods)
+
+    @property
+    def methods_version(self) -> int:
+        """本地方法表版本"""
+        return self._methods_version
 
     def __getattr__(self, method: str) -> Any:
-        if method in self.methods:
-            return lambda *args, **kwargs: self.__call__(method, *args, **kwargs)
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        # 已绑定的stub不会进入__getattr__, 仅在未命中且未订阅推送时才刷新方法表
+        if self._watcher is None and vxtime.now() > self._last_updated_dt + 60:
+            self._update_rpc_methods()
+            if method in self.__dict__:
+                return self.__dict__[method]
+
         raise AttributeError(f"no method: {method}")
 
     def __call__(self, method: str, *args, **kwargs):
         reply_event = self._request(
             vxEvent(type=method, channel="__RPC__", data=(args, kwargs))
         )
-        self._last_updated_dt = vxtime.now()
 
         if isinstance(reply_event.data, Exception):
             raise reply_event.data
 
         return reply_event.data
 
+    def close(self) -> None:
+        """关闭方法表推送的订阅"""
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+
 
 if __name__ == "__main__":
     publisher = vxZMQPublisher(
@@ -18,6 +18,8 @@ _default_worker_config = {
             "connect_mode": "connect",
             "channels": ["test"],
         },
+        # 引擎事件队列长度限制，maxsize为0时不限制；overflow: Block/DropOldest/Coalesce/Reject
+        "event_queue": {"maxsize": 0, "overflow": "Block"},
     },
     "params": {},
 }
@@ -28,13 +30,29 @@ _default_broker_config = {
             "addr": "tcp://127.0.0.1:5555",
             "public_key": "",
             "connect_mode": "bind",
+            "sndhwm": 1000,
+            "rcvhwm": 1000,
         },
         "backend": {
             "addr": "tcp://127.0.0.1:6666",
             "public_key": "",
             "connect_mode": "bind",
+            "sndhwm": 1000,
+            "rcvhwm": 1000,
         },
         "events": {},
+        # 队列长度限制，maxsize为0时不限制；overflow: Block/DropOldest/Coalesce/Reject
+        "queues": {
+            "backend": {"maxsize": 0, "overflow": "Reject"},
+            "frontend": {"maxsize": 0, "overflow": "DropOldest"},
+        },
+        # backend_queue 使用率超过该比例时，回复发布端 BUSY
+        "pressure_ratio": 0.8,
+        "event_queue": {"maxsize": 0, "overflow": "Block"},
+        # 事件日志目录，为空时不写事件日志
+        "journal_dir": "",
+        # backend_queue 内存中最多保存的events个数，0为不限制
+        "high_water_mark": 0,
     },
     "params": {},
     "rpc_methods": {},
@@ -57,7 +75,9 @@ def run_worker(config: str = "", mod_path: str = ""):
         vxengine.load_modules(mod_path)
 
     # logger.info(f"置换context : {context}")
-    vxengine.initialize(context=context)
+    vxengine.initialize(
+        context=context, event_queue=vxEventQueue(**context.settings.get("event_queue", {}))
+    )
 
     vxengine.serve_forever()
 
@@ -78,7 +98,9 @@ def run_broker(config: str = "", mod_path: str = ""):
 
 
     logger.info(f"置换context : {context}")
-    vxengine.initialize(context=context)
+    vxengine.initialize(
+        context=context, event_queue=vxEventQueue(**context.settings.get("event_queue", {}))
+    )
 
     vxengine.serve_forever()
 
@@ -1,23 +1,28 @@
 """ run zmq broker"""
 
 import zmq
+import secrets
 import argparse
 
 import contextlib
 from collections.abc import Mapping
 
 from itertools import chain
-from queue import Queue, Empty
+from queue import Empty, Full
 from vxutils import logger, vxZMQContext, to_binary, storage, vxtime, vxWrapper
 
 from vxsched.core import vxengine
 from vxsched.triggers import vxDailyTrigger
 from vxsched.event import vxEvent, vxEventQueue
+from vxsched.pubsubs.zeromq import RPCMETHODS_CHANNEL
 
 
 def init_socket(socket_type, settings):
     ctx = vxZMQContext().instance()
     socket_ = ctx.socket(socket_type)
+    # 高水位，超过后 ROUTER/XPUB 丢弃发往慢速对端的消息，避免broker内存无限增长
+    socket_.setsockopt(zmq.SNDHWM, settings.get("sndhwm", 1000))
+    socket_.setsockopt(zmq.RCVHWM, settings.get("rcvhwm", 1000))
     if settings["connect_mode"].lower() == "connect":
         socket_.connect(settings["addr"], settings["public_key"])
     else:
@@ -25,6 +30,37 @@ def init_socket(socket_type, settings):
     return socket_
 
 
+def reply_frontend(context, event) -> None:
+    """回复前端消息，frontend_queue 已满时丢弃"""
+    try:
+        context.frontend_queue.put_nowait(event)
+    except Full:
+        logger.warning(f"frontend_queue 已满，丢弃消息: {event.type} --> {event.channel}")
+
+
+def put_backend(context, event, retries: int = 10, interval: float = 0.1) -> bool:
+    """放入 backend_queue，队列已满时等待 interval 秒后重试，仍然失败时丢弃
+
+    Returns:
+        bool -- 是否放入成功
+    """
+    for i in range(retries + 1):
+        try:
+            context.backend_queue.put_nowait(event)
+            return True
+        except Full:
+            if i < retries:
+                vxtime.sleep(interval)
+    logger.error(f"backend_queue 已满，丢弃消息: {event.type} --> {event.channel}")
+    return False
+
+
+def backend_pressure(context) -> float:
+    """backend_queue 的使用率，未限制长度时为0"""
+    metrics = context.backend_queue.metrics
+    return metrics["size"] / metrics["maxsize"] if metrics["maxsize"] > 0 else 0.0
+
+
 def on_recv_frontend_msg(engine, msgs):
     client_addr, empty, packed_event = msgs
     assert empty == b""
@@ -39,28 +75,56 @@ def on_recv_frontend_msg(engine, msgs):
         if event.type in context.rpc_methods:
             event.reply_to = client_addr
             event.channel = context.rpc_methods[event.type]
-            context.backend_queue.put_nowait(event)
+            try:
+                context.backend_queue.put_nowait(event)
+            except Full:
+                reply_frontend(
+                    context,
+                    vxEvent(
+                        type="__RPC_REPLY__",
+                        data=Full("broker backend_queue is full."),
+                        channel=client_addr,
+                    ),
+                )
         else:
-            context.frontend_queue.put_nowait(
+            reply_frontend(
+                context,
                 vxEvent(
                     type="__RPC_REPLY__",
                     data=AttributeError(f"不支持的远程调用方法: {event.type}"),
                     channel=client_addr,
-                )
+                ),
             )
     elif event.type.startswith("_"):
-        context.frontend_queue.put_nowait(
+        reply_frontend(
+            context,
             vxEvent(
                 type="__ACK__",
                 data=ValueError(f"not suport event.type({event.type})"),
                 channel=client_addr,
-            )
+            ),
         )
     else:
         event.reply_to = ""
-        context.backend_queue.put_nowait(event)
-        context.frontend_queue.put_nowait(
-            vxEvent(type="__ACK__", data="OK", channel=client_addr)
+        try:
+            context.backend_queue.put_nowait(event)
+        except Full:
+            # 拒绝接收，发布端收到 __NACK__ 后退避重试
+            reply_frontend(
+                context,
+                vxEvent(
+                    type="__NACK__",
+                    data=context.backend_queue.metrics,
+                    channel=client_addr,
+                ),
+            )
+            return
+
+        # 已接收，backend_queue 使用率超过 pressure_ratio 时回复 BUSY，发布端降低发送速度
+        is_busy = backend_pressure(context) >= context.settings.get("pressure_ratio", 0.8)
+        reply_frontend(
+            context,
+            vxEvent(type="__ACK__", data="BUSY" if is_busy else "OK", channel=client_addr),
         )
 
 
@@ -92,7 +156,7 @@ def on_recv_backend_msg(engine, msgs):
         if event.channel == "__BROKER__":
             engine.submit_event(event)
         elif event.channel:
-            context.frontend_queue.put(event)
+            reply_frontend(context, event)
         else:
             logger.warning(f"收到错误消息: {event}")
 
@@ -103,9 +167,17 @@ def on_recv_backend_msg(engine, msgs):
 @vxengine.backend
 def run_broker_backend(engine):
     context = engine.context
-    context.backend_queue = vxEventQueue()
-    context.frontend_queue = Queue()
+    queue_settings = context.settings.get("queues", {})
+    # 配置 journal_dir 后，backend_queue 中待发送的events写入事件日志，重启后恢复
+    context.backend_queue = vxEventQueue(
+        journal=context.settings.get("journal_dir") or None,
+        high_water_mark=context.settings.get("high_water_mark", 0),
+        **queue_settings.get("backend", {}),
+    )
+    context.frontend_queue = vxEventQueue(**queue_settings.get("frontend", {}))
     context.rpc_methods = {}
+    context.rpc_methods_epoch = secrets.token_hex(8)
+    context.rpc_methods_version = 0
 
     for event_type, trigger_params in context.settings.events.items():
         if isinstance(trigger_params, Mapping):
@@ -114,12 +186,25 @@ def run_broker_backend(engine):
             trigger = vxDailyTrigger(run_time=trigger_params)
         else:
             logger.error(f"不符合设置: {event_type} == {trigger_params}. ")
-        preset_event = vxEvent(type=event_type, trigger=trigger, channel="__BROKER__")
-        context.backend_queue.put(preset_event)
-        logger.info(f"提交预设事件: {preset_event}")
+        # 预设事件使用固定的id，已从事件日志中恢复的预设事件不再重复提交
+        preset_event = vxEvent(
+            id=f"__preset__{event_type}",
+            type=event_type,
+            trigger=trigger,
+            channel="__BROKER__",
+        )
+        try:
+            context.backend_queue.put(preset_event)
+            logger.info(f"提交预设事件: {preset_event}")
+        except ValueError:
+            logger.info(f"预设事件已从事件日志中恢复: {event_type}")
+        except Full:
+            logger.error(f"backend_queue 已满，预设事件提交失败: {event_type}")
 
     frontend = init_socket(zmq.ROUTER, context.settings.frontend)
     backend = init_socket(zmq.XPUB, context.settings.backend)
+    # 每个订阅都通知broker(而不仅是首个订阅)，新的客户端订阅方法表时都能收到快照
+    backend.setsockopt(zmq.XPUB_VERBOSE, 1)
 
     poller = zmq.Poller()
     poller.register(frontend, zmq.POLLIN | zmq.POLLOUT)
@@ -152,33 +237,72 @@ def run_broker_backend(engine):
             with contextlib.suppress(Empty):
                 event = context.backend_queue.get(timeout=0.05)
                 backend.send_multipart([to_binary(event.channel), vxEvent.pack(event)])
+                # 发送成功后才写入完成记录，发送前崩溃的event在重启后重新发送
+                context.backend_queue.done(event)
                 logger.debug(
                     f"backend 发送消息: {event.type} ({event.data}) --> {event.channel}"
                 )
         # vxtime.sleep(0.1)
 
 
+def _rpc_methods_message(context) -> dict:
+    """带版本信息的rpc方法表"""
+    return {
+        "epoch": context.rpc_methods_epoch,
+        "version": context.rpc_methods_version,
+        "methods": dict(context.rpc_methods),
+    }
+
+
+def publish_rpc_methods(context, bump_version: bool = True) -> None:
+    """通过 RPCMETHODS_CHANNEL 推送rpc方法表
+
+    Arguments:
+        context {vxContext} -- broker上下文
+
+    Keyword Arguments:
+        bump_version {bool} -- 方法表是否有变化，有变化时版本号加1 (default: {True})
+    """
+    if bump_version:
+        context.rpc_methods_version += 1
+
+    event = vxEvent(
+        type="__RPC_METHODS_UPDATED__",
+        data=_rpc_methods_message(context),
+        channel=RPCMETHODS_CHANNEL,
+    )
+    if put_backend(context, event):
+        logger.info(f"推送rpc methods(version={context.rpc_methods_version})")
+
+
 @vxengine.event_handler("__ON_SUBSCRIBE__")
 def backend_on_subscribe(context, event) -> None:
     """订阅事件触发"""
     logger.error(f"收到订阅信息: {event.data} =====")
     if event.data.startswith("rpc_"):
-        context.backend_queue.put_nowait(
+        put_backend(
+            context,
             vxEvent(
                 type="__GET_RPCMETHODS__", channel=event.data, reply_to="__BROKER__"
-            )
+            ),
         )
+    elif event.data == RPCMETHODS_CHANNEL:
+        # 新的客户端订阅时，推送当前的方法表快照
+        publish_rpc_methods(context, bump_version=False)
 
 
 @vxengine.event_handler("__ON_UNSUBSCRIBE__")
 def backend_on_unsubscribe(context, event) -> None:
     logger.warning(f"取消订阅信息: {event.data}")
     if event.data.startswith("rpc_"):
-        context.rpc_methods = {
+        rpc_methods = {
             method: channel
             for method, channel in context.rpc_methods.items()
             if channel != event.data
         }
+        if len(rpc_methods) != len(context.rpc_methods):
+            context.rpc_methods = rpc_methods
+            publish_rpc_methods(context)
 
 
 def handle_subscribers(context, event) -> None:
@@ -201,10 +325,10 @@ def frontend_handle_get_rpc_method(context, event):
     """前端或许rpc methods"""
     reply_event = vxEvent(
         type="__GET_RPCMETHODS__",
-        data=context.rpc_methods,
+        data=_rpc_methods_message(context),
         channel=event.reply_to,
     )
-    context.frontend_queue.put_nowait(reply_event)
+    reply_frontend(context, reply_event)
 
 
 @vxengine.event_handler("__RPC_METHODS__")
@@ -215,7 +339,10 @@ def backend_on_update_methods(context, event):
         logger.warning(f"更新rpc methods 错误: {event.data}")
     else:
         logger.warning(f"更新rpc method: {event.data}")
-        context.rpc_methods.update(event.data)
+        rpc_methods = dict(context.rpc_methods, **event.data)
+        if rpc_methods != context.rpc_methods:
+            context.rpc_methods = rpc_methods
+            publish_rpc_methods(context)
 
 
 @vxengine.event_handler("__READY__")
@@ -226,7 +353,7 @@ def frontend_ready_event(context, event):
         data="OK",
         channel=event.reply_to,
     )
-    context.frontend_queue.put_nowait(reply_event)
+    reply_frontend(context, reply_event)
     logger.info(f"发送frontend 消息: {reply_event}")
 
 
@@ -4,13 +4,18 @@ import contextlib
 from functools import reduce
 from multiprocessing import Lock
 import operator
-from typing import Type, List, Dict, Any
+from datetime import datetime, timezone
+from typing import Type, List, Dict, Any, Union
 import pymongo
 from pymongo import MongoClient
 from vxutils import vxDict, vxDataClass, logger
 from vxutils.convertors import local_tzinfo
 
 
+# ttl索引字段，保存时写入当前时间
+_EXPIRE_FIELD = "_expire_dt"
+
+
 class vxMongoDB:
     def __init__(
         self,
@@ -24,6 +29,7 @@ class vxMongoDB:
         self._lock = Lock()
         self._db = self._db_conn.get_database(db_name)
         self._collection_mapping = collection_mapping or {}
+        self._ttl_collections = set()
         try:
             self._db_conn.admin.command("replSetGetStatus")
             self._is_replica_set = True
@@ -72,12 +78,19 @@ class vxMongoDB:
         collection_name: str,
         doc_class: Any,
         primary_keys: List[str] = None,
+        indexes: List[Union[str, List[str]]] = None,
+        ttl: int = 0,
     ) -> None:
-        """建立collection 和 vxDataClass 映射关系
+        """建立collection 和 vxDataClass 映射关系，并确保相应的索引已建立
 
         Arguments:
-            collection_name {str} -- _description_
-            doc_class {Type[vxDataClass]} -- _description_
+            collection_name {str} -- collection名称
+            doc_class {Type[vxDataClass]} -- 映射的数据类型
+
+        Keyword Arguments:
+            primary_keys {List[str]} -- 主键，建立唯一索引 (default: {None})
+            indexes {List[Union[str, List[str]]]} -- 二级索引，列表中每项为一个单字段或复合索引 (default: {None})
+            ttl {int} -- 文档最后一次保存ttl秒后自动过期删除，0 表示不过期 (default: {0})
         """
         primary_keys = primary_keys or []
         self._collection_mapping[collection_name] = (doc_class, primary_keys)
@@ -86,6 +99,68 @@ class vxMongoDB:
             f" {doc_class.__name__} primary_keys {primary_keys}"
         )
 
+        if primary_keys:
+            self.ensure_index(collection_name, primary_keys, unique=True)
+
+        for keys in indexes or []:
+            self.ensure_index(collection_name, keys)
+
+        if ttl > 0:
+            self._ttl_collections.add(collection_name)
+            self.ensure_index(collection_name, _EXPIRE_FIELD, expireAfterSeconds=ttl)
+
+    def ensure_index(
+        self, collection_name: str, keys: Union[str, List[str]], **kwargs
+    ) -> str:
+        """确保索引已建立，建立失败时(如已有重复数据)仅记录告警
+
+        Arguments:
+            collection_name {str} -- collection名称
+            keys {Union[str, List[str]]} -- 索引字段
+
+        Returns:
+            str -- 索引名称
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+
+        try:
+            return self._db[collection_name].create_index(
+                [(key, pymongo.ASCENDING) for key in keys], **kwargs
+            )
+        except pymongo.errors.PyMongoError as err:
+            logger.warning(
+                f"{self.__class__.__name__}: collection({collection_name}) 建立索引"
+                f" {keys} 失败: {err}"
+            )
+            return ""
+
+    def explain(self, collection_name: str, filter_: dict) -> List[str]:
+        """分析查询计划，发现全表扫描时告警
+
+        Arguments:
+            collection_name {str} -- collection名称
+            filter_ {dict} -- 查询条件
+
+        Returns:
+            List[str] -- 查询计划中各阶段名称，如 ['FETCH', 'IXSCAN']
+        """
+        plan = self._db[collection_name].find(filter_).explain()
+        stage = plan.get("queryPlanner", {}).get("winningPlan", {})
+        stages = []
+        while stage:
+            # 新版本mongodb的查询计划包含在 queryPlan 中
+            stage = stage.get("queryPlan", stage)
+            stages.append(stage.get("stage", ""))
+            stage = stage.get("inputStage", None)
+
+        if "COLLSCAN" in stages:
+            logger.warning(
+                f"{self.__class__.__name__}: collection({collection_name}) 查询"
+                f" {filter_} 全表扫描"
+            )
+        return stages
+
     def query(
         self,
         collection_name: str,
@@ -131,6 +206,15 @@ class vxMongoDB:
         target_class, _ = self._collection_mapping[collection_name]
         return target_class(item)
 
+    def _document(self, collection_name: str, vxdata_obj: Any) -> Dict:
+        """转换为保存的文档，ttl collection 同时写入过期计时字段"""
+        document = (
+            vxdata_obj.message if hasattr(vxdata_obj, "message") else dict(vxdata_obj)
+        )
+        if collection_name in self._ttl_collections:
+            document[_EXPIRE_FIELD] = datetime.now(timezone.utc)
+        return document
+
     def save(
         self,
         collection_name: str,
@@ -155,18 +239,13 @@ class vxMongoDB:
             logger.debug(f"{self.__class__.__name__} save vxdata_obj: {vxdata_obj}")
             self._db[collection_name].update_one(
                 filter_,
-                update={
-                    "$set": vxdata_obj.message
-                    if hasattr(vxdata_obj, "message")
-                    else vxdata_obj
-                },
+                update={"$set": self._document(collection_name, vxdata_obj)},
                 session=session,
                 upsert=True,
             )
         else:
             self._db[collection_name].insert_one(
-                vxdata_obj.message if hasattr(vxdata_obj, "message") else vxdata_obj,
-                session=session,
+                self._document(collection_name, vxdata_obj), session=session
             )
         return
 
@@ -191,17 +270,11 @@ class vxMongoDB:
             if filter_:
                 cmd = pymongo.UpdateOne(
                     filter_,
-                    update={
-                        "$set": vxdata_obj.message
-                        if hasattr(vxdata_obj, "message")
-                        else vxdata_obj
-                    },
+                    update={"$set": self._document(collection_name, vxdata_obj)},
                     upsert=True,
                 )
             else:
-                cmd = pymongo.InsertOne(
-                    vxdata_obj.message if hasattr(vxdata_obj, "message") else vxdata_obj
-                )
+                cmd = pymongo.InsertOne(self._document(collection_name, vxdata_obj))
             commands.append(cmd)
         if commands:
             self._db[collection_name].bulk_write(
@@ -8,7 +8,9 @@ import contextlib
 import ftplib
 import os
 import time
-from multiprocessing import Lock
+import weakref
+from threading import BoundedSemaphore, Event, Lock, Thread, current_thread, local
+from concurrent.futures import ThreadPoolExecutor as Executor
 from ftplib import FTP, all_errors, Error as FTPError
 import requests
 import vxutils
@@ -20,36 +22,74 @@ __all__ = [
 
 
 class vxFTPConnector:
-    """FTP网络连接器"""
-
-    def __init__(self, host="", port=21, user="", passwd=""):
+    """FTP网络连接器
+
+    内部维护一个FTP会话连接池，空闲会话定期发送NOOP保活，
+    遇到421等连接级错误时自动重新登录并重试一次。
+    """
+
+    def __init__(
+        self,
+        host="",
+        port=21,
+        user="",
+        passwd="",
+        pool_size=4,
+        keepalive=30,
+    ):
+        """FTP网络连接器
+
+        Keyword Arguments:
+            host {str} -- ftp服务器地址 (default: {""})
+            port {int} -- ftp服务器端口 (default: {21})
+            user {str} -- 用户名 (default: {""})
+            passwd {str} -- 密码 (default: {""})
+            pool_size {int} -- 连接池大小，即最大并发FTP会话数 (default: {4})
+            keepalive {int} -- 空闲会话超过该秒数后发送NOOP保活 (default: {30})
+        """
         self._host = host
         self._port = port
         self._user = user
         self._passwd = passwd
-        self._timeout = 0
+        self._pool_size = max(pool_size, 1)
+        self._keepalive = keepalive
         self._lock = Lock()
-        self._ftp = None
+        # 空闲会话: [(ftp, 最后活跃时间)]，后进先出，优先复用最近使用的会话
+        self._idle_sessions = []
+        self._semaphore = BoundedSemaphore(self._pool_size)
+        self._local = local()
+        self._executor = None
+        self._keepalive_thread = None
+        self._keepalive_stopped = Event()
+        self._metrics = {
+            "download_files": 0,
+            "download_bytes": 0,
+            "download_seconds": 0.0,
+            "upload_files": 0,
+            "upload_bytes": 0,
+            "upload_seconds": 0.0,
+            "errors": 0,
+            "relogins": 0,
+        }
 
     @vxutils.retry(3)
     def login(self):
-        """登录ftp服务器"""
+        """登录ftp服务器
 
-        if self._ftp:
-            self.logout()
+        Returns:
+            FTP -- 登录成功的ftp会话，登录失败时返回None
+        """
 
         try:
-            self._ftp = FTP()
-            self._ftp.encoding = "GB2312"
-            self._ftp.connect(self._host, self._port)
-            self._ftp.login(self._user, self._passwd)
-            time.sleep(0.1)
-            vxutils.logger.debug(f"ftp login Success.{self._ftp.pwd()}")
-            self._timeout = time.time() + 60
-            return True
+            ftp = FTP()
+            ftp.encoding = "GB2312"
+            ftp.connect(self._host, self._port)
+            ftp.login(self._user, self._passwd)
+            vxutils.logger.debug(f"ftp login Success.{ftp.pwd()}")
+            return ftp
         except all_errors as e:
             vxutils.logger.error(f"ftp login error. {e}")
-            return False
+            return None
 
     def __str__(self) -> str:
         return f"ftp://{self._user}@{self._host}:{self._port}/"
@@ -57,92 +97,280 @@ class vxFTPConnector:
     __repr__ = __str__
 
     def logout(self):
-        """登出ftp服务器"""
-        with contextlib.suppress(all_errors):
-            self._ftp.quit()
-            self._ftp = None
-            self._timeout = 0
+        """登出ftp服务器，停止保活线程并关闭所有空闲会话"""
+        self._stop_keepalive()
+        with self._lock:
+            idle_sessions = self._idle_sessions
+            self._idle_sessions = []
 
-    @contextlib.contextmanager
-    def autologin(self):
-        """自动登录ftp服务器"""
+        for ftp, _ in idle_sessions:
+            with contextlib.suppress(all_errors):
+                ftp.quit()
+
+    def __del__(self):
+        self._keepalive_stopped.set()
+
+    def _checkout(self):
+        """从连接池中取出一个可用的会话"""
         now = time.time()
+        while True:
+            with self._lock:
+                if not self._idle_sessions:
+                    break
+                ftp, last_active = self._idle_sessions.pop()
+
+            if now - last_active <= self._keepalive:
+                return ftp
+
+            with contextlib.suppress(all_errors):
+                ftp.voidcmd("NOOP")
+                return ftp
+            self._discard(ftp)
+
         wait_to_retry = 0.3
+        for i in range(1, 6):
+            ftp = self.login()
+            if ftp:
+                self._start_keepalive()
+                return ftp
+
+            if i >= 5:
+                raise FTPError("ftp connect error ...")
+
+            wait_to_retry = min(wait_to_retry + i * 0.3, 3)
+            vxutils.logger.info(
+                f"auto login  wait {wait_to_retry}s to retry the {i}th times ..."
+            )
+            time.sleep(wait_to_retry)
+
+    def _checkin(self, ftp):
+        """归还会话至连接池"""
+        with self._lock:
+            self._idle_sessions.append((ftp, time.time()))
+
+    @staticmethod
+    def _discard(ftp):
+        """关闭失效的会话"""
+        with contextlib.suppress(all_errors, AttributeError):
+            ftp.close()
+
+    def _start_keepalive(self):
         with self._lock:
-            for i in range(1, 6):
-                if self._ftp and now <= self._timeout:
+            if self._keepalive_thread or self._keepalive <= 0:
+                return
+            self._keepalive_stopped.clear()
+            # 保活线程只持有弱引用，连接器被回收时线程随之退出
+            self._keepalive_thread = Thread(
+                target=self._run_keepalive,
+                args=(weakref.ref(self), self._keepalive, self._keepalive_stopped),
+                name=f"{self}_keepalive",
+                daemon=True,
+            )
+        self._keepalive_thread.start()
+
+    def _stop_keepalive(self):
+        """停止保活线程，并等待其退出"""
+        with self._lock:
+            thread = self._keepalive_thread
+            self._keepalive_thread = None
+        self._keepalive_stopped.set()
+        if thread is not None and thread is not current_thread():
+            thread.join()
+
+    @staticmethod
+    def _run_keepalive(ref, interval, stopped):
+        """每隔interval秒保活一次空闲会话，直至stopped被设置或连接器被回收"""
+        while not stopped.wait(interval):
+            connector = ref()
+            if connector is None:
+                return
+            connector._ping_idle_sessions()
+            del connector
+
+    def _ping_idle_sessions(self):
+        """对空闲超过keepalive秒的会话发送NOOP，失效的会话直接丢弃"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                session
+                for session in self._idle_sessions
+                if now - session[1] > self._keepalive
+            ]
+            self._idle_sessions = [
+                session
+                for session in self._idle_sessions
+                if now - session[1] <= self._keepalive
+            ]
+
+        for ftp, _ in expired:
+            try:
+                ftp.voidcmd("NOOP")
+                self._checkin(ftp)
+            except all_errors:
+                self._discard(ftp)
+
+    @staticmethod
+    def _is_connection_error(err):
+        """421 或连接断开等错误，需要重新登录"""
+        return isinstance(err, (EOFError, ConnectionError)) or str(err).startswith(
+            "421"
+        )
+
+    def _execute(self, operation, *args):
+        """在连接池中的会话上执行operation(ftp, *args)
+
+        遇到连接级错误时重新登录并重试一次。operation 开始非幂等的传输前须将
+        _local.retryable 置为 False，此后出错不再重试。
+        执行结果记录在当前线程的 _local.succeeded 中。
+
+        Arguments:
+            operation {Callable} -- 操作函数
+
+        Returns:
+            Any -- operation的返回值，执行失败时返回None
+        """
+        self._local.succeeded = False
+        with self._semaphore:
+            for attempt in range(2):
+                try:
+                    ftp = self._checkout()
+                except FTPError as err:
+                    vxutils.logger.info(f"FTP Error occur: {err}")
                     break
-                elif self._ftp:
-                    with contextlib.suppress(all_errors):
-                        self._ftp.pwd()
-                        self._timeout = now + 60
-                        break
 
-                if self.login():
+                self._local.retryable = True
+                try:
+                    result = operation(ftp, *args)
+                except all_errors as err:
+                    self._discard_or_checkin(ftp, err)
+                    if (
+                        attempt == 0
+                        and self._local.retryable
+                        and self._is_connection_error(err)
+                    ):
+                        with self._lock:
+                            self._metrics["relogins"] += 1
+                        vxutils.logger.info(f"FTP connection lost: {err}, relogin ...")
+                        # 服务端断开连接时，其余空闲会话通常也已失效
+                        with self._lock:
+                            idle_sessions = self._idle_sessions
+                            self._idle_sessions = []
+                        for idle_ftp, _ in idle_sessions:
+                            self._discard(idle_ftp)
+                        continue
+
+                    with self._lock:
+                        self._metrics["errors"] += 1
+                    vxutils.logger.info(f"FTP Error occur: {err}")
                     break
-                wait_to_retry = min(wait_to_retry + i * 0.3, 3)
 
-                if i >= 5:
-                    raise FTPError("ftp connect error ...")
+                self._checkin(ftp)
+                self._local.succeeded = True
+                return result
+        return None
 
-                vxutils.logger.info(
-                    f"auto login  wait {wait_to_retry}s to retry the {i}th times ..."
-                )
-                time.sleep(wait_to_retry)
+    def _discard_or_checkin(self, ftp, err):
+        # 传输中途的网络错误(如超时)后会话状态未知，同样丢弃
+        if isinstance(err, OSError) or self._is_connection_error(err):
+            self._discard(ftp)
+        else:
+            self._checkin(ftp)
 
+    @contextlib.contextmanager
+    def autologin(self):
+        """从连接池中获取一个已登录的ftp会话"""
+        with self._semaphore:
+            ftp = self._checkout()
             try:
-                yield self._ftp
-                self._timeout = time.time() + 60
+                yield ftp
             except all_errors as err:
-                self._timeout = 0
+                self._discard_or_checkin(ftp, err)
                 vxutils.logger.info(f"FTP Error occur: {err}")
+            else:
+                self._checkin(ftp)
+
+    def _record(self, direction, nbytes, start):
+        with self._lock:
+            self._metrics[f"{direction}_files"] += 1
+            self._metrics[f"{direction}_bytes"] += nbytes
+            self._metrics[f"{direction}_seconds"] += time.perf_counter() - start
+
+    @property
+    def metrics(self):
+        """传输统计信息
+
+        Returns:
+            dict -- 传输的文件数、字节数、耗时以及吞吐量(bytes/s)等
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["idle_sessions"] = len(self._idle_sessions)
+
+        for direction in ("download", "upload"):
+            seconds = metrics[f"{direction}_seconds"]
+            metrics[f"{direction}_throughput"] = (
+                metrics[f"{direction}_bytes"] / seconds if seconds > 0 else 0.0
+            )
+        return metrics
 
     def mkdir(self, remote_dir):
         """创建远程目录"""
 
-        with self.autologin():
-            self._ftp.mkd(remote_dir)
+        self._execute(lambda ftp: ftp.mkd(remote_dir))
+        if self._local.succeeded:
             vxutils.logger.debug(f"ftp mkdir Success.{remote_dir}")
-        return self._timeout > 0
+        return self._local.succeeded
 
     def rmdir(self, remote_dir):
         """删除远程目录"""
 
-        with self.autologin():
-            self._ftp.rmd(remote_dir)
+        self._execute(lambda ftp: ftp.rmd(remote_dir))
+        if self._local.succeeded:
             vxutils.logger.debug(f"ftp rmdir Success.{remote_dir}")
-        return self._timeout > 0
+        return self._local.succeeded
 
     def list(self, remote_dir):
         """list远程目录"""
-        with self.autologin():
-            remote_files = self._ftp.nlst(remote_dir)
+        remote_files = self._execute(lambda ftp: ftp.nlst(remote_dir))
         return (
             [os.path.join(remote_dir, remote_file) for remote_file in remote_files]
-            if self._timeout > 0
+            if self._local.succeeded
             else []
         )
 
-    def download(self, remote_file, local_file):
+    def download(self, remote_file, local_file, offset=0):
         """FTP下载文件
 
         Arguments:
             remote_file -- 远程文件路径
             local_file -- 本地文件目录_
 
+        Keyword Arguments:
+            offset -- 从远程文件的offset字节处开始下载(REST) (default: {0})
+
         Returns:
             False -- 下载失败
             True  -- 下载成功
         """
 
-        with self.autologin():
-            if isinstance(local_file, str):
-                with open(local_file, "wb") as fp:
-                    self._ftp.retrbinary(f"RETR {remote_file}", fp.write)
-            else:
-                fp = local_file
-                self._ftp.retrbinary(f"RETR {remote_file}", fp.write)
-        return self._timeout > 0
+        if isinstance(local_file, str):
+            with open(local_file, "ab" if offset else "wb") as fp:
+                return self._download(remote_file, fp, offset)
+        return self._download(remote_file, local_file, offset)
+
+    def _download(self, remote_file, fp, offset):
+        start_pos = fp.tell()
+
+        def _retr(ftp):
+            # 重试时丢弃上一次写入的部分数据
+            fp.seek(start_pos)
+            fp.truncate()
+            start = time.perf_counter()
+            ftp.retrbinary(f"RETR {remote_file}", fp.write, rest=offset or None)
+            self._record("download", fp.tell() - start_pos, start)
+
+        self._execute(_retr)
+        return self._local.succeeded
 
     def upload(self, local_file, remote_file):
         """上传本地文件
@@ -155,15 +383,89 @@ class vxFTPConnector:
             True -- 上传成功
             False -- 上传失败
         """
+        return self._store("STOR", local_file, remote_file)
 
-        with self.autologin():
-            if isinstance(local_file, str):
-                with open(local_file, "rb") as fp:
-                    self._ftp.storbinary(f"STOR {remote_file}", fp)
-            else:
-                fp = local_file
-                self._ftp.storbinary(f"STOR {remote_file}", fp)
-        return self._timeout > 0
+    def append(self, local_file, remote_file):
+        """追加本地文件内容至远程文件末尾(APPE)，远程文件不存在时自动创建
+
+        APPE 不是幂等操作，开始传输后出错不会重试，此时远程文件可能已写入部分内容。
+
+        Arguments:
+            local_file -- 本地文件
+            remote_file -- 远程文件
+
+        Returns:
+            True -- 上传成功
+            False -- 上传失败
+        """
+        return self._store("APPE", local_file, remote_file)
+
+    def _store(self, cmd, local_file, remote_file):
+        if isinstance(local_file, str):
+            with open(local_file, "rb") as fp:
+                return self._store(cmd, fp, remote_file)
+
+        fp = local_file
+        start_pos = fp.tell()
+
+        def _stor(ftp):
+            fp.seek(start_pos)
+            if cmd == "APPE":
+                # 先确认会话可用，会话失效时仍可重新登录重试
+                ftp.voidcmd("NOOP")
+                self._local.retryable = False
+            start = time.perf_counter()
+            ftp.storbinary(f"{cmd} {remote_file}", fp)
+            self._record("upload", fp.tell() - start_pos, start)
+
+        self._execute(_stor)
+        return self._local.succeeded
+
+    def _map(self, func, tasks):
+        """在线程池中并行执行传输任务，并行度不超过连接池大小"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = Executor(
+                    max_workers=self._pool_size, thread_name_prefix="vxFTPConnector"
+                )
+        return list(self._executor.map(lambda task: func(*task), tasks))
+
+    def download_many(self, tasks):
+        """并行下载多个文件
+
+        Arguments:
+            tasks {Iterable[Tuple]} -- [(remote_file, local_file), ...] 或 [(remote_file, local_file, offset), ...]
+
+        Returns:
+            List[bool] -- 与tasks顺序一致的下载结果
+        """
+        return self._map(self.download, tasks)
+
+    def upload_many(self, tasks):
+        """并行上传多个文件
+
+        Arguments:
+            tasks {Iterable[Tuple]} -- [(local_file, remote_file), ...]
+
+        Returns:
+            List[bool] -- 与tasks顺序一致的上传结果
+        """
+        return self._map(self.upload, tasks)
+
+    def rename(self, remote_src, remote_dst):
+        """重命名远程文件
+
+        Arguments:
+            remote_src -- 原远程文件
+            remote_dst -- 目标远程文件
+
+        Returns:
+            True -- 重命名成功
+            False -- 重命名失败
+        """
+
+        self._execute(lambda ftp: ftp.rename(remote_src, remote_dst))
+        return self._local.succeeded
 
     def delete(self, remote_file):
         """删除ftp文件
@@ -176,9 +478,19 @@ class vxFTPConnector:
             False -- 删除失败
         """
 
-        with self.autologin():
-            self._ftp.delete(remote_file)
-        return self._timeout > 0
+        self._execute(lambda ftp: ftp.delete(remote_file))
+        return self._local.succeeded
+
+    def delete_many(self, remote_files):
+        """并行删除多个ftp文件
+
+        Arguments:
+            remote_files {Iterable[str]} -- 远程文件列表
+
+        Returns:
+            List[bool] -- 与remote_files顺序一致的删除结果
+        """
+        return self._map(self.delete, [(remote_file,) for remote_file in remote_files])
 
     def __eq__(self, __o: object) -> bool:
         return (
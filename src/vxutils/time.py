@@ -15,6 +15,17 @@ from vxutils.convertors import (
 
 __all__ = ["vxtime"]
 
+_ONEDAY = 24 * 60 * 60
+# 本地时区相对UTC的偏移(秒)，用于将时间戳换算为本地日期
+_UTC_OFFSET = -time.timezone
+
+
+def _day_number(date_: Any) -> int:
+    """日期/时间 --> 本地日期距1970-01-01的天数"""
+    if not isinstance(date_, (int, float)):
+        date_ = to_timestamp(date_)
+    return int((date_ + _UTC_OFFSET) // _ONEDAY)
+
 
 class vxtime:
     """量化交易时间机器"""
@@ -22,7 +33,10 @@ class vxtime:
     _timefunc = time.time
     _delayfunc = time.sleep
     __time_marks__ = []
+    # 假期，保存为本地日期距1970-01-01的天数
     __holidays__ = set()
+    # 交易日历，需实现 covers(date_) 及 is_trading_day(date_)
+    _calendar = None
 
     @classmethod
     def now(cls) -> float:
@@ -54,14 +68,26 @@ class vxtime:
 
     @classmethod
     def is_holiday(cls, date_: Any = None) -> bool:
-        """是否假日"""
+        """是否假日
+
+        已设置交易日历且日期在日历范围内时，以交易日历为准；否则按周末及登记的假期判断
+        """
         date_ = date_ if date_ is not None else cls.now()
-        if to_datetime(date_).weekday in [0, 1]:
-            # 星期六日 均为休息日
-            return True
+        if not isinstance(date_, (int, float)):
+            date_ = to_timestamp(date_)
 
-        date_ = to_timestring(date_, "%Y-%m-%d")
-        return date_ in cls.__holidays__
+        calendar = cls._calendar
+        if calendar is not None and calendar.covers(date_):
+            return not calendar.is_trading_day(date_)
+
+        day = _day_number(date_)
+        # 1970-01-01 为星期四，(day + 3) % 7 >= 5 即星期六日，均为休息日
+        return (day + 3) % 7 >= 5 or day in cls.__holidays__
+
+    @classmethod
+    def set_calendar(cls, calendar: Any) -> None:
+        """设置交易日历，为None时取消"""
+        cls._calendar = calendar
 
     @classmethod
     def set_timefunc(cls, timefunc: Callable) -> None:
@@ -89,7 +115,7 @@ class vxtime:
         """增加假期时间"""
         if len(holidays) == 1 and isinstance(holidays[0], list):
             holidays = holidays[0]
-        cls.__holidays__.update(map(lambda d: to_timestring(d, "%Y-%m-%d"), holidays))
+        cls.__holidays__.update(map(_day_number, holidays))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""测试账户内存账本"""
+
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from vxutils.database import mongodb
+from vxquant.model.ledger import vxAccountLedger
+from vxquant.model.exchange import (
+    vxAccountInfo,
+    vxCashPosition,
+    vxPosition,
+    vxOrder,
+    vxTrade,
+    vxTick,
+)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    def command(self, command, **kwargs):
+        # mongomock 不支持 replSetGetStatus，按单机模式处理
+        raise pymongo.errors.OperationFailure("not running with --replSet")
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        # mongomock 的 bulk_write 与当前 pymongo 版本不兼容，逐条执行
+        for request in requests:
+            self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    monkeypatch.setattr(mongomock.database.Database, "command", command)
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    monkeypatch.setattr(mongodb, "MongoClient", mongomock.MongoClient)
+    db = mongodb.vxMongoDB("mongodb://localhost:27017", "test")
+    db.mapping("accounts", vxAccountInfo, ["account_id"])
+    db.mapping("positions", vxPosition, ["account_id", "symbol"])
+    db.mapping("orders", vxOrder, ["order_id"])
+    db.mapping("trades", vxTrade, ["trade_id"])
+    db.save("accounts", vxAccountInfo(account_id="test", portfolio_id="p1"))
+    db.save("positions", vxCashPosition(account_id="test", portfolio_id="p1"))
+    return db
+
+
+def test_ledger_write_behind(database, tmp_path):
+    """测试内存校验冻结、成交处理、批量写回以及事件日志恢复"""
+    ledger = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    ledger.deposit("test", 100_000)
+
+    order = vxOrder(
+        account_id="test",
+        symbol="SHSE.600000",
+        order_direction="Buy",
+        order_offset="Open",
+        order_type="Limit",
+        volume=1000,
+        price=10.0,
+        status="PendingNew",
+    )
+    order = ledger.submit_order(order)
+    assert ledger.get_account("test").frozen == pytest.approx(10030.0)
+    assert database.orders.count_documents({}) == 0
+
+    trade = vxTrade(
+        account_id="test",
+        order_id=order.order_id,
+        symbol="SHSE.600000",
+        order_direction="Buy",
+        order_offset="Open",
+        volume=1000,
+        price=10.0,
+        commission=5.0,
+    )
+    ledger.apply_trade(trade)
+    ledger.apply_trade(trade)
+    assert ledger.get_open_orders("test") == {}
+    assert ledger.get_positions("test", "SHSE.600000")["SHSE.600000"].volume == 1000
+    assert ledger.get_account("test").frozen == 0
+
+    # 模拟进程崩溃: 不写回直接丢弃内存账本，由事件日志恢复
+    ledger._active = False
+    ledger._journal.close()
+    assert database.positions.count_documents({"symbol": "SHSE.600000"}) == 0
+
+    recovered = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    assert recovered.metrics["pending"] == 0
+    assert database.trades.count_documents({}) == 1
+    assert database.orders.find_one({"order_id": order.order_id})["status"] == "Filled"
+    cash = recovered.get_positions("test", "CNY")["CNY"]
+    assert cash.volume == pytest.approx(100_000 - 10_005)
+    recovered.close()
+
+
+def test_ledger_prices_and_journal_segments(database, tmp_path):
+    """测试行情更新持仓市值，以及事件日志跨分段后不重放已写回的变更"""
+    ledger = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    ledger._journal._segment_size = 512
+    ledger.deposit("test", 100_000)
+    ledger.flush()
+    for i in range(10):
+        ledger.apply_trade(
+            vxTrade(
+                account_id="test",
+                order_id=f"order{i}",
+                symbol="SHSE.600000",
+                order_direction="Buy",
+                order_offset="Open",
+                volume=100,
+                price=10.0,
+                commission=0.0,
+            )
+        )
+        ledger.flush()
+    # 已切换过分段文件，且写回后历史分段均已删除
+    assert [int(path.stem) > 1 for path in tmp_path.glob("*.journal")] == [True]
+
+    ledger.update_prices({"SHSE.600000": vxTick(symbol="SHSE.600000", lasttrade=11.0)})
+    assert ledger.get_account("test").marketvalue == pytest.approx(11_000)
+    ledger.flush()
+
+    # 进程崩溃后重放日志，不应将已写回的旧状态重新写入数据库
+    ledger._active = False
+    ledger._journal.close()
+    database.positions.update_one(
+        {"account_id": "test", "symbol": "SHSE.600000"}, {"$set": {"lasttrade": 12.0}}
+    )
+    recovered = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    assert recovered.metrics["flushed_docs"] == 0
+    position = recovered.get_positions("test", "SHSE.600000")["SHSE.600000"]
+    assert position.lasttrade == 12.0
+    recovered.close()
+
+
+def test_ledger_trade_ids_since_settlement(database, tmp_path):
+    """测试加载账户时只加载上次结算后的成交回报id用于去重"""
+    settle_day = database.query_one("accounts", {"account_id": "test"}).settle_day
+
+    def trade(trade_id, created_dt):
+        return vxTrade(
+            account_id="test",
+            trade_id=trade_id,
+            order_id="order",
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            order_offset="Open",
+            volume=100,
+            price=10.0,
+            created_dt=created_dt,
+        )
+
+    database.save("trades", trade("settled", settle_day - 60))
+    database.save("trades", trade("today", settle_day + 60))
+
+    ledger = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    ledger.deposit("test", 100_000)
+    assert ledger._trade_ids["test"] == {"today"}
+    ledger.apply_trade(trade("today", settle_day + 60))
+    assert ledger.get_positions("test", "SHSE.600000") == {}
+    ledger.close()
@@ -0,0 +1,253 @@
+"""测试账户管理器"""
+
+import functools
+import threading
+import time
+
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from vxutils.database import mongodb
+from vxquant.model.ledger import vxAccountLedger
+from vxquant.model.exchange import (
+    vxAccountInfo,
+    vxCashPosition,
+    vxOrder,
+    vxPosition,
+    vxTick,
+    vxTrade,
+)
+
+
+def _import_portfolio():
+    """vxquant.model.portfolio 导入时需要连接通达信行情服务器，无法连接时跳过"""
+    try:
+        from vxquant.model import portfolio
+    except Exception as err:
+        pytest.skip(f"无法导入 vxquant.model.portfolio: {err}")
+    return portfolio
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    portfolio = _import_portfolio()
+
+    def command(self, command, **kwargs):
+        # mongomock 不支持 replSetGetStatus，按单机模式处理
+        raise pymongo.errors.OperationFailure("not running with --replSet")
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        # mongomock 的 bulk_write 与当前 pymongo 版本不兼容，逐条执行
+        for request in requests:
+            self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    handle_arithmetic = mongomock.aggregate._Parser._handle_arithmetic_operator
+
+    def handle_arithmetic_operator(self, operator, values):
+        # mongomock 不支持 $round
+        if operator == "$round":
+            number, places = values
+            return round(self.parse(number), places)
+        return handle_arithmetic(self, operator, values)
+
+    monkeypatch.setattr(mongomock.database.Database, "command", command)
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    monkeypatch.setattr(
+        mongomock.aggregate,
+        "arithmetic_operators",
+        mongomock.aggregate.arithmetic_operators | {"$round"},
+    )
+    monkeypatch.setattr(
+        mongomock.aggregate._Parser,
+        "_handle_arithmetic_operator",
+        handle_arithmetic_operator,
+    )
+    # 结算引擎另行建立连接，各连接共享同一份数据
+    monkeypatch.setattr(
+        mongodb,
+        "MongoClient",
+        functools.partial(mongomock.MongoClient, _store=mongomock.store.ServerStore()),
+    )
+    return portfolio.vxAccountsManager(
+        "mongodb://localhost:27017", "test", hqfetcher=lambda symbols: {}
+    )
+
+
+def test_aggregate_account_info(manager, monkeypatch):
+    """测试数据库聚合计算与逐个持仓计算的账户值一致，且只写回变化的字段"""
+    database = manager._database
+    account_ids = ["a1", "a2", "a3"]
+    for account_id in account_ids:
+        database.save(
+            "accounts", vxAccountInfo(account_id=account_id, portfolio_id="p1")
+        )
+    for account_id, balance in (("a1", 100_000.0), ("a2", 3_333.33)):
+        database.save(
+            "positions",
+            vxCashPosition(
+                account_id=account_id, volume_today=balance, frozen=1_000.5
+            ),
+        )
+    for account_id, symbol, volume, lasttrade, cost in (
+        ("a1", "SHSE.600000", 1300, 10.337, 13_100.0),
+        ("a1", "SZSE.000001", 700, 5.113, 3_650.0),
+        ("a2", "SHSE.600000", 100, 10.337, 1_000.0),
+    ):
+        database.save(
+            "positions",
+            vxPosition(
+                account_id=account_id,
+                symbol=symbol,
+                volume_his=volume,
+                lasttrade=lasttrade,
+                cost=cost,
+            ),
+        )
+
+    database.accounts.update_one(
+        {"account_id": "a1"}, {"$set": {"fund_shares": 90_000.0, "nav_yd": 1e5}}
+    )
+    fields = ["balance", "frozen", "marketvalue", "fnl", "asset", "nav", "fund_nav"]
+
+    def account_values():
+        return {
+            item["account_id"]: [item[field] for field in fields]
+            for item in database.accounts.find({}, {"_id": 0})
+        }
+
+    manager._update_account_info(account_ids)
+    expected = account_values()
+    assert expected["a3"] == [0, 0, 0, 0, 0, 0, 1.0]
+
+    database.accounts.update_many({}, {"$set": {"marketvalue": -1.0}})
+    database.accounts.update_one({"account_id": "a1"}, {"$set": {"deposit": 42.0}})
+    updates = []
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def record_bulk_write(self, requests, ordered=True, **kwargs):
+        updates.extend(request._doc for request in requests)
+        return bulk_write(self, requests, ordered, **kwargs)
+
+    monkeypatch.setattr(
+        mongomock.collection.Collection, "bulk_write", record_bulk_write
+    )
+    manager._aggregate_revaluation = True
+    assert manager._update_account_info(account_ids) == 3
+    # 只写回变化的字段
+    assert all(list(update["$set"]) == ["marketvalue"] for update in updates)
+    assert account_values() == expected
+    assert database.accounts.find_one({"account_id": "a1"})["deposit"] == 42.0
+    assert manager._update_account_info(account_ids) == 0
+
+    # 负债变化后，净资产及基金净值同样写回
+    database.accounts.update_one({"account_id": "a1"}, {"$set": {"debt": 9_000.0}})
+    updates.clear()
+    assert manager._update_account_info(account_ids) == 1
+    assert sorted(updates[0]["$set"]) == ["fund_nav", "nav"]
+    nav = expected["a1"][fields.index("asset")] - 9_000
+    assert account_values()["a1"][-2:] == [nav, round(nav / 90_000, 4)]
+
+
+def test_update_ticks(manager, monkeypatch):
+    """测试行情缓存命中、缺失symbol的短时缓存以及返回行情副本"""
+    portfolio = _import_portfolio()
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(portfolio.vxtime, "now", lambda: now[0])
+
+    fetched = []
+
+    def hqfetcher(*symbols):
+        fetched.append(sorted(symbols))
+        return {
+            symbol: vxTick(symbol=symbol, lasttrade=10.0, created_dt=now[0])
+            for symbol in symbols
+            if symbol != "SZSE.999999"
+        }
+
+    queried = []
+    query = manager._database.query
+
+    def spy_query(collection_name, filter_, **kwargs):
+        queried.append(sorted(filter_["symbol"]["$in"]))
+        return query(collection_name, filter_, **kwargs)
+
+    manager._hqfetcher = hqfetcher
+    monkeypatch.setattr(manager._database, "query", spy_query)
+
+    ticks = manager._update_ticks("SHSE.600000", "SZSE.999999")
+    assert list(ticks) == ["SHSE.600000"]
+    assert fetched == queried == [["SHSE.600000", "SZSE.999999"]]
+
+    # 缓存中的行情及缺失的symbol在短时间内都不再查询
+    ticks["SHSE.600000"].lasttrade = 11.0
+    now[0] += 1
+    ticks = manager._update_ticks("SHSE.600000", "SZSE.999999")
+    assert ticks["SHSE.600000"].lasttrade == 10.0
+    assert len(fetched) == len(queried) == 1
+
+    now[0] += 3
+    manager._update_ticks("SHSE.600000", "SZSE.999999")
+    assert fetched[-1] == ["SHSE.600000", "SZSE.999999"]
+    assert queried[-1] == ["SZSE.999999"]
+    manager._tick_writer.shutdown(wait=True)
+    assert manager._database.current.count_documents({}) == 1
+
+
+def test_settle_write_behind(manager, monkeypatch, tmp_path):
+    """测试结算期间暂停账户读写，结算期间的成交回报在结算结果之上处理"""
+    portfolio = _import_portfolio()
+    database = manager._database
+    database.save("accounts", vxAccountInfo(account_id="a1", portfolio_id="p1"))
+    database.save("positions", vxCashPosition(account_id="a1"))
+    ledger = vxAccountLedger(database, str(tmp_path), flush_interval=60)
+    manager._ledger = ledger
+    ledger.deposit("a1", 100_000)
+    order = ledger.submit_order(
+        vxOrder(
+            account_id="a1",
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            order_offset="Open",
+            order_type="Limit",
+            volume=1000,
+            price=10.0,
+            status="PendingNew",
+            due_dt=time.time() + 86400,
+        )
+    )
+    trade = vxTrade(
+        account_id="a1",
+        order_id=order.order_id,
+        symbol="SHSE.600000",
+        order_direction="Buy",
+        order_offset="Open",
+        volume=1000,
+        price=10.0,
+        commission=5.0,
+    )
+
+    settle = portfolio.vxSettlementEngine.settle
+    late_fill = threading.Thread(target=ledger.apply_trade, args=(trade,))
+
+    def settle_with_trade(self, account_ids=None, settle_dt=None):
+        # 结算期间收到成交回报，等待结算完成后处理
+        late_fill.start()
+        late_fill.join(0.2)
+        assert late_fill.is_alive()
+        return settle(self, account_ids, settle_dt)
+
+    monkeypatch.setattr(portfolio.vxSettlementEngine, "settle", settle_with_trade)
+    assert manager.settle(["a1"], workers=1)["accounts"] == 1
+    late_fill.join(5)
+    assert not late_fill.is_alive()
+    ledger.flush()
+
+    assert database.trades.count_documents({"trade_id": trade.trade_id}) == 1
+    assert database.orders.find_one({"order_id": order.order_id})["status"] == "Filled"
+    cash = database.positions.find_one({"account_id": "a1", "symbol": "CNY"})
+    assert (cash["volume_his"], cash["volume_today"]) == (100_000 - 10_005, 0)
+    position = ledger.get_positions("a1", "SHSE.600000")["SHSE.600000"]
+    assert (position.volume_his, position.volume_today) == (0, 1000)
+    ledger.close()
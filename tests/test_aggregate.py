@@ -0,0 +1,63 @@
+"""测试组合汇总"""
+
+from vxquant.model.aggregate import vxPortfolioAggregator, vxSnapshotLog
+from vxquant.model.exchange import vxAccountInfo, vxCashPosition, vxPosition
+
+
+def _position(account_id, symbol, volume, lasttrade, security_type="STOCK"):
+    return vxPosition(
+        account_id=account_id,
+        symbol=symbol,
+        security_type=security_type,
+        volume_his=volume,
+        lasttrade=lasttrade,
+    )
+
+
+def test_portfolio_aggregator():
+    """测试成员账户的增量汇总及移除"""
+    aggregator = vxPortfolioAggregator()
+    aggregator.update(
+        vxAccountInfo(account_id="a1", balance=1_000, marketvalue=1_100),
+        {
+            "CNY": vxCashPosition(account_id="a1", volume_his=1_000),
+            "SHSE.600000": _position("a1", "SHSE.600000", 100, 11.0),
+        },
+    )
+    aggregator.update(
+        vxAccountInfo(account_id="a2", balance=500, marketvalue=1_400),
+        {
+            "SHSE.600000": _position("a2", "SHSE.600000", 100, 10.0),
+            "SHSE.510300": _position("a2", "SHSE.510300", 100, 4.0, "ETFLOF"),
+        },
+    )
+    assert aggregator.nav == 4_000
+    assert aggregator.exposure() == {"SHSE.600000": 2_100, "SHSE.510300": 400}
+    assert aggregator.exposure("security_type") == {"STOCK": 2_100, "ETFLOF": 400}
+
+    aggregator.pop_changes()
+    aggregator.update(
+        vxAccountInfo(account_id="a2", balance=1_500, marketvalue=400),
+        {"SHSE.510300": _position("a2", "SHSE.510300", 100, 4.0, "ETFLOF")},
+    )
+    assert aggregator.pop_changes() == {"SHSE.600000": 1_100}
+    aggregator.remove("a1")
+    assert aggregator.nav == 1_900
+    assert aggregator.exposure() == {"SHSE.510300": 400}
+    assert aggregator.exposure("security_type") == {"ETFLOF": 400}
+
+
+def test_snapshot_log():
+    """测试关键帧 + 增量的快照回放"""
+    log = vxSnapshotLog(keyframe_interval=2)
+    log.append(1.0, 100.0, 100.0, {"A": 10.0, "B": 5.0}, {})
+    log.append(2.0, 110.0, 100.0, {"A": 20.0, "B": 5.0}, {"A": 20.0})
+    log.append(3.0, 90.0, 100.0, {"A": 20.0, "C": 1.0}, {})
+    log.append(4.0, 95.0, 100.0, {"C": 2.0}, {"A": 0.0, "C": 2.0})
+
+    assert log.at(0.5) is None
+    assert log.at(2.5)["exposure"] == {"A": 20.0, "B": 5.0}
+    assert log.at(3.0)["exposure"] == {"A": 20.0, "C": 1.0}
+    snapshot = log.at(10.0)
+    assert snapshot["exposure"] == {"C": 2.0}
+    assert snapshot["fund_nav"] == 0.95
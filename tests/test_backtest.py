@@ -0,0 +1,139 @@
+"""测试虚拟时钟驱动的回测模式"""
+
+import time
+
+import pandas as pd
+import pytest
+
+from vxutils import vxtime
+from vxsched import vxEngine, vxEvent, vxVirtualClock
+from vxsched.triggers import vxIntervalTrigger
+
+
+def test_virtual_clock():
+    """测试虚拟时钟的替换及恢复"""
+    clock = vxVirtualClock(1_000_000.0)
+    with clock.install():
+        assert vxtime.now() == 1_000_000.0
+        vxtime.sleep(60)
+        assert vxtime.now() == 1_000_060.0
+        clock.advance_to(1_000_000.0)
+        assert vxtime.now() == 1_000_060.0
+    assert abs(vxtime.now() - time.time()) < 1
+
+
+def test_run_backtest():
+    """测试回测模式下 feed 与定时events按触发时间合并处理"""
+    start = 1_000_000.0
+    engine = vxEngine()
+    handled = []
+
+    @engine.event_handler("on_bar")
+    def on_bar(context, event):
+        handled.append((event.type, vxtime.now()))
+
+    @engine.event_handler("on_timer")
+    def on_timer(context, event):
+        handled.append((event.type, vxtime.now()))
+
+    clock = vxVirtualClock(start)
+    with clock.install():
+        engine.submit_event(
+            "on_timer",
+            trigger=vxIntervalTrigger(100, start_dt=start + 50, end_dt=start + 260),
+        )
+    feed = [vxEvent(type="on_bar", trigger_dt=start + i * 100) for i in range(4)]
+
+    started = time.perf_counter()
+    count = engine.run_backtest(start + 1000, clock=clock, feed=feed)
+    assert time.perf_counter() - started < 1
+
+    assert count == len(handled) == 7
+    assert handled == sorted(handled, key=lambda x: x[1])
+    assert [dt - start for _, dt in handled] == [0, 50, 100, 150, 200, 250, 300]
+    assert clock.now() == start + 1000
+
+
+_STRATEGY = """
+from vxsched import vxengine
+
+
+@vxengine.event_handler("on_bar")
+def buy_once(context, event):
+    if not context.get("bought"):
+        context.account.submit_order("SHSE.600000", context.params["volume"], 10.0)
+        context.bought = True
+"""
+
+
+def _import_backtest():
+    """vxquant.model.portfolio 导入时需要连接通达信行情服务器，无法连接时跳过"""
+    try:
+        from vxquant.agent import backtest
+    except Exception as err:
+        pytest.skip(f"无法导入 vxquant.agent.backtest: {err}")
+    return backtest
+
+
+def _bar_store(root):
+    from vxquant.mdapi.barstore import vxBarStore
+
+    store = vxBarStore(root)
+    dates = pd.bdate_range("2023-01-03", periods=3)
+    index = pd.MultiIndex.from_product(
+        [dates, ["SHSE.600000"]], names=["date", "symbol"]
+    )
+    store.append(
+        pd.DataFrame(
+            {
+                "open": [10.0, 9.8, 11.0],
+                "high": [10.2, 10.0, 11.0],
+                "low": [9.9, 9.5, 10.8],
+                "close": [10.0, 9.9, 11.0],
+                "volume": 1e6,
+            },
+            index=index,
+        )
+    )
+    return store
+
+
+def test_run_backtest_with_bar_store(tmp_path):
+    """测试按K线撮合的成交、每日净值，以及同一进程中重复运行回测"""
+    backtest = _import_backtest()
+    from vxsched import vxengine
+
+    store = _bar_store(tmp_path / "bars")
+    mod_path = tmp_path / "strategy"
+    mod_path.mkdir()
+    (mod_path / "strategy.py").write_text(_STRATEGY, encoding="utf-8")
+
+    for volume, navs in ((100, [10000, 10005, 10115]), (200, [10000, 10015, 10235])):
+        result = backtest.run_backtest(
+            str(mod_path),
+            store,
+            start_date="2023-01-03",
+            end_date="2023-01-05",
+            balance=10000,
+            params={"volume": volume},
+        )
+        # 限价10.0买入，次日以开盘价9.8成交，佣金5元
+        assert result["nav"].round(2).tolist() == navs
+        position = vxengine.context.account.get_positions("SHSE.600000")
+        assert (position.volume, position.lasttrade) == (volume, 11.0)
+
+
+def test_engine_reset():
+    """测试重置后清空事件处理函数、待处理的events及上下文"""
+    engine = vxEngine()
+    engine.context.value = 1
+
+    @engine.event_handler("on_bar")
+    def on_bar(context, event):
+        pass
+
+    engine.submit_event("on_bar")
+    engine.reset()
+    assert "value" not in engine.context
+    assert not engine.event_handler.handlers.get("on_bar")
+    assert engine._event_queue.next_trigger_dt() is None
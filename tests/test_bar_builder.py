@@ -0,0 +1,114 @@
+"""测试K线合成"""
+
+import threading
+
+import pandas as pd
+
+from vxutils import to_timestamp
+from vxquant.mdapi.barbuilder import vxBarAggregator
+from vxquant.mdapi.calenders import vxTradingCalendar
+
+
+def _ticks(rows):
+    return pd.DataFrame(
+        [
+            (symbol, to_timestamp(dt), price, volume, volume * price, 9.9)
+            for symbol, dt, price, volume in rows
+        ],
+        columns=["symbol", "created_dt", "lasttrade", "volume", "amount", "yclose"],
+    )
+
+
+def test_bar_aggregator_replay():
+    """测试按交易时段对齐的多周期K线合成"""
+    calendar = vxTradingCalendar.from_weekdays("2023-01-02", "2023-01-31")
+    aggregator = vxBarAggregator(["1min", "5min", "1d"], calendar=calendar)
+    bars = aggregator.replay(
+        _ticks(
+            [
+                ("SHSE.600000", "2023-01-03 09:25:00", 10.0, 100),
+                ("SHSE.600000", "2023-01-03 09:30:30", 10.2, 300),
+                ("SZSE.000001", "2023-01-03 09:30:40", 5.0, 50),
+                ("SHSE.600000", "2023-01-03 09:31:10", 10.1, 600),
+                ("SHSE.600000", "2023-01-03 11:30:03", 10.5, 1000),
+                ("SHSE.600000", "2023-01-04 09:30:03", 10.6, 200),
+                ("SHSE.600000", "2023-01-07 10:00:00", 11.0, 1),
+            ]
+        )
+    )
+
+    minute = bars["1min"].loc[(slice(None), "SHSE.600000"), :].droplevel("symbol")
+    assert minute.index.strftime("%F %T").tolist() == [
+        "2023-01-03 09:31:00",
+        "2023-01-03 09:32:00",
+        "2023-01-03 11:30:00",
+        "2023-01-04 09:31:00",
+    ]
+    assert minute["volume"].tolist() == [300, 300, 400, 200]
+    assert minute["high"].tolist() == [10.2, 10.1, 10.5, 10.6]
+
+    daily = bars["1d"].xs("SHSE.600000", level="symbol")
+    assert daily[["open", "high", "low", "close"]].iloc[0].tolist() == [
+        10.0,
+        10.5,
+        10.0,
+        10.5,
+    ]
+    assert daily["yclose"].tolist() == [9.9, 10.5]
+    assert len(bars["5min"]) == 4
+
+
+def test_bar_aggregator_update():
+    """测试K线到时结束及迟到快照"""
+    calendar = vxTradingCalendar.from_weekdays("2023-01-02", "2023-01-31")
+    aggregator = vxBarAggregator(["1min"], calendar=calendar, close_delay=3)
+    ticks = _ticks([("SHSE.600000", "2023-01-03 09:30:30", 10.2, 300)])
+
+    assert aggregator.update(ticks, now=to_timestamp("2023-01-03 09:30:31")) == []
+    assert aggregator.flush(now=to_timestamp("2023-01-03 09:31:02")) == []
+    events = aggregator.flush(now=to_timestamp("2023-01-03 09:31:03"))
+    assert [event.type for event in events] == ["on_bar_1min"]
+    assert events[0].data.loc["SHSE.600000", "close"] == 10.2
+
+    late = _ticks([("SHSE.600000", "2023-01-03 09:30:59", 10.3, 400)])
+    assert aggregator.update(late, now=to_timestamp("2023-01-03 09:31:04")) == []
+    assert aggregator.current_bars("1min").empty
+
+
+def test_bar_aggregator_close_delay():
+    """测试下一根K线的快照不提前结束当前K线，以及多线程更新"""
+    calendar = vxTradingCalendar.from_weekdays("2023-01-02", "2023-01-31")
+    aggregator = vxBarAggregator(["1min"], calendar=calendar, close_delay=3)
+    aggregator.update(
+        _ticks([("SHSE.600000", "2023-01-03 09:30:30", 10.2, 300)]),
+        now=to_timestamp("2023-01-03 09:30:31"),
+    )
+    # 其他标的先收到下一分钟的快照，当前K线仍等待迟到的快照
+    early = _ticks([("SZSE.000001", "2023-01-03 09:31:01", 5.0, 50)])
+    assert aggregator.update(early, now=to_timestamp("2023-01-03 09:31:01")) == []
+    late = _ticks([("SHSE.600000", "2023-01-03 09:30:59", 10.3, 400)])
+    assert aggregator.update(late, now=to_timestamp("2023-01-03 09:31:02")) == []
+
+    events = aggregator.flush(now=to_timestamp("2023-01-03 09:31:03"))
+    assert events[0].data.loc["SHSE.600000", ["close", "volume"]].tolist() == [
+        10.3,
+        400,
+    ]
+    assert aggregator.current_bars("1min").index.tolist() == ["SZSE.000001"]
+
+    symbols = [f"SHSE.{600000 + i}" for i in range(50)]
+    threads = [
+        threading.Thread(
+            target=aggregator.update,
+            args=(_ticks([(symbol, "2023-01-03 09:31:30", 10.0, 100)]),),
+            kwargs={"now": to_timestamp("2023-01-03 09:31:31")},
+        )
+        for symbol in symbols
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    bars = aggregator.current_bars("1min")
+    assert sorted(bars.index) == symbols + ["SZSE.000001"]
+    assert bars.loc["SHSE.600001", "volume"] == 100
@@ -0,0 +1,66 @@
+"""测试本地K线库"""
+
+import pandas as pd
+
+from vxquant.mdapi.barstore import vxBarStore
+
+
+def test_bar_store_append_and_read(tmp_path):
+    """测试分区写入、增量追加覆盖以及日期、标的、字段筛选"""
+    store = vxBarStore(tmp_path, buckets=4)
+    dates = pd.bdate_range("2022-12-28", "2023-01-04")
+    symbols = ["SHSE.600000", "SHSE.600001", "SZSE.000001"]
+    index = pd.MultiIndex.from_product([dates, symbols], names=["date", "symbol"])
+    bars = pd.DataFrame({"close": range(len(index)), "volume": 100.0}, index=index)
+    assert store.append(bars) == 18
+
+    update = bars.loc[(slice("2023-01-04", None), slice(None)), :].copy()
+    update["close"] = -1
+    store.append(update)
+    assert {p.name for p in tmp_path.iterdir()} == {"frequency=1d"}
+    assert {p.name for p in (tmp_path / "frequency=1d").iterdir()} == {
+        "year=2022",
+        "year=2023",
+    }
+
+    result = store.read(["SHSE.600001"], ["close"], "2022-12-30", "2023-01-04")
+    assert list(result.columns) == ["close"]
+    assert result.index.get_level_values("symbol").unique().tolist() == [
+        "SHSE.600001"
+    ]
+    assert result["close"].tolist() == [7, 10, 13, -1]
+    assert store.last_date("SZSE.000001") == pd.Timestamp("2023-01-04")
+    assert store.read(["SHSE.600000"], ["close"], frequency="1min").empty
+
+
+def test_bar_store_schema_evolution(tmp_path):
+    """测试后续写入新增字段以及早期文件中整数类型的字段"""
+    store = vxBarStore(tmp_path, buckets=1)
+    # 早期版本写入的文件中 close 为 int64
+    legacy = tmp_path / "frequency=1d" / "year=2023" / "bucket=0"
+    legacy.mkdir(parents=True)
+    pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2023-01-03"]),
+            "symbol": ["SHSE.600000"],
+            "close": [10],
+            "_version": [1],
+        }
+    ).to_parquet(legacy / "part-1-legacy-0.parquet", index=False)
+
+    index = pd.MultiIndex.from_product(
+        [pd.to_datetime(["2023-01-04"]), ["SHSE.600000"]], names=["date", "symbol"]
+    )
+    store.append(pd.DataFrame({"close": [2.5], "volume": [100]}, index=index))
+
+    result = store.read(["SHSE.600000"], ["close", "volume"])
+    assert result["close"].tolist() == [10.0, 2.5]
+    assert result["volume"].isna().tolist() == [True, False]
+    assert result["volume"].iloc[1] == 100.0
+    assert list(store.read().columns) == ["close", "volume"]
+    assert store.last_date("SHSE.600000") == pd.Timestamp("2023-01-04")
+
+    # 后续追加的文件新增字段
+    store.append(pd.DataFrame({"close": [3.0], "amount": [300]}, index=index))
+    result = store.read(["SHSE.600000"], ["close", "amount"], "2023-01-04")
+    assert result.iloc[0].tolist() == [3.0, 300.0]
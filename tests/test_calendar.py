@@ -0,0 +1,56 @@
+"""测试交易日历"""
+
+import numpy as np
+import pytest
+
+from vxutils import vxtime
+from vxutils.convertors import to_timestamp
+from vxquant.mdapi.calenders import vxTradingCalendar, register_calendar
+
+
+def test_trading_calendar(tmp_path):
+    """测试交易日查询、前后交易日、区间及向量化版本"""
+    calendar = vxTradingCalendar.from_weekdays(
+        "2023-09-25", "2023-10-13", holidays=["2023-09-29", "2023-10-02"]
+    )
+    calendar = vxTradingCalendar.load(calendar.save(tmp_path))
+    assert calendar.exchange_id == "SHSE"
+
+    assert calendar.is_trading_day("2023-09-28")
+    assert not calendar.is_trading_day("2023-09-29")
+    assert not calendar.is_trading_day(to_timestamp("2023-09-30 10:00:00"))
+    assert calendar.next_trading_day("2023-09-28") == to_timestamp("2023-10-03")
+    assert calendar.prev_trading_day("2023-10-03", n=2) == to_timestamp("2023-09-27")
+    assert calendar.count_trading_days("2023-09-28", "2023-10-04") == 3
+    assert calendar.trading_days_between("2023-09-28", "2023-10-03").strftime(
+        "%F"
+    ).tolist() == ["2023-09-28", "2023-10-03"]
+    with pytest.raises(ValueError):
+        calendar.next_trading_day("2023-10-13")
+
+    timestamps = np.array(
+        [to_timestamp(t) for t in ["2023-09-28 10:00:00", "2023-09-29 10:00:00",
+                                   "2023-10-03 12:00:00", "2023-10-03 14:59:00"]]
+    )  # fmt: skip
+    assert calendar.is_trading_days(timestamps).tolist() == [True, False, True, True]
+    assert calendar.is_trading_times(timestamps).tolist() == [True, False, False, True]
+    assert calendar.next_trading_days(timestamps[:2]).tolist() == [
+        to_timestamp("2023-10-03")
+    ] * 2
+    assert calendar.sessions("2023-09-29") == []
+    assert calendar.session_close("2023-09-28") == to_timestamp("2023-09-28 15:00:00")
+
+    register_calendar(calendar, "SHSE", "SZSE")
+    try:
+        assert vxtime.is_holiday("2023-10-02")
+        assert not vxtime.is_holiday(to_timestamp("2023-10-03 09:00:00"))
+        # 日历范围之外按周末判断
+        assert vxtime.is_holiday("2024-01-06")
+        assert not vxtime.is_holiday("2024-01-05")
+    finally:
+        vxtime.set_calendar(None)
+
+    empty = vxTradingCalendar([])
+    assert empty.is_trading_days(timestamps).tolist() == [False] * 4
+    assert empty.is_trading_times(timestamps).tolist() == [False] * 4
+    assert not empty.is_trading_day("2023-09-28")
@@ -0,0 +1,56 @@
+"""测试事件日志"""
+
+from vxutils import vxtime
+from vxsched import vxEvent, vxEventQueue, vxEventJournal
+
+
+def test_journal_replay(tmp_path):
+    """测试重启后恢复未完成的events"""
+    journal = vxEventJournal(tmp_path, segment_size=512)
+    queue = vxEventQueue(journal=journal)
+    now = vxtime.now()
+    for i in range(10):
+        queue.put(vxEvent(type="test", data=i, trigger_dt=now - 10 + i))
+    queue.put(vxEvent(type="__internal__", trigger_dt=now - 20))
+
+    assert queue.get().type == "__internal__"
+    events = [queue.get() for _ in range(5)]
+    assert [event.data for event in events] == [0, 1, 2, 3, 4]
+    # 第5个event已取出但未处理完成，重启后再次投递
+    for event in events[:4]:
+        queue.done(event)
+    journal.close()
+
+    # 已完成的分段文件被删除
+    assert len(list(tmp_path.glob("*.journal"))) < 5
+
+    queue = vxEventQueue(journal=vxEventJournal(tmp_path))
+    assert [queue.get().data for _ in range(6)] == [4, 5, 6, 7, 8, 9]
+    assert queue.qsize() == 0
+
+
+def test_high_water_mark(tmp_path):
+    """测试超过内存水位时溢出至日志，并保持触发顺序"""
+    queue = vxEventQueue(journal=str(tmp_path), high_water_mark=3)
+    now = vxtime.now()
+    for i in (5, 1, 7, 3, 9, 0, 8, 2, 6, 4):
+        queue.put(vxEvent(type="test", data=i, trigger_dt=now - 10 + i))
+
+    assert len(queue.queue) <= 5
+    assert queue.qsize() == 10
+    assert [queue.get().data for _ in range(10)] == list(range(10))
+
+
+def test_journal_keeps_done_segments(tmp_path):
+    """含DONE记录的分段在更早的分段删除前保留，已完成的event不会在重启后恢复"""
+    journal = vxEventJournal(tmp_path)
+    journal.put(vxEvent(type="test", id="a"))
+    journal.put(vxEvent(type="test", id="x"))
+    journal._roll()
+    journal.done("x")
+    journal._roll()
+    journal.put(vxEvent(type="test", id="b"))
+    journal.close()
+
+    events = vxEventJournal(tmp_path).replay()
+    assert sorted(event.id for event, _ in events) == ["a", "b"]
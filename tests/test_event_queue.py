@@ -0,0 +1,72 @@
+"""测试消息队列的流控策略"""
+
+from queue import Full
+
+import pytest
+
+from vxutils import vxtime
+from vxsched import vxEvent, vxEventQueue, vxTrigger, OverflowPolicy
+
+
+def _fill(queue, n):
+    now = vxtime.now()
+    for i in range(n):
+        queue.put_nowait(vxEvent(type=f"test_{i % 2}", data=i, trigger_dt=now - 10 + i))
+
+
+def test_block_and_reject():
+    """测试队列满时阻塞超时及拒绝"""
+    queue = vxEventQueue(maxsize=2)
+    _fill(queue, 2)
+    with pytest.raises(Full):
+        queue.put_nowait("test")
+    with pytest.raises(Full):
+        queue.put("test", timeout=0.05)
+    assert queue.metrics["blocked"] == 1
+    assert queue.metrics["blocked_seconds"] >= 0.05
+
+    queue = vxEventQueue(maxsize=2, overflow="Reject")
+    _fill(queue, 2)
+    with pytest.raises(Full):
+        queue.put("test")
+    assert queue.metrics["rejected"] == 1
+
+
+def test_drop_oldest_and_coalesce():
+    """测试丢弃最早的event以及合并同类型event"""
+    queue = vxEventQueue(maxsize=3, overflow=OverflowPolicy.DropOldest)
+    _fill(queue, 5)
+    assert [queue.get_nowait().data for _ in range(3)] == [2, 3, 4]
+    assert queue.metrics["dropped"] == 2
+
+    queue = vxEventQueue(maxsize=3, overflow=OverflowPolicy.Coalesce)
+    _fill(queue, 5)
+    assert sorted(event.data for event in queue.queue) == [2, 3, 4]
+    assert queue.metrics["coalesced"] == 2
+
+
+def test_overflow_exemptions():
+    """测试周期event及RPC回复不被丢弃，以及消费线程不阻塞等待"""
+    queue = vxEventQueue(maxsize=2, overflow=OverflowPolicy.DropOldest)
+    queue.put_nowait(vxEvent(type="every", trigger=vxTrigger.every(60)))
+    queue.put_nowait(vxEvent(type="reply", reply_to="request-1"))
+    _fill(queue, 3)
+    assert queue.metrics["size"] == 2
+    assert queue.metrics["dropped"] == 2
+    assert sorted(event.type for event in queue.queue) == ["every", "reply", "test_0"]
+
+    queue.put_nowait(vxEvent(type="reply", reply_to="request-2"))
+    assert queue.metrics["size"] == 3
+
+    queue = vxEventQueue(maxsize=1, overflow=OverflowPolicy.DropOldest)
+    queue.put_nowait(vxEvent(type="reply", reply_to="request-1"))
+    with pytest.raises(Full):
+        queue.put_nowait("test")
+
+    queue = vxEventQueue(maxsize=1)
+    _fill(queue, 1)
+    queue.get_nowait()
+    _fill(queue, 1)
+    with pytest.raises(Full):
+        queue.put("test")
+    assert queue.metrics["blocked"] == 0
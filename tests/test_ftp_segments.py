@@ -0,0 +1,171 @@
+"""测试FTP分段文件消息传输"""
+
+import ftplib
+import gc
+import io
+import socket
+import threading
+
+import pytest
+
+pyftpdlib_servers = pytest.importorskip("pyftpdlib.servers")
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+
+from vxsched.pubsubs.ftp import (
+    pack_frames,
+    unpack_frames,
+    vxFTPSegmentPublisher,
+    vxFTPSegmentSubscriber,
+)
+from vxsched.event import vxEvent
+from vxutils.net import vxFTPConnector
+
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("test", "test", str(tmp_path), perm="elradfmwMT")
+    handler = type("TestFTPHandler", (FTPHandler,), {"authorizer": authorizer})
+    server = pyftpdlib_servers.FTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"timeout": 0.1}, daemon=True
+    )
+    thread.start()
+    yield server.address[1]
+    server.close_all()
+
+
+def test_frames():
+    """测试帧打包与不完整帧的处理"""
+    events = [vxEvent(type="test", data=i) for i in range(3)]
+    data = pack_frames(events)
+
+    unpacked, consumed = unpack_frames(data)
+    assert consumed == len(data)
+    assert [event.data for event in unpacked] == [0, 1, 2]
+
+    unpacked, consumed = unpack_frames(data[:-1])
+    assert [event.data for event in unpacked] == [0, 1]
+    assert data[consumed:] == pack_frames(events[2:])
+
+
+def test_segment_pubsub(ftp_server):
+    """测试分段文件的发布、增量订阅以及分段滚动"""
+    kwargs = dict(host="127.0.0.1", port=ftp_server, user="test", passwd="test")
+    subscriber = vxFTPSegmentSubscriber("test", from_beginning=True, **kwargs)
+    subscriber._interval = 0
+    publisher = vxFTPSegmentPublisher(
+        "test", batch_interval=60, segment_size=200, max_segments=2, **kwargs
+    )
+
+    for i in range(3):
+        publisher("test_event", data=i)
+    publisher.flush()
+    assert [event.data for event in subscriber()] == [0, 1, 2]
+    assert subscriber() == []
+
+    for i in range(3, 20):
+        publisher("test_event", data=i)
+        publisher.flush()
+    assert len(publisher._manifests["/test"]["segments"]) <= 2
+
+    received = [event.data for event in subscriber()]
+    assert received == sorted(received)
+    assert received[-1] == 19
+
+
+def test_segment_publisher_retry(ftp_server):
+    """测试未清理分段文件时不丢失events，以及上传失败后重试"""
+    kwargs = dict(host="127.0.0.1", port=ftp_server, user="test", passwd="test")
+    subscriber = vxFTPSegmentSubscriber("retry", from_beginning=True, **kwargs)
+    subscriber._interval = 0
+    publisher = vxFTPSegmentPublisher(
+        "retry", batch_interval=60, segment_size=200, max_segments=100, **kwargs
+    )
+
+    for i in range(10):
+        publisher("test_event", data=i)
+        publisher.flush()
+    assert len(publisher._manifests["/retry"]["segments"]) > 1
+
+    append = publisher._ftp_conn.append
+    publisher._ftp_conn.append = lambda *args: False
+    publisher("test_event", data=10)
+    publisher.flush()
+    assert publisher._buffer_bytes > 0
+
+    publisher._ftp_conn.append = append
+    publisher("test_event", data=11)
+    publisher.flush()
+    assert publisher._buffer_bytes == 0
+    assert [event.data for event in subscriber()] == list(range(12))
+
+
+def test_connector_pool(ftp_server, tmp_path):
+    """测试连接池并行传输、断线重连以及传输统计"""
+    conn = vxFTPConnector("127.0.0.1", ftp_server, "test", "test", pool_size=3)
+    files = [(io.BytesIO(b"x" * 100), f"/file_{i}.bin") for i in range(6)]
+    assert conn.upload_many(files) == [True] * 6
+
+    buffers = [io.BytesIO() for _ in files]
+    results = conn.download_many(
+        [(remote_file, bfp) for (_, remote_file), bfp in zip(files, buffers)]
+    )
+    assert results == [True] * 6
+    assert all(bfp.getvalue() == b"x" * 100 for bfp in buffers)
+    assert conn.metrics["idle_sessions"] <= 3
+
+    # 服务端断开所有会话后自动重新登录
+    for ftp, _ in conn._idle_sessions:
+        ftp.sock.shutdown(socket.SHUT_RDWR)
+    assert conn.download("/file_0.bin", io.BytesIO())
+    assert conn.download("/not_exists.bin", io.BytesIO()) is False
+
+    metrics = conn.metrics
+    assert metrics["upload_files"] == 6
+    assert metrics["download_bytes"] == 700
+    assert metrics["relogins"] >= 1
+    assert metrics["errors"] == 1
+
+
+def test_connector_keepalive(ftp_server):
+    """测试登出或连接器被回收后保活线程退出"""
+    conn = vxFTPConnector("127.0.0.1", ftp_server, "test", "test", keepalive=0.05)
+    assert conn.download("/not_exists.bin", io.BytesIO()) is False
+    thread = conn._keepalive_thread
+    assert thread.is_alive()
+    conn.logout()
+    assert not thread.is_alive()
+    assert conn.metrics["idle_sessions"] == 0
+
+    assert conn.download("/not_exists.bin", io.BytesIO()) is False
+    thread = conn._keepalive_thread
+    del conn
+    gc.collect()
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_connector_append_no_retry(ftp_server, tmp_path, monkeypatch):
+    """测试会话失效时APPE重新登录重试，传输开始后出错不再重试"""
+    conn = vxFTPConnector("127.0.0.1", ftp_server, "test", "test")
+    assert conn.append(io.BytesIO(b"a" * 10), "/seg.bin")
+    for ftp, _ in conn._idle_sessions:
+        ftp.sock.shutdown(socket.SHUT_RDWR)
+    assert conn.append(io.BytesIO(b"b" * 10), "/seg.bin")
+
+    calls = []
+    storbinary = ftplib.FTP.storbinary
+
+    def broken_storbinary(self, cmd, fp, *args, **kwargs):
+        calls.append(cmd)
+        # 只写入一半数据后连接断开
+        storbinary(self, cmd, io.BytesIO(fp.read(5)), *args, **kwargs)
+        raise ConnectionResetError("connection reset")
+
+    monkeypatch.setattr(ftplib.FTP, "storbinary", broken_storbinary)
+    assert conn.append(io.BytesIO(b"c" * 10), "/seg.bin") is False
+    assert calls == ["APPE /seg.bin"]
+    assert (tmp_path / "seg.bin").read_bytes() == b"a" * 10 + b"b" * 10 + b"c" * 5
+    conn.logout()
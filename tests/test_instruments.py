@@ -0,0 +1,76 @@
+"""测试证券主数据"""
+
+import pandas as pd
+
+from vxquant.model.contants import SecType
+from vxquant.mdapi.instruments import vxInstrumentMaster
+
+
+def test_instrument_master_refresh(tmp_path):
+    """测试增量更新、证券池筛选及保存加载"""
+    master = vxInstrumentMaster()
+    changes = master.refresh(
+        pd.DataFrame(
+            {
+                "symbol": ["SHSE.600000", "SHSE.510300", "SZSE.000001"],
+                "name": ["浦发银行", "沪深300ETF", "平安银行"],
+            }
+        ),
+        as_of="2023-01-03",
+    )
+    assert changes["added"] == ["SHSE.600000", "SHSE.510300", "SZSE.000001"]
+
+    changes = master.refresh(
+        pd.DataFrame(
+            {
+                "symbol": ["SHSE.600000", "SHSE.510300", "SZSE.000002"],
+                "name": ["浦发银行", "300ETF", "万科A"],
+            }
+        ),
+        as_of="2023-02-01",
+        max_delist_ratio=0.5,
+    )
+    assert changes["added"] == ["SZSE.000002"]
+    assert changes["renamed"] == ["SHSE.510300"]
+    assert changes["delisted"] == ["SZSE.000001"]
+
+    assert master.get("SHSE.510300").name == "300ETF"
+    assert master.get("SHSE.510300").security_type == SecType.ETFLOF
+    assert master.get("SZSE.999999") is None
+    assert master.universe("2023-01-10") == [
+        "SHSE.600000",
+        "SHSE.510300",
+        "SZSE.000001",
+    ]
+    assert master.universe("2023-02-01", SecType.STOCK) == [
+        "SHSE.600000",
+        "SZSE.000002",
+    ]
+
+    path = master.save(tmp_path / "instruments.parquet")
+    loaded = vxInstrumentMaster.load(path)
+    assert loaded is vxInstrumentMaster.load(path)
+    pd.testing.assert_frame_equal(loaded.to_frame(), master.to_frame())
+
+
+def test_instrument_master_guards():
+    """测试上市日期的初始化以及证券列表不完整时不做退市处理"""
+    master = vxInstrumentMaster()
+    master.refresh(
+        pd.DataFrame(
+            {
+                "symbol": ["SHSE.600000", "SZSE.000001"],
+                "name": ["浦发银行", "平安银行"],
+                "listed_date": ["1999-11-10", None],
+            }
+        ),
+        as_of="2023-01-03",
+    )
+    assert master.universe("2000-01-04") == ["SHSE.600000"]
+
+    changes = master.refresh(
+        pd.DataFrame({"symbol": ["SHSE.600000"], "name": ["浦发银行"]}),
+        as_of="2023-01-04",
+    )
+    assert changes["delisted"] == []
+    assert master.universe("2023-01-04") == ["SHSE.600000", "SZSE.000001"]
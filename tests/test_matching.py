@@ -0,0 +1,99 @@
+"""测试模拟撮合引擎"""
+
+from vxquant.tdapi import sim
+from vxquant.tdapi.sim import vxMatchingEngine
+from vxquant.model.contants import OrderRejectReason, OrderStatus
+from vxquant.model.exchange import vxOrder, vxTick
+
+
+def _order(direction, volume, price):
+    return vxOrder(
+        symbol="SHSE.600000",
+        order_direction=direction,
+        volume=volume,
+        price=price,
+        order_type="Limit" if price > 0 else "Market",
+    )
+
+
+def _tick():
+    asks = [(10.01, 300), (10.02, 500), (10.03, 1000), (10.04, 100), (10.05, 100)]
+    bids = [(10.00, 200), (9.99, 400), (9.98, 100), (9.97, 100), (9.96, 100)]
+    depth = {}
+    for i, ((ask_p, ask_v), (bid_p, bid_v)) in enumerate(zip(asks, bids), 1):
+        depth.update(
+            {
+                f"ask{i}_p": ask_p,
+                f"ask{i}_v": ask_v,
+                f"bid{i}_p": bid_p,
+                f"bid{i}_v": bid_v,
+            }
+        )
+    return vxTick(symbol="SHSE.600000", yclose=10.0, lasttrade=10.0, **depth)
+
+
+def test_match_orders():
+    """测试价格优先、时间优先的部分成交、涨跌停拒绝及市价剩余撤销"""
+    engine = vxMatchingEngine()
+    buy_1002 = _order("Buy", 500, 10.02)
+    buy_1003 = _order("Buy", 700, 10.03)
+    buy_1001 = _order("Buy", 300, 10.01)
+    buy_limit_up = _order("Buy", 300, 11.5)
+    sell_market = _order("Sell", 1000, 0)
+    sell_999 = _order("Sell", 100, 9.99)
+    orders = [buy_1002, buy_1003, buy_1001, buy_limit_up, sell_market, sell_999]
+    engine.add_orders(orders)
+
+    trades, updated = engine.match({"SHSE.600000": _tick()})
+
+    # 价格更优的 buy_1003 先成交: 300@10.01 + 400@10.02
+    assert buy_1003.status == OrderStatus.Filled
+    (trade,) = [trade for trade in trades if trade.order_id == buy_1003.order_id]
+    assert abs(trade.price - (300 * 10.01 + 400 * 10.02) / 700) < 1e-3
+    # buy_1002 只剩 10.02 档的 100 股
+    assert buy_1002.status == OrderStatus.PartiallyFilled
+    assert buy_1002.filled_volume == 100
+    assert buy_1001.status == OrderStatus.New
+    assert buy_limit_up.status == OrderStatus.Rejected
+    assert buy_limit_up.reject_code == OrderRejectReason.IllegalPrice
+    # 市价卖单吃完买五档后剩余撤销，限价卖单无剩余盘口
+    assert sell_market.status == OrderStatus.Canceled
+    assert sell_market.filled_volume == 900
+    assert sell_999.status == OrderStatus.New
+
+    assert sorted(trade.volume for trade in trades) == [100, 700, 900]
+    assert len(updated) == 4
+    assert {order.order_id for order in engine.open_orders} == {
+        buy_1002.order_id,
+        buy_1001.order_id,
+        sell_999.order_id,
+    }
+
+    engine.cancel(buy_1001.order_id)
+    assert buy_1001.status == OrderStatus.Canceled
+    assert len(engine) == 2
+
+
+def test_sim_tdapi_on_tick(monkeypatch):
+    """测试模拟交易接口撮合后同时返回成交回报及委托状态更新"""
+
+    class _Response:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+    # 模拟交易接口初始化时检查网络连通
+    monkeypatch.setattr(sim.requests.Session, "get", lambda *args, **kw: _Response())
+    tdapi = sim.vxSIMTdAPI()
+    filled = tdapi.order_volume("SHSE.600000", 700, 10.02)
+    partial = tdapi.order_volume("SHSE.600000", 500, 10.02)
+
+    trades, orders = tdapi.on_tick({"SHSE.600000": _tick()})
+    assert sorted(trade.volume for trade in trades) == [100, 700]
+    assert {order.order_id: order.status for order in orders} == {
+        partial.order_id: OrderStatus.PartiallyFilled,
+        filled.order_id: OrderStatus.Filled,
+    }
+    assert tdapi.get_orders()[partial.exchange_order_id].filled_volume == 100
+    assert len(tdapi.get_execution_reports()) == 2
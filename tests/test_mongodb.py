@@ -0,0 +1,52 @@
+"""测试mongodb映射及索引"""
+
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from vxutils.database import mongodb
+from vxquant.model.exchange import vxOrder, vxTick
+
+
+def test_mapping_indexes(monkeypatch):
+    """测试主键、二级索引及ttl索引的建立，以及ttl collection 写入过期计时字段"""
+
+    def command(self, command, **kwargs):
+        # mongomock 不支持 replSetGetStatus，按单机模式处理
+        raise pymongo.errors.OperationFailure("not running with --replSet")
+
+    def create_index(self, keys, **kwargs):
+        # 已废弃的 background 参数不得传入
+        assert "background" not in kwargs
+        return create_index_(self, keys, **kwargs)
+
+    create_index_ = mongomock.collection.Collection.create_index
+    monkeypatch.setattr(mongomock.database.Database, "command", command)
+    monkeypatch.setattr(mongomock.collection.Collection, "create_index", create_index)
+    monkeypatch.setattr(mongodb, "MongoClient", mongomock.MongoClient)
+    db = mongodb.vxMongoDB("mongodb://localhost:27017", "test")
+    db.mapping(
+        "orders",
+        vxOrder,
+        ["order_id"],
+        indexes=[["account_id", "status"], "frozen_position_id"],
+    )
+    db.mapping("current", vxTick, ["symbol"], ttl=60)
+
+    indexes = {
+        tuple(info["key"]): info for info in db.orders.index_information().values()
+    }
+    assert indexes[(("order_id", 1),)]["unique"]
+    assert (("account_id", 1), ("status", 1)) in indexes
+    assert (("frozen_position_id", 1),) in indexes
+
+    indexes = {
+        tuple(info["key"]): info for info in db.current.index_information().values()
+    }
+    assert indexes[(("_expire_dt", 1),)]["expireAfterSeconds"] == 60
+
+    db.save("current", vxTick(symbol="SHSE.600000", lasttrade=10.0))
+    assert db.current.find_one({"symbol": "SHSE.600000"})["_expire_dt"] is not None
+    db.save("orders", vxOrder(account_id="a1", symbol="SHSE.600000"))
+    assert "_expire_dt" not in db.orders.find_one({})
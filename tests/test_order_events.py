@@ -0,0 +1,117 @@
+"""测试委托事件日志"""
+
+from vxquant.model.orderlog import vxOrderEventStore
+from vxquant.model.exchange import vxOrder, vxTrade
+
+
+def test_order_event_store():
+    """测试状态变化、成交累计、重复回报过滤以及重放审计"""
+    store = vxOrderEventStore()
+    order = vxOrder(
+        account_id="a1",
+        symbol="SHSE.600000",
+        order_direction="Buy",
+        order_offset="Open",
+        order_type="Limit",
+        volume=300,
+        price=10.0,
+    )
+    assert store.submit(order) == 0
+    assert store.submit(order) == 0
+
+    broker_order = vxOrder(order.message)
+    broker_order.status = "New"
+    broker_order.exchange_order_id = "ex_1"
+    assert store.on_status(broker_order)
+    assert not store.on_status(broker_order)
+
+    def trade(volume):
+        return vxTrade(
+            account_id="a1",
+            order_id=order.order_id,
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            volume=volume,
+            price=10.0,
+            commission=1.0,
+        )
+
+    first = trade(100)
+    assert store.on_fill(first).status.name == "PartiallyFilled"
+    assert store.has_trade(first.trade_id)
+    assert store.on_fill(first) is None
+
+    # 状态回报中的成交数量不与成交回报重复累计
+    broker_order.status = "PartiallyFilled"
+    broker_order.filled_volume = 100
+    assert store.on_status(broker_order)
+    assert store.get_order(order.order_id).filled_volume == 100
+
+    filled = store.on_fill(trade(200))
+    assert filled.status.name == "Filled"
+    assert filled.filled_volume == 300
+    assert filled.filled_amount == 3002.0
+    assert filled.exchange_order_id == "ex_1"
+    assert list(store.open_orders("a1")) == []
+
+    history = store.history(order.order_id)
+    assert [event["event"] for event in history] == [
+        "Submit",
+        "Status",
+        "Fill",
+        "Status",
+        "Fill",
+    ]
+    replayed = store.replay(order.order_id)
+    assert replayed.status == filled.status
+    assert replayed.filled_amount == filled.filled_amount
+
+
+def test_order_event_store_truncate():
+    """测试日终清除已终结的委托，保留未完成委托的成交信息及成交回报去重"""
+    store = vxOrderEventStore()
+
+    def order(account_id):
+        vxorder = vxOrder(
+            account_id=account_id,
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            order_offset="Open",
+            order_type="Limit",
+            volume=300,
+            price=10.0,
+        )
+        store.submit(vxorder)
+        return vxorder
+
+    def trade(vxorder, volume):
+        vxtrade = vxTrade(
+            account_id=vxorder.account_id,
+            order_id=vxorder.order_id,
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            volume=volume,
+            price=10.0,
+        )
+        store.on_fill(vxtrade)
+        return vxtrade
+
+    filled, other_filled, partial = order("a1"), order("a2"), order("a1")
+    trade(filled, 300)
+    trade(other_filled, 300)
+    first = trade(partial, 100)
+    nbytes = store.nbytes
+
+    assert store.truncate(["a1"]) == 1
+    assert filled.order_id not in store
+    assert store.get_order(other_filled.order_id).status.name == "Filled"
+
+    assert store.truncate() == 1
+    assert len(store) == 1
+    assert store.nbytes < nbytes
+    assert store.has_trade(first.trade_id)
+    assert store.on_fill(first) is None
+    assert store.get_order(partial.order_id).filled_volume == 100
+    trade(partial, 200)
+    assert store.get_order(partial.order_id).status.name == "Filled"
+    assert store.get_order(partial.order_id).filled_volume == 300
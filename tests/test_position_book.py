@@ -0,0 +1,36 @@
+"""测试持仓簿"""
+
+import pytest
+
+from vxquant.model.book import vxPositionBook
+from vxquant.model.exchange import vxCashPosition, vxPosition
+
+
+def test_position_book_snapshot():
+    """测试写入时复制、快照隔离以及异常回滚"""
+    book = vxPositionBook()
+    with book.transaction("a1") as positions:
+        positions["CNY"] = vxCashPosition(account_id="a1", volume_his=1000)
+        positions["SHSE.600000"] = vxPosition(account_id="a1", symbol="SHSE.600000")
+
+    snapshot = book.snapshot("a1")
+    assert book.version == 1
+    assert set(snapshot) == {"CNY", "SHSE.600000"}
+
+    with book.transaction("a1") as positions:
+        positions.edit("CNY").volume_today += 500
+        del positions["SHSE.600000"]
+        assert "SHSE.600000" not in positions
+
+    assert snapshot["CNY"].volume == 1000
+    assert "SHSE.600000" in snapshot
+    assert book["a1", "CNY"].volume == 1500
+    assert ("a1", "SHSE.600000") not in book
+
+    with pytest.raises(ValueError):
+        with book.transaction("a1") as positions:
+            positions.edit("CNY").volume_today = 0
+            raise ValueError("rollback")
+    assert book["a1", "CNY"].volume == 1500
+    assert book.version == 2
+    assert book.snapshot("a2") == {}
@@ -0,0 +1,38 @@
+"""测试交易所预设"""
+
+import pytest
+
+from vxquant.model.contants import SecType
+from vxquant.model.preset import vxMarketPreset, presets_for
+
+
+def test_market_preset():
+    """测试前缀匹配、完整代码匹配及共享只读对象"""
+    preset = vxMarketPreset("SHSE.600000")
+    assert preset is vxMarketPreset("SHSE.600000")
+    assert preset.security_type == SecType.STOCK
+    assert preset.upper_limit_ratio == 1.1
+    with pytest.raises(AttributeError):
+        preset.price_tick = 1
+
+    assert vxMarketPreset("SHSE.204001").security_type == SecType.REPO
+    cash = vxMarketPreset("SHSE.511990")
+    assert cash.security_type == SecType.CASH and cash.allow_t0
+    # 完整代码的预设只对完全相同的代码生效
+    assert vxMarketPreset("SHSE.5119901").security_type == SecType.ETFLOF
+    assert vxMarketPreset("XXXX.000000").security_type == SecType.OTHER
+
+
+def test_presets_for():
+    """测试批量获取预设值"""
+    symbols = ["SHSE.600000", "SHSE.511990", "SHSE.600000"]
+    presets = presets_for(symbols)
+    assert presets.index.tolist() == symbols
+    assert presets["security_type"].tolist() == [
+        SecType.STOCK,
+        SecType.CASH,
+        SecType.STOCK,
+    ]
+    assert presets["volume_unit"].tolist() == [100, 100, 100]
+    assert presets["allow_t0"].tolist() == [False, True, False]
+    assert presets_for([]).empty
@@ -0,0 +1,61 @@
+"""测试复权价格缓存"""
+
+import numpy as np
+import pandas as pd
+
+from vxquant.mdapi.pricecache import vxAdjustedArray, vxPriceCache
+
+
+def test_price_cache_adjustment(tmp_path):
+    """测试内存映射视图、前/后复权以及除权除息事件"""
+    dates = pd.bdate_range("2023-01-02", periods=5)
+    cache = vxPriceCache.create(tmp_path, ["A", "B", "C"], dates)
+    index = pd.MultiIndex.from_product([dates[:3], ["A", "B"]], names=["date", "symbol"])
+    cache.write(
+        pd.DataFrame(
+            {"close": [10.0, 20.0, 11.0, 21.0, 12.0, 22.0],
+             "factor": [1.0, 1.0, 2.0, 1.0, 2.0, 1.0]},
+            index=index,
+        )
+    )  # fmt: skip
+    cache.flush()
+
+    cache = vxPriceCache(tmp_path, readonly=True)
+    raw = cache.raw("close", ["A", "B"], end_date=dates[2])
+    assert isinstance(raw.base, np.memmap) or isinstance(raw, np.memmap)
+    assert isinstance(cache.adjusted("close"), vxAdjustedArray)
+    assert cache.adjusted("close", symbols=["A"])[0, :3].tolist() == [5.0, 11.0, 12.0]
+    backward = cache.frame("close", "backward", ["A"], end_date=dates[2])
+    assert backward["A"].tolist() == [10.0, 22.0, 24.0]
+
+    cache = vxPriceCache(tmp_path)
+    cache.on_corporate_action("B", dates[1], 2.0)
+    assert (cache.version("A"), cache.version("B")) == (0, 1)
+    forward = cache.frame("close", "forward", ["B", "A"], end_date=dates[2])
+    assert forward["B"].tolist() == [10.0, 21.0, 22.0]
+    assert forward["A"].tolist() == [5.0, 11.0, 12.0]
+
+
+def test_price_cache_factor_fill(tmp_path):
+    """复权因子只填充至下一个显式写入的列，单次写入中跳过的日期沿用之前的值"""
+    dates = pd.bdate_range("2023-01-02", periods=6)
+    cache = vxPriceCache.create(tmp_path, ["A", "B"], dates)
+
+    def _factor(symbol, days, values):
+        index = pd.MultiIndex.from_product(
+            [dates[days], [symbol]], names=["date", "symbol"]
+        )
+        return pd.DataFrame({"factor": values}, index=index)
+
+    cache.write(_factor("A", [3], [2.0]))
+    cache.write(_factor("A", [0], [1.0]))
+    assert cache.raw("factor", ["A"])[0].tolist() == [1, 1, 1, 2, 2, 2]
+
+    cache.write(_factor("B", [0, 3], [3.0, 3.0]))
+    cache.on_corporate_action("B", dates[4], 2.0)
+    cache.write(_factor("B", [1], [3.0]))
+    assert cache.raw("factor", ["B"])[0].tolist() == [3, 3, 3, 3, 6, 6]
+    cache.flush()
+
+    cache = vxPriceCache(tmp_path, readonly=True)
+    assert cache.raw("factor", ["A"])[0].tolist() == [1, 1, 1, 2, 2, 2]
@@ -0,0 +1,84 @@
+"""测试批量委托风控"""
+
+import numpy as np
+
+from vxquant.model.risk import vxBatchRiskChecker
+from vxquant.model.contants import OrderRejectReason, OrderStatus
+from vxquant.model.exchange import vxOrder, vxTick
+
+
+def _order(symbol, direction, volume, price, order_type="Limit"):
+    return vxOrder(
+        symbol=symbol,
+        order_direction=direction,
+        volume=volume,
+        price=price,
+        order_type=order_type,
+    )
+
+
+def test_batch_risk_check():
+    """测试交易规则、资金及持仓的累计占用以及自定义规则"""
+    orders = [
+        _order("SHSE.600000", "Buy", 100, 10.0),
+        _order("SHSE.600000", "Buy", 150, 10.0),
+        _order("SHSE.600001", "Buy", 100, 10.005),
+        _order("SHSE.600002", "Buy", 100, 12.0),
+        _order("SHSE.600003", "Buy", 200, 10.0),
+        _order("SHSE.600004", "Sell", 200, 10.0),
+        _order("SHSE.600004", "Sell", 200, 10.0),
+        _order("SHSE.600005", "Sell", 50, 0.0, "Market"),
+        _order("SHSE.600006", "Buy", 100, 10.0),
+    ]
+    ticks = {"SHSE.600002": vxTick(symbol="SHSE.600002", yclose=10.0)}
+    checker = vxBatchRiskChecker()
+    checker.add_rule(
+        "blacklist", lambda frame: (frame["symbol"] == "SHSE.600006").to_numpy()
+    )
+
+    result = checker.check(
+        orders,
+        cash=2_500,
+        positions={"SHSE.600004": 300, "SHSE.600005": 50},
+        ticks=ticks,
+    )
+
+    assert result.accepted.tolist() == [
+        True, False, False, False, False, True, False, True, False
+    ]  # fmt: skip
+    assert list(result.rules[~result.accepted]) == [
+        "lot_size", "price_tick", "price_limit", "cash", "position", "blacklist"
+    ]  # fmt: skip
+    assert result.reasons[4] == OrderRejectReason.NoEnoughCash
+    assert result.reasons[8] == OrderRejectReason.RiskRuleCheckFailed
+    assert all(o.status == OrderStatus.Rejected for o in result.rejected_orders)
+    assert np.count_nonzero(result.rejected) == len(result.rejected_orders) == 6
+
+
+def test_rejected_orders_release_cash_and_position():
+    """被拒绝的委托不占用资金及持仓，缺少价格的市价买单被拒绝"""
+    checker = vxBatchRiskChecker()
+    result = checker.check(
+        [
+            _order("SHSE.600000", "Buy", 100_000, 10.0),
+            _order("SHSE.600000", "Buy", 100, 10.0),
+            _order("SHSE.600001", "Buy", 100, 0.0, "Market"),
+        ],
+        cash=10_000,
+        positions={},
+    )
+    assert result.accepted.tolist() == [False, True, False]
+    assert list(result.rules) == ["cash", "", "market_price"]
+
+    result = checker.check(
+        [
+            _order("SHSE.600000", "Sell", 1000, 10.0),
+            _order("SHSE.600000", "Sell", 100, 10.0),
+            _order("SHSE.600000", "Sell", 400, 10.0),
+            _order("SHSE.600000", "Sell", 100, 10.0),
+        ],
+        cash=0,
+        positions={"SHSE.600000": 500},
+    )
+    assert result.accepted.tolist() == [False, True, True, False]
+    assert result.reasons[0] == OrderRejectReason.NoEnoughPosition
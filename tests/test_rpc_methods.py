@@ -0,0 +1,122 @@
+"""测试broker推送rpc方法表"""
+
+import copy
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+zmq = pytest.importorskip("zmq")
+
+from vxutils import vxZMQRequest
+from vxsched.event import vxEvent
+from vxsched.scripts import _default_broker_config
+from vxsched.pubsubs.zeromq import RPCMETHODS_CHANNEL, vxZMQRpcClient
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def broker(tmp_path):
+    frontend = f"tcp://127.0.0.1:{_free_port()}"
+    backend = f"tcp://127.0.0.1:{_free_port()}"
+    settings = copy.deepcopy(_default_broker_config)
+    settings["settings"]["frontend"]["addr"] = frontend
+    settings["settings"]["backend"]["addr"] = backend
+    config = tmp_path / "broker.json"
+    config.write_text(json.dumps(settings), encoding="utf-8")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"from vxsched.scripts import run_broker; run_broker({str(config)!r})",
+        ],
+        cwd=tmp_path,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(10):
+            request = vxZMQRequest(frontend, "", vxEvent.pack, vxEvent.unpack)
+            try:
+                request(vxEvent(type="__READY__", channel="__BROKER__"))
+                break
+            except TimeoutError:
+                request.reset()
+        else:
+            pytest.fail("broker 启动失败")
+        yield frontend, backend
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def test_rpc_methods_push(broker):
+    """测试worker注册方法后客户端绑定stub，方法表变化后重新绑定"""
+    frontend, backend = broker
+    client = vxZMQRpcClient(frontend, sub_url=backend)
+    assert client.methods_version == 0
+    assert client.methods == {}
+
+    ctx = zmq.Context()
+    worker = ctx.socket(zmq.XSUB)
+    worker.connect(backend)
+    worker.send(b"\x01rpc_test")
+    assert worker.poll(5000, zmq.POLLIN)
+    channel, packed_event = worker.recv_multipart()
+    assert (channel, vxEvent.unpack(packed_event).type) == (
+        b"rpc_test",
+        "__GET_RPCMETHODS__",
+    )
+    worker.send_multipart(
+        [
+            b"__BROKER__",
+            vxEvent.pack(
+                vxEvent(
+                    type="__RPC_METHODS__",
+                    data={"hello": "rpc_test"},
+                    channel="__BROKER__",
+                )
+            ),
+        ]
+    )
+    assert _wait(lambda: client.methods_version == 1)
+    assert client.methods == {"hello": "rpc_test"}
+    assert callable(client.__dict__["hello"])
+
+    # 后订阅的客户端同样收到方法表快照
+    watcher = ctx.socket(zmq.XSUB)
+    watcher.connect(backend)
+    watcher.send(b"\x01" + RPCMETHODS_CHANNEL.encode())
+    assert watcher.poll(5000, zmq.POLLIN)
+    snapshot = vxEvent.unpack(watcher.recv_multipart()[1]).data
+    assert (snapshot["version"], snapshot["methods"]) == (1, {"hello": "rpc_test"})
+
+    # worker 取消订阅后方法表版本递增，客户端解除绑定
+    worker.send(b"\x00rpc_test")
+    assert _wait(lambda: client.methods_version == 2)
+    assert not hasattr(client, "hello")
+
+    client.close()
+    worker.close(0)
+    watcher.close(0)
+    ctx.term()
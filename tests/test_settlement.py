@@ -0,0 +1,60 @@
+"""测试日终结算"""
+
+import pandas as pd
+import pytest
+
+from vxquant.model.settle import settle_frames
+
+
+def test_settle_frames():
+    """测试持仓滚动、委托超时、冻结及净值计算"""
+    accounts = pd.DataFrame(
+        [
+            {"account_id": "a1", "debt": 0.0, "fund_shares": 10_000.0},
+            {"account_id": "a2", "debt": 0.0, "fund_shares": 0.0},
+        ]
+    )
+    positions = pd.DataFrame(
+        [
+            {"account_id": "a1", "symbol": "CNY", "volume_his": 5_000.0,
+             "volume_today": 1_000.0, "lasttrade": 1.0, "cost": 6_000.0},
+            {"account_id": "a1", "symbol": "SHSE.600000", "volume_his": 0.0,
+             "volume_today": 300.0, "lasttrade": 10.0, "cost": 2_000.0},
+            {"account_id": "a1", "symbol": "SZSE.000001", "volume_his": 0.0,
+             "volume_today": 0.0, "lasttrade": 12.0, "cost": 0.0},
+            {"account_id": "a2", "symbol": "CNY", "volume_his": 100.0,
+             "volume_today": 0.0, "lasttrade": 1.0, "cost": 100.0},
+        ]
+    )  # fmt: skip
+    orders = pd.DataFrame(
+        [
+            {"order_id": "o1", "account_id": "a1", "symbol": "SHSE.600000",
+             "order_direction": "Sell", "volume": 200, "filled_volume": 0,
+             "price": 10.0, "status": "New", "due_dt": 200.0},
+            {"order_id": "o2", "account_id": "a1", "symbol": "SHSE.600000",
+             "order_direction": "Buy", "volume": 100, "filled_volume": 0,
+             "price": 10.0, "status": "New", "due_dt": 50.0},
+            {"order_id": "o3", "account_id": "a1", "symbol": "SHSE.600000",
+             "order_direction": "Buy", "volume": 100, "filled_volume": 50,
+             "price": 10.0, "status": "PartiallyFilled", "due_dt": 200.0},
+        ]
+    )  # fmt: skip
+
+    result = settle_frames(accounts, positions, orders, settle_dt=100.0)
+
+    assert result["expired_orders"]["order_id"].tolist() == ["o2"]
+    assert result["removed_positions"]["symbol"].tolist() == ["SZSE.000001"]
+
+    settled = result["positions"].set_index(["account_id", "symbol"])
+    assert settled.loc[("a1", "SHSE.600000"), "volume_his"] == 300
+    assert settled.loc[("a1", "SHSE.600000"), "volume_today"] == 0
+    assert settled.loc[("a1", "SHSE.600000"), "frozen"] == 200
+    assert settled.loc[("a1", "SHSE.600000"), "fnl"] == 1_000
+    assert settled.loc[("a1", "CNY"), "frozen"] == pytest.approx(501.5)
+
+    settled = result["accounts"].set_index("account_id")
+    assert settled.loc["a1", "balance"] == 6_000
+    assert settled.loc["a1", "marketvalue"] == 3_000
+    assert settled.loc["a1", "nav_yd"] == 9_000
+    assert settled.loc["a1", "fund_nav_yd"] == 0.9
+    assert settled.loc["a2", "fund_nav"] == 1.0
@@ -0,0 +1,83 @@
+"""测试股票账户的委托索引"""
+
+import pytest
+
+from vxquant.model.exchange import vxOrder, vxTrade
+
+
+def _import_portfolio():
+    """vxquant.model.portfolio 导入时需要连接通达信行情服务器，无法连接时跳过"""
+    try:
+        from vxquant.model import portfolio
+    except Exception as err:
+        pytest.skip(f"无法导入 vxquant.model.portfolio: {err}")
+    return portfolio
+
+
+def _status(order, status, exchange_order_id):
+    agent_order = vxOrder(order.message)
+    agent_order.status = status
+    agent_order.exchange_order_id = exchange_order_id
+    return agent_order
+
+
+def test_stock_account_order_indexes():
+    """测试按算法单号及交易所单号查询、未完成委托以及索引重建"""
+    portfolio = _import_portfolio()
+    account = portfolio.vxStockAccount(account_id="a1", balance=1_000_000)
+
+    buy, sell = account.submit_orders(
+        [("SHSE.600000", 1000, 10.0), ("SHSE.600001", 1000, 10.0)]
+    )
+    algo_order = vxOrder(buy.message)
+    algo_order.order_id = "algo_child"
+    algo_order.algo_order_id = "algo_1"
+    algo_order.status = "New"
+    account.on_order_status(algo_order)
+    assert set(account.get_orders(algo_order_id="algo_1")) == {"algo_child"}
+    assert set(account.get_open_orders()) == {
+        buy.order_id,
+        sell.order_id,
+        "algo_child",
+    }
+
+    # 交易所单号变更后，旧单号不再能查到委托
+    account.on_order_status(_status(buy, "New", "ex_1"))
+    account.on_order_status(_status(buy, "New", "ex_2"))
+    assert account.get_orders(exchange_order_id="ex_1") == {}
+    assert set(account.get_orders(exchange_order_id="ex_2")) == {buy.order_id}
+
+    account.on_execution_report(
+        vxTrade(
+            account_id="a1",
+            order_id=buy.order_id,
+            symbol="SHSE.600000",
+            order_direction="Buy",
+            volume=1000,
+            price=10.0,
+            commission=5.0,
+            status="Trade",
+        )
+    )
+    assert account.get_orders(order_id=buy.order_id)[buy.order_id].status.name == (
+        "Filled"
+    )
+    assert len(account.get_trades(order_id=buy.order_id)) == 1
+
+    account.on_order_status(_status(sell, "Canceled", "ex_3"))
+    assert set(account.get_open_orders()) == {"algo_child"}
+
+    indexes = (
+        dict(account._algo_order_index),
+        dict(account._exchange_order_index),
+        set(account._open_order_ids),
+        dict(account._order_trade_index),
+    )
+    account._rebuild_indexes()
+    assert (
+        dict(account._algo_order_index),
+        dict(account._exchange_order_index),
+        set(account._open_order_ids),
+        dict(account._order_trade_index),
+    ) == indexes
+    assert set(account.get_orders(exchange_order_id="ex_2")) == {buy.order_id}
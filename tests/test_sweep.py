@@ -0,0 +1,104 @@
+"""测试参数扫描"""
+
+import pandas as pd
+import pytest
+
+from vxquant.mdapi.barstore import vxBarStore
+
+_STRATEGY = """
+from vxsched import vxengine
+
+
+@vxengine.event_handler("on_bar")
+def buy_once(context, event):
+    if not context.get("bought"):
+        context.account.submit_order(
+            "SHSE.600000", context.params["volume"], context.params["price"]
+        )
+        context.bought = True
+"""
+
+
+def _import_sweep():
+    """vxquant.model.portfolio 导入时需要连接通达信行情服务器，无法连接时跳过"""
+    try:
+        from vxquant.agent import sweep
+    except Exception as err:
+        pytest.skip(f"无法导入 vxquant.agent.sweep: {err}")
+    return sweep
+
+
+@pytest.fixture
+def sweep_inputs(tmp_path):
+    store = vxBarStore(tmp_path / "bars")
+    dates = pd.bdate_range("2023-01-03", periods=4)
+    index = pd.MultiIndex.from_product(
+        [dates, ["SHSE.600000", "SHSE.600001"]], names=["date", "symbol"]
+    )
+    store.append(
+        pd.DataFrame(
+            {
+                "open": [10.0, 5.0, 9.8, 5.0, 11.0, 5.0, 12.0, 5.0],
+                "high": [10.2, 5.0, 10.0, 5.0, 11.0, 5.0, 12.0, 5.0],
+                "low": [9.9, 5.0, 9.5, 5.0, 10.8, 5.0, 12.0, 5.0],
+                "close": [10.0, 5.0, 9.9, 5.0, 11.0, 5.0, 12.0, 5.0],
+                "volume": 1e6,
+            },
+            index=index,
+        )
+    )
+    mod_path = tmp_path / "strategy"
+    mod_path.mkdir()
+    (mod_path / "strategy.py").write_text(_STRATEGY, encoding="utf-8")
+    return mod_path, store, tmp_path / "sweep"
+
+
+def test_parameter_sweep(sweep_inputs):
+    """测试两个参数的网格扫描、共享的K线文件以及断点续跑"""
+    sweep = _import_sweep()
+    mod_path, store, output = sweep_inputs
+    grid = {"volume": [100, 200], "price": [10.0, 9.0]}
+
+    runner = sweep.vxParameterSweep(
+        mod_path, store, grid, "2023-01-03", "2023-01-05", output, balance=10000
+    )
+    metrics = runner.run(max_workers=1)
+    assert len(runner) == len(metrics) == 4
+    # 限价9.0的买单不能成交，净值不变
+    unfilled = metrics[metrics["price"] == 9.0]
+    assert (unfilled["total_return"] == 0).all()
+    filled = metrics[metrics["price"] == 10.0].set_index("volume")
+    assert filled["total_return"].round(6).to_dict() == {100: 0.0115, 200: 0.0235}
+    assert set(runner.navs()["sweep_id"]) == set(metrics.index)
+    assert len(list(output.glob("bars-*.arrow"))) == 1
+
+    # 再次运行时跳过已完成的参数组合
+    mtimes = {p: p.stat().st_mtime_ns for p in (output / "runs").iterdir()}
+    runner.run(max_workers=1)
+    assert {p: p.stat().st_mtime_ns for p in (output / "runs").iterdir()} == mtimes
+
+    # 回测区间不同的扫描使用新的K线文件及结果，不返回其他扫描的结果
+    longer = sweep.vxParameterSweep(
+        mod_path, store, grid, "2023-01-03", "2023-01-06", output, balance=10000
+    )
+    assert longer.completed() == []
+    metrics = longer.run(max_workers=1)
+    assert len(metrics) == 4 and not set(metrics.index) & set(mtimes)
+    filled = metrics[metrics["price"] == 10.0].set_index("volume")
+    assert filled["total_return"].round(6).to_dict() == {100: 0.0215, 200: 0.0435}
+    assert len(list(output.glob("bars-*.arrow"))) == 2
+
+
+def test_read_bars_zero_copy(sweep_inputs):
+    """测试内存映射读取的K线不拷贝数值列"""
+    sweep = _import_sweep()
+    mod_path, store, output = sweep_inputs
+    runner = sweep.vxParameterSweep(
+        mod_path, store, {"volume": [100]}, "2023-01-03", "2023-01-06", output
+    )
+    output.mkdir()
+    bars = sweep._read_bars(str(runner._prepare_bars()))
+    expected = store.read(start_date="2023-01-03", end_date="2023-01-06")
+
+    pd.testing.assert_frame_equal(bars, expected, check_like=True)
+    assert not bars["close"].to_numpy().flags.writeable
@@ -0,0 +1,43 @@
+"""测试证券代码规范化"""
+
+import pytest
+
+from vxquant.model.nomalize import to_symbol, to_symbols, vxSymbolRegistry
+
+
+@pytest.mark.parametrize(
+    "instrument, symbol",
+    [
+        ("SHSE.600000", "SHSE.600000"),
+        ("sh600000", "SHSE.600000"),
+        ("600000.SH", "SHSE.600000"),
+        ("600000.SHSE", "SHSE.600000"),
+        ("sz.000001", "SZSE.000001"),
+        ("510300.ETF", "SHSE.510300"),
+        ("159919.OF", "SZSE.159919"),
+        ("CZCE.123456", "CZCE.123456"),
+        ("cny", "CNY"),
+    ],
+)
+def test_to_symbol(instrument, symbol):
+    assert to_symbol(instrument) == symbol
+
+
+def test_symbol_registry():
+    """测试代码驻留、整数id及批量规范化"""
+    registry = vxSymbolRegistry(cache_size=2)
+    assert registry.normalize("sh600000") is registry.normalize("600000.SH")
+    assert registry.ids_of(["SZ000001", "SHSE.600000", "000001.SZ"]).tolist() == [
+        1,
+        0,
+        1,
+    ]
+    assert registry.symbol_of(1) == "SZSE.000001"
+    assert registry.symbols == ["SHSE.600000", "SZSE.000001"]
+    assert to_symbols(["sh600000", "sz000001", "sh600000"]).tolist() == [
+        "SHSE.600000",
+        "SZSE.000001",
+        "SHSE.600000",
+    ]
+    with pytest.raises(ValueError):
+        registry.normalize("600000")